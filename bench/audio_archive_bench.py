@@ -0,0 +1,109 @@
+"""Benchmark the rolling audio archive (server/audio_archive.py).
+
+Encodes synthetic room audio (quiet noise with speech-like bursts) the way
+the archive's reader thread does, writes it through the writer's batching
+into a temporary directory, then streams a time range back through the same
+span lookup and chunked reader the range API uses.  Reports:
+
+  * encode time per 64 ms chunk p50 / p99 (µs) and the share of one core
+  * bytes per minute on disk and the projected days within
+    AUDIO_ARCHIVE_MAX_BYTES
+  * batched write time per batch (AUDIO_ARCHIVE_FLUSH_SECONDS of audio)
+  * range streaming throughput and the peak Python memory it allocated
+    (a couple of PLAYBACK_CHUNK_BYTES pieces, whatever the range)
+
+Usage:
+    python bench/audio_archive_bench.py
+    python bench/audio_archive_bench.py --minutes 5 --bitrate 32000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from server import config, playback  # noqa: E402
+from server.audio_archive import AudioArchive, adts_header  # noqa: E402
+
+RATE = config.AUDIO_SAMPLE_RATE
+CHUNK = config.AUDIO_CHUNK_SIZE
+
+
+def room_audio(minutes: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n = int(minutes * 60 * RATE)
+    audio = rng.standard_normal(n) * 30
+    t = np.arange(n) / RATE
+    bursts = (np.sin(2 * np.pi * 0.2 * t) > 0.6)  # a third of the time "busy"
+    audio += bursts * 4000 * np.sin(2 * np.pi * (300 + 200 * np.sin(2 * np.pi * 3 * t)) * t)
+    return np.clip(audio, -32768, 32767).astype(np.int16)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=3)
+    parser.add_argument("--bitrate", type=int, default=config.AUDIO_ARCHIVE_BITRATE)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    config.AUDIO_ARCHIVE_BITRATE = args.bitrate
+    samples = room_audio(args.minutes, args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        config.AUDIO_ARCHIVE_DIR = tmp
+        archive = AudioArchive(None)
+        codec = archive._open_codec()
+        start = time.time()
+        seg = archive._new_segment(start)
+        encode_us, write_ms, batch = [], [], []
+        batch_frames = int(config.AUDIO_ARCHIVE_FLUSH_SECONDS * RATE / CHUNK)
+        for i, pts in enumerate(range(0, len(samples) - CHUNK + 1, CHUNK)):
+            began = time.perf_counter()
+            for packet in codec.encode(archive._frame(samples[pts:pts + CHUNK].tobytes(), pts)):
+                batch.append((start + packet.pts / RATE, adts_header(packet.size) + bytes(packet)))
+            encode_us.append((time.perf_counter() - began) * 1e6)
+            if (i + 1) % batch_frames == 0:
+                began = time.perf_counter()
+                archive._write(seg, batch)
+                write_ms.append((time.perf_counter() - began) * 1000)
+                batch = []
+        batch += archive._drain(codec, start)
+        if batch:
+            archive._write(seg, batch)
+        archive._close(seg)
+
+        seconds = len(samples) / RATE
+        per_minute = seg["size"] / seconds * 60
+        encode_us.sort()
+        print(f"# {args.minutes:.0f} min at {args.bitrate // 1000} kbps AAC-LC, "
+              f"{config.AUDIO_ARCHIVE_FLUSH_SECONDS}s write batches")
+        print(f"encode per {CHUNK * 1000 // RATE} ms chunk: p50 {encode_us[len(encode_us) // 2]:.0f} µs, "
+              f"p99 {encode_us[int(len(encode_us) * 0.99)]:.0f} µs; "
+              f"one core: {sum(encode_us) / 1e6 / seconds * 100:.2f}%")
+        print(f"on disk: {per_minute / 1024:.0f} KB/min, "
+              f"{config.AUDIO_ARCHIVE_MAX_BYTES / (per_minute * 60 * 24):.1f} days in "
+              f"{config.AUDIO_ARCHIVE_MAX_BYTES / 2 ** 30:.0f} GB")
+        write_ms.sort()
+        if write_ms:
+            print(f"write per batch: p50 {write_ms[len(write_ms) // 2]:.2f} ms, max {write_ms[-1]:.2f} ms")
+
+        spans = archive.spans(start, start + seconds)
+        tracemalloc.start()
+        began = time.perf_counter()
+        sent = sum(len(piece) for piece in playback._iter_spans([s[:3] for s in spans]))
+        elapsed = time.perf_counter() - began
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"range stream: {sent / 1024:.0f} KB in {elapsed * 1000:.1f} ms "
+              f"({sent / elapsed / 2 ** 20:.0f} MB/s), peak allocation {peak / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
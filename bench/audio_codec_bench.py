@@ -0,0 +1,94 @@
+"""Benchmark the audio_stream payload formats (server/audio_codec.py).
+
+Encodes a few seconds of synthetic microphone audio (a voiced tone plus noise
+and silence gaps) chunk by chunk, as the broadcaster does, and reports per
+format:
+
+  * encode time per chunk p50 / p99 (µs) — paid once per chunk, not per listener
+  * bitrate (kbps) of the resulting audio_stream messages
+  * SNR (dB) of the decoded audio against the input (pcm and adpcm only;
+    Opus is perceptual, so SNR says little about it)
+
+Usage:
+    python bench/audio_codec_bench.py
+    python bench/audio_codec_bench.py --seconds 30 --formats adpcm opus
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from server import audio_codec, config  # noqa: E402
+
+
+def synth(seconds: float) -> np.ndarray:
+    rate = config.AUDIO_SAMPLE_RATE
+    t = np.arange(int(seconds * rate)) / rate
+    rng = np.random.default_rng(0)
+    voiced = 6000 * np.sin(2 * np.pi * 220 * t) + 2500 * np.sin(2 * np.pi * 1330 * t)
+    envelope = (np.sin(2 * np.pi * 0.7 * t) > -0.3).astype(float)  # pauses between "barks"
+    signal = voiced * envelope + 300 * rng.standard_normal(len(t))
+    return np.clip(signal, -32768, 32767).astype(np.int16)
+
+
+def run(fmt: str, samples: np.ndarray) -> dict:
+    encoder = audio_codec.create_encoder(fmt)
+    chunk = config.AUDIO_CHUNK_SIZE
+    timings, total_bytes, payloads = [], 0, []
+    for start in range(0, len(samples) - chunk + 1, chunk):
+        pcm = samples[start:start + chunk].tobytes()
+        began = time.perf_counter()
+        payload = encoder.encode(pcm)
+        timings.append((time.perf_counter() - began) * 1e6)
+        total_bytes += len(payload)
+        payloads.append(payload)
+
+    snr = None
+    if fmt in ("pcm", "adpcm"):
+        decoded = np.concatenate([
+            np.frombuffer(p, dtype=np.int16) if fmt == "pcm" else audio_codec.adpcm_decode(p)
+            for p in payloads])
+        reference = samples[:len(decoded)].astype(float)
+        noise = ((reference - decoded) ** 2).mean()
+        snr = float("inf") if noise == 0 else 10 * np.log10((reference ** 2).mean() / noise)
+
+    seconds = len(timings) * chunk / config.AUDIO_SAMPLE_RATE
+    timings.sort()
+    return {
+        "p50": timings[len(timings) // 2],
+        "p99": timings[int(len(timings) * 0.99)],
+        "kbps": total_bytes * 8 / seconds / 1000,
+        "snr": snr,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--formats", nargs="+", default=list(audio_codec.FORMATS))
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    samples = synth(args.seconds)
+    print(f"# {config.AUDIO_CHUNK_SIZE} samples/chunk @ {config.AUDIO_SAMPLE_RATE} Hz, "
+          f"{args.seconds:.0f}s of audio")
+    header = f"{'format':<7} {'p50 µs':>8} {'p99 µs':>8} {'kbps':>7} {'SNR dB':>7}"
+    print(header)
+    print("-" * len(header))
+    for fmt in args.formats:
+        if fmt == "opus" and not audio_codec.opus_available():
+            print(f"{fmt:<7} (libopus not available)")
+            continue
+        r = run(fmt, samples)
+        snr = "-" if r["snr"] is None else f"{r['snr']:.1f}"
+        print(f"{fmt:<7} {r['p50']:>8.1f} {r['p99']:>8.1f} {r['kbps']:>7.1f} {snr:>7}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
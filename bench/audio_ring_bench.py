@@ -0,0 +1,159 @@
+"""Benchmark the microphone fan-out: per-listener queues vs. the shared ring.
+
+Simulates the PortAudio callback at the real chunk rate with N listener
+threads reading concurrently, and reports per configuration:
+
+  * callback time p50 / p99 / max (µs) — the work done on the audio thread
+  * chunks delivered per listener, and chunks missed (ring) or listeners
+    evicted (queues) when one listener stalls for --stall seconds
+
+"queue" reproduces the previous AudioCapture (tobytes + lock + one
+queue.Queue(maxsize=50) per listener, full queues evicted); "ring" is the
+current PcmRing / AudioReader.
+
+Usage:
+    python bench/audio_ring_bench.py
+    python bench/audio_ring_bench.py --listeners 1 10 50 --seconds 5 --stall 5
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from server import config  # noqa: E402
+from server.audio import AudioReader, PcmRing  # noqa: E402
+
+
+class QueueFanout:
+    """The previous AudioCapture callback, kept here for comparison."""
+
+    def __init__(self):
+        self._listeners: list[queue.Queue] = []
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def callback(self, indata):
+        pcm_bytes = indata.tobytes()
+        with self._lock:
+            dead = []
+            for q in self._listeners:
+                try:
+                    q.put_nowait(pcm_bytes)
+                except queue.Full:
+                    dead.append(q)
+            for q in dead:
+                self._listeners.remove(q)
+                self.evicted += 1
+
+    def add_listener(self):
+        q = queue.Queue(maxsize=50)
+        with self._lock:
+            self._listeners.append(q)
+
+        def read(timeout):
+            try:
+                return q.get(timeout=timeout), 0
+            except queue.Empty:
+                return None
+        return read
+
+
+class RingFanout:
+    def __init__(self):
+        self._ring = PcmRing(config.AUDIO_RING_CHUNKS,
+                             config.AUDIO_CHUNK_SIZE * config.AUDIO_CHANNELS)
+        self.evicted = 0
+
+    def callback(self, indata):
+        self._ring.write(indata)
+
+    def add_listener(self):
+        return AudioReader(self._ring).read
+
+
+def run(kind: str, listeners: int, seconds: float, stall: float) -> dict:
+    fanout = QueueFanout() if kind == "queue" else RingFanout()
+    stop = threading.Event()
+    delivered = [0] * listeners
+    missed = [0] * listeners
+
+    def listen(index, read):
+        stalled = False
+        while not stop.is_set():
+            if index == 0 and stall and not stalled and delivered[0] > 5:
+                time.sleep(stall)  # one slow client
+                stalled = True
+            item = read(0.2)
+            if item is not None:
+                delivered[index] += 1
+                missed[index] += item[1]
+
+    threads = [threading.Thread(target=listen, args=(i, fanout.add_listener()), daemon=True)
+               for i in range(listeners)]
+    for t in threads:
+        t.start()
+
+    chunk = np.zeros((config.AUDIO_CHUNK_SIZE, config.AUDIO_CHANNELS), dtype=np.int16)
+    period = config.AUDIO_CHUNK_SIZE / config.AUDIO_SAMPLE_RATE
+    timings = []
+    next_tick = time.perf_counter()
+    end = next_tick + seconds
+    while next_tick < end:
+        chunk[0, 0] = len(timings)
+        started = time.perf_counter()
+        fanout.callback(chunk)
+        timings.append((time.perf_counter() - started) * 1e6)
+        next_tick += period
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+    time.sleep(0.3)
+    stop.set()
+    for t in threads:
+        t.join(timeout=1)
+
+    timings.sort()
+    return {
+        "p50": timings[len(timings) // 2],
+        "p99": timings[int(len(timings) * 0.99)],
+        "max": timings[-1],
+        "chunks": len(timings),
+        "delivered_min": min(delivered),
+        "delivered_stalled": delivered[0],
+        "missed_stalled": missed[0],
+        "evicted": fanout.evicted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kinds", nargs="+", default=["queue", "ring"])
+    parser.add_argument("--listeners", nargs="+", type=int, default=[1, 5, 20, 50])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--stall", type=float, default=4.5,
+                        help="listener 0 stops reading this long (0 = never)")
+    args = parser.parse_args()
+
+    print(f"# {config.AUDIO_CHUNK_SIZE} samples/chunk @ {config.AUDIO_SAMPLE_RATE} Hz, "
+          f"{args.seconds:.0f}s per run, listener 0 stalls {args.stall}s")
+    header = (f"{'kind':<6} {'listeners':>9} {'p50 µs':>8} {'p99 µs':>8} {'max µs':>8} "
+              f"{'chunks':>7} {'min recv':>9} {'stalled recv':>13} {'missed':>7} {'evicted':>8}")
+    print(header)
+    print("-" * len(header))
+    for listeners in args.listeners:
+        for kind in args.kinds:
+            r = run(kind, listeners, args.seconds, args.stall)
+            print(f"{kind:<6} {listeners:>9} {r['p50']:>8.1f} {r['p99']:>8.1f} {r['max']:>8.1f} "
+                  f"{r['chunks']:>7} {r['delivered_min']:>9} {r['delivered_stalled']:>13} "
+                  f"{r['missed_stalled']:>7} {r['evicted']:>8}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
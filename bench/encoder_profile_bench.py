@@ -0,0 +1,155 @@
+"""Benchmark WebRTC encoder profiles on a replayed clip.
+
+Decodes a clip into memory once, then feeds the same frames through the
+server's profile encoders (server/encoder_profiles.py) for every codec x
+profile combination and reports:
+
+  * CPU ms per frame (process CPU time, all encoder threads included)
+  * wall ms per frame
+  * bytes per second of RTP payload at the clip's frame rate
+  * number of keyframes
+
+Usage:
+    python bench/encoder_profile_bench.py clips/clip_20250101_120000_000.mp4
+    python bench/encoder_profile_bench.py --seconds 20 --fps 15   # synthetic clip
+    python bench/encoder_profile_bench.py --codecs H264 --profiles low_latency quality
+
+Without an input file a synthetic 1280x720 clip (moving noise and a panning
+gradient) is generated, which is harder to compress than a typical room.
+"""
+
+import argparse
+import fractions
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import av  # noqa: E402
+import numpy as np  # noqa: E402
+from aiortc.codecs.vpx import VpxPayloadDescriptor  # noqa: E402
+
+from server import config, encoder_profiles  # noqa: E402
+
+TIME_BASE = fractions.Fraction(1, 90000)
+
+
+def load_clip(path: str, max_seconds: float) -> tuple[list[np.ndarray], int]:
+    container = av.open(path)
+    stream = container.streams.video[0]
+    fps = round(float(stream.average_rate or 15))
+    frames = []
+    for frame in container.decode(stream):
+        frames.append(frame.to_ndarray(format="bgr24"))
+        if len(frames) >= max_seconds * fps:
+            break
+    container.close()
+    return frames, fps
+
+
+def synthetic_clip(seconds: float, fps: int, width: int, height: int) -> list[np.ndarray]:
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 64, (height, width * 2, 3), dtype=np.uint8)
+    gradient = np.tile(np.linspace(0, 191, width * 2, dtype=np.uint8)[None, :, None],
+                       (height, 1, 3))
+    base = noise + gradient
+    frames = []
+    for i in range(int(seconds * fps)):
+        offset = (i * 6) % width
+        frames.append(np.ascontiguousarray(base[:, offset:offset + width]))
+    return frames
+
+
+def run(codec: str, profile_name: str, frames: list[np.ndarray], fps: int) -> dict:
+    _, profile = encoder_profiles.resolve_profile(profile_name)
+    encoder = encoder_profiles.create_encoder(encoder_profiles.CODEC_MIME_TYPES[codec], profile)
+    total_bytes = 0
+    keyframes = 0
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for i, raw in enumerate(frames):
+        frame = av.VideoFrame.from_ndarray(raw, format="bgr24")
+        frame.pts = int(i * 90000 / fps)
+        frame.time_base = TIME_BASE
+        payloads, _ = encoder.encode(frame, force_keyframe=(i == 0))
+        total_bytes += sum(len(p) for p in payloads)
+        if _is_keyframe(codec, payloads):
+            keyframes += 1
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+    duration = len(frames) / fps
+    return {
+        "cpu_ms": cpu * 1000 / len(frames),
+        "wall_ms": wall * 1000 / len(frames),
+        "bytes_per_second": total_bytes / duration,
+        "keyframes": keyframes,
+    }
+
+
+def _is_keyframe(codec: str, payloads: list[bytes]) -> bool:
+    if not payloads:
+        return False
+    if codec == "H264":
+        # IDR slice (type 5) as a single NAL, inside a STAP-A or starting a FU-A
+        for p in payloads:
+            nal = p[0] & 0x1F
+            if nal == 5 or (nal == 28 and p[1] & 0x80 and p[1] & 0x1F == 5):
+                return True
+            if nal == 24 and _stap_has_idr(p):
+                return True
+        return False
+    # VP8: P bit clear in the first byte of the frame header
+    _, data = VpxPayloadDescriptor.parse(payloads[0])
+    return not data[0] & 0x01
+
+
+def _stap_has_idr(payload: bytes) -> bool:
+    pos = 1
+    while pos + 2 < len(payload):
+        size = int.from_bytes(payload[pos:pos + 2], "big")
+        if payload[pos + 2] & 0x1F == 5:
+            return True
+        pos += 2 + size
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", help="clip to replay (any format PyAV can decode)")
+    parser.add_argument("--seconds", type=float, default=10, help="clip length to use")
+    parser.add_argument("--fps", type=int, default=15, help="frame rate of the synthetic clip")
+    parser.add_argument("--resolution", default="1280x720", help="synthetic clip size")
+    parser.add_argument("--codecs", nargs="+", default=list(encoder_profiles.CODEC_MIME_TYPES))
+    parser.add_argument("--profiles", nargs="+", default=list(config.WEBRTC_PROFILES))
+    args = parser.parse_args()
+
+    if args.input:
+        frames, fps = load_clip(args.input, args.seconds)
+        source = os.path.basename(args.input)
+    else:
+        width, height = (int(v) for v in args.resolution.split("x"))
+        fps = args.fps
+        frames = synthetic_clip(args.seconds, fps, width, height)
+        source = "synthetic"
+    if not frames:
+        sys.exit("no frames decoded")
+    config.WEBRTC_DEFAULT_FPS = fps  # keyframe interval is derived from it
+    height, width = frames[0].shape[:2]
+
+    print(f"# {source}: {len(frames)} frames, {width}x{height} @ {fps}fps, "
+          f"x264 preset {config.WEBRTC_ENCODER_PRESET}")
+    header = f"{'codec':<6} {'profile':<12} {'cpu ms/f':>9} {'wall ms/f':>10} {'kB/s':>8} {'keyframes':>10}"
+    print(header)
+    print("-" * len(header))
+    for codec in encoder_profiles.parse_codecs(args.codecs):
+        for profile in args.profiles:
+            r = run(codec, profile, frames, fps)
+            print(f"{codec:<6} {profile:<12} {r['cpu_ms']:>9.2f} {r['wall_ms']:>10.2f} "
+                  f"{r['bytes_per_second'] / 1000:>8.1f} {r['keyframes']:>10}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Owner-to-display video: JPEG frames vs the phone's WebRTC track forwarded as is.
+
+Synthesises the owner's selfie camera (640x480 at 10 fps: a textured,
+mostly still room, a moving face-sized blob and sensor noise) and sends it
+both ways:
+
+  * "jpeg":    every frame a JPEG at quality 60 (cv2, standing in for the
+               phone's canvas.toBlob('image/jpeg', 0.6)), relayed as is
+  * "forward": H.264 with inter-frame compression at VIDEO_FORWARD_MAX_BITRATE
+               (libx264 veryfast / zerolatency, standing in for the phone's
+               WebRTC encoder, which is usually hardware); the server only
+               packetizes it for each display (server/video_forward.py)
+
+Reports the bytes per second each display receives (= the phone's upload
+for one display), the compression time per frame in software here (on the
+phone the WebRTC encoder is normally hardware and off the page's main
+thread, while the JPEG path also draws every frame to a canvas on it), and
+the server's time per frame per display: packetizing only when forwarding
+("transcode" is what decoding and re-encoding would cost instead).
+
+Usage:
+    python bench/owner_video_bench.py
+    python bench/owner_video_bench.py --seconds 20 --noise 6
+"""
+
+import argparse
+import fractions
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import av  # noqa: E402
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+from aiortc.codecs.h264 import H264Encoder  # noqa: E402
+
+from server import config  # noqa: E402
+
+WIDTH, HEIGHT, FPS = 640, 480, 10
+TIME_BASE = fractions.Fraction(1, 90000)
+
+
+def selfie_frames(seconds: float, noise: float, seed: int):
+    rng = np.random.default_rng(seed)
+    room = cv2.GaussianBlur(rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8), (0, 0), 3)
+    for k in range(int(seconds * FPS)):
+        frame = room.copy()
+        cx = int(WIDTH / 2 + 80 * np.sin(k / 15))
+        cy = int(HEIGHT / 2 + 30 * np.sin(k / 7))
+        cv2.ellipse(frame, (cx, cy), (90, 120), 0, 0, 360, (150, 170, 210), -1)
+        cv2.circle(frame, (cx - 35, cy - 20), 10, (40, 40, 40), -1)
+        cv2.circle(frame, (cx + 35, cy - 20), 10, (40, 40, 40), -1)
+        grain = rng.normal(0, noise, frame.shape)
+        yield np.clip(frame + grain, 0, 255).astype(np.uint8)
+
+
+def h264_encoder(bitrate: int):
+    codec = av.CodecContext.create("libx264", "w")
+    codec.width, codec.height = WIDTH, HEIGHT
+    codec.pix_fmt = "yuv420p"
+    codec.time_base = TIME_BASE
+    codec.framerate = fractions.Fraction(FPS, 1)
+    codec.gop_size = FPS * 10  # WebRTC encoders key on demand (PLI), not on a short GOP
+    codec.bit_rate = bitrate
+    codec.options = {"preset": "veryfast", "tune": "zerolatency",
+                     "maxrate": str(bitrate), "bufsize": str(bitrate)}
+    return codec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--noise", type=float, default=4, help="sensor noise (std of 0-255 levels)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    frames = list(selfie_frames(args.seconds, args.noise, args.seed))
+    bitrate = config.VIDEO_FORWARD_MAX_BITRATE
+
+    jpeg_bytes, jpeg_ms = 0, []
+    for raw in frames:
+        began = time.perf_counter()
+        _, data = cv2.imencode(".jpg", raw, [cv2.IMWRITE_JPEG_QUALITY, 60])
+        jpeg_ms.append((time.perf_counter() - began) * 1000)
+        jpeg_bytes += len(data)
+
+    encoder = h264_encoder(bitrate)
+    packets, encode_ms = [], []
+    for k, raw in enumerate(frames):
+        frame = av.VideoFrame.from_ndarray(raw, format="bgr24")
+        frame.pts, frame.time_base = k * 90000 // FPS, TIME_BASE
+        began = time.perf_counter()
+        out = encoder.encode(frame)
+        encode_ms.append((time.perf_counter() - began) * 1000)
+        packets += [bytes(p) for p in out]
+    packets += [bytes(p) for p in encoder.encode(None)]
+    h264_bytes = sum(map(len, packets))
+
+    # Server, per frame per display: forward (packetize) vs decode + re-encode
+    packer = H264Encoder()
+    pack_ms = []
+    for k, data in enumerate(packets):
+        packet = av.Packet(data)
+        packet.pts, packet.time_base = k * 90000 // FPS, TIME_BASE
+        began = time.perf_counter()
+        packer.pack(packet)
+        pack_ms.append((time.perf_counter() - began) * 1000)
+    decoder = av.CodecContext.create("h264", "r")
+    reencoder = h264_encoder(bitrate)
+    transcode_ms = []
+    for k, data in enumerate(packets):
+        began = time.perf_counter()
+        for decoded in decoder.decode(av.Packet(data)):
+            decoded.pts, decoded.time_base = k * 90000 // FPS, TIME_BASE
+            reencoder.encode(decoded)
+        transcode_ms.append((time.perf_counter() - began) * 1000)
+
+    seconds = len(frames) / FPS
+    print(f"# {seconds:.0f}s of {WIDTH}x{HEIGHT} at {FPS} fps, noise {args.noise}, "
+          f"H.264 at {bitrate // 1000} kbps")
+    print(f"{'mode':<9} {'KB/s per display':>16} {'encode ms/frame':>15} {'server ms/frame/display':>23}")
+    print(f"{'jpeg':<9} {jpeg_bytes / seconds / 1024:>16.1f} {np.mean(jpeg_ms):>15.2f} {'-':>23}")
+    print(f"{'forward':<9} {h264_bytes / seconds / 1024:>16.1f} {np.mean(encode_ms):>15.2f} "
+          f"{np.mean(pack_ms):>23.3f}")
+    print(f"{'transcode':<9} {'':>16} {'':>15} {np.mean(transcode_ms):>23.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Exclusive session bookkeeping: scanning globals vs the indexed registry.
+
+Connects viewers to /audio from a number of phones (IPs) on a real
+Flask-SocketIO server whose packets are counted instead of sent, while one
+phone keeps starting and stopping video sending: every start claims the
+exclusive session and every stop releases it.
+
+  * "globals":  the old app.py helpers: a stop scans the listeners, talker
+                and sender for the holding IP, and a claim or release emits
+                exclusive_status to each connected client in turn (one packet
+                encoded per client)
+  * "registry": server/presence.py: counters instead of the scan, and one
+                emit to the presence room that skips the holder's own clients
+
+Per start/stop pair: emit calls, exclusive_status packets delivered and
+microseconds spent (including Socket.IO's packet encoding and fan-out).
+
+Usage:
+    python bench/presence_bench.py
+    python bench/presence_bench.py --clients 50 200 1000 --rounds 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask  # noqa: E402
+from flask_socketio import SocketIO  # noqa: E402
+
+from server import presence  # noqa: E402
+
+
+class Counting(SocketIO):
+    """A real Socket.IO server whose engine packets are counted, not sent."""
+
+    def __init__(self):
+        super().__init__(Flask(__name__), async_mode="threading")
+        self.calls = 0
+        self.delivered = 0
+        self.server._send_eio_packet = self._count
+
+    def _count(self, eio_sid, pkt):
+        self.delivered += 1
+
+    def emit(self, *args, **kwargs):
+        self.calls += 1
+        super().emit(*args, **kwargs)
+
+    def connect_client(self, k: int) -> str:
+        return self.server.manager.connect(f"eio{k}", "/audio")
+
+
+class Globals:
+    """The replaced app.py state and helpers, minus Flask."""
+
+    def __init__(self, socketio: Counting):
+        self.socketio = socketio
+        self.connected: set[str] = set()
+        self.sid_to_ip: dict[str, str] = {}
+        self.listeners: set[str] = set()
+        self.talking_sid = None
+        self.sender_sid = None
+        self.exclusive_ip = None
+
+    def connect(self, sid, ip):
+        self.connected.add(sid)
+        self.sid_to_ip[sid] = ip
+
+    def claim(self, ip) -> bool:
+        if self.exclusive_ip is None:
+            self.exclusive_ip = ip
+            self.broadcast()
+            return True
+        return self.exclusive_ip == ip
+
+    def feature_active(self, ip) -> bool:
+        for sid in list(self.listeners):
+            if self.sid_to_ip.get(sid) == ip:
+                return True
+        if self.talking_sid is not None and self.sid_to_ip.get(self.talking_sid) == ip:
+            return True
+        return self.sender_sid is not None and self.sid_to_ip.get(self.sender_sid) == ip
+
+    def maybe_release(self):
+        if self.exclusive_ip is not None and not self.feature_active(self.exclusive_ip):
+            self.exclusive_ip = None
+            self.broadcast()
+
+    def broadcast(self):
+        for sid in list(self.connected):
+            blocked = self.exclusive_ip is not None and self.sid_to_ip.get(sid) != self.exclusive_ip
+            self.socketio.emit("exclusive_status", {"blocked": blocked}, namespace="/audio", to=sid)
+
+
+def run(mode: str, clients: int, ips: int, rounds: int) -> dict:
+    socketio = Counting()
+    holder_ip = "10.0.0.1"
+    if mode == "globals":
+        state = Globals(socketio)
+        connect = state.connect
+
+        def toggle(sid):
+            if state.claim(holder_ip) and state.sender_sid in (None, sid):
+                state.sender_sid = sid
+            state.sender_sid = None
+            state.maybe_release()
+    else:
+        state = presence.Presence(socketio)
+
+        def connect(sid, ip):
+            state.connect(sid, ip, "token", "/audio")
+
+        def toggle(sid):
+            state.start(sid, presence.SEND)
+            state.stop(sid, presence.SEND)
+
+    sids = [socketio.connect_client(k) for k in range(clients)]
+    for k, sid in enumerate(sids):
+        connect(sid, f"10.0.0.{k % ips + 1}")  # sids[0] is on holder_ip
+    socketio.calls = socketio.delivered = 0
+    began = time.perf_counter()
+    for _ in range(rounds):
+        toggle(sids[0])
+    elapsed = time.perf_counter() - began
+    return {"calls": socketio.calls / rounds, "delivered": socketio.delivered / rounds,
+            "us": elapsed / rounds * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--ips", type=int, default=8, help="phones the clients connect from")
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"# /audio clients from {args.ips} IPs, {args.rounds} start/stop pairs")
+    print(f"{'clients':>7} {'mode':<9} {'emit calls':>10} {'delivered':>9} {'us/pair':>9}")
+    for clients in args.clients:
+        for mode in ("globals", "registry"):
+            r = run(mode, clients, args.ips, args.rounds)
+            print(f"{clients:>7} {mode:<9} {r['calls']:>10.0f} {r['delivered']:>9.0f} {r['us']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Benchmark the streaming polyphase resampler (server/resample.py).
+
+Converts test tones chunk by chunk (64 ms chunks, as the capture callback and
+the broadcaster do) between AUDIO_SAMPLE_RATE and common device / browser
+rates, and compares against the linear interpolation the viewer used to
+downsample talk-back audio before the server could resample.  Per rate pair:
+
+  * time per 64 ms chunk p50 / p99 (µs)
+  * SNR (dB) of a 1 kHz tone against the exact tone (delay compensated)
+  * alias (dB): when decimating, what is left of a tone above the output
+    Nyquist frequency, relative to its input level (lower is better; it
+    folds back into the pass band as an audible false tone)
+
+Usage:
+    python bench/resample_bench.py
+    python bench/resample_bench.py --rates 44100 48000 --seconds 5
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from server import config  # noqa: E402
+from server.resample import Resampler  # noqa: E402
+
+AMPLITUDE = 10000
+
+
+class LinearResampler:
+    """Chunk-wise linear interpolation, like resample() in static/js/audio.js."""
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self._ratio = src_rate / dst_rate
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        out_len = round(len(samples) / self._ratio)
+        pos = np.arange(out_len) * self._ratio
+        index = pos.astype(np.int64)
+        following = np.minimum(index + 1, len(samples) - 1)
+        frac = pos - index
+        mixed = samples[index] * (1 - frac) + samples[following] * frac
+        return np.rint(mixed).astype(np.int16)
+
+
+def tone(rate: int, freq: float, seconds: float) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (AMPLITUDE * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def convert(resampler, samples: np.ndarray, chunk: int) -> tuple[np.ndarray, list[float]]:
+    parts, timings = [], []
+    for start in range(0, len(samples) - chunk + 1, chunk):
+        block = samples[start:start + chunk]
+        began = time.perf_counter()
+        parts.append(resampler.process(block))
+        timings.append((time.perf_counter() - began) * 1e6)
+    return np.concatenate(parts), timings
+
+
+def best_snr(output: np.ndarray, rate: int, freq: float) -> float:
+    """SNR against the exact tone, fitting the output's phase (filter delay)."""
+    body = output[rate // 10:-rate // 10].astype(float)  # skip the filter's start-up
+    t = np.arange(len(body)) / rate
+    basis = np.stack([np.sin(2 * np.pi * freq * t), np.cos(2 * np.pi * freq * t)], axis=1)
+    coef, *_ = np.linalg.lstsq(basis, body, rcond=None)
+    noise = ((body - basis @ coef) ** 2).mean()
+    return 10 * np.log10((AMPLITUDE ** 2 / 2) / noise)
+
+
+def run(kind: str, src: int, dst: int, seconds: float) -> dict:
+    make = Resampler if kind == "polyphase" else LinearResampler
+    chunk = round(config.AUDIO_CHUNK_SIZE * src / config.AUDIO_SAMPLE_RATE)
+    output, timings = convert(make(src, dst), tone(src, 1000, seconds), chunk)
+    alias = None
+    if dst < src:
+        # A tone 25% above the output Nyquist frequency (e.g. 10 kHz for 16 kHz output)
+        aliased, _ = convert(make(src, dst), tone(src, dst * 0.625, seconds), chunk)
+        level = np.sqrt((aliased[dst // 10:].astype(float) ** 2).mean())
+        alias = 20 * np.log10(max(level, 1e-3) / (AMPLITUDE / np.sqrt(2)))
+    timings.sort()
+    return {
+        "p50": timings[len(timings) // 2],
+        "p99": timings[int(len(timings) * 0.99)],
+        "snr": best_snr(output, dst, 1000),
+        "alias": alias,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rates", nargs="+", type=int, default=[44100, 48000])
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    base = config.AUDIO_SAMPLE_RATE
+    print(f"# {config.AUDIO_CHUNK_SIZE * 1000 // base} ms chunks, {args.seconds:.0f}s of 1 kHz tone")
+    header = f"{'method':<10} {'from':>6} {'to':>6} {'p50 µs':>8} {'p99 µs':>8} {'SNR dB':>7} {'alias dB':>9}"
+    print(header)
+    print("-" * len(header))
+    for rate in args.rates:
+        for src, dst in ((rate, base), (base, rate)):
+            for kind in ("linear", "polyphase"):
+                r = run(kind, src, dst, args.seconds)
+                alias = "-" if r["alias"] is None else f"{r['alias']:.1f}"
+                print(f"{kind:<10} {src:>6} {dst:>6} {r['p50']:>8.1f} {r['p99']:>8.1f} "
+                      f"{r['snr']:>7.1f} {alias:>9}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
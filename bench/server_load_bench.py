@@ -0,0 +1,258 @@
+"""Load test: Werkzeug threading server vs gevent server (server/serving.py).
+
+Starts the real server (run.py) once per mode with PET_CAMERA_SERVER set,
+in development mode (plain HTTP) on 127.0.0.1, and drives it from one
+asyncio process with no extra dependencies: a minimal WebSocket client
+speaks Engine.IO v4 / Socket.IO v5 directly.
+
+For each mode, Socket.IO clients join the /audio namespace (token auth) in
+steps of --step and stay connected, answering pings.  After each step:
+
+  * p50 / p99 latency of --requests authenticated GET /api/status, sent one
+    after another on fresh connections while all clients stay connected
+  * server RSS and thread count (/proc, or psutil where available); memory
+    per connection = RSS growth since the idle baseline / clients
+
+The ramp stops at --max-clients or at the first step in which clients fail
+to connect within --connect-timeout; "max clients" is the last fully
+connected step.  Raise the open-file limit (ulimit -n) for large ramps.
+
+Usage:
+    python bench/server_load_bench.py
+    python bench/server_load_bench.py --max-clients 2000 --step 250 --modes gevent
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "load-bench"
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# ── Minimal client ──
+
+async def http_request(port: int, method: str, path: str, body: bytes = b"",
+                       headers: dict | None = None) -> tuple[int, dict, bytes]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    lines = [f"{method} {path} HTTP/1.1", f"Host: 127.0.0.1:{port}", "Connection: close",
+             f"Content-Length: {len(body)}"]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+    data = await reader.read()
+    writer.close()
+    head, _, payload = data.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    resp_headers = {}
+    for line in header_lines:
+        k, _, v = line.partition(":")
+        resp_headers.setdefault(k.strip().lower(), v.strip())
+    return int(status_line.split()[1]), resp_headers, payload
+
+
+class SocketIOClient:
+    """One WebSocket connection in the /audio namespace."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.reader = self.writer = None
+        self.task = None
+
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        self.writer.write((f"GET /socket.io/?EIO=4&transport=websocket HTTP/1.1\r\n"
+                           f"Host: 127.0.0.1:{self.port}\r\nUpgrade: websocket\r\n"
+                           f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                           f"Sec-WebSocket-Version: 13\r\n\r\n").encode())
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        if b" 101 " not in head.split(b"\r\n", 1)[0]:
+            raise ConnectionError(head.split(b"\r\n", 1)[0].decode())
+        if not (await self.recv()).startswith("0"):  # Engine.IO open
+            raise ConnectionError("no Engine.IO open packet")
+        self.send("40/audio," + json.dumps({"token": TOKEN}))
+        while True:
+            msg = await self.recv()
+            if msg.startswith("40/audio"):
+                break
+            if msg.startswith("44/audio") or msg.startswith("41/audio"):
+                raise ConnectionError("namespace connect refused")
+        self.task = asyncio.ensure_future(self._pump())
+
+    def send(self, text: str):
+        payload = text.encode()
+        mask = os.urandom(4)
+        n = len(payload)
+        header = bytes([0x81]) + (bytes([0x80 | n]) if n < 126 else bytes([0x80 | 126]) + n.to_bytes(2, "big"))
+        self.writer.write(header + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload)))
+
+    async def recv(self) -> str:
+        while True:
+            b0, b1 = await self.reader.readexactly(2)
+            n = b1 & 0x7F
+            if n == 126:
+                n = int.from_bytes(await self.reader.readexactly(2), "big")
+            elif n == 127:
+                n = int.from_bytes(await self.reader.readexactly(8), "big")
+            payload = await self.reader.readexactly(n)
+            opcode = b0 & 0x0F
+            if opcode == 8:
+                raise ConnectionError("closed by server")
+            if opcode == 1:
+                return payload.decode()
+            # binary frames (audio) and control frames are ignored
+
+    async def _pump(self):
+        try:
+            while True:
+                if await self.recv() == "2":  # Engine.IO ping
+                    self.send("3")
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            pass
+
+    def close(self):
+        if self.task:
+            self.task.cancel()
+        if self.writer:
+            self.writer.close()
+
+
+# ── Server process ──
+
+def server_usage(pid: int) -> tuple[int, int]:
+    """(RSS bytes, threads) of the server process."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return int(fields["VmRSS"].split()[0]) * 1024, int(fields["Threads"])
+    except OSError:
+        import psutil
+        p = psutil.Process(pid)
+        return p.memory_info().rss, p.num_threads()
+
+
+async def start_server(mode: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PET_CAMERA_SERVER=mode, PET_CAMERA_ENV="development",
+               PET_CAMERA_TOKEN=TOKEN, PET_CAMERA_HOST="127.0.0.1", PET_CAMERA_PORT=str(port))
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT, "run.py")], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            await http_request(port, "GET", "/login")
+            return proc
+        except OSError:
+            await asyncio.sleep(0.5)
+    proc.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+async def login(port: int) -> str:
+    _, headers, _ = await http_request(port, "POST", "/api/auth", json.dumps({"token": TOKEN}).encode(),
+                                       {"Content-Type": "application/json"})
+    return headers["set-cookie"].split(";", 1)[0]
+
+
+async def status_latency(port: int, cookie: str, count: int) -> list[float]:
+    latencies = []
+    for _ in range(count):
+        began = time.perf_counter()
+        status, _, _ = await http_request(port, "GET", "/api/status", headers={"Cookie": cookie})
+        if status == 200:
+            latencies.append((time.perf_counter() - began) * 1000)
+    return sorted(latencies)
+
+
+async def run_mode(mode: str, args) -> list[dict]:
+    proc = await start_server(mode, args.port)
+    clients, rows = [], []
+    try:
+        cookie = await login(args.port)
+        await asyncio.sleep(2)  # let the subsystems settle
+        await status_latency(args.port, cookie, 20)  # warm up
+        base_rss, _ = server_usage(proc.pid)
+        target = 0
+        while True:
+            latencies = await status_latency(args.port, cookie, args.requests)
+            rss, threads = server_usage(proc.pid)
+            rows.append({
+                "clients": len(clients),
+                "p50": latencies[len(latencies) // 2],
+                "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+                "rss": rss,
+                "per_conn": (rss - base_rss) / len(clients) if clients else 0,
+                "threads": threads,
+            })
+            if target >= args.max_clients:
+                break
+            target = min(target + args.step, args.max_clients)
+            batch = [SocketIOClient(args.port) for _ in range(target - len(clients))]
+            results = await asyncio.gather(
+                *(asyncio.wait_for(c.connect(), args.connect_timeout) for c in batch),
+                return_exceptions=True)
+            clients += [c for c, r in zip(batch, results) if r is None]
+            failed = sum(r is not None for r in results)
+            for c, r in zip(batch, results):
+                if r is not None:
+                    c.close()
+            if failed:
+                rows[-1]["failed_next"] = failed
+                break
+    finally:
+        for c in clients:
+            c.close()
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="threading,gevent")
+    parser.add_argument("--max-clients", type=int, default=1000)
+    parser.add_argument("--step", type=int, default=250)
+    parser.add_argument("--requests", type=int, default=200, help="GET /api/status per step")
+    parser.add_argument("--connect-timeout", type=float, default=10)
+    parser.add_argument("--port", type=int, default=5599)
+    args = parser.parse_args()
+
+    if resource is not None:
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))  # inherited by the server
+
+    summary = []
+    for mode in args.modes.split(","):
+        rows = asyncio.run(run_mode(mode, args))
+        print(f"# {mode}")
+        print(f"{'clients':>8} {'p50 ms':>8} {'p99 ms':>8} {'RSS MB':>8} {'KB/conn':>8} {'threads':>8}")
+        for r in rows:
+            print(f"{r['clients']:>8} {r['p50']:>8.1f} {r['p99']:>8.1f} {r['rss'] / 2 ** 20:>8.0f} "
+                  f"{r['per_conn'] / 1024:>8.0f} {r['threads']:>8}")
+        last = rows[-1]
+        if "failed_next" in last:
+            print(f"  {last['failed_next']} of the next {args.step} clients failed to connect")
+        summary.append((mode, last))
+    print("\n# summary")
+    print(f"{'mode':<10} {'max clients':>11} {'p99 ms':>8} {'KB/conn':>8}")
+    for mode, last in summary:
+        capped = "" if "failed_next" in last else "+"
+        print(f"{mode:<10} {str(last['clients']) + capped:>11} {last['p99']:>8.1f} "
+              f"{last['per_conn'] / 1024:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
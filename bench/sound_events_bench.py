@@ -0,0 +1,180 @@
+"""Benchmark the sound-event detector (server/sound_events.py) on synthetic audio.
+
+Builds a timeline of quiet room noise with known events mixed in (barks and
+double barks, a whine, a vacuum cleaner) and distractors that must not be
+reported (hand claps, a steady hum, a door knock), feeds it chunk by chunk
+through the capture's voice-activity gate and the detector as the server
+does, and reports:
+
+  * per type: events in the audio, detected, missed, false detections
+  * analysis time per chunk p50 / p99 (µs) and the share of one core used
+    to keep up with real time (budget: under 2%)
+
+The cooldown between reports is disabled so that every detection counts.
+
+Usage:
+    python bench/sound_events_bench.py
+    python bench/sound_events_bench.py --minutes 10 --seed 3
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from server import config  # noqa: E402
+from server.audio import VoiceActivityDetector  # noqa: E402
+from server.sound_events import EVENT_TYPES, SoundEventDetector  # noqa: E402
+
+RATE = config.AUDIO_SAMPLE_RATE
+
+
+def dbfs(level: float) -> float:
+    return 32768 * 10 ** (level / 20)
+
+
+def bark(rng) -> np.ndarray:
+    """Harmonic burst with a noisy attack and fast decay, 120-300 ms."""
+    n = int(RATE * rng.uniform(0.12, 0.3))
+    t = np.arange(n) / RATE
+    f0 = rng.uniform(450, 750) * (1 - 0.2 * t / t[-1])  # pitch falls
+    phase = 2 * np.pi * np.cumsum(f0) / RATE
+    tone = sum(np.sin(k * phase) / k for k in range(1, 6))
+    signal = tone + 0.3 * rng.standard_normal(n)
+    envelope = np.minimum(1, t / 0.01) * np.exp(-t / (t[-1] / 2.5))
+    return signal * envelope / np.abs(signal).max() * dbfs(rng.uniform(-22, -12)) * 1.4
+
+
+def whine(rng) -> np.ndarray:
+    """Gliding tone with vibrato, 1.2-2.5 s."""
+    n = int(RATE * rng.uniform(1.2, 2.5))
+    t = np.arange(n) / RATE
+    freq = 900 + 350 * t / t[-1] + 25 * np.sin(2 * np.pi * 6 * t)
+    phase = 2 * np.pi * np.cumsum(freq) / RATE
+    envelope = np.minimum(1, t / 0.1) * np.minimum(1, (t[-1] - t) / 0.1)
+    return (np.sin(phase) + 0.15 * np.sin(2 * phase)) * envelope * dbfs(-28) * 1.4
+
+
+def vacuum(rng) -> np.ndarray:
+    """Broadband noise with a motor hum, 3-6 s."""
+    n = int(RATE * rng.uniform(3, 6))
+    t = np.arange(n) / RATE
+    noise = rng.standard_normal(n)
+    signal = noise + 0.5 * np.sin(2 * np.pi * 180 * t)
+    envelope = np.minimum(1, t / 0.3) * np.minimum(1, (t[-1] - t) / 0.3)
+    return signal / signal.std() * envelope * dbfs(-22)
+
+
+def clap(rng) -> np.ndarray:
+    """Very short broadband transient (not a bark)."""
+    n = int(RATE * 0.04)
+    t = np.arange(n) / RATE
+    return rng.standard_normal(n) * np.exp(-t / 0.008) * dbfs(-10)
+
+
+def knock(rng) -> np.ndarray:
+    """Three low thuds (energy below 300 Hz)."""
+    out = np.zeros(int(RATE * 0.6))
+    for start in (0, 0.2, 0.4):
+        n = int(RATE * 0.08)
+        t = np.arange(n) / RATE
+        i = int(start * RATE)
+        out[i:i + n] += np.sin(2 * np.pi * 110 * t) * np.exp(-t / 0.02) * dbfs(-15)
+    return out
+
+
+def hum(rng) -> np.ndarray:
+    """Steady 100 Hz hum, 8 s (a fridge starting)."""
+    t = np.arange(int(RATE * 8)) / RATE
+    return np.sin(2 * np.pi * 100 * t) * np.minimum(1, t / 0.5) * dbfs(-30) * 1.4
+
+
+SOURCES = {"bark": bark, "whine": whine, "noise": vacuum,
+           "clap": clap, "knock": knock, "hum": hum}
+
+
+def timeline(minutes: float, seed: int) -> tuple[np.ndarray, list[tuple[str, float, float]]]:
+    rng = np.random.default_rng(seed)
+    total = int(minutes * 60 * RATE)
+    audio = rng.standard_normal(total) * dbfs(-62)
+    truth = []
+    pos = 2.0
+    kinds = list(SOURCES) + ["bark", "bark"]  # barks are the common case
+    while True:
+        kind = kinds[rng.integers(len(kinds))]
+        clips = [SOURCES[kind](rng)]
+        if kind == "bark" and rng.random() < 0.4:  # "woof woof"
+            clips += [np.zeros(int(RATE * rng.uniform(0.25, 0.4))), bark(rng)]
+        clip = np.concatenate(clips)
+        start = int(pos * RATE)
+        if start + len(clip) >= total:
+            break
+        audio[start:start + len(clip)] += clip
+        truth.append((kind, pos, pos + len(clip) / RATE))
+        pos += len(clip) / RATE + rng.uniform(3, 12)
+    return np.clip(audio, -32768, 32767).astype(np.int16), truth
+
+
+def run(samples: np.ndarray, truth: list) -> tuple[dict, list[float], float]:
+    config.SOUND_EVENT_COOLDOWN_SECONDS = 0
+    detector = SoundEventDetector()
+    vad = VoiceActivityDetector(config.AUDIO_VAD_OPEN_DBFS, config.AUDIO_VAD_CLOSE_DBFS,
+                                config.AUDIO_VAD_HANGOVER_CHUNKS)
+    chunk = config.AUDIO_CHUNK_SIZE
+    timings, detections = [], []
+    for start in range(0, len(samples) - chunk + 1, chunk):
+        block = samples[start:start + chunk]
+        voiced = vad.update(block)  # in the capture callback, not timed here
+        began = time.perf_counter()
+        events = detector.feed(block, voiced)
+        timings.append((time.perf_counter() - began) * 1e6)
+        for event in events:
+            detections.append((event["type"], (start + chunk) / RATE))
+
+    result = {kind: {"truth": 0, "hit": 0, "false": 0} for kind in EVENT_TYPES}
+    matched = set()
+    for kind, begin, end in truth:
+        if kind in result:
+            result[kind]["truth"] += 1
+    for kind, at in detections:
+        # Reported during or shortly after a true event of the same type
+        hit = next((i for i, (k, b, e) in enumerate(truth)
+                    if k == kind and b <= at <= e + 0.3 and (i, kind) not in matched), None)
+        if hit is None:
+            if not any(k == kind and b <= at <= e + 0.3 for k, b, e in truth):
+                result[kind]["false"] += 1  # (a second report inside one event is not false)
+            continue
+        matched.add((hit, kind))
+        result[kind]["hit"] += 1
+    return result, timings, detector.stats()["cpu_percent"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    samples, truth = timeline(args.minutes, args.seed)
+    distractors = sum(1 for kind, *_ in truth if kind not in EVENT_TYPES)
+    print(f"# {args.minutes:.0f} min of synthetic audio, {len(truth)} sounds "
+          f"({distractors} distractors), {config.SOUND_FFT_SIZE}-point FFT, 50% overlap")
+    result, timings, cpu = run(samples, truth)
+    header = f"{'type':<6} {'truth':>6} {'hit':>6} {'missed':>7} {'false':>6}"
+    print(header)
+    print("-" * len(header))
+    for kind, r in result.items():
+        print(f"{kind:<6} {r['truth']:>6} {r['hit']:>6} {r['truth'] - r['hit']:>7} {r['false']:>6}")
+    timings.sort()
+    print(f"\nper {config.AUDIO_CHUNK_SIZE * 1000 // RATE} ms chunk: p50 {timings[len(timings) // 2]:.1f} µs, "
+          f"p99 {timings[int(len(timings) * 0.99)]:.1f} µs; one core: {cpu:.3f}% (budget 2%)")
+
+
+if __name__ == "__main__":
+    main()
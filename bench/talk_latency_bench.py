@@ -0,0 +1,150 @@
+"""Mouth-to-speaker latency of Socket.IO talk-back: ScriptProcessor vs AudioWorklet.
+
+Simulates the PCM talk path on one clock, with the server side being the
+real code: the browser captures in blocks, the page's main thread emits
+each block (and is sometimes busy with long UI tasks), the WebSocket
+delivers in order with jittered delay, and the server's JitterBuffer is
+read one device block at a time as AudioPlayer's writer does.
+
+  * "script": createScriptProcessor(4096) at 48 kHz (85 ms blocks) running
+    on the main thread; a block whose handler runs more than a block late is
+    lost (the glitch the viewer used to have while the UI was busy)
+  * "worklet": the pet-capture AudioWorklet (static/js/audio-worklet.js),
+    20 ms chunks produced on the audio thread; a busy main thread only
+    delays the emit
+
+Latency of the sample reaching the speaker = now - its capture time + one
+device block of output buffering; reported as mean / p50 / p95 along with
+lost capture blocks and jitter-buffer underruns.  The network delay is the
+same for both, so the difference is the browser side plus the jitter buffer
+depth the server settles on for each chunk size.
+
+Usage:
+    python bench/talk_latency_bench.py
+    python bench/talk_latency_bench.py --seconds 120 --busy-rate 5 --seed 2
+"""
+
+import argparse
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from server import audio, config  # noqa: E402
+
+CTX_RATE = 48000
+PHRASE, PAUSE = 3.0, 0.5  # seconds of talk, then of silence
+RATE = config.AUDIO_SAMPLE_RATE
+DEVICE_BLOCK = config.AUDIO_CHUNK_SIZE
+CLIENTS = {"script": (4096, True), "worklet": (CTX_RATE * 20 // 1000, False)}  # (block, on main thread)
+
+
+def busy_periods(seconds: float, rate: float, rng) -> list[tuple[float, float]]:
+    """Long tasks on the page's main thread: Poisson arrivals, 10-80 ms each."""
+    periods, t = [], 0.0
+    while rate > 0:
+        t += rng.exponential(1 / rate)
+        if t >= seconds:
+            return periods
+        length = rng.uniform(0.010, 0.080)
+        periods.append((t, t + length))
+        t += length
+    return periods
+
+
+def free_at(t: float, periods: list[tuple[float, float]]) -> float:
+    for start, end in periods:
+        if start <= t < end:
+            return end
+        if start > t:
+            break
+    return t
+
+
+def arrivals(kind: str, seconds: float, periods, rng) -> tuple[list[tuple[float, float, int]], int]:
+    """(arrival time, capture time of the block's last sample, frames) per block, and blocks lost."""
+    block, on_main = CLIENTS[kind]
+    duration = block / CTX_RATE
+    out, lost = [], 0
+    handled = arrived = 0.0
+    for k in range(int(seconds / duration)):
+        captured = (k + 1) * duration
+        handled = max(free_at(captured, periods), handled)  # main thread runs handlers in order
+        if on_main and handled - captured > duration:
+            lost += 1  # the ScriptProcessor missed its deadline
+            continue
+        delay = 0.015 + rng.exponential(0.005)
+        arrived = max(arrived, handled + delay)  # one WebSocket: in order
+        out.append((arrived, captured, block * RATE // CTX_RATE))
+    return out, lost
+
+
+def run(kind: str, seconds: float, busy_rate: float, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    periods = busy_periods(seconds, busy_rate, rng)
+    blocks, lost = arrivals(kind, seconds, periods, rng)
+
+    clock = [0.0]
+    # JitterBuffer reads time.monotonic(); run it on the simulated clock
+    audio.time = types.SimpleNamespace(monotonic=lambda: clock[0])
+    jitter = audio.JitterBuffer(RATE, 1, target_ms=config.AUDIO_JITTER_TARGET_MS,
+                                max_ms=config.AUDIO_JITTER_MAX_MS, min_ms=config.AUDIO_JITTER_MIN_MS)
+    tone = (3000 * np.sin(np.arange(RATE) * 2 * np.pi * 220 / RATE)).astype(np.int16)
+    pause = np.zeros(RATE, dtype=np.int16)
+    device_period = DEVICE_BLOCK / RATE
+    latencies = []
+    newest_capture = None
+    i = 0
+    pop_at = device_period
+    while i < len(blocks) or pop_at < blocks[-1][0]:
+        if i < len(blocks) and blocks[i][0] <= pop_at:
+            clock[0], captured, frames = blocks[i]
+            talking = captured % (PHRASE + PAUSE) < PHRASE  # the buffer only adjusts in pauses
+            jitter.push((tone if talking else pause)[:frames].tobytes())
+            newest_capture = captured
+            i += 1
+            continue
+        clock[0] = pop_at
+        depth = jitter.stats()["depth_ms"] / 1000
+        if jitter.pop(DEVICE_BLOCK, timeout=0) is not None and newest_capture is not None:
+            latencies.append(pop_at - (newest_capture - depth) + device_period)
+        pop_at += device_period
+    latencies = np.array(latencies[int(len(latencies) * 0.1):]) * 1000  # after the first estimate settles
+    stats = jitter.stats()
+    return {
+        "mean": latencies.mean(),
+        "p50": np.percentile(latencies, 50),
+        "p95": np.percentile(latencies, 95),
+        "lost": lost,
+        "underruns": stats["underruns"],
+        "target": stats["target_ms"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--busy-rate", type=float, default=3, help="long main-thread tasks per second")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"# {args.seconds:.0f}s of talk ({PHRASE:g} s phrases, {PAUSE:g} s pauses) at {CTX_RATE} Hz, "
+          f"{args.busy_rate:g} long UI tasks/s (10-80 ms), network 15 ms + exp(5 ms), "
+          f"{DEVICE_BLOCK * 1000 // RATE} ms device blocks")
+    header = (f"{'client':<8} {'block ms':>8} {'mean ms':>8} {'p50 ms':>7} {'p95 ms':>7} "
+              f"{'lost':>5} {'underruns':>9} {'target ms':>9}")
+    print(header)
+    print("-" * len(header))
+    for kind, (block, _) in CLIENTS.items():
+        r = run(kind, args.seconds, args.busy_rate, args.seed)
+        print(f"{kind:<8} {block * 1000 / CTX_RATE:>8.1f} {r['mean']:>8.1f} {r['p50']:>7.1f} "
+              f"{r['p95']:>7.1f} {r['lost']:>5} {r['underruns']:>9} {r['target']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Owner-to-display relay: emit every frame vs one latest-frame slot per display.
+
+Simulates the sender's JPEG stream (VIDEO_MAX_FPS) relayed to displays on
+links of different speeds, on one clock.  Each display's link is a FIFO
+(the WebSocket's TCP stream): a frame is on screen after the frames queued
+before it have gone through, plus half an RTT and a decode.
+
+  * "every":   the old relay, one emit per frame per display
+  * "mailbox": server/video_relay.py (the real VideoRelay; its Socket.IO
+               emit is replaced by the simulated link, and the display's
+               ack comes back half an RTT after the decode)
+
+Per display: frames shown per second, frames dropped at the server per
+second and frame age on screen (capture to display) p50 / p95 / max.  The
+throttled link drops to a trickle halfway through the run and then recovers,
+which is where an unbounded backlog shows.
+
+Usage:
+    python bench/video_relay_bench.py
+    python bench/video_relay_bench.py --seconds 60 --frame-kb 60
+"""
+
+import argparse
+import heapq
+import os
+import sys
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+from server import config, video_relay  # noqa: E402
+
+RTT = 0.04
+DECODE = 0.01
+# name: (link bytes/s, throttled bytes/s during the middle fifth of the run)
+DISPLAYS = {
+    "fast": (2_500_000, 2_500_000),
+    "living-room": (400_000, 400_000),
+    "throttled": (2_500_000, 40_000),
+}
+
+
+class Link:
+    def __init__(self, rate, slow_rate, slow_from, slow_to):
+        self.rate, self.slow_rate = rate, slow_rate
+        self.slow_from, self.slow_to = slow_from, slow_to
+        self.free_at = 0.0
+
+    def transmit(self, now: float, size: int) -> float:
+        """Time the last byte of *size* bytes queued at *now* arrives."""
+        start = max(now, self.free_at)
+        rate = self.slow_rate if self.slow_from <= start < self.slow_to else self.rate
+        self.free_at = start + size / rate
+        return self.free_at + RTT / 2
+
+
+def simulate(mode: str, seconds: float, frame_bytes: int, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    events = []  # (time, order, callable)
+    order = [0]
+    clock = [0.0]
+
+    def at(t, fn):
+        order[0] += 1
+        heapq.heappush(events, (t, order[0], fn))
+
+    links = {name: Link(r, s, seconds * 0.4, seconds * 0.6) for name, (r, s) in DISPLAYS.items()}
+    shown = {name: [] for name in DISPLAYS}  # (time shown, capture time)
+    captured_at = {}
+
+    def show(name, frame):
+        shown[name].append((clock[0], captured_at[frame]))
+
+    if mode == "mailbox":
+        video_relay.time = types.SimpleNamespace(monotonic=lambda: clock[0])
+
+        def emit(event, frame, namespace, to, callback):
+            arrive = links[to].transmit(clock[0], len(frame))
+            at(arrive + DECODE, lambda: (show(to, frame), at(clock[0] + RTT / 2, callback)))
+
+        relay = video_relay.VideoRelay(types.SimpleNamespace(server=types.SimpleNamespace(emit=emit)))
+        for name in DISPLAYS:
+            relay.add(name, "bench")
+        publish = relay.publish
+    else:
+        relay = None
+
+        def publish(frame):
+            for name in DISPLAYS:
+                arrive = links[name].transmit(clock[0], len(frame))
+                at(arrive + DECODE, lambda n=name: show(n, frame))
+
+    interval = 1.0 / config.VIDEO_MAX_FPS
+    for k in range(int(seconds / interval)):
+        size = int(frame_bytes * rng.uniform(0.8, 1.2))
+        frame = k.to_bytes(4, "big") + bytes(size)
+        captured_at[frame] = k * interval
+        at(k * interval, lambda f=frame: publish(f))
+
+    while events:
+        t, _, fn = heapq.heappop(events)
+        if t > seconds:
+            break
+        clock[0] = t
+        fn()
+
+    results = {}
+    stats = {s["sid"]: s for s in relay.stats()} if relay else {}
+    for name in DISPLAYS:
+        ages = np.array([(t - c) * 1000 for t, c in shown[name]])
+        results[name] = {
+            "shown_fps": len(ages) / seconds,
+            "dropped_fps": stats[name]["frames_dropped"] / seconds if relay else 0.0,
+            "p50": np.percentile(ages, 50) if len(ages) else float("nan"),
+            "p95": np.percentile(ages, 95) if len(ages) else float("nan"),
+            "max": ages.max() if len(ages) else float("nan"),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30)
+    parser.add_argument("--frame-kb", type=float, default=30, help="mean JPEG size")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"# {args.seconds:.0f}s at {config.VIDEO_MAX_FPS} fps, ~{args.frame_kb:.0f} KB frames, "
+          f"RTT {RTT * 1000:.0f} ms; 'throttled' link at "
+          f"{DISPLAYS['throttled'][1] // 1000} KB/s for the middle fifth")
+    header = (f"{'mode':<8} {'display':<12} {'KB/s':>6} {'shown fps':>9} {'drop fps':>8} "
+              f"{'age p50 ms':>10} {'p95 ms':>8} {'max ms':>8}")
+    print(header)
+    print("-" * len(header))
+    for mode in ("every", "mailbox"):
+        results = simulate(mode, args.seconds, int(args.frame_kb * 1024), args.seed)
+        for name, r in results.items():
+            print(f"{mode:<8} {name:<12} {DISPLAYS[name][0] // 1000:>6} {r['shown_fps']:>9.1f} "
+                  f"{r['dropped_fps']:>8.1f} {r['p50']:>10.0f} {r['p95']:>8.0f} {r['max']:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Benchmark WebRTC video encoding: in-process (aiortc) vs. worker process.
+
+Starts the real server-side WebRTC module with a synthetic camera and N
+loopback aiortc viewers in the same process, then reports, per
+configuration:
+
+  * received FPS per viewer (run with a high --fps to find the sustainable max)
+  * p50 / p99 frame latency: camera hand-off -> decoded frame at the viewer
+    (each frame carries its capture time as a luma barcode)
+  * p99 lag of the server's asyncio loop, a direct measure of how much the
+    encoder competes with it for the GIL
+
+Each configuration runs in a fresh subprocess.  Viewers decode in this
+process too, so absolute numbers include client-side decode cost; compare
+the modes against each other rather than reading them as production figures.
+
+Usage:
+    python bench/webrtc_encoder_bench.py
+    python bench/webrtc_encoder_bench.py --peers 1 3 6 --fps 15 60 --seconds 10
+    python bench/webrtc_encoder_bench.py --load-threads 2   # simulate busy Flask threads
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BITS = 40
+BLOCK = 16
+
+
+class SyntheticCamera:
+    """Moving noise pattern with the hand-off time encoded in the top row."""
+
+    def __init__(self, width: int, height: int):
+        import numpy as np
+        self._np = np
+        rng = np.random.default_rng(0)
+        self._base = rng.integers(0, 255, (height, width * 2, 3), dtype=np.uint8)
+        self._width = width
+        self._offset = 0
+        self.fps = 60
+
+    def get_settings(self) -> dict:
+        return {"fps": self.fps}
+
+    def get_frame_raw(self):
+        np = self._np
+        self._offset = (self._offset + 8) % self._width
+        frame = np.ascontiguousarray(self._base[:, self._offset:self._offset + self._width])
+        stamp = int(time.perf_counter() * 1e6) & ((1 << BITS) - 1)
+        frame[:BLOCK, :BITS * BLOCK] = 0
+        for bit in range(BITS):
+            if stamp >> bit & 1:
+                frame[:BLOCK, bit * BLOCK:(bit + 1) * BLOCK] = 255
+        return frame
+
+
+def read_stamp(frame) -> float | None:
+    """Decode the capture time from the luma plane of a received frame."""
+    import numpy as np
+    plane = frame.planes[0]
+    row = np.frombuffer(plane, np.uint8, count=plane.line_size * BLOCK)
+    row = row.reshape(BLOCK, plane.line_size)[BLOCK // 2]
+    stamp = 0
+    for bit in range(BITS):
+        if row[bit * BLOCK + BLOCK // 2] > 128:
+            stamp |= 1 << bit
+    now = int(time.perf_counter() * 1e6)
+    delta = (now - stamp) & ((1 << BITS) - 1)
+    return delta / 1000 if delta < 10_000_000 else None
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(i * i for i in range(2000))
+
+
+def run_one(mode: str, peers: int, fps: int, seconds: float, width: int, height: int,
+            load_threads: int) -> dict:
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+    from aiortc.mediastreams import MediaStreamError
+    from server import config, webrtc
+
+    config.WEBRTC_ENCODER_MODE = mode
+    config.WEBRTC_DEFAULT_FPS = fps
+    camera = SyntheticCamera(width, height)
+    webrtc.start()
+
+    stop_load = threading.Event()
+    for _ in range(load_threads):
+        threading.Thread(target=busy_worker, args=(stop_load,), daemon=True).start()
+
+    lags: list[float] = []
+    measuring = threading.Event()
+
+    async def probe_loop_lag():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            if measuring.is_set():
+                lags.append((time.perf_counter() - started - 0.01) * 1000)
+
+    asyncio.run_coroutine_threadsafe(probe_loop_lag(), webrtc._loop)
+
+    async def viewers():
+        counts = [0] * peers
+        latencies: list[float] = []
+        pcs = []
+
+        async def consume(index, track):
+            while True:
+                try:
+                    frame = await track.recv()
+                except MediaStreamError:
+                    return
+                if measuring.is_set():
+                    counts[index] += 1
+                    latency = read_stamp(frame)
+                    if latency is not None:
+                        latencies.append(latency)
+
+        loop = asyncio.get_running_loop()
+        for i in range(peers):
+            pc = RTCPeerConnection()
+            pcs.append(pc)
+            pc.addTransceiver("video", direction="recvonly")
+            pc.on("track", lambda track, i=i: asyncio.ensure_future(consume(i, track)))
+            await pc.setLocalDescription(await pc.createOffer())
+            answer = await loop.run_in_executor(
+                None, webrtc.handle_offer, camera, pc.localDescription.sdp,
+                f"bench-{i}", "bench", peers)
+            await pc.setRemoteDescription(RTCSessionDescription(sdp=answer, type="answer"))
+
+        await asyncio.sleep(3)  # warm-up: ICE/DTLS, first keyframe
+        measuring.set()
+        started = time.perf_counter()
+        await asyncio.sleep(seconds)
+        measuring.clear()
+        elapsed = time.perf_counter() - started
+        for pc in pcs:
+            await pc.close()
+        return counts, latencies, elapsed
+
+    counts, latencies, elapsed = asyncio.run(viewers())
+    stop_load.set()
+    webrtc.stop()
+    return {
+        "mode": mode,
+        "peers": peers,
+        "target_fps": fps,
+        "fps_per_peer": round(sum(counts) / peers / elapsed, 1),
+        "latency_p50_ms": round(percentile(latencies, 50), 1),
+        "latency_p99_ms": round(percentile(latencies, 99), 1),
+        "loop_lag_p99_ms": round(percentile(lags, 99), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["inprocess", "process"])
+    parser.add_argument("--peers", nargs="+", type=int, default=[1, 3, 6])
+    parser.add_argument("--fps", nargs="+", type=int, default=[15, 60],
+                        help="target FPS values; a high value measures the sustainable maximum")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--resolution", default="1280x720")
+    parser.add_argument("--load-threads", type=int, default=0)
+    parser.add_argument("--run", nargs=3, metavar=("MODE", "PEERS", "FPS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.resolution.split("x"))
+
+    if args.run:
+        mode, peers, fps = args.run[0], int(args.run[1]), int(args.run[2])
+        result = run_one(mode, peers, fps, args.seconds, width, height, args.load_threads)
+        print("RESULT " + json.dumps(result), flush=True)
+        os._exit(0)  # skip slow interpreter teardown of aiortc/av threads
+
+    print(f"# {args.resolution}, {args.seconds:.0f}s per run, load threads: {args.load_threads}")
+    header = f"{'mode':<10} {'peers':>5} {'target':>6} {'fps/peer':>9} {'p50 ms':>8} {'p99 ms':>8} {'loop p99':>9}"
+    print(header)
+    print("-" * len(header))
+    for fps in args.fps:
+        for peers in args.peers:
+            for mode in args.modes:
+                cmd = [sys.executable, os.path.abspath(__file__), "--run", mode, str(peers),
+                       str(fps), "--seconds", str(args.seconds), "--resolution", args.resolution,
+                       "--load-threads", str(args.load_threads)]
+                out = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+                line = next((l for l in out.stdout.splitlines() if l.startswith("RESULT ")), None)
+                if line is None:
+                    print(f"{mode:<10} {peers:>5} {fps:>6}  failed:\n{out.stderr[-2000:]}")
+                    continue
+                r = json.loads(line[7:])
+                print(f"{mode:<10} {peers:>5} {fps:>6} {r['fps_per_peer']:>9} "
+                      f"{r['latency_p50_ms']:>8} {r['latency_p99_ms']:>8} {r['loop_lag_p99_ms']:>9}",
+                      flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,18 @@
 import glob
 import logging
 import os
+import re
 import time
+import uuid
 from datetime import datetime, timezone
 
 from flask import Flask, Response, jsonify, render_template, request, send_from_directory, session
 from flask_socketio import SocketIO, disconnect, emit, join_room, leave_room
 
-from . import config
+from . import bandwidth, config, serving
 from .auth import (
     extend_session,
+    validate_session,
     handle_auth_request,
     handle_logout,
     is_authenticated,
@@ -21,8 +24,23 @@ from .auth import (
 )
 from .camera import Camera, enumerate_cameras, find_best_camera_index
 from .audio import AudioCapture, AudioPlayer
+from . import audio_codec
+from .audio_archive import AudioArchive
+from .audio_broadcast import AudioBroadcaster
+from .audio_devices import ACTIVE, AudioDeviceSupervisor
+from .clips import ClipBuffer, ClipsBusy
+from .hls import HlsPackager
+from .mjpeg import MjpegBroadcaster
+from .presence import BLOCKED, BUSY, LISTEN, SEND, TALK, Presence
+from . import playback
+from .encoder import LiveEncoder
+from .recorder import Recorder
+from .sound_events import SoundEventDetector
+from .video_relay import VideoRelay
 from . import webauthn_auth
 from . import webrtc
+from . import control_channel
+from . import encoder_profiles
 
 # ---------------------------------------------------------------------------
 # Logging
@@ -47,8 +65,9 @@ app.config["SESSION_COOKIE_HTTPONLY"] = True
 app.config["SESSION_COOKIE_SECURE"] = not config.IS_DEV
 app.config["SESSION_COOKIE_SAMESITE"] = "Strict"
 
-socketio = SocketIO(app, cors_allowed_origins=None, async_mode="threading",
+socketio = SocketIO(app, cors_allowed_origins=None, async_mode=serving.MODE,
                     manage_session=False)
+serving.install(socketio)
 
 # ---------------------------------------------------------------------------
 # Subsystems
@@ -64,38 +83,81 @@ logger.info("Camera: using index %d (config=%s)", _camera_index,
             "env" if config.CAMERA_INDEX is not None else "auto-detect")
 audio_capture = AudioCapture()
 audio_player = AudioPlayer()
+webrtc.set_talk_sink(audio_player.play)
+live_encoder = LiveEncoder(camera)
+recorder = Recorder(live_encoder)
+clip_buffer = ClipBuffer(live_encoder, audio_capture)
+hls_packager = HlsPackager(live_encoder)
+mjpeg_broadcaster = MjpegBroadcaster(camera)
+audio_broadcaster = AudioBroadcaster(socketio, audio_capture)
+audio_devices = AudioDeviceSupervisor(audio_capture, audio_player)
+audio_devices.set_on_change(lambda states: socketio.emit("audio_device", states, namespace="/audio"))
+_opus_available = audio_codec.opus_available()
+audio_archive = AudioArchive(audio_capture)
+sound_events = SoundEventDetector(audio_capture)
+video_relay = VideoRelay(socketio)
+# Exclusive session control: only one phone can use audio/video features at a time
+presence = Presence(socketio)
+
+
+def _archive_audio_url(ts: float) -> str | None:
+    """Archived audio around wall-clock *ts*, for events and snapshots (None if not archiving)."""
+    if not config.AUDIO_ARCHIVE_ENABLED:
+        return None
+    return (f"/api/audio/archive?t={ts:.0f}&before={config.AUDIO_ARCHIVE_EVENT_BEFORE_SECONDS}"
+            f"&after={config.AUDIO_ARCHIVE_EVENT_AFTER_SECONDS}")
+
+
+def _on_sound_event(event: dict):
+    # Every viewer connects to /audio, listening or not, so all of them get alerts
+    at = datetime.fromisoformat(event["time"]).timestamp()
+    socketio.emit("sound_event", dict(event, audio_url=_archive_audio_url(at)), namespace="/audio")
 
-# Server start time for uptime calculation
-_start_time = time.time()
 
-# Track connected clients
-_connected_clients: set[str] = set()
+sound_events.set_on_event(_on_sound_event)
 
-# Track audio listeners: {sid: queue}
-_audio_listeners: dict = {}
+# Server start time for uptime calculation
+_start_time = time.time()
 
-# Phase 2: Video relay state
-_active_sender_sid: str | None = None  # SID of the client currently sending video
-_display_clients: set[str] = set()  # SIDs of display clients
+# Phase 2: Video relay state (the sending client is presence.holder(SEND))
 _video_client_roles: dict[str, str] = {}  # {sid: 'sender' | 'display'}
+_video_pcs: dict[str, str] = {}  # {sid: WebRTC pc_id} owner-video publisher / display peers
 _last_frame_time: float = 0.0  # Rate limiting for incoming frames
 
-# Exclusive session control: only one phone can use audio/video features at a time
-_exclusive_ip: str | None = None  # IP that currently holds exclusive access
-_sid_to_ip: dict[str, str] = {}  # socket sid → client IP (across both namespaces)
-_talking_sid: str | None = None  # audio sid currently talking
+# Talk state (the talking client is presence.holder(TALK))
+_talk_rate = config.AUDIO_SAMPLE_RATE  # rate of its audio_talk PCM
 
 # ---------------------------------------------------------------------------
 # Ensure directories
 # ---------------------------------------------------------------------------
 os.makedirs(config.SNAPSHOT_DIR, exist_ok=True)
 os.makedirs(config.LOG_DIR, exist_ok=True)
+os.makedirs(config.RECORDING_DIR, exist_ok=True)
 
 # ---------------------------------------------------------------------------
 # Access logging
 # ---------------------------------------------------------------------------
 setup_access_log(app)
 
+
+def _account_key() -> str:
+    """Bandwidth account of the current request (login session or bearer token)."""
+    return bandwidth.key_for(session.get("sid") if session else None)
+
+
+@app.after_request
+def meter_response(response):
+    """Count response bodies sent to authenticated clients."""
+    if not is_authenticated():
+        return response
+    key = _account_key()
+    if response.is_streamed:
+        # MJPEG, playback and file responses: count chunks as they are sent
+        response.response = bandwidth.metered(key, "http", response.response)
+    else:
+        bandwidth.record(key, "http", response.calculate_content_length() or 0)
+    return response
+
 # ===========================================================================
 # HTTP Routes
 # ===========================================================================
@@ -112,26 +174,45 @@ def service_worker():
 @app.route("/")
 def index():
     if is_authenticated():
-        return render_template("index.html")
+        response = app.make_response(render_template("index.html"))
+        # Cross-origin isolation lets audio.js share its playback ring buffer with
+        # the AudioWorklet (SharedArrayBuffer); "credentialless" keeps the CDN script
+        response.headers["Cross-Origin-Opener-Policy"] = "same-origin"
+        response.headers["Cross-Origin-Embedder-Policy"] = "credentialless"
+        return response
     return render_template("login.html")
 
 
 @app.route("/snapshot")
 @login_required
 def snapshot():
-    jpeg = camera.get_frame_jpeg(quality=95)
+    jpeg = serving.blocking(camera.get_frame_jpeg, quality=95)
     if jpeg is None:
         return jsonify({"error": {"code": "CAMERA_ERROR", "message": "No frame available"}}), 500
     return Response(jpeg, mimetype="image/jpeg",
                     headers={"Content-Disposition": "attachment; filename=snapshot.jpg"})
 
 
+@app.route("/stream.mjpeg")
+@login_required
+def mjpeg_stream():
+    key = _account_key()
+
+    def max_fps():
+        limits = bandwidth.limits(key)
+        return limits["mjpeg_max_fps"] if limits else None
+
+    return Response(serving.iterate(mjpeg_broadcaster.stream(request.remote_addr, max_fps)),
+                    mimetype=MjpegBroadcaster.MIMETYPE,
+                    headers={"Cache-Control": "no-cache, no-store", "X-Accel-Buffering": "no"})
+
+
 # --- Snapshots CRUD ---
 
 @app.route("/api/snapshots", methods=["POST"])
 @login_required
 def save_snapshot():
-    jpeg = camera.get_frame_jpeg(quality=95)
+    jpeg = serving.blocking(camera.get_frame_jpeg, quality=95)
     if jpeg is None:
         return jsonify({"error": {"code": "CAMERA_ERROR", "message": "No frame available"}}), 500
 
@@ -153,6 +234,7 @@ def save_snapshot():
         "filename": filename,
         "size_bytes": len(jpeg),
         "timestamp": now.astimezone(timezone.utc).isoformat(),
+        "audio_url": _archive_audio_url(now.timestamp()),
         "storage_used_bytes": used,
         "storage_limit_bytes": config.SNAPSHOT_MAX_BYTES,
     })
@@ -170,6 +252,7 @@ def list_snapshots():
             "filename": fname,
             "size_bytes": stat.st_size,
             "timestamp": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).isoformat(),
+            "audio_url": _archive_audio_url(stat.st_mtime),
         })
     used = sum(s["size_bytes"] for s in snapshots)
     return jsonify({
@@ -205,25 +288,337 @@ def delete_snapshot(filename):
     return jsonify({"deleted": True})
 
 
-# --- Status & Settings ---
+# --- Event clips ---
 
-@app.route("/api/status")
+@app.route("/api/clips", methods=["POST"])
 @login_required
-def status():
+def create_clip():
+    if not clip_buffer.is_active:
+        return jsonify({"error": {"code": "CLIPS_DISABLED", "message": "Clip buffer is not running"}}), 503
+    data = request.get_json(silent=True) or {}
+    try:
+        pre = data.get("pre_seconds")
+        post = data.get("post_seconds")
+        pre = None if pre is None else float(pre)
+        post = None if post is None else float(post)
+    except (TypeError, ValueError):
+        return jsonify({"error": {"code": "INVALID_PARAMETER", "message": "pre_seconds/post_seconds must be numbers"}}), 400
+    try:
+        clip = clip_buffer.trigger(pre, post, reason="api")
+    except ClipsBusy as e:
+        return jsonify({"error": {"code": "CLIPS_BUSY", "message": str(e)}}), 503
+    return jsonify({
+        "filename": clip["filename"],
+        "start": datetime.fromtimestamp(clip["start"], tz=timezone.utc).isoformat(),
+        "end": datetime.fromtimestamp(clip["end"], tz=timezone.utc).isoformat(),
+        "status": "recording",
+    }), 202
+
+
+@app.route("/api/clips", methods=["GET"])
+@login_required
+def list_clips():
+    files = sorted(glob.glob(os.path.join(config.CLIP_DIR, "clip_*.mp4")))
+    clips = []
+    for fp in files:
+        stat = os.stat(fp)
+        clips.append({
+            "filename": os.path.basename(fp),
+            "size_bytes": stat.st_size,
+            "timestamp": datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).isoformat(),
+        })
+    return jsonify({
+        "clips": clips,
+        "total_count": len(clips),
+        "pending": [c["filename"] for c in clip_buffer.stats()["writing"]],
+        "storage_used_bytes": sum(c["size_bytes"] for c in clips),
+        "storage_limit_bytes": config.CLIP_MAX_BYTES,
+    })
+
+
+@app.route("/api/clips/<filename>", methods=["GET"])
+@login_required
+def get_clip(filename):
+    safe = os.path.basename(filename)
+    if safe != filename or not safe.startswith("clip_") or not safe.endswith(".mp4"):
+        return jsonify({"error": {"code": "NOT_FOUND", "message": "Clip not found"}}), 404
+    filepath = os.path.join(config.CLIP_DIR, safe)
+    if not os.path.isfile(filepath):
+        return jsonify({"error": {"code": "NOT_FOUND", "message": "Clip not found"}}), 404
+    return playback.send_ranged(filepath, "video/mp4")
+
+
+@app.route("/api/clips/<filename>", methods=["DELETE"])
+@login_required
+def delete_clip(filename):
+    safe = os.path.basename(filename)
+    if safe != filename or not safe.startswith("clip_") or not safe.endswith(".mp4"):
+        return jsonify({"error": {"code": "NOT_FOUND", "message": "Clip not found"}}), 404
+    filepath = os.path.join(config.CLIP_DIR, safe)
+    if not os.path.isfile(filepath):
+        return jsonify({"error": {"code": "NOT_FOUND", "message": "Clip not found"}}), 404
+    os.remove(filepath)
+    return jsonify({"deleted": True})
+
+
+# --- Recording playback ---
+
+_DAY_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _parse_time(value: str) -> float:
+    """UNIX time or ISO 8601 -> UNIX time.  Raises ValueError."""
+    return float(value) if value.replace(".", "", 1).isdigit() else datetime.fromisoformat(value).timestamp()
+
+
+@app.route("/api/recordings/timeline", methods=["GET"])
+@login_required
+def recordings_timeline():
+    day = request.args.get("day")
+    if day is not None and not _DAY_RE.match(day):
+        return jsonify({"error": {"code": "INVALID_PARAMETER", "message": "day must be YYYY-MM-DD"}}), 400
+    return jsonify({
+        "days": playback.timeline(recorder.segments(), day),
+        "storage_used_bytes": recorder.storage_used_bytes,
+        "storage_limit_bytes": config.RECORDING_MAX_BYTES,
+    })
+
+
+@app.route("/api/recordings/seek", methods=["GET"])
+@login_required
+def recordings_seek():
+    t = request.args.get("t")
+    day = request.args.get("day")
+    clock = request.args.get("time")
+    try:
+        if t is not None:
+            ts = _parse_time(t)
+        elif day and clock:
+            fmt = "%Y-%m-%d %H:%M:%S" if clock.count(":") == 2 else "%Y-%m-%d %H:%M"
+            ts = datetime.strptime(f"{day} {clock}", fmt).timestamp()
+        else:
+            raise ValueError("missing time")
+    except ValueError:
+        return jsonify({"error": {"code": "INVALID_PARAMETER",
+                                  "message": "Specify t (UNIX time or ISO 8601) or day=YYYY-MM-DD&time=HH:MM[:SS]"}}), 400
+    position = playback.locate(recorder.segments(), ts)
+    if position is None:
+        return jsonify({"error": {"code": "NOT_FOUND", "message": "No recording at or after that time"}}), 404
+    return jsonify(position)
+
+
+@app.route("/api/recordings/<day>/<filename>", methods=["GET"])
+@login_required
+def get_recording(day, filename):
+    safe = os.path.basename(filename)
+    if (not _DAY_RE.match(day) or safe != filename
+            or not safe.startswith("rec_") or not safe.endswith(".mp4")):
+        return jsonify({"error": {"code": "NOT_FOUND", "message": "Recording not found"}}), 404
+    filepath = os.path.join(config.RECORDING_DIR, day, safe)
+    if not os.path.isfile(filepath):
+        return jsonify({"error": {"code": "NOT_FOUND", "message": "Recording not found"}}), 404
+    return playback.send_ranged(filepath, "video/mp4")
+
+
+# --- Audio archive ---
+
+@app.route("/api/audio/archive/timeline", methods=["GET"])
+@login_required
+def audio_archive_timeline():
+    day = request.args.get("day")
+    if day is not None and not _DAY_RE.match(day):
+        return jsonify({"error": {"code": "INVALID_PARAMETER", "message": "day must be YYYY-MM-DD"}}), 400
     return jsonify({
+        "days": playback.timeline(audio_archive.segments(), day, url=playback.archive_url),
+        "storage_used_bytes": audio_archive.storage_used_bytes,
+        "storage_limit_bytes": config.AUDIO_ARCHIVE_MAX_BYTES,
+    })
+
+
+@app.route("/api/audio/archive", methods=["GET"])
+@login_required
+def get_audio_archive():
+    args = request.args
+    try:
+        if "t" in args:
+            at = _parse_time(args["t"])
+            before = float(args.get("before", config.AUDIO_ARCHIVE_EVENT_BEFORE_SECONDS))
+            after = float(args.get("after", config.AUDIO_ARCHIVE_EVENT_AFTER_SECONDS))
+            if before < 0 or after < 0:
+                raise ValueError("negative duration")
+            start, end = at - before, at + after
+        elif "start" in args and "end" in args:
+            start, end = _parse_time(args["start"]), _parse_time(args["end"])
+        else:
+            raise ValueError("missing time")
+        if not start < end:
+            raise ValueError("empty range")
+    except ValueError:
+        return jsonify({"error": {"code": "INVALID_PARAMETER",
+                                  "message": "Specify start and end (UNIX time or ISO 8601), "
+                                             "or t with optional before/after seconds"}}), 400
+    spans = audio_archive.spans(start, end)
+    if not spans:
+        return jsonify({"error": {"code": "NOT_FOUND", "message": "No archived audio in that range"}}), 404
+    name = datetime.fromtimestamp(spans[0][3]).strftime("audio_%Y%m%d_%H%M%S.aac")
+    response = playback.send_concatenated([span[:3] for span in spans], "audio/aac", name)
+    # Actual coverage (frame-aligned, gaps between files are skipped)
+    response.headers["X-Audio-Start"] = datetime.fromtimestamp(spans[0][3], tz=timezone.utc).isoformat()
+    response.headers["X-Audio-End"] = datetime.fromtimestamp(spans[-1][4], tz=timezone.utc).isoformat()
+    return response
+
+
+# --- LL-HLS fallback ---
+
+def _hls_not_found():
+    return jsonify({"error": {"code": "NOT_FOUND", "message": "HLS resource not available"}}), 404
+
+
+@app.route("/hls/stream.m3u8")
+@login_required
+def hls_playlist():
+    if not config.HLS_ENABLED:
+        return _hls_not_found()
+    try:
+        msn = request.args.get("_HLS_msn", type=int)
+        part = request.args.get("_HLS_part", type=int)
+        if part is not None and msn is None:
+            raise ValueError("_HLS_part requires _HLS_msn")
+        text = serving.blocking(hls_packager.playlist, msn, part)
+    except ValueError as e:
+        return jsonify({"error": {"code": "INVALID_PARAMETER", "message": str(e)}}), 400
+    if text is None:
+        return jsonify({"error": {"code": "CAMERA_ERROR", "message": "Live stream not ready"}}), 503
+    return Response(text, mimetype="application/vnd.apple.mpegurl",
+                    headers={"Cache-Control": "no-cache"})
+
+
+@app.route("/hls/init_<int:init_id>.mp4")
+@login_required
+def hls_init(init_id):
+    data = hls_packager.init(init_id)
+    if data is None:
+        return _hls_not_found()
+    return Response(data, mimetype="video/mp4", headers={"Cache-Control": "private, max-age=3600"})
+
+
+@app.route("/hls/seg_<int:msn>.m4s")
+@login_required
+def hls_segment(msn):
+    data = serving.blocking(hls_packager.segment, msn)
+    if data is None:
+        return _hls_not_found()
+    return Response(data, mimetype="video/iso.segment", headers={"Cache-Control": "private, max-age=60"})
+
+
+@app.route("/hls/part_<int:msn>_<int:index>.m4s")
+@login_required
+def hls_part(msn, index):
+    data = serving.blocking(hls_packager.part, msn, index)
+    if data is None:
+        return _hls_not_found()
+    return Response(data, mimetype="video/iso.segment", headers={"Cache-Control": "private, max-age=60"})
+
+
+# --- Status & Settings ---
+
+def _status_snapshot() -> dict:
+    return {
         "status": "running",
         "uptime_seconds": int(time.time() - _start_time),
         "fps": camera.fps_actual,
         "resolution": camera.resolution_str,
-        "clients_connected": len(_connected_clients),
+        "clients_connected": presence.count("/audio"),
         "camera_index": camera.camera_index,
         "camera_active": camera.is_active,
         "audio": {
             "microphone_active": audio_capture.is_active,
             "speaker_active": audio_player.is_active,
-            "listening_clients": audio_capture.listener_count,
+            "device_rates": {"microphone": audio_capture.device_rate,
+                             "speaker": audio_player.device_rate},
+            "listening_clients": audio_broadcaster.count,
+            "devices": audio_devices.states(),
+            "missed_chunks": audio_capture.missed_chunks,
+            "activity": audio_capture.activity,
+            "broadcast": audio_broadcaster.stats(),
+            "jitter": audio_player.jitter_stats,
+            "sound_events": sound_events.stats(),
+            "archive": audio_archive.stats(),
         },
-    })
+        "mjpeg": mjpeg_broadcaster.stats(),
+        "video_relay": {"sending": presence.holder(SEND) is not None, "displays": video_relay.stats(),
+                        "webrtc": webrtc.forward_stats()},
+        "presence": presence.stats(),
+        "bandwidth_bytes": bandwidth.totals(),
+        "recording": {
+            "enabled": config.RECORDING_ENABLED,
+            "active": recorder.is_active,
+            "storage_used_bytes": recorder.storage_used_bytes,
+            "storage_limit_bytes": config.RECORDING_MAX_BYTES,
+        },
+    }
+
+
+@app.route("/api/status")
+@login_required
+def status():
+    return jsonify(_status_snapshot())
+
+
+def _apply_settings(data) -> tuple[dict | None, dict | None]:
+    """Shared by PATCH /api/settings and the control channel. Returns (result, error).
+
+    Blocks on the capture device (cap.set): routes call it through
+    serving.blocking, the control channel from its executor thread.
+    """
+    if not data or not isinstance(data, dict):
+        return None, {"code": "INVALID_PARAMETER", "message": "Request body required"}
+
+    result, error = camera.update_settings(data)
+    if error:
+        code = "UNKNOWN_PARAMETER" if "Unknown" in error else "INVALID_PARAMETER"
+        return None, {"code": code, "message": error}
+
+    # Move WebRTC viewers onto a fresh source track with the new settings
+    webrtc.reset_source_track()
+    return result, None
+
+
+def _set_budget(key: str, data) -> tuple[dict | None, dict | None]:
+    """Shared by PUT /api/bandwidth/budget and the control channel."""
+    if not isinstance(data, dict):
+        return None, {"code": "INVALID_PARAMETER", "message": "Request body required"}
+    if data.get("monthly_bytes") is not None:
+        return None, {"code": "INVALID_PARAMETER",
+                      "message": "Monthly budgets are not supported (usage is kept per session)"}
+    try:
+        return bandwidth.set_budget(key, data.get("daily_bytes")), None
+    except ValueError as e:
+        return None, {"code": "INVALID_PARAMETER", "message": str(e)}
+
+
+def _list_cameras() -> dict:
+    return {
+        "cameras": enumerate_cameras(),
+        "current_index": camera.camera_index,
+    }
+
+
+def _switch_camera(data) -> tuple[dict | None, dict | None]:
+    """Shared by PATCH /api/cameras/current and the control channel.
+
+    Stops and reopens the capture (up to seconds): see _apply_settings.
+    """
+    if not isinstance(data, dict) or "index" not in data:
+        return None, {"code": "INVALID_PARAMETER", "message": "index is required"}
+    idx = data["index"]
+    if not isinstance(idx, int) or isinstance(idx, bool) or idx < 0:
+        return None, {"code": "INVALID_PARAMETER",
+                      "message": "index must be a non-negative integer"}
+
+    camera.switch_camera(idx)
+    webrtc.reset_source_track()
+    return {"current_index": camera.camera_index}, None
 
 
 @app.route("/api/settings", methods=["GET"])
@@ -235,18 +630,27 @@ def get_settings():
 @app.route("/api/settings", methods=["PATCH"])
 @login_required
 def patch_settings():
-    data = request.get_json(silent=True)
-    if not data:
-        return jsonify({"error": {"code": "INVALID_PARAMETER", "message": "Request body required"}}), 400
-
-    result, error = camera.update_settings(data)
+    result, error = serving.blocking(_apply_settings, request.get_json(silent=True))
     if error:
-        code = "UNKNOWN_PARAMETER" if "Unknown" in error else "INVALID_PARAMETER"
-        return jsonify({"error": {"code": code, "message": error}}), 400
+        return jsonify({"error": error}), 400
+    return jsonify(result)
 
-    # Reset WebRTC source track so next connection uses new camera settings
-    webrtc.reset_source_track()
 
+# --- Bandwidth / data budget ---
+
+@app.route("/api/bandwidth", methods=["GET"])
+@login_required
+def get_bandwidth():
+    """Bytes sent to this session, its budget and current quality limits."""
+    return jsonify(bandwidth.usage(_account_key()))
+
+
+@app.route("/api/bandwidth/budget", methods=["PUT"])
+@login_required
+def put_bandwidth_budget():
+    result, error = _set_budget(_account_key(), request.get_json(silent=True))
+    if error:
+        return jsonify({"error": error}), 400
     return jsonify(result)
 
 
@@ -256,30 +660,53 @@ def patch_settings():
 @login_required
 def list_cameras():
     """List available camera devices."""
-    cameras = enumerate_cameras()
-    return jsonify({
-        "cameras": cameras,
-        "current_index": camera.camera_index,
-    })
+    return jsonify(serving.blocking(_list_cameras))
 
 
 @app.route("/api/cameras/current", methods=["PATCH"])
 @login_required
 def switch_camera_endpoint():
     """Switch to a different camera device."""
-    data = request.get_json(silent=True)
-    if not data or "index" not in data:
-        return jsonify({"error": {"code": "INVALID_PARAMETER",
-                                  "message": "index is required"}}), 400
-    idx = data["index"]
-    if not isinstance(idx, int) or idx < 0:
-        return jsonify({"error": {"code": "INVALID_PARAMETER",
-                                  "message": "index must be a non-negative integer"}}), 400
+    result, error = serving.blocking(_switch_camera, request.get_json(silent=True))
+    if error:
+        return jsonify({"error": error}), 400
+    return jsonify(result)
 
-    camera.switch_camera(idx)
-    webrtc.reset_source_track()
 
-    return jsonify({"current_index": camera.camera_index})
+# --- WebRTC control channel ---
+
+def _control_command(session_id: str, msg: dict) -> dict:
+    """Execute one control-channel command (runs in an executor thread).
+
+    The channel was opened on an authenticated offer; cookie sessions are
+    re-checked so a logged-out or expired session stops working here too.
+    """
+    if session_id and not validate_session(session_id):
+        return {"ok": False, "error": {"code": "AUTH_INVALID", "message": "Session expired"}}
+
+    kind = msg["type"]
+    if kind == "settings.get":
+        result, error = camera.get_settings(), None
+    elif kind == "settings.set":
+        result, error = _apply_settings(msg.get("settings"))
+    elif kind == "cameras.list":
+        result, error = _list_cameras(), None
+    elif kind == "camera.switch":
+        result, error = _switch_camera(msg)
+    elif kind == "bandwidth.get":
+        result, error = bandwidth.usage(bandwidth.key_for(session_id)), None
+    elif kind == "bandwidth.budget":
+        result, error = _set_budget(bandwidth.key_for(session_id), msg)
+    else:
+        result, error = None, {"code": "UNKNOWN_COMMAND", "message": f"Unknown command: {kind}"}
+
+    if error:
+        return {"ok": False, "error": error}
+    return {"ok": True, "result": result}
+
+
+control_channel.set_handler(_control_command)
+control_channel.set_status_provider(_status_snapshot)
 
 
 # --- WebRTC ---
@@ -293,13 +720,20 @@ def webrtc_offer():
         return jsonify({"error": {"code": "INVALID_PARAMETER",
                                   "message": "SDP offer required"}}), 400
 
-    import uuid
+    try:
+        profile, _ = encoder_profiles.resolve_profile(data.get("profile"))
+        codecs = encoder_profiles.parse_codecs(data.get("codecs") or [])
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": {"code": "INVALID_PARAMETER",
+                                  "message": str(e)}}), 400
+
     pc_id = str(uuid.uuid4())[:8]
     session_id = session.get("sid", "")
 
     try:
-        answer_sdp = webrtc.handle_offer(
-            camera, data["sdp"], pc_id, session_id, config.WEBRTC_MAX_PEERS
+        answer_sdp = serving.blocking(
+            webrtc.handle_offer, camera, data["sdp"], pc_id, session_id, config.WEBRTC_MAX_PEERS,
+            profile=profile, codecs=codecs or None,
         )
     except ValueError as e:
         if "TOO_MANY_PEERS" in str(e):
@@ -312,7 +746,8 @@ def webrtc_offer():
         return jsonify({"error": {"code": "WEBRTC_ERROR",
                                   "message": str(e)}}), 500
 
-    return jsonify({"sdp": answer_sdp, "type": "answer", "pc_id": pc_id})
+    return jsonify({"sdp": answer_sdp, "type": "answer", "pc_id": pc_id,
+                    "profile": profile})
 
 
 @app.route("/api/webrtc/<pc_id>", methods=["DELETE"])
@@ -320,7 +755,7 @@ def webrtc_offer():
 def webrtc_close(pc_id):
     """Close a WebRTC connection (owner only)."""
     session_id = session.get("sid", "")
-    ok = webrtc.close_peer(pc_id, session_id)
+    ok = serving.blocking(webrtc.close_peer, pc_id, session_id)
     if not ok:
         return jsonify({"error": {"code": "FORBIDDEN",
                                   "message": "Not the owner of this connection"}}), 403
@@ -337,6 +772,8 @@ def auth():
 @app.route("/api/logout", methods=["POST"])
 @login_required
 def logout():
+    if session.get("sid"):
+        bandwidth.forget(session["sid"])
     return handle_logout()
 
 
@@ -432,58 +869,6 @@ def _enforce_snapshot_limit(new_size: int):
         os.remove(oldest)
 
 
-# ===========================================================================
-# Exclusive session control helpers
-# ===========================================================================
-
-def _check_and_claim_exclusive(client_ip: str) -> bool:
-    """Check if this IP can use features, and claim exclusive if not yet held."""
-    global _exclusive_ip
-    if client_ip is None:
-        return False
-    if _exclusive_ip is None:
-        _exclusive_ip = client_ip
-        logger.info("Exclusive: claimed by %s", client_ip)
-        _broadcast_exclusive_status()
-        return True
-    return _exclusive_ip == client_ip
-
-
-def _is_feature_active_for_ip(ip: str) -> bool:
-    """Check if any feature (listen/talk/video) is active for the given IP."""
-    for sid in _audio_listeners:
-        if _sid_to_ip.get(sid) == ip:
-            return True
-    if _talking_sid is not None and _sid_to_ip.get(_talking_sid) == ip:
-        return True
-    if _active_sender_sid is not None and _sid_to_ip.get(_active_sender_sid) == ip:
-        return True
-    return False
-
-
-def _maybe_release_exclusive():
-    """Release exclusive access if the holding IP has no active features."""
-    global _exclusive_ip
-    if _exclusive_ip is None:
-        return
-    if not _is_feature_active_for_ip(_exclusive_ip):
-        logger.info("Exclusive: released by %s", _exclusive_ip)
-        _exclusive_ip = None
-        _broadcast_exclusive_status()
-
-
-def _broadcast_exclusive_status():
-    """Notify all audio-connected clients about their blocked/unblocked status."""
-    for sid in list(_connected_clients):
-        client_ip = _sid_to_ip.get(sid)
-        is_blocked = _exclusive_ip is not None and client_ip != _exclusive_ip
-        try:
-            socketio.emit("exclusive_status", {"blocked": is_blocked},
-                          namespace="/audio", to=sid)
-        except Exception:
-            pass
-
-
 # ===========================================================================
 # Socket.IO — Audio namespace
 # ===========================================================================
@@ -495,64 +880,71 @@ def audio_connect(auth_data=None):
         disconnect()
         return False
     sid = request.sid
-    _connected_clients.add(sid)
-    _sid_to_ip[sid] = request.remote_addr
+    emit("audio_device", audio_devices.states())
+    presence.connect(sid, request.remote_addr, _account_key(), "/audio")  # sends exclusive_status
     logger.info("Audio WS: client connected (sid=%s, ip=%s, total=%d)",
-                sid, request.remote_addr, len(_connected_clients))
-
-    # Send initial exclusive status
-    client_ip = request.remote_addr
-    is_blocked = _exclusive_ip is not None and client_ip != _exclusive_ip
-    emit("exclusive_status", {"blocked": is_blocked})
+                sid, request.remote_addr, presence.count("/audio"))
 
 
 @socketio.on("disconnect", namespace="/audio")
 def audio_disconnect():
-    global _talking_sid
     sid = request.sid
-    _connected_clients.discard(sid)
+    # Free the player's talk slot before presence lets another client take
+    # TALK, so whoever gets TALK next also gets the slot
+    if presence.holder(TALK) == sid:
+        serving.blocking(webrtc.set_talker, None)
+        audio_player.release_talk()
+    presence.disconnect(sid)  # may release the exclusive session
 
     # Clean up listener if active
-    q = _audio_listeners.pop(sid, None)
-    if q:
-        audio_capture.remove_listener(q)
-
-    # Release talk slot only if this client held it
-    if _talking_sid == sid:
-        _talking_sid = None
-        audio_player.release_talk()
+    audio_broadcaster.remove(sid)
 
-    # Clean up IP tracking
-    _sid_to_ip.pop(sid, None)
     logger.info("Audio WS: client disconnected (sid=%s)", sid)
 
-    _maybe_release_exclusive()
-
 
 @socketio.on("audio_listen_start", namespace="/audio")
-def audio_listen_start():
+def audio_listen_start(data=None):
+    """Start the microphone stream.
+
+    ``{"format": "pcm" | "adpcm" | "opus", "rate": 48000}`` picks the
+    audio_stream payload (default "pcm") and the rate to send it at (the
+    client's playback rate; default and fallback AUDIO_SAMPLE_RATE, see
+    audio_codec.stream_rate).  Opus falls back to ADPCM when libopus is
+    missing, and the session's data budget may cap the format (see
+    audio_broadcast); the format and rate actually sent are echoed in
+    ``audio_status``.
+    """
     try:
         sid = request.sid
-        client_ip = _sid_to_ip.get(sid)
+
+        data = data if isinstance(data, dict) else {}
+        fmt = data.get("format", "pcm")
+        if fmt not in audio_codec.FORMATS:
+            emit("audio_status", {"listening": False, "error": "invalid_format"})
+            return
+        if fmt == "opus" and not _opus_available:
+            fmt = "adpcm"
+        rate = audio_codec.stream_rate(fmt, data.get("rate"))
 
         # Exclusive session check
-        if not _check_and_claim_exclusive(client_ip):
+        if presence.start(sid, LISTEN) == BLOCKED:
             emit("audio_status", {"listening": False, "error": "exclusive_blocked"})
             return
 
-        if sid in _audio_listeners:
+        if sid in audio_broadcaster:
             return  # Already listening
 
-        if not audio_capture.is_active:
-            audio_capture.start()
-
-        q = audio_capture.add_listener()
-        _audio_listeners[sid] = q
-
-        # Start a background task to stream audio to this client
-        socketio.start_background_task(_stream_audio_to_client, sid, q)
-
-        emit("audio_status", {"listening": True, "talking_clients": audio_player.talking_clients})
+        # Never open the device here: the supervisor does, and audio starts
+        # flowing to this listener as soon as the microphone is up
+        device = audio_devices.want("microphone")
+        audio_broadcaster.add(sid, presence.account(sid), fmt, rate)
+        fmt, rate = audio_broadcaster.stream_of(sid) or (fmt, rate)
+
+        status = {"listening": True, "format": fmt, "rate": rate, "device": device,
+                  "talking_clients": audio_player.talking_clients}
+        if device != ACTIVE:
+            status["error"] = "device_unavailable"
+        emit("audio_status", status)
     except Exception:
         logger.exception("audio_listen_start handler error")
 
@@ -561,86 +953,101 @@ def audio_listen_start():
 def audio_listen_stop():
     try:
         sid = request.sid
-        q = _audio_listeners.pop(sid, None)
-        if q:
-            audio_capture.remove_listener(q)
-        emit("audio_status", {"listening": False, "talking_clients": audio_player.talking_clients})
-        _maybe_release_exclusive()
+        saved = audio_broadcaster.bytes_saved(sid)
+        audio_broadcaster.remove(sid)
+        presence.stop(sid, LISTEN)
+        emit("audio_status", {"listening": False, "bytes_saved": saved,
+                              "talking_clients": audio_player.talking_clients})
     except Exception:
         logger.exception("audio_listen_stop handler error")
 
 
 @socketio.on("audio_talk_start", namespace="/audio")
-def audio_talk_start():
-    global _talking_sid
+def audio_talk_start(data=None):
+    """Acquire the talk slot.
+
+    If the client passes the ``pc_id`` of its WebRTC connection, the Opus
+    microphone track of that peer is routed to the speaker. Otherwise the
+    client falls back to sending PCM via ``audio_talk``, at ``rate`` if it
+    passes one of AUDIO_CLIENT_RATES (its own capture rate; resampled on
+    the server) and at AUDIO_SAMPLE_RATE otherwise.
+    """
+    global _talk_rate
     try:
         sid = request.sid
-        client_ip = _sid_to_ip.get(sid)
 
-        # Exclusive session check
-        if not _check_and_claim_exclusive(client_ip):
+        # Exclusive session check (start() below checks again, atomically)
+        if presence.blocked(sid):
             emit("audio_status", {"talking": False, "error": "exclusive_blocked"})
             return
 
-        if audio_player.acquire_talk():
-            _talking_sid = sid
-            logger.info("Audio WS: talk started (sid=%s)", sid)
-            if not audio_player.is_active:
-                audio_player.start()
-            emit("audio_status", {"listening": sid in _audio_listeners, "talking": True})
+        device = audio_devices.want("speaker")
+        if device != ACTIVE:
+            emit("audio_status", {"listening": sid in audio_broadcaster, "talking": False,
+                                  "error": "device_unavailable", "device": device})
+            return
+
+        already = presence.holder(TALK) == sid
+        started = presence.start(sid, TALK)
+        if started == BLOCKED:
+            emit("audio_status", {"talking": False, "error": "exclusive_blocked"})
+            return
+        if started is None and audio_player.acquire_talk():
+            data = data if isinstance(data, dict) else {}
+            pc_id = data.get("pc_id")
+            rate = data.get("rate")
+            _talk_rate = rate if rate in config.AUDIO_CLIENT_RATES else config.AUDIO_SAMPLE_RATE
+            transport = "socketio"
+            if pc_id and serving.blocking(webrtc.set_talker, pc_id, session.get("sid")):
+                transport = "webrtc"
+            logger.info("Audio WS: talk started (sid=%s, via=%s)", sid, transport)
+            status = {"listening": sid in audio_broadcaster, "talking": True,
+                      "transport": transport}
+            if transport == "socketio":
+                status["talk_rate"] = _talk_rate
+            emit("audio_status", status)
         else:
-            emit("audio_status", {"listening": sid in _audio_listeners, "talking": False, "error": "talk_slot_busy"})
+            if started is None and not already:
+                presence.stop(sid, TALK)  # the player's slot is still held: give TALK back
+            emit("audio_status", {"listening": sid in audio_broadcaster, "talking": False, "error": "talk_slot_busy"})
     except Exception:
         logger.exception("audio_talk_start handler error")
 
 
 @socketio.on("audio_talk_stop", namespace="/audio")
 def audio_talk_stop():
-    global _talking_sid
     try:
         sid = request.sid
-        if _talking_sid == sid:
-            _talking_sid = None
-        audio_player.release_talk()
+        if presence.holder(TALK) == sid:
+            serving.blocking(webrtc.set_talker, None)
+            audio_player.release_talk()  # before TALK, as on disconnect
+            presence.stop(sid, TALK)
         logger.info("Audio WS: talk stopped (sid=%s)", sid)
-        emit("audio_status", {"listening": sid in _audio_listeners, "talking": False})
-        _maybe_release_exclusive()
+        emit("audio_status", {"listening": sid in audio_broadcaster, "talking": False})
     except Exception:
         logger.exception("audio_talk_stop handler error")
 
 
 @socketio.on("audio_talk", namespace="/audio")
 def audio_talk(data):
-    """Receive audio data from client and play through speaker."""
+    """Receive PCM from a client without a WebRTC connection and play it.
+
+    Clients with an active peer connection send their microphone as a WebRTC
+    audio track instead (see audio_talk_start).
+    """
     try:
         sid = request.sid
 
         # Only accept audio from the client that holds the talk slot
-        if _talking_sid != sid:
+        if presence.holder(TALK) != sid:
             return
 
-        if not audio_player.is_active:
-            audio_player.start()
-
         if isinstance(data, (bytes, bytearray)):
-            audio_player.play(bytes(data))
+            audio_player.play(bytes(data), _talk_rate)
     except Exception:
         logger.exception("audio_talk handler error")
 
 
-def _stream_audio_to_client(sid: str, q):
-    """Background task: read from queue and emit audio chunks to client."""
-    import queue as queue_module
-    while sid in _audio_listeners:
-        try:
-            pcm_data = q.get(timeout=0.5)
-            socketio.emit("audio_stream", pcm_data, namespace="/audio", to=sid)
-        except queue_module.Empty:
-            continue
-        except Exception:
-            break
-
-
 # ===========================================================================
 # Socket.IO — Video namespace (Phase 2)
 # ===========================================================================
@@ -661,54 +1068,47 @@ def video_connect(auth_data=None):
 
     sid = request.sid
     _video_client_roles[sid] = role
-    _sid_to_ip[sid] = request.remote_addr
+    presence.connect(sid, request.remote_addr, _account_key(), "/video")
     logger.info("Video WS: %s connected (sid=%s, role=%s)", request.remote_addr, sid, role)
 
 
 @socketio.on("disconnect", namespace="/video")
 def video_disconnect():
-    global _active_sender_sid
     try:
         sid = request.sid
         role = _video_client_roles.pop(sid, None)
 
-        if role == "sender" and _active_sender_sid == sid:
-            _active_sender_sid = None
+        _close_video_pc(sid)
+        if SEND in presence.disconnect(sid):  # may release the exclusive session
             logger.info("Video WS: sender disconnected, releasing send slot (sid=%s)", sid)
             socketio.emit("video_status", _build_video_status(), namespace="/video")
 
         if role == "display":
-            _display_clients.discard(sid)
-            logger.info("Video WS: display client left (sid=%s, remaining=%d)", sid, len(_display_clients))
+            video_relay.remove(sid)
+            logger.info("Video WS: display client left (sid=%s, remaining=%d)", sid, video_relay.count)
             socketio.emit("video_status", _build_video_status(), namespace="/video")
-
-        _sid_to_ip.pop(sid, None)
-        _maybe_release_exclusive()
     except Exception:
         logger.exception("video_disconnect handler error")
 
 
 @socketio.on("video_send_start", namespace="/video")
 def video_send_start(data=None):
-    global _active_sender_sid
     try:
         sid = request.sid
-        client_ip = _sid_to_ip.get(sid)
 
         if _video_client_roles.get(sid) != "sender":
             return
 
-        # Exclusive session check
-        if not _check_and_claim_exclusive(client_ip):
+        # Exclusive session check and the single send slot, in one step
+        started = presence.start(sid, SEND)
+        if started == BLOCKED:
             emit("video_error", {"code": "EXCLUSIVE_BLOCKED",
                                  "message": "Another device is currently using the system"})
             return
-
-        if _active_sender_sid is not None and _active_sender_sid != sid:
+        if started == BUSY:
             emit("video_error", {"code": "SENDER_BUSY", "message": "Another device is already sending"})
             return
 
-        _active_sender_sid = sid
         info = data if isinstance(data, dict) else {}
         logger.info("Video WS: send started (sid=%s, %s)", sid,
                     f"{info.get('width', '?')}x{info.get('height', '?')}@{info.get('fps', '?')}fps")
@@ -719,19 +1119,84 @@ def video_send_start(data=None):
 
 @socketio.on("video_send_stop", namespace="/video")
 def video_send_stop():
-    global _active_sender_sid
     try:
         sid = request.sid
 
-        if _active_sender_sid == sid:
-            _active_sender_sid = None
+        if presence.stop(sid, SEND):  # may release the exclusive session
+            _close_video_pc(sid)
             logger.info("Video WS: send stopped (sid=%s)", sid)
             socketio.emit("video_status", _build_video_status(), namespace="/video")
-            _maybe_release_exclusive()
     except Exception:
         logger.exception("video_send_stop handler error")
 
 
+@socketio.on("video_publish", namespace="/video")
+def video_publish(data=None):
+    """WebRTC offer from the active sender; the ack carries the answer.
+
+    The phone's encoded camera track is forwarded to display peers as is.
+    """
+    try:
+        sid = request.sid
+        if _video_client_roles.get(sid) != "sender" or presence.holder(SEND) != sid:
+            return {"error": {"code": "NOT_SENDING", "message": "Call video_send_start first"}}
+        return _video_webrtc_offer(sid, data, "publisher")
+    except Exception:
+        logger.exception("video_publish handler error")
+        return {"error": {"code": "WEBRTC_ERROR", "message": "Publish failed"}}
+
+
+@socketio.on("display_webrtc", namespace="/video")
+def display_webrtc(data=None):
+    """WebRTC offer from a display for the forwarded owner video; the ack carries the answer."""
+    try:
+        sid = request.sid
+        if _video_client_roles.get(sid) != "display":
+            return {"error": {"code": "FORBIDDEN", "message": "Display role required"}}
+        return _video_webrtc_offer(sid, data, "display")
+    except Exception:
+        logger.exception("display_webrtc handler error")
+        return {"error": {"code": "WEBRTC_ERROR", "message": "Connection failed"}}
+
+
+def _video_webrtc_offer(sid: str, data, role: str) -> dict:
+    if not isinstance(data, dict) or not isinstance(data.get("sdp"), str):
+        return {"error": {"code": "INVALID_PARAMETER", "message": "SDP offer required"}}
+    _close_video_pc(sid)  # a new offer replaces the client's previous connection
+    pc_id = str(uuid.uuid4())[:8]
+    session_id = session.get("sid", "")
+    try:
+        if role == "publisher":
+            answer_sdp = serving.blocking(webrtc.handle_publish, data["sdp"], pc_id, session_id)
+        else:
+            answer_sdp = serving.blocking(webrtc.handle_display, data["sdp"], pc_id, session_id,
+                                          config.VIDEO_FORWARD_MAX_DISPLAYS)
+    except ValueError as e:
+        if "TOO_MANY_PEERS" in str(e):
+            return {"error": {"code": "TOO_MANY_PEERS", "message": "Maximum displays reached"}}
+        if "FORWARD_UNAVAILABLE" in str(e):
+            return {"error": {"code": "FORWARD_UNAVAILABLE",
+                              "message": "WebRTC forwarding unavailable; use JPEG frames"}}
+        return {"error": {"code": "WEBRTC_ERROR", "message": str(e)}}
+    except Exception as e:
+        logger.exception("Video WS: %s offer failed", role)
+        return {"error": {"code": "WEBRTC_ERROR", "message": str(e)}}
+
+    _video_pcs[sid] = pc_id
+    logger.info("Video WS: WebRTC %s connected (sid=%s, pc_id=%s)", role, sid, pc_id)
+    socketio.emit("video_status", _build_video_status(), namespace="/video")
+    answer = {"sdp": answer_sdp, "type": "answer", "pc_id": pc_id}
+    if role == "publisher":
+        answer.update(max_bitrate=config.VIDEO_FORWARD_MAX_BITRATE, max_fps=config.VIDEO_MAX_FPS)
+    return answer
+
+
+def _close_video_pc(sid: str):
+    pc_id = _video_pcs.pop(sid, None)
+    if pc_id:
+        serving.blocking(webrtc.close_peer, pc_id)
+
+
 @socketio.on("video_frame", namespace="/video")
 def video_frame(data):
     global _last_frame_time
@@ -739,7 +1204,7 @@ def video_frame(data):
         sid = request.sid
 
         # Only accept from active sender
-        if _video_client_roles.get(sid) != "sender" or _active_sender_sid != sid:
+        if _video_client_roles.get(sid) != "sender" or presence.holder(SEND) != sid:
             return
 
         if not isinstance(data, (bytes, bytearray)):
@@ -756,9 +1221,8 @@ def video_frame(data):
             return
         _last_frame_time = now
 
-        # Relay to all display clients
-        for display_sid in list(_display_clients):
-            socketio.emit("video_frame", data, namespace="/video", to=display_sid)
+        # Newest frame to each display, as soon as it has acked the previous one
+        video_relay.publish(bytes(data))
     except Exception:
         logger.exception("video_frame handler error")
 
@@ -770,9 +1234,9 @@ def display_join():
         if _video_client_roles.get(sid) != "display":
             return
 
-        _display_clients.add(sid)
+        video_relay.add(sid, presence.account(sid))
         join_room("display", sid=sid, namespace="/video")
-        logger.info("Video WS: display client joined (sid=%s, total=%d)", sid, len(_display_clients))
+        logger.info("Video WS: display client joined (sid=%s, total=%d)", sid, video_relay.count)
         emit("video_status", _build_video_status())
     except Exception:
         logger.exception("display_join handler error")
@@ -782,9 +1246,9 @@ def display_join():
 def display_leave():
     try:
         sid = request.sid
-        _display_clients.discard(sid)
+        video_relay.remove(sid)
         leave_room("display", sid=sid, namespace="/video")
-        logger.info("Video WS: display client left (sid=%s, total=%d)", sid, len(_display_clients))
+        logger.info("Video WS: display client left (sid=%s, total=%d)", sid, video_relay.count)
         socketio.emit("video_status", _build_video_status(), namespace="/video")
     except Exception:
         logger.exception("display_leave handler error")
@@ -802,9 +1266,14 @@ def display_heartbeat():
 
 
 def _build_video_status() -> dict:
+    webrtc_displays = sum(1 for sid in _video_pcs
+                          if _video_client_roles.get(sid) == "display" and sid not in video_relay)
+    sender_sid = presence.holder(SEND)
     return {
-        "sending": _active_sender_sid is not None,
-        "display_clients": len(_display_clients),
+        "sending": sender_sid is not None,
+        "display_clients": video_relay.count + webrtc_displays,
+        "jpeg_displays": video_relay.count,  # the sender only needs video_frame JPEGs for these
+        "webrtc_publishing": sender_sid in _video_pcs,
     }
 
 
@@ -831,8 +1300,19 @@ def main():
     # Start subsystems (webrtc first so asyncio loop is ready before requests)
     webrtc.start()
     camera.start()
-    audio_capture.start()
-    audio_player.start()
+    audio_devices.start()
+    if config.RECORDING_ENABLED or config.CLIPS_ENABLED or config.HLS_ENABLED:
+        live_encoder.start()
+    if config.RECORDING_ENABLED:
+        recorder.start()
+    if config.CLIPS_ENABLED:
+        clip_buffer.start()
+    if config.HLS_ENABLED:
+        hls_packager.start()
+    if config.AUDIO_ARCHIVE_ENABLED:
+        audio_archive.start()
+    if config.SOUND_EVENTS_ENABLED:
+        sound_events.start()
 
     # TLS setup
     ssl_ctx = None
@@ -854,17 +1334,16 @@ def main():
     logger.info("Starting Pet Camera server at %s://%s:%d", proto, config.HOST, config.PORT)
 
     try:
-        socketio.run(
-            app,
-            host=config.HOST,
-            port=config.PORT,
-            ssl_context=ssl_ctx,
-            allow_unsafe_werkzeug=True,
-        )
+        serving.run(app, socketio, config.HOST, config.PORT, ssl_ctx)
     finally:
+        sound_events.stop()
+        audio_archive.stop()
+        hls_packager.stop()
+        clip_buffer.stop()
+        recorder.stop()
+        live_encoder.stop()
         camera.stop()
-        audio_capture.stop()
-        audio_player.stop()
+        audio_devices.stop()
         webrtc.stop()
 
 
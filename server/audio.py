@@ -1,7 +1,8 @@
 """Audio module: microphone capture and speaker playback using sounddevice."""
 
+import collections
 import logging
-import queue
+import math
 import threading
 import time
 
@@ -9,86 +10,274 @@ import numpy as np
 import sounddevice as sd
 
 from . import config
-
-# Retry settings for audio device initialization
-DEVICE_RETRY_INTERVAL = 10  # seconds between retries
-DEVICE_MAX_RETRIES = 6      # max retries (60 seconds total)
+from .resample import Resampler
 
 logger = logging.getLogger(__name__)
 
 
+class PcmRing:
+    """Preallocated ring of PCM chunks: one writer, any number of readers.
+
+    The writer (the PortAudio callback) copies each chunk into the next slot
+    and then publishes it by advancing ``write_seq``; it never takes a lock
+    or looks at the readers, so its cost does not depend on how many there
+    are.  Each reader keeps its own cursor.  A reader that falls more than
+    ``capacity`` chunks behind skips ahead and is told how many it missed;
+    a slot overwritten while it was being copied is detected by re-checking
+    ``write_seq`` afterwards (seqlock style) and counted as missed too.
+
+    Each chunk carries the voice-activity decision made when it was written.
+    """
+
+    def __init__(self, capacity: int, chunk_samples: int):
+        self._capacity = capacity
+        self._slots = np.zeros((capacity, chunk_samples), dtype=np.int16)
+        self._lengths = np.zeros(capacity, dtype=np.int64)
+        self._voiced = np.ones(capacity, dtype=bool)
+        self.write_seq = 0  # chunks written so far; slot = seq % capacity
+
+    def write(self, samples: np.ndarray, voiced: bool = True):
+        """Append one chunk (writer thread only)."""
+        seq = self.write_seq
+        slot = seq % self._capacity
+        flat = samples.reshape(-1)[:self._slots.shape[1]]
+        self._slots[slot, :len(flat)] = flat
+        self._lengths[slot] = len(flat)
+        self._voiced[slot] = voiced
+        self.write_seq = seq + 1  # publish
+
+    def read(self, seq: int) -> tuple[bytes | None, bool, int]:
+        """Return (chunk *seq* or None if not written yet, its voiced flag, next cursor).
+
+        If *seq* has already been overwritten the returned cursor is the
+        oldest chunk still readable and the chunk is None; the caller counts
+        the difference as missed.
+        """
+        written = self.write_seq
+        if seq >= written:
+            return None, True, seq
+        oldest = written - self._capacity + 1  # the writer may be reusing the slot before it
+        if seq < oldest:
+            return None, True, oldest
+        slot = seq % self._capacity
+        data = self._slots[slot, :self._lengths[slot]].tobytes()
+        voiced = bool(self._voiced[slot])
+        if self.write_seq - seq >= self._capacity:
+            return None, True, self.write_seq - self._capacity + 1  # overwritten during the copy
+        return data, voiced, seq + 1
+
+
+class AudioReader:
+    """One listener's cursor into the capture ring.
+
+    Starts at the newest audio.  Slow readers are never evicted: ``read()``
+    reports how many chunks were skipped instead.
+    """
+
+    POLL_SECONDS = 0.005
+
+    def __init__(self, ring: PcmRing):
+        self._ring = ring
+        self._cursor = ring.write_seq
+        self.missed = 0  # total chunks skipped
+        self.voiced = True  # voice activity of the chunk last returned by read()
+
+    def read(self, timeout: float) -> tuple[bytes, int] | None:
+        """Next chunk and the number of chunks missed just before it.
+
+        Returns None if nothing arrives within *timeout* seconds.
+        """
+        deadline = time.monotonic() + timeout
+        missed = 0
+        while True:
+            data, voiced, cursor = self._ring.read(self._cursor)
+            if data is not None:
+                self._cursor = cursor
+                self.missed += missed
+                self.voiced = voiced
+                return data, missed
+            if cursor != self._cursor:  # fell behind: skip to the oldest readable chunk
+                missed += cursor - self._cursor
+                self._cursor = cursor
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.missed += missed
+                return None
+            time.sleep(min(self.POLL_SECONDS, remaining))
+
+
+class VoiceActivityDetector:
+    """RMS gate with hysteresis deciding whether a chunk is worth sending.
+
+    The level of a chunk is the loudest RMS of its ~16 ms sub-frames
+    (computed in one numpy pass), so a short bark at the end of a chunk
+    still counts.  The gate opens as soon as a chunk reaches ``open_dbfs``
+    and closes only after ``hangover`` chunks in a row below ``close_dbfs``,
+    so speech pauses and decaying sounds are not chopped.  While closed, the
+    background level is tracked as ``noise_dbfs`` for comfort noise.
+    """
+
+    SUBFRAME_SAMPLES = 256
+    FLOOR_DBFS = -96.0
+
+    def __init__(self, open_dbfs: float, close_dbfs: float, hangover: int):
+        self._open_power = _dbfs_to_power(open_dbfs)
+        self._close_power = _dbfs_to_power(close_dbfs)
+        self._hangover = hangover
+        self._quiet = hangover  # start closed
+        self.active = False
+        self.level_dbfs = self.FLOOR_DBFS
+        self.noise_dbfs = self.FLOOR_DBFS
+
+    def update(self, samples: np.ndarray) -> bool:
+        """Classify one chunk; returns True while the gate is open."""
+        flat = samples.reshape(-1).astype(np.float32)
+        usable = len(flat) // self.SUBFRAME_SAMPLES * self.SUBFRAME_SAMPLES
+        frames = flat[:usable].reshape(-1, self.SUBFRAME_SAMPLES) if usable else flat.reshape(1, -1)
+        power = float(np.einsum("ij,ij->i", frames, frames).max()) / frames.shape[1]
+        self.level_dbfs = _power_to_dbfs(power)
+
+        if power >= self._open_power:
+            self._quiet = 0
+        elif power < self._close_power:
+            self._quiet += 1
+        self.active = self._quiet < self._hangover
+        if not self.active:
+            if self.noise_dbfs <= self.FLOOR_DBFS:
+                self.noise_dbfs = self.level_dbfs
+            # Slow average so a single click does not move the comfort-noise level
+            self.noise_dbfs += 0.1 * (self.level_dbfs - self.noise_dbfs)
+        return self.active
+
+
+def _dbfs_to_power(dbfs: float) -> float:
+    return 32768.0 ** 2 * 10 ** (dbfs / 10)
+
+
+def _power_to_dbfs(power: float) -> float:
+    if power <= 0:
+        return VoiceActivityDetector.FLOOR_DBFS
+    return max(VoiceActivityDetector.FLOOR_DBFS, 10 * math.log10(power / 32768.0 ** 2))
+
+
+def _device_rate(kind: str) -> int:
+    """Rate to open the default *kind* ("input" / "output") device at.
+
+    AUDIO_DEVICE_RATE if set, otherwise whatever the hardware prefers.
+    """
+    if config.AUDIO_DEVICE_RATE:
+        return config.AUDIO_DEVICE_RATE
+    try:
+        return int(sd.query_devices(kind=kind)["default_samplerate"])
+    except Exception:
+        return config.AUDIO_SAMPLE_RATE
+
+
+def _device_blocksize(rate: int) -> int:
+    """Device block with the same duration as one AUDIO_CHUNK_SIZE chunk."""
+    return round(config.AUDIO_CHUNK_SIZE * rate / config.AUDIO_SAMPLE_RATE)
+
+
 class AudioCapture:
-    """Captures audio from microphone and distributes PCM chunks to listeners."""
+    """Captures audio from the microphone into a ring read by any number of listeners.
+
+    The device runs at its own rate; the callback resamples to
+    AUDIO_SAMPLE_RATE and re-blocks into AUDIO_CHUNK_SIZE chunks.
+    """
 
     def __init__(self):
-        self._listeners: list[queue.Queue] = []
-        self._lock = threading.Lock()
+        self._ring = PcmRing(config.AUDIO_RING_CHUNKS,
+                             config.AUDIO_CHUNK_SIZE * config.AUDIO_CHANNELS)
+        self._vad = VoiceActivityDetector(config.AUDIO_VAD_OPEN_DBFS,
+                                          config.AUDIO_VAD_CLOSE_DBFS,
+                                          config.AUDIO_VAD_HANGOVER_CHUNKS)
+        self._listeners: list[AudioReader] = []
+        self._lock = threading.Lock()  # listener list only; never taken by the callback
         self._stream: sd.InputStream | None = None
         self._running = False
+        self._last_callback = 0.0
+        self.device_rate = config.AUDIO_SAMPLE_RATE
+        self._resampler = Resampler(self.device_rate, config.AUDIO_SAMPLE_RATE)
+        self._pending = np.zeros(0, dtype=np.int16)  # resampled audio short of a full chunk
 
     def _audio_callback(self, indata: np.ndarray, frames: int, time_info, status):
         if status:
             logger.warning("AudioCapture: %s", status)
-        pcm_bytes = indata.tobytes()
-        with self._lock:
-            dead = []
-            for q in self._listeners:
-                try:
-                    q.put_nowait(pcm_bytes)
-                except queue.Full:
-                    dead.append(q)
-            for q in dead:
-                self._listeners.remove(q)
-
-    def start(self):
+        self._last_callback = time.monotonic()
+        samples = self._resampler.process(indata)
+        if len(self._pending):
+            samples = np.concatenate([self._pending, samples])
+        chunk = config.AUDIO_CHUNK_SIZE
+        end = len(samples) - len(samples) % chunk
+        for start in range(0, end, chunk):
+            block = samples[start:start + chunk]
+            self._ring.write(block, self._vad.update(block))
+        self._pending = samples[end:]
+
+    def start(self) -> bool:
+        """Open the default input device (one attempt; AudioDeviceSupervisor retries)."""
         if self._running:
-            return
-        for attempt in range(1, DEVICE_MAX_RETRIES + 1):
-            try:
-                devices = sd.query_devices()
-                default_in = sd.default.device[0]
-                logger.info("AudioCapture: available devices:\n%s", devices)
-                logger.info("AudioCapture: using default input device: %s", default_in)
-                self._stream = sd.InputStream(
-                    samplerate=config.AUDIO_SAMPLE_RATE,
-                    channels=config.AUDIO_CHANNELS,
-                    dtype="int16",
-                    blocksize=config.AUDIO_CHUNK_SIZE,
-                    callback=self._audio_callback,
-                )
-                self._stream.start()
-                self._running = True
-                logger.info("AudioCapture: microphone stream started (rate=%d, ch=%d, chunk=%d)",
-                            config.AUDIO_SAMPLE_RATE, config.AUDIO_CHANNELS, config.AUDIO_CHUNK_SIZE)
-                return
-            except Exception:
-                logger.exception("AudioCapture: failed to start microphone (attempt %d/%d)",
-                                 attempt, DEVICE_MAX_RETRIES)
-                if attempt < DEVICE_MAX_RETRIES:
-                    logger.info("AudioCapture: retrying in %d seconds...", DEVICE_RETRY_INTERVAL)
-                    time.sleep(DEVICE_RETRY_INTERVAL)
-        logger.error("AudioCapture: all %d attempts exhausted, microphone unavailable",
-                      DEVICE_MAX_RETRIES)
+            return True
+        try:
+            default_in = sd.default.device[0]
+            logger.info("AudioCapture: using default input device: %s", default_in)
+            rate = _device_rate("input")
+            self.device_rate = rate
+            self._resampler = Resampler(rate, config.AUDIO_SAMPLE_RATE)
+            self._pending = np.zeros(0, dtype=np.int16)
+            self._stream = sd.InputStream(
+                samplerate=rate,
+                channels=config.AUDIO_CHANNELS,
+                dtype="int16",
+                blocksize=_device_blocksize(rate),
+                callback=self._audio_callback,
+            )
+            self._last_callback = time.monotonic()
+            self._stream.start()
+            self._running = True
+            logger.info("AudioCapture: microphone stream started (device rate=%d, ch=%d, chunk=%d)",
+                        rate, config.AUDIO_CHANNELS, config.AUDIO_CHUNK_SIZE)
+            return True
+        except Exception as e:
+            logger.warning("AudioCapture: failed to start microphone: %s", e)
+            self._close_stream()
+            return False
 
     def stop(self):
         self._running = False
-        if self._stream:
-            self._stream.stop()
-            self._stream.close()
-            self._stream = None
+        self._close_stream()
         logger.info("AudioCapture: stopped")
 
-    def add_listener(self) -> queue.Queue:
-        q = queue.Queue(maxsize=50)
+    def _close_stream(self):
+        stream, self._stream = self._stream, None
+        if stream:
+            try:
+                stream.stop()
+                stream.close()
+            except Exception:
+                logger.exception("AudioCapture: error closing stream")
+
+    @property
+    def healthy(self) -> bool:
+        """Open, running, and its callback fired recently (a pulled device goes quiet)."""
+        stream = self._stream
+        return (self._running and stream is not None and stream.active
+                and time.monotonic() - self._last_callback < config.AUDIO_DEVICE_STALL_SECONDS)
+
+    def add_listener(self) -> AudioReader:
+        reader = AudioReader(self._ring)
         with self._lock:
-            self._listeners.append(q)
+            self._listeners.append(reader)
         logger.info("AudioCapture: listener added (total=%d)", len(self._listeners))
-        return q
+        return reader
 
-    def remove_listener(self, q: queue.Queue):
+    def remove_listener(self, reader: AudioReader):
         with self._lock:
-            if q in self._listeners:
-                self._listeners.remove(q)
+            if reader in self._listeners:
+                self._listeners.remove(reader)
+        if reader.missed:
+            logger.info("AudioCapture: listener missed %d chunks in total", reader.missed)
         logger.info("AudioCapture: listener removed (total=%d)", len(self._listeners))
 
     @property
@@ -100,161 +289,384 @@ class AudioCapture:
         with self._lock:
             return len(self._listeners)
 
+    @property
+    def activity(self) -> dict:
+        """Voice-activity state of the latest chunk (the UI's "sound" indicator)."""
+        vad = self._vad
+        return {
+            "active": self.is_active and vad.active,
+            "level_dbfs": round(vad.level_dbfs, 1),
+            "noise_dbfs": round(vad.noise_dbfs, 1),
+        }
+
+    @property
+    def missed_chunks(self) -> int:
+        """Chunks skipped by current listeners that fell behind."""
+        with self._lock:
+            return sum(reader.missed for reader in self._listeners)
+
+
+class JitterBuffer:
+    """Adaptive sample FIFO between network arrival and the speaker writer thread.
+
+    Talk-back audio arrives in bursts (WebRTC frames of 20 ms, or larger
+    Socket.IO chunks from the fallback path).  Arrival jitter is estimated
+    as in RFC 3550 (smoothed deviation of inter-arrival time from chunk
+    duration) and the target depth follows it: one device read plus one
+    arriving chunk plus three times the jitter, kept between ``min_ms`` and
+    half of ``max_ms``.  Playback starts once the target is buffered.
+
+    The depth converges on the target during silence only: a device-sized
+    read whose audio is quiet (below AUDIO_VAD_CLOSE_DBFS) gets up to
+    SILENCE_ADJUST of a block of it cut out when the buffer is too deep, or
+    silence inserted when it is too shallow.  Nothing is resampled, so the
+    pitch never shifts; while someone talks the depth is left alone.  An
+    underrun is concealed by fading out the last block rather than cutting
+    to silence, and the buffer re-fills.  Only a backlog beyond ``max_ms``
+    is trimmed outright.
+    """
+
+    SILENCE_ADJUST = 0.5
+    SPLICE_MS = 4  # crossfade where silence is cut or inserted
+    CONCEAL_MS = 40
+
+    def __init__(self, sample_rate: int, channels: int, target_ms: int = 120,
+                 max_ms: int = 500, min_ms: int = 40):
+        self._rate = sample_rate
+        self._channels = channels
+        self._initial_target = sample_rate * target_ms // 1000
+        self._min = sample_rate * min_ms // 1000
+        self._max = sample_rate * max_ms // 1000
+        self._quiet_power = _dbfs_to_power(config.AUDIO_VAD_CLOSE_DBFS)
+        self._cond = threading.Condition()
+        self._chunks: collections.deque[np.ndarray] = collections.deque()
+        self._frames = 0
+        self._buffering = True
+        self._target = self._initial_target
+        self._jitter = 0.0  # seconds
+        self._last_arrival: float | None = None
+        self._last_duration = 0.0
+        self._read_frames = 0  # size of the device reads
+        self._last_block: np.ndarray | None = None
+        self._starved = False
+        self._underruns = 0  # reads completed by concealment
+        self._late_chunks = 0
+        self._concealed_frames = 0
+        self._adjusted_frames = 0  # net frames of silence cut (+) or inserted (-)
+        self._trimmed_frames = 0
+
+    def push(self, pcm_data: bytes):
+        samples = np.frombuffer(pcm_data, dtype=np.int16)
+        if samples.size == 0:
+            return
+        samples = samples.reshape(-1, self._channels)
+        now = time.monotonic()
+        with self._cond:
+            self._track_jitter(now, len(samples) / self._rate)
+            if self._starved:
+                self._late_chunks += 1  # its audio was due while the buffer was empty
+                self._starved = False
+            self._chunks.append(samples)
+            self._frames += len(samples)
+            if self._frames > self._max:
+                self._trim(self._frames - self._target)
+            if self._buffering and self._frames >= self._target:
+                self._buffering = False
+            if not self._buffering:
+                self._cond.notify()
+
+    def _track_jitter(self, now: float, duration: float):
+        """Update the jitter estimate and target depth. Caller holds the lock."""
+        if self._last_arrival is not None:
+            gap = now - self._last_arrival
+            if gap < 1.0:  # longer gaps are pauses between talk spurts, not jitter
+                deviation = abs(gap - self._last_duration)
+                self._jitter += (deviation - self._jitter) / 16
+        self._last_arrival, self._last_duration = now, duration
+        if not self._read_frames:
+            return  # keep the initial target until playback has started
+        target = self._read_frames + int((duration + 3 * self._jitter) * self._rate)
+        self._target = min(max(target, self._min), self._max // 2)
+
+    def pop(self, frames: int, timeout: float) -> np.ndarray | None:
+        """Return *frames* samples, or None if nothing is playable yet.
+
+        A read that empties the buffer is completed with concealment and
+        puts the buffer back into pre-fill.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: not self._buffering, timeout):
+                return None
+            self._read_frames = frames
+            limit = int(frames * self.SILENCE_ADJUST)
+            want = frames + max(-limit, min(self._frames - self._target, limit))
+            block = self._take(min(want, self._frames))
+            if want != frames and not self._quiet(block):
+                # Not silence: play exactly one block
+                if len(block) > frames:
+                    surplus = block[frames:]
+                    block = block[:frames]
+                    self._chunks.appendleft(surplus)
+                    self._frames += len(surplus)
+                elif self._frames:
+                    block = np.concatenate([block, self._take(min(frames - len(block),
+                                                                  self._frames))])
+                want = frames
+            if self._frames == 0:
+                self._buffering = True
+                self._starved = True
+        adjusted = concealed = 0
+        if len(block) != frames and len(block) >= want:
+            out = _splice_silence(block, frames, self._rate * self.SPLICE_MS // 1000)
+            adjusted = len(block) - frames
+        elif len(block) < frames:
+            concealed = frames - len(block)
+            out = np.concatenate([block, self._conceal(concealed)])
+        else:
+            out = block
+        self._last_block = out
+        with self._cond:
+            self._adjusted_frames += adjusted
+            if concealed:
+                self._underruns += 1
+                self._concealed_frames += concealed
+        return out
+
+    def _quiet(self, block: np.ndarray) -> bool:
+        return len(block) > 0 and float(np.mean(block.astype(np.float32) ** 2)) < self._quiet_power
+
+    def _take(self, frames: int) -> np.ndarray:
+        """Remove up to *frames* of the oldest samples. Caller holds the lock."""
+        parts = []
+        taken = 0
+        while taken < frames and self._chunks:
+            head = self._chunks[0]
+            n = min(frames - taken, len(head))
+            parts.append(head[:n])
+            taken += n
+            if n == len(head):
+                self._chunks.popleft()
+            else:
+                self._chunks[0] = head[n:]
+        self._frames -= taken
+        if not parts:
+            return np.zeros((0, self._channels), dtype=np.int16)
+        return np.concatenate(parts)
+
+    def _conceal(self, frames: int) -> np.ndarray:
+        """Fill a gap with the end of the last block, faded out over CONCEAL_MS."""
+        out = np.zeros((frames, self._channels), dtype=np.int16)
+        last = self._last_block
+        if last is None or len(last) == 0:
+            return out
+        fade = min(frames, len(last), self._rate * self.CONCEAL_MS // 1000)
+        ramp = np.linspace(1.0, 0.0, fade, dtype=np.float32)[:, None]
+        out[:fade] = (last[-fade:] * ramp).astype(np.int16)
+        return out
+
+    def clear(self):
+        with self._cond:
+            self._chunks.clear()
+            self._frames = 0
+            self._buffering = True
+            self._starved = False
+            self._last_arrival = None
+            self._last_block = None
+            self._jitter = 0.0
+            self._target = self._initial_target
+
+    def _trim(self, frames: int):
+        """Drop *frames* of the oldest samples. Caller holds the lock."""
+        self._trimmed_frames += len(self._take(frames))
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "depth_ms": self._frames * 1000 // self._rate,
+                "target_ms": self._target * 1000 // self._rate,
+                "jitter_ms": round(self._jitter * 1000, 1),
+                "buffering": self._buffering,
+                "underruns": self._underruns,
+                "late_chunks": self._late_chunks,
+                "concealed_frames": self._concealed_frames,
+                "adjusted_frames": self._adjusted_frames,
+                "trimmed_frames": self._trimmed_frames,
+            }
+
+
+def _splice_silence(samples: np.ndarray, frames: int, fade: int) -> np.ndarray:
+    """Cut from or insert silence into the middle of quiet *samples* to make *frames* rows.
+
+    Samples are never resampled; the splice is crossfaded over *fade* rows.
+    """
+    half = len(samples) // 2
+    fade = min(fade, half, len(samples) - half)
+    ramp = np.linspace(1.0, 0.0, fade, dtype=np.float32)[:, None]
+    head = samples[:half].astype(np.float32)
+    if len(samples) > frames:
+        tail = samples[half - fade + len(samples) - frames:].astype(np.float32)
+        head[half - fade:] = head[half - fade:] * ramp + tail[:fade] * ramp[::-1]
+        mixed = np.concatenate([head, tail[fade:]])
+    else:
+        tail = samples[half:].astype(np.float32)
+        head[half - fade:] *= ramp
+        tail[:fade] *= ramp[::-1]
+        gap = np.zeros((frames - len(samples), samples.shape[1]), dtype=np.float32)
+        mixed = np.concatenate([head, gap, tail])
+    return np.round(mixed).astype(np.int16)
+
 
 class AudioPlayer:
     """Plays received PCM audio through the speaker.
 
-    play() is non-blocking: PCM is enqueued and written to the OutputStream by
-    a dedicated worker thread. This keeps Socket.IO event handlers off the
-    audio device, so a transient PortAudio stall cannot freeze the websocket
-    connection. The queue is bounded; on overflow the oldest chunk is dropped
-    to prevent latency build-up.
+    play() is non-blocking: PCM is pushed into a JitterBuffer and written to
+    the OutputStream by a dedicated worker thread. This keeps Socket.IO event
+    handlers and the WebRTC event loop off the audio device, so a transient
+    PortAudio stall cannot freeze either. The jitter buffer adapts its depth
+    to network burstiness and converges on it during silence. The writer
+    resamples from AUDIO_SAMPLE_RATE to the device's own rate.
     """
 
-    # Bounded playback queue. 16 chunks ≈ 1 s of audio at 1024 samples / 16 kHz.
-    _PLAY_QUEUE_MAX = 16
-
     def __init__(self):
         self._stream: sd.OutputStream | None = None
         self._lock = threading.Lock()
         self._running = False
         self._talking_clients = 0
-        self._play_queue: queue.Queue[bytes] = queue.Queue(maxsize=self._PLAY_QUEUE_MAX)
+        self._jitter = JitterBuffer(
+            config.AUDIO_SAMPLE_RATE, config.AUDIO_CHANNELS,
+            target_ms=config.AUDIO_JITTER_TARGET_MS,
+            max_ms=config.AUDIO_JITTER_MAX_MS,
+            min_ms=config.AUDIO_JITTER_MIN_MS,
+        )
         self._writer_thread: threading.Thread | None = None
         self._stop_event = threading.Event()
+        self._failed = False  # the writer hit a device error
+        self.device_rate = config.AUDIO_SAMPLE_RATE
+        self._resampler = Resampler(config.AUDIO_SAMPLE_RATE, self.device_rate)
+        self._talk_resampler: Resampler | None = None  # client rate -> AUDIO_SAMPLE_RATE
 
-    def start(self):
+    def start(self) -> bool:
+        """Open the default output device (one attempt; AudioDeviceSupervisor retries)."""
         if self._running:
-            return
-        for attempt in range(1, DEVICE_MAX_RETRIES + 1):
-            try:
-                default_out = sd.default.device[1]
-                logger.info("AudioPlayer: using default output device: %s", default_out)
-                self._stream = sd.OutputStream(
-                    samplerate=config.AUDIO_SAMPLE_RATE,
-                    channels=config.AUDIO_CHANNELS,
-                    dtype="int16",
-                    blocksize=config.AUDIO_CHUNK_SIZE,
-                )
-                self._stream.start()
-                self._running = True
-                self._stop_event.clear()
-                self._writer_thread = threading.Thread(
-                    target=self._writer_loop,
-                    name="audio-player-writer",
-                    daemon=True,
-                )
-                self._writer_thread.start()
-                logger.info("AudioPlayer: speaker stream started (rate=%d, ch=%d, chunk=%d)",
-                            config.AUDIO_SAMPLE_RATE, config.AUDIO_CHANNELS, config.AUDIO_CHUNK_SIZE)
-                return
-            except Exception:
-                logger.exception("AudioPlayer: failed to start speaker (attempt %d/%d)",
-                                 attempt, DEVICE_MAX_RETRIES)
-                if attempt < DEVICE_MAX_RETRIES:
-                    logger.info("AudioPlayer: retrying in %d seconds...", DEVICE_RETRY_INTERVAL)
-                    time.sleep(DEVICE_RETRY_INTERVAL)
-        logger.error("AudioPlayer: all %d attempts exhausted, speaker unavailable",
-                      DEVICE_MAX_RETRIES)
+            return True
+        try:
+            default_out = sd.default.device[1]
+            logger.info("AudioPlayer: using default output device: %s", default_out)
+            rate = _device_rate("output")
+            self.device_rate = rate
+            self._resampler = Resampler(config.AUDIO_SAMPLE_RATE, rate)
+            self._stream = sd.OutputStream(
+                samplerate=rate,
+                channels=config.AUDIO_CHANNELS,
+                dtype="int16",
+                blocksize=_device_blocksize(rate),
+            )
+            self._stream.start()
+        except Exception as e:
+            logger.warning("AudioPlayer: failed to start speaker: %s", e)
+            self._close_stream()
+            return False
+        self._failed = False
+        self._running = True
+        self._stop_event.clear()
+        self._writer_thread = threading.Thread(
+            target=self._writer_loop,
+            name="audio-player-writer",
+            daemon=True,
+        )
+        self._writer_thread.start()
+        logger.info("AudioPlayer: speaker stream started (device rate=%d, ch=%d, chunk=%d)",
+                    self.device_rate, config.AUDIO_CHANNELS, config.AUDIO_CHUNK_SIZE)
+        return True
 
     def stop(self):
         self._running = False
         self._stop_event.set()
-        # Drain queue so the writer thread exits its blocking get() promptly.
-        while True:
-            try:
-                self._play_queue.get_nowait()
-            except queue.Empty:
-                break
+        self._jitter.clear()
         if self._writer_thread and self._writer_thread.is_alive():
             self._writer_thread.join(timeout=2)
         self._writer_thread = None
-        if self._stream:
+        self._close_stream()
+        logger.info("AudioPlayer: stopped")
+
+    def _close_stream(self):
+        stream, self._stream = self._stream, None
+        if stream:
             try:
-                self._stream.stop()
-                self._stream.close()
+                stream.stop()
+                stream.close()
             except Exception:
                 logger.exception("AudioPlayer: error closing stream")
-            self._stream = None
-        logger.info("AudioPlayer: stopped")
 
-    def play(self, pcm_data: bytes):
-        """Enqueue PCM for asynchronous playback. Non-blocking.
+    def play(self, pcm_data: bytes, rate: int = config.AUDIO_SAMPLE_RATE):
+        """Queue PCM for asynchronous playback. Non-blocking.
 
-        On overflow drops the oldest queued chunk so playback stays close to
-        real time even if the device temporarily slows down.
+        Accepts int16 PCM of any length at *rate* (the talking client's own
+        rate, resampled here to AUDIO_SAMPLE_RATE); the jitter buffer
+        re-blocks it into device-sized writes.
         """
         if not self._running:
             return
-        try:
-            self._play_queue.put_nowait(pcm_data)
-        except queue.Full:
-            try:
-                self._play_queue.get_nowait()
-            except queue.Empty:
-                pass
-            try:
-                self._play_queue.put_nowait(pcm_data)
-            except queue.Full:
-                pass
+        if rate != config.AUDIO_SAMPLE_RATE:
+            # Under the talk-slot lock: a talker's resampler state never
+            # carries over into the next talker's stream
+            with self._lock:
+                resampler = self._talk_resampler
+                if resampler is None or resampler.src_rate != rate:
+                    resampler = self._talk_resampler = Resampler(rate, config.AUDIO_SAMPLE_RATE)
+                pcm_data = resampler.process(np.frombuffer(pcm_data, dtype=np.int16)).tobytes()
+        self._jitter.push(pcm_data)
 
     def _writer_loop(self):
-        """Background worker: drain the queue into the OutputStream."""
+        """Background worker: drain the jitter buffer into the OutputStream.
+
+        A device error parks the loop; the supervisor sees ``healthy`` go
+        False and re-opens the device.
+        """
         while not self._stop_event.is_set():
-            try:
-                pcm_data = self._play_queue.get(timeout=0.2)
-            except queue.Empty:
+            samples = self._jitter.pop(config.AUDIO_CHUNK_SIZE, timeout=0.2)
+            if samples is None:
                 continue
             stream = self._stream
-            if stream is None:
+            if stream is None or self._failed:
                 continue
+            samples = self._resampler.process(samples).reshape(-1, config.AUDIO_CHANNELS)
             try:
-                samples = np.frombuffer(pcm_data, dtype=np.int16)
-                samples = samples.reshape(-1, config.AUDIO_CHANNELS)
                 stream.write(samples)
             except sd.PortAudioError:
-                logger.exception("AudioPlayer: PortAudio error, attempting stream reopen")
-                self._reopen_stream()
+                logger.exception("AudioPlayer: PortAudio error, waiting for the device to be re-opened")
+                self._failed = True
             except Exception:
                 logger.exception("AudioPlayer: playback error")
 
-    def _reopen_stream(self):
-        """Re-open the OutputStream after a device error. Called from the writer thread."""
-        try:
-            if self._stream:
-                try:
-                    self._stream.close()
-                except Exception:
-                    pass
-                self._stream = None
-            self._stream = sd.OutputStream(
-                samplerate=config.AUDIO_SAMPLE_RATE,
-                channels=config.AUDIO_CHANNELS,
-                dtype="int16",
-                blocksize=config.AUDIO_CHUNK_SIZE,
-            )
-            self._stream.start()
-            logger.info("AudioPlayer: stream re-opened after error")
-        except Exception:
-            logger.exception("AudioPlayer: stream re-open failed")
-
     def acquire_talk(self) -> bool:
         """Try to acquire talk slot (only 1 client can talk at a time)."""
         with self._lock:
             if self._talking_clients > 0:
                 return False
             self._talking_clients = 1
+            self._talk_resampler = None  # also drops one a late play() recreated
             return True
 
     def release_talk(self):
         with self._lock:
             self._talking_clients = max(0, self._talking_clients - 1)
+            self._talk_resampler = None
 
     @property
     def is_active(self) -> bool:
         return self._running and self._stream is not None
 
+    @property
+    def healthy(self) -> bool:
+        stream = self._stream
+        return self._running and stream is not None and stream.active and not self._failed
+
     @property
     def talking_clients(self) -> int:
         with self._lock:
             return self._talking_clients
+
+    @property
+    def jitter_stats(self) -> dict:
+        return self._jitter.stats()
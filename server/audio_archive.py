@@ -0,0 +1,425 @@
+"""Rolling on-disk archive of the microphone, one compressed file per minute.
+
+A reader thread takes every chunk from the capture ring (like the other
+listeners) and encodes it to AAC-LC at AUDIO_ARCHIVE_BITRATE.  Each AAC frame
+(1024 samples) is written with its own ADTS header, so a file is playable on
+its own and any run of whole frames, from one file or several, concatenates
+into a valid stream without remuxing.  That is what the range API serves.
+
+Frames are handed to a writer thread in batches every
+AUDIO_ARCHIVE_FLUSH_SECONDS, so disk latency never holds up the reader (the
+capture ring only holds a few seconds).  Files roll on the wall-clock minute:
+
+    audio_archive/YYYY-MM-DD/audio_YYYYMMDD_HHMMSS.aac
+
+Each finished file gets a JSON sidecar with its time index (seconds from the
+file start -> byte offset of the frame, about one entry per second); the
+index of the file being written is kept in memory and only covers bytes that
+are already on disk.  Chunks the reader fell behind on are archived as
+silence so times stay exact; when the microphone stops delivering (device
+gone) the current file is closed and a new one starts when audio returns.
+The oldest files are deleted to stay within AUDIO_ARCHIVE_MAX_BYTES and the
+retention period.
+"""
+
+import fractions
+import glob
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import av
+import numpy as np
+from av import AudioFrame
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+FRAME_SAMPLES = 1024      # AAC-LC frame
+ADTS_HEADER_BYTES = 7
+INDEX_INTERVAL = 1.0      # seconds between time index entries
+MAX_DRIFT_SECONDS = 1.0   # capture clock this far from the wall clock = new file
+_ADTS_RATES = (96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050,
+               16000, 12000, 11025, 8000, 7350)
+
+
+def _sidecar_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def adts_header(payload_bytes: int, rate: int = config.AUDIO_SAMPLE_RATE,
+                channels: int = config.AUDIO_CHANNELS) -> bytes:
+    """ADTS header (MPEG-4, no CRC) for one AAC-LC frame of *payload_bytes*."""
+    size = payload_bytes + ADTS_HEADER_BYTES
+    freq = _ADTS_RATES.index(rate)
+    return bytes((
+        0xFF, 0xF1,
+        (1 << 6) | (freq << 2) | (channels >> 2),  # profile LC (object type 2, minus 1)
+        ((channels & 3) << 6) | (size >> 11),
+        (size >> 3) & 0xFF,
+        ((size & 7) << 5) | 0x1F,                   # buffer fullness 0x7FF (VBR)...
+        0xFC,                                       # ...and one raw block per frame
+    ))
+
+
+class AudioArchive:
+    def __init__(self, audio_capture):
+        self._capture = audio_capture
+        self._rate = config.AUDIO_SAMPLE_RATE
+        self._layout = "mono" if config.AUDIO_CHANNELS == 1 else "stereo"
+        self._lock = threading.Lock()
+        self._segments: list[dict] = []     # finished files, oldest first
+        self._current: dict | None = None   # file being written (writer thread)
+        self._queue: queue.Queue = queue.Queue()
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self._writer_thread: threading.Thread | None = None
+        self._file = None
+        self.bytes_written = 0
+        self.batches_written = 0
+
+    # ── Lifecycle ──
+
+    def start(self):
+        if self._running:
+            return
+        os.makedirs(config.AUDIO_ARCHIVE_DIR, exist_ok=True)
+        self._load_index()
+        self._running = True
+        self._writer_thread = threading.Thread(target=self._write_loop, name="audio-archive-writer",
+                                               daemon=True)
+        self._writer_thread.start()
+        self._thread = threading.Thread(target=self._run, name="audio-archive", daemon=True)
+        self._thread.start()
+        logger.info("AudioArchive: started (%d files on disk)", len(self._segments))
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._writer_thread:
+            self._queue.put(None)
+            self._writer_thread.join(timeout=10)
+            self._writer_thread = None
+        logger.info("AudioArchive: stopped")
+
+    @property
+    def is_active(self) -> bool:
+        return self._running
+
+    def segments(self) -> list[dict]:
+        """Finished files plus the one being written (``in_progress``), oldest first."""
+        with self._lock:
+            segs = [dict(s) for s in self._segments]
+            if self._current and self._current["size"]:
+                segs.append(dict(self._current, index=list(self._current["index"]),
+                                 in_progress=True))
+        return segs
+
+    @property
+    def storage_used_bytes(self) -> int:
+        with self._lock:
+            used = sum(s["size"] for s in self._segments)
+            return used + (self._current["size"] if self._current else 0)
+
+    def segment_path(self, seg: dict) -> str:
+        return os.path.join(config.AUDIO_ARCHIVE_DIR, seg["day"], seg["filename"])
+
+    def stats(self) -> dict:
+        segs = self.segments()
+        return {
+            "running": self._running,
+            "files": len(segs),
+            "oldest": segs[0]["start"] if segs else None,
+            "newest": segs[-1]["end"] if segs else None,
+            "storage_used_bytes": sum(s["size"] for s in segs),
+            "storage_limit_bytes": config.AUDIO_ARCHIVE_MAX_BYTES,
+            "bytes_written": self.bytes_written,
+            "batches_written": self.batches_written,
+            "pending_batches": self._queue.qsize(),
+        }
+
+    # ── Lookup ──
+
+    def spans(self, start: float, end: float) -> list[tuple[str, int, int, float, float]]:
+        """Byte spans covering wall-clock [start, end), oldest first.
+
+        Each span is ``(path, byte_start, byte_stop, time_start, time_stop)``
+        and begins and ends on frame boundaries at index resolution (about a
+        second), so the spans concatenated are one valid ADTS stream.
+        """
+        result = []
+        for seg in self.segments():
+            if seg["end"] <= start or seg["start"] >= end or not seg["index"]:
+                continue
+            index = seg["index"]
+            byte_start, time_start = index[0][1], seg["start"] + index[0][0]
+            byte_stop, time_stop = seg["size"], seg["end"]
+            for sec, offset in index:
+                at = seg["start"] + sec
+                if at <= start:
+                    byte_start, time_start = offset, at
+                elif at >= end:
+                    byte_stop, time_stop = offset, at
+                    break
+            if byte_stop > byte_start:
+                result.append((self.segment_path(seg), byte_start, byte_stop,
+                               time_start, time_stop))
+        return result
+
+    # ── Reader / encoder ──
+
+    def _open_codec(self):
+        codec = av.CodecContext.create("aac", "w")
+        codec.sample_rate = self._rate
+        codec.layout = self._layout
+        codec.format = "fltp"
+        codec.bit_rate = config.AUDIO_ARCHIVE_BITRATE
+        codec.time_base = fractions.Fraction(1, self._rate)
+        codec.open()
+        return codec
+
+    def _run(self):
+        reader = self._capture.add_listener()
+        chunk_bytes = config.AUDIO_CHUNK_SIZE * config.AUDIO_CHANNELS * 2
+        codec = None
+        run_start = 0.0
+        pts = 0
+        seg: dict | None = None
+        batch: list[tuple[float, bytes]] = []
+        flushed = time.monotonic()
+        try:
+            while self._running:
+                item = reader.read(timeout=0.5)
+                if item is not None:
+                    pcm, missed = item
+                    now = time.time()
+                    expected = run_start + (pts + (missed + 1) * config.AUDIO_CHUNK_SIZE) / self._rate
+                    if codec is not None and abs(now - expected) > MAX_DRIFT_SECONDS:
+                        # Device was gone (or the clocks drifted apart): start a new file
+                        self._emit(seg, batch, self._drain(codec, run_start), close=True)
+                        seg, batch, codec = None, [], None
+                    if codec is None:
+                        codec, pts, missed = self._open_codec(), 0, 0
+                        run_start = now - config.AUDIO_CHUNK_SIZE / self._rate
+                    chunks = [bytes(chunk_bytes)] * missed + [pcm]  # silence for what we skipped
+                    for data in chunks:
+                        for packet in codec.encode(self._frame(data, pts)):
+                            at = run_start + packet.pts / self._rate
+                            if seg is not None and int(at // 60) != int(seg["start"] // 60):
+                                self._emit(seg, batch, [], close=True)
+                                seg, batch = None, []
+                            if seg is None:
+                                seg = self._new_segment(at)
+                            batch.append((at, adts_header(packet.size) + bytes(packet)))
+                        pts += config.AUDIO_CHUNK_SIZE
+                if batch and time.monotonic() - flushed >= config.AUDIO_ARCHIVE_FLUSH_SECONDS:
+                    self._emit(seg, batch, [], close=False)
+                    batch, flushed = [], time.monotonic()
+            if codec is not None:
+                self._emit(seg, batch, self._drain(codec, run_start), close=True)
+        except Exception:
+            logger.exception("AudioArchive: stopped on error")
+            self._running = False
+            if seg is not None:
+                self._emit(seg, batch, [], close=True)
+        finally:
+            self._capture.remove_listener(reader)
+
+    def _frame(self, pcm: bytes, pts: int) -> AudioFrame:
+        samples = np.frombuffer(pcm, dtype=np.int16).reshape(1, -1)
+        frame = AudioFrame.from_ndarray(samples, format="s16", layout=self._layout)
+        frame.sample_rate = self._rate
+        frame.pts = pts
+        return frame
+
+    def _drain(self, codec, run_start: float) -> list[tuple[float, bytes]]:
+        """Frames still inside the encoder (its look-ahead), at end of a run."""
+        return [(run_start + p.pts / self._rate, adts_header(p.size) + bytes(p))
+                for p in codec.encode(None)]
+
+    def _new_segment(self, at: float) -> dict:
+        started = datetime.fromtimestamp(at)
+        return {
+            "day": started.strftime("%Y-%m-%d"),
+            "filename": started.strftime("audio_%Y%m%d_%H%M%S.aac"),
+            "start": at,
+            "end": at,
+            "rate": self._rate,
+            "bitrate": config.AUDIO_ARCHIVE_BITRATE,
+            "size": 0,
+            "index": [],
+        }
+
+    def _emit(self, seg: dict | None, batch: list, tail: list, close: bool):
+        """Hand *batch* + *tail* for *seg* to the writer, closing the file after it if *close*."""
+        if seg is not None:
+            self._queue.put((seg, batch + tail, close))
+
+    # ── Writer ──
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            seg, frames, close = item
+            try:
+                if frames:
+                    self._write(seg, frames)
+                if close:
+                    self._close(seg)
+            except OSError:
+                logger.exception("AudioArchive: write failed for %s", seg["filename"])
+                self._file = None
+                with self._lock:
+                    self._current = None
+
+    def _write(self, seg: dict, frames: list[tuple[float, bytes]]):
+        if self._current is not seg:
+            path = self.segment_path(seg)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._file = open(path, "wb")
+            with self._lock:
+                self._current = seg
+            logger.info("AudioArchive: file opened %s/%s", seg["day"], seg["filename"])
+        offset = seg["size"]
+        entries = []
+        last = seg["index"][-1][0] if seg["index"] else -INDEX_INTERVAL
+        for at, data in frames:
+            sec = at - seg["start"]
+            if sec - last >= INDEX_INTERVAL:
+                entries.append([round(max(0.0, sec), 3), offset])
+                last = sec
+            offset += len(data)
+        self._file.write(b"".join(data for _, data in frames))
+        self._file.flush()
+        # Publish only what is on disk
+        with self._lock:
+            seg["index"].extend(entries)
+            seg["size"] = offset
+            seg["end"] = frames[-1][0] + FRAME_SAMPLES / self._rate
+        self.bytes_written += sum(len(data) for _, data in frames)
+        self.batches_written += 1
+
+    def _close(self, seg: dict):
+        if self._current is not seg:
+            return  # nothing was written
+        self._file.close()
+        self._file = None
+        path = self.segment_path(seg)
+        try:
+            tmp = _sidecar_path(path) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(seg, f)
+            os.replace(tmp, _sidecar_path(path))
+        except OSError:
+            logger.exception("AudioArchive: failed to finalize %s", seg["filename"])
+        with self._lock:
+            self._segments.append(seg)
+            self._current = None
+        logger.info("AudioArchive: file closed %s (%.0fs, %d bytes)",
+                    seg["filename"], seg["end"] - seg["start"], seg["size"])
+        self._enforce_limits()
+
+    def _enforce_limits(self):
+        """Delete the oldest files beyond the size quota or retention period."""
+        cutoff = time.time() - config.AUDIO_ARCHIVE_RETENTION_DAYS * 24 * 60 * 60
+        with self._lock:
+            used = sum(s["size"] for s in self._segments)
+            if self._current:
+                used += self._current["size"]
+            expired = []
+            while self._segments and (used > config.AUDIO_ARCHIVE_MAX_BYTES
+                                      or self._segments[0]["end"] < cutoff):
+                seg = self._segments.pop(0)
+                used -= seg["size"]
+                expired.append(seg)
+        for seg in expired:
+            path = self.segment_path(seg)
+            logger.info("AudioArchive: deleting oldest %s/%s (FIFO)", seg["day"], seg["filename"])
+            for p in (path, _sidecar_path(path)):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # e.g. still memory-mapped by a range request on Windows
+                    logger.warning("AudioArchive: could not delete %s", p)
+            try:
+                os.rmdir(os.path.dirname(path))  # only succeeds once the day is empty
+            except OSError:
+                pass
+
+    # ── Index ──
+
+    def _load_index(self):
+        segments = []
+        pattern = os.path.join(config.AUDIO_ARCHIVE_DIR, "*", "audio_*.aac")
+        for path in sorted(glob.glob(pattern)):
+            sidecar = _sidecar_path(path)
+            try:
+                with open(sidecar, encoding="utf-8") as f:
+                    segments.append(json.load(f))
+                continue
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError):
+                logger.warning("AudioArchive: unreadable index %s, rebuilding", sidecar)
+            seg = self._recover_segment(path)
+            if seg:
+                segments.append(seg)
+        segments.sort(key=lambda s: s["start"])
+        with self._lock:
+            self._segments = segments
+        self._enforce_limits()
+
+    def _recover_segment(self, path: str) -> dict | None:
+        """Rebuild the index of a file left unfinished by a crash by walking its ADTS headers."""
+        filename = os.path.basename(path)
+        frame_seconds = FRAME_SAMPLES / self._rate
+        try:
+            start = datetime.strptime(filename, "audio_%Y%m%d_%H%M%S.aac").timestamp()
+            index, offset, frames = [], 0, 0
+            with open(path, "rb") as f:
+                while True:
+                    header = f.read(ADTS_HEADER_BYTES)
+                    if len(header) < ADTS_HEADER_BYTES or header[0] != 0xFF or header[1] & 0xF0 != 0xF0:
+                        break
+                    size = (header[3] & 3) << 11 | header[4] << 3 | header[5] >> 5
+                    if f.seek(offset + size) != offset + size or size <= ADTS_HEADER_BYTES:
+                        break
+                    if not index or frames * frame_seconds - index[-1][0] >= INDEX_INTERVAL:
+                        index.append([round(frames * frame_seconds, 3), offset])
+                    offset += size
+                    frames += 1
+                end_of_file = f.seek(0, os.SEEK_END)
+        except (OSError, ValueError):
+            logger.exception("AudioArchive: cannot recover %s", path)
+            return None
+        if not index:
+            return None
+        if end_of_file > offset:  # a frame cut short by the crash
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+        seg = {
+            "day": os.path.basename(os.path.dirname(path)),
+            "filename": filename,
+            "start": start,
+            "end": start + frames * frame_seconds,
+            "rate": self._rate,
+            "bitrate": config.AUDIO_ARCHIVE_BITRATE,
+            "size": offset,
+            "index": index,
+            "recovered": True,
+        }
+        with open(_sidecar_path(path), "w", encoding="utf-8") as f:
+            json.dump(seg, f)
+        logger.info("AudioArchive: recovered index for %s (%d frames)", filename, frames)
+        return seg
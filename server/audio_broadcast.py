@@ -0,0 +1,260 @@
+"""Microphone audio to Socket.IO listeners with one reader and one emit per packet.
+
+A single thread reads the capture ring (AudioCapture) once per chunk and
+emits each packet to a Socket.IO room holding every listener, so thread count
+and per-chunk CPU stay flat as listeners are added.  Optionally several
+chunks are coalesced into one packet (AUDIO_PACKET_CHUNKS) to cut
+per-message framing and syscalls at the cost of that much extra latency.
+
+Each listener picks a payload format (audio_codec.FORMATS) and a rate
+(audio_codec.stream_rate) and also joins the room of that stream.  A packet
+is resampled and encoded once per (format, rate) in use, never once per
+listener; an encoder is created when its first listener arrives and dropped
+with its last.
+
+Data budgets: a listener whose bandwidth account reaches a budget step is
+moved to a lighter format (the step's ``audio_max_format``), and back when
+the budget allows its own again.  Budgets are checked when a listener is
+added and every BANDWIDTH_POLL_SECONDS; a move is announced to the listener
+with an ``audio_status`` carrying the new format, sent before any packet in
+that format.
+
+With AUDIO_SILENCE_SUPPRESSION, chunks the capture's voice-activity gate
+marks as silent are neither encoded nor sent.  Going quiet is announced once
+with an ``audio_vad`` marker carrying the background level (clients may play
+comfort noise at it); the first loud chunk is sent as soon as it is read, so
+resuming costs no extra latency.  What each listener would have received is
+counted as bytes saved.
+
+The thread only runs while at least one client is listening.  If it falls
+behind the capture ring, the skipped audio is reported to the room as an
+``audio_lag`` event.
+"""
+
+import logging
+import threading
+import time
+
+from . import audio_codec, bandwidth, config
+
+logger = logging.getLogger(__name__)
+
+ROOM = "listeners"
+
+
+def stream_room(fmt: str, rate: int) -> str:
+    return f"{ROOM}:{fmt}:{rate}"
+
+
+class AudioBroadcaster:
+    def __init__(self, socketio, audio_capture, namespace: str = "/audio"):
+        self._socketio = socketio
+        self._capture = audio_capture
+        self._namespace = namespace
+        self._lock = threading.Lock()
+        self._listeners: dict[str, tuple[str, str, int]] = {}  # {sid: (bandwidth account, format, rate)}
+        self._requested: dict[str, tuple[str, int]] = {}  # {sid: (format, rate) it asked for}
+        self._thread: threading.Thread | None = None
+        self._bytes_saved: dict[str, int] = {}  # {sid: bytes not sent during silence}
+        self._silent = False
+        self.packets_sent = 0
+        self.chunks_suppressed = 0
+
+    def add(self, sid: str, account: str, fmt: str = "pcm",
+            rate: int = config.AUDIO_SAMPLE_RATE) -> bool:
+        """Start sending *fmt* packets at *rate* to *sid*.  Returns False if it was already listening.
+
+        The account's data budget may start it on a lighter format (see
+        ``stream_of``).
+
+        Raises:
+            ValueError: *fmt* is not one of audio_codec.FORMATS, or *fmt* is
+                not sent at *rate* (see audio_codec.stream_rate)
+        """
+        if fmt not in audio_codec.FORMATS:
+            raise ValueError(f"Unknown audio format: {fmt}")
+        if audio_codec.stream_rate(fmt, rate) != rate:
+            raise ValueError(f"Unsupported rate for {fmt}: {rate}")
+        requested = (fmt, rate)
+        fmt, rate = _budget_stream(account, requested)
+        with self._lock:
+            if sid in self._listeners:
+                return False
+            self._listeners[sid] = (account, fmt, rate)
+            self._requested[sid] = requested
+            self._bytes_saved[sid] = 0
+            self._socketio.server.enter_room(sid, ROOM, namespace=self._namespace)
+            self._socketio.server.enter_room(sid, stream_room(fmt, rate), namespace=self._namespace)
+            if self._silent:
+                self._socketio.emit("audio_vad", self._vad_marker(False),
+                                    namespace=self._namespace, to=sid)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audio-broadcast",
+                                                daemon=True)
+                self._thread.start()
+                logger.info("AudioBroadcast: started")
+        logger.info("AudioBroadcast: listener %s added (%s @ %d Hz, total=%d)", sid, fmt, rate,
+                    len(self._listeners))
+        return True
+
+    def remove(self, sid: str) -> bool:
+        """Stop sending to *sid*.  Returns False if it was not listening."""
+        with self._lock:
+            listener = self._listeners.pop(sid, None)
+            if listener is None:
+                return False
+            saved = self._bytes_saved.pop(sid, 0)
+            self._requested.pop(sid, None)
+            try:
+                self._socketio.server.leave_room(sid, ROOM, namespace=self._namespace)
+                self._socketio.server.leave_room(sid, stream_room(*listener[1:]),
+                                                 namespace=self._namespace)
+            except Exception:
+                pass  # already disconnected
+        logger.info("AudioBroadcast: listener %s removed (saved %d bytes, total=%d)", sid, saved,
+                    len(self._listeners))
+        return True
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._listeners
+
+    def stream_of(self, sid: str) -> tuple[str, int] | None:
+        """(format, rate) *sid* is listening with, or None."""
+        listener = self._listeners.get(sid)
+        return listener[1:] if listener else None
+
+    def sids(self) -> list[str]:
+        with self._lock:
+            return list(self._listeners)
+
+    @property
+    def count(self) -> int:
+        return len(self._listeners)
+
+    def bytes_saved(self, sid: str) -> int:
+        """Bytes *sid* was spared by silence suppression since it started listening."""
+        return self._bytes_saved.get(sid, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            listeners = [{"format": fmt, "rate": rate, "bytes_saved": self._bytes_saved.get(sid, 0)}
+                         for sid, (_, fmt, rate) in self._listeners.items()]
+        return {
+            "packets_sent": self.packets_sent,
+            "chunks_suppressed": self.chunks_suppressed,
+            "silent": self._silent,
+            "listeners": listeners,
+        }
+
+    def _apply_budgets(self):
+        """Move listeners whose budget level changed onto the stream it allows."""
+        with self._lock:
+            for sid, (account, fmt, rate) in list(self._listeners.items()):
+                stream = _budget_stream(account, self._requested[sid])
+                if stream == (fmt, rate):
+                    continue
+                self._listeners[sid] = (account, *stream)
+                try:
+                    self._socketio.server.leave_room(sid, stream_room(fmt, rate),
+                                                     namespace=self._namespace)
+                    self._socketio.server.enter_room(sid, stream_room(*stream),
+                                                     namespace=self._namespace)
+                    self._socketio.emit("audio_status", {"listening": True, "format": stream[0],
+                                                         "rate": stream[1]},
+                                        namespace=self._namespace, to=sid)
+                except Exception:
+                    logger.exception("AudioBroadcast: could not move %s to %s", sid, stream)
+                    continue
+                logger.info("AudioBroadcast: listener %s now %s @ %d Hz (data budget)",
+                            sid, *stream)
+
+    def _vad_marker(self, active: bool) -> dict:
+        return {"active": active, "noise_dbfs": self._capture.activity["noise_dbfs"]}
+
+    def _run(self):
+        reader = self._capture.add_listener()
+        chunk_ms = config.AUDIO_CHUNK_SIZE * 1000 // config.AUDIO_SAMPLE_RATE
+        packet: list[bytes] = []
+        encoders: dict = {}  # {(format, rate): encoder}
+        next_budget_check = time.monotonic() + config.BANDWIDTH_POLL_SECONDS
+        try:
+            while True:
+                with self._lock:
+                    if not self._listeners:
+                        self._thread = None
+                        logger.info("AudioBroadcast: no listeners, stopped")
+                        return
+                if time.monotonic() >= next_budget_check:
+                    next_budget_check += config.BANDWIDTH_POLL_SECONDS
+                    self._apply_budgets()
+                item = reader.read(timeout=0.5)
+                if item is None:
+                    continue
+                pcm, missed = item
+                if missed:
+                    packet.clear()  # don't join audio across the gap
+                    self._socketio.emit("audio_lag",
+                                        {"missed_chunks": missed, "missed_ms": missed * chunk_ms},
+                                        namespace=self._namespace, to=ROOM)
+                if config.AUDIO_SILENCE_SUPPRESSION and not reader.voiced:
+                    if packet:  # the tail of the sound, already inside the hangover
+                        self._send(b"".join(packet), encoders)
+                        packet.clear()
+                    self._suppress(pcm)
+                    continue
+                if self._silent:
+                    self._silent = False
+                    self._socketio.emit("audio_vad", self._vad_marker(True),
+                                        namespace=self._namespace, to=ROOM)
+                packet.append(pcm)
+                if len(packet) < config.AUDIO_PACKET_CHUNKS:
+                    continue
+                self._send(b"".join(packet), encoders)
+                packet.clear()
+        except Exception:
+            logger.exception("AudioBroadcast: stopped on error")
+            with self._lock:
+                self._thread = None
+        finally:
+            self._silent = False
+            self._capture.remove_listener(reader)
+
+    def _send(self, data: bytes, encoders: dict):
+        """Encode *data* once per stream in use and emit it to each stream's room."""
+        with self._lock:
+            listeners = list(self._listeners.values())
+        sizes = {}
+        for stream in {(fmt, rate) for _, fmt, rate in listeners}:
+            if stream not in encoders:
+                encoders[stream] = audio_codec.create_encoder(*stream)
+            payload = encoders[stream].encode(data)
+            sizes[stream] = len(payload)
+            if payload:  # Opus may still be filling its first frame
+                self._socketio.emit("audio_stream", payload, namespace=self._namespace,
+                                    to=stream_room(*stream))
+        for stream in [stream for stream in encoders if stream not in sizes]:
+            del encoders[stream]  # restart the codec state on the next listener
+        self.packets_sent += 1
+        for account, fmt, rate in listeners:
+            bandwidth.record(account, "audio", sizes[fmt, rate])
+
+    def _suppress(self, pcm: bytes):
+        """Drop a silent chunk, announcing the silence once."""
+        if not self._silent:
+            self._silent = True
+            self._socketio.emit("audio_vad", self._vad_marker(False),
+                                namespace=self._namespace, to=ROOM)
+        self.chunks_suppressed += 1
+        with self._lock:
+            for sid, (_, fmt, rate) in self._listeners.items():
+                self._bytes_saved[sid] += audio_codec.encoded_size(fmt, len(pcm), rate)
+
+
+def _budget_stream(account: str, stream: tuple[str, int]) -> tuple[str, int]:
+    """*stream*, or a lighter one if *account*'s data budget level caps the format."""
+    fmt, rate = stream
+    limits = bandwidth.limits(account)
+    ceiling = limits["audio_max_format"] if limits else None
+    if ceiling and audio_codec.FORMATS.index(fmt) < audio_codec.FORMATS.index(ceiling):
+        return ceiling, audio_codec.stream_rate(ceiling, rate)
+    return stream
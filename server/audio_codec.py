@@ -0,0 +1,215 @@
+"""Encoders for the Socket.IO listen stream.
+
+Each encoder turns one packet of 16 kHz mono int16 PCM into the payload of an
+``audio_stream`` message.  The broadcaster keeps one encoder per format and
+rate in use, so a chunk is encoded once however many clients listen that way.
+A client may ask for its own playback rate (``stream_rate``); the audio is
+then resampled before encoding, so the browser plays it without converting.
+
+  * "pcm":   raw int16 little-endian (~256 kbps)
+  * "adpcm": IMA-ADPCM in independent 64-sample blocks (~72 kbps); no native
+             dependency, and a lost packet never corrupts the next one
+  * "opus":  libopus through PyAV, 20 ms frames (AUDIO_OPUS_BITRATE); each
+             message is a sequence of [u16 big-endian length][Opus packet]
+
+ADPCM block layout: int16 LE initial predictor, u8 step index, u8 zero, then
+32 bytes of 4-bit codes, first sample in the low nibble.
+"""
+
+import fractions
+import struct
+
+import av
+import numpy as np
+
+from . import config
+from .resample import Resampler
+
+FORMATS = ("pcm", "adpcm", "opus")  # most to fewest bytes per second
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)  # the only rates libopus encodes at
+
+ADPCM_BLOCK_SAMPLES = 64
+
+_STEP_TABLE = np.array([
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767,
+], dtype=np.int32)
+_INDEX_TABLE = np.array([-1, -1, -1, -1, 2, 4, 6, 8], dtype=np.int32)
+
+# Decoder delta and next step index for every (step index, 3-bit magnitude)
+_CODES = np.arange(8)
+_STEPS = _STEP_TABLE[:, None]
+_DELTA = ((_STEPS >> 3) + (_CODES >> 2 & 1) * _STEPS + (_CODES >> 1 & 1) * (_STEPS >> 1)
+          + (_CODES & 1) * (_STEPS >> 2)).astype(np.int32)
+_NEXT_INDEX = np.clip(np.arange(89)[:, None] + _INDEX_TABLE, 0, 88).astype(np.int32)
+
+
+def opus_available() -> bool:
+    try:
+        av.codec.Codec("libopus", "w")
+    except Exception:
+        return False
+    return True
+
+
+def stream_rate(fmt: str, rate: int | None) -> int:
+    """Rate *fmt* is sent at for a client asking for *rate*.
+
+    Unsupported rates get AUDIO_SAMPLE_RATE; Opus rounds up to a rate it
+    can encode at (44.1 kHz clients get 48 kHz).
+    """
+    if rate not in config.AUDIO_CLIENT_RATES:
+        return config.AUDIO_SAMPLE_RATE
+    if fmt == "opus":
+        return next((r for r in OPUS_RATES if r >= rate), OPUS_RATES[-1])
+    return rate
+
+
+def create_encoder(fmt: str, rate: int = config.AUDIO_SAMPLE_RATE):
+    """Encoder for *fmt* at *rate* (see ``stream_rate``).
+
+    Raises:
+        ValueError: unknown format
+    """
+    if fmt == "pcm":
+        encoder = PcmEncoder()
+    elif fmt == "adpcm":
+        encoder = AdpcmEncoder()
+    elif fmt == "opus":
+        encoder = OpusEncoder(rate)
+    else:
+        raise ValueError(f"Unknown audio format: {fmt}")
+    if rate != config.AUDIO_SAMPLE_RATE:
+        encoder = ResamplingEncoder(encoder, rate)
+    return encoder
+
+
+def encoded_size(fmt: str, pcm_bytes: int, rate: int = config.AUDIO_SAMPLE_RATE) -> int:
+    """Bytes *fmt* at *rate* sends for *pcm_bytes* of 16 kHz PCM (Opus: nominal, from its bitrate)."""
+    samples = pcm_bytes // 2 * rate // config.AUDIO_SAMPLE_RATE
+    if fmt == "adpcm":
+        blocks = -(-samples // ADPCM_BLOCK_SAMPLES)
+        return blocks * (4 + ADPCM_BLOCK_SAMPLES // 2)
+    if fmt == "opus":
+        seconds = samples / (rate * config.AUDIO_CHANNELS)
+        return int(seconds * config.AUDIO_OPUS_BITRATE / 8)
+    return samples * 2
+
+
+class ResamplingEncoder:
+    """Resamples each packet from AUDIO_SAMPLE_RATE to *rate* before *encoder*.
+
+    Resampled packets vary by a sample or so; the encoder is only ever given
+    whole multiples of its ``block_samples`` and the rest is carried over.
+    """
+
+    def __init__(self, encoder, rate: int):
+        self._encoder = encoder
+        self._resampler = Resampler(config.AUDIO_SAMPLE_RATE, rate)
+        self._block = getattr(encoder, "block_samples", 1)
+        self._carry = np.zeros(0, dtype=np.int16)
+
+    def encode(self, pcm: bytes) -> bytes:
+        samples = self._resampler.process(np.frombuffer(pcm, dtype=np.int16))
+        if self._block > 1:
+            samples = np.concatenate([self._carry, samples])
+            end = len(samples) - len(samples) % self._block
+            samples, self._carry = samples[:end], samples[end:]
+        return self._encoder.encode(samples.tobytes()) if len(samples) else b""
+
+
+class PcmEncoder:
+    def encode(self, pcm: bytes) -> bytes:
+        return pcm
+
+
+class AdpcmEncoder:
+    """IMA-ADPCM, vectorised across the blocks of a packet.
+
+    The predictor recursion is sequential within a block, so the loop runs
+    over the 64 sample positions while numpy handles every block at once.
+    """
+
+    block_samples = ADPCM_BLOCK_SAMPLES
+
+    def encode(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        pad = -len(samples) % ADPCM_BLOCK_SAMPLES
+        if pad:
+            samples = np.concatenate([samples, np.repeat(samples[-1:], pad)])
+        blocks = samples.reshape(-1, ADPCM_BLOCK_SAMPLES).astype(np.int32)
+
+        predictor = blocks[:, 0].copy()
+        # Start each block with a step near its mean sample-to-sample change
+        mean_diff = np.abs(np.diff(blocks, axis=1)).mean(axis=1)
+        index = np.clip(np.searchsorted(_STEP_TABLE, mean_diff), 0, 88).astype(np.int32)
+        header = np.zeros((len(blocks), 4), dtype=np.uint8)
+        header[:, :2] = predictor.astype("<i2").view(np.uint8).reshape(-1, 2)
+        header[:, 2] = index
+
+        codes = np.empty(blocks.shape, dtype=np.uint8)
+        for i in range(ADPCM_BLOCK_SAMPLES):
+            diff = blocks[:, i] - predictor
+            sign = diff < 0
+            # floor(4·|diff|/step): the reference successive subtraction, up to shift rounding
+            code = np.minimum((np.abs(diff) << 2) // _STEP_TABLE[index], 7)
+            delta = _DELTA[index, code]
+            predictor = np.clip(predictor + np.where(sign, -delta, delta), -32768, 32767)
+            index = _NEXT_INDEX[index, code]
+            codes[:, i] = code | (sign << 3)
+
+        packed = codes[:, 0::2] | (codes[:, 1::2] << 4)
+        return np.concatenate([header, packed], axis=1).tobytes()
+
+
+def adpcm_decode(data: bytes) -> np.ndarray:
+    """Reference decoder (the viewer has its own in audio.js)."""
+    block_bytes = 4 + ADPCM_BLOCK_SAMPLES // 2
+    out = []
+    for offset in range(0, len(data), block_bytes):
+        predictor, index = struct.unpack_from("<hB", data, offset)
+        for byte in data[offset + 4:offset + block_bytes]:
+            for code in (byte & 0x0F, byte >> 4):
+                step = int(_STEP_TABLE[index])
+                delta = step >> 3
+                if code & 4:
+                    delta += step
+                if code & 2:
+                    delta += step >> 1
+                if code & 1:
+                    delta += step >> 2
+                predictor += -delta if code & 8 else delta
+                predictor = max(-32768, min(32767, predictor))
+                index = max(0, min(88, index + int(_INDEX_TABLE[code & 7])))
+                out.append(predictor)
+    return np.array(out, dtype=np.int16)
+
+
+class OpusEncoder:
+    """libopus in VoIP mode; PyAV buffers the input into 20 ms frames."""
+
+    def __init__(self, rate: int = config.AUDIO_SAMPLE_RATE):
+        codec = av.CodecContext.create("libopus", "w")
+        codec.sample_rate = rate
+        codec.layout = "mono" if config.AUDIO_CHANNELS == 1 else "stereo"
+        codec.format = "s16"
+        codec.bit_rate = config.AUDIO_OPUS_BITRATE
+        codec.time_base = fractions.Fraction(1, rate)
+        codec.options = {"application": "voip", "frame_duration": "20"}
+        codec.open()
+        self._codec = codec
+        self._rate = rate
+        self._pts = 0
+
+    def encode(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype=np.int16).reshape(1, -1)
+        frame = av.AudioFrame.from_ndarray(samples, format="s16", layout=self._codec.layout.name)
+        frame.sample_rate = self._rate
+        frame.pts = self._pts
+        self._pts += samples.shape[1] // config.AUDIO_CHANNELS
+        return b"".join(struct.pack(">H", p.size) + bytes(p) for p in self._codec.encode(frame))
@@ -0,0 +1,167 @@
+"""Background owner of the microphone and speaker devices.
+
+Opening a PortAudio device can fail (nothing plugged in, driver busy) and
+used to be retried inline for up to a minute, freezing whichever Socket.IO
+handler asked for it.  AudioDeviceSupervisor does every open, retry and
+re-open on its own thread; callers only read ``state()``.
+
+Each wanted device is in one of:
+
+  * "opening":  an attempt is in progress
+  * "active":   open and healthy
+  * "retrying": the last attempt failed (or the device went away); the next
+                one follows after AUDIO_DEVICE_RETRY_SECONDS, doubling up to
+                AUDIO_DEVICE_RETRY_MAX_SECONDS
+  * "stopped":  not wanted
+
+Active devices are health-checked every AUDIO_DEVICE_POLL_SECONDS: a stream
+that stopped, a writer that hit a device error, or a microphone whose
+callback has been silent for AUDIO_DEVICE_STALL_SECONDS (unplugged) is
+closed and re-opened.  PortAudio only enumerates devices when initialised,
+so while nothing is open it is re-initialised before each retry to pick up
+newly plugged hardware.  sounddevice has no public call for that; its
+private ``_terminate()`` / ``_initialize()`` are used where present (the
+versions in requirements.txt), otherwise a warning is logged once and new
+devices are only found after a restart.  Every state change is passed to
+the callback set with ``set_on_change`` (the app pushes it to clients).
+"""
+
+import logging
+import threading
+import time
+
+import sounddevice as sd
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Private sounddevice calls used to re-enumerate devices (see _rescan)
+_CAN_RESCAN = callable(getattr(sd, "_terminate", None)) and callable(getattr(sd, "_initialize", None))
+
+STOPPED = "stopped"
+OPENING = "opening"
+ACTIVE = "active"
+RETRYING = "retrying"
+
+
+class AudioDeviceSupervisor:
+    def __init__(self, audio_capture, audio_player):
+        # Both expose start() -> bool (one attempt), stop() and healthy
+        self._devices = {"microphone": audio_capture, "speaker": audio_player}
+        self._lock = threading.Lock()
+        self._states = dict.fromkeys(self._devices, STOPPED)
+        self._wanted: set[str] = set()
+        self._failures = dict.fromkeys(self._devices, 0)
+        self._next_attempt = dict.fromkeys(self._devices, 0.0)
+        self._wake = threading.Event()
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self._on_change = None
+
+    def set_on_change(self, callback):
+        """Register ``callback(states)`` invoked from the supervisor thread on every change."""
+        self._on_change = callback
+
+    def start(self, *names: str):
+        """Start the supervisor thread and open *names* (default: every device)."""
+        if not self._running:
+            if not _CAN_RESCAN:
+                logger.warning("AudioDevices: sounddevice %s cannot re-initialise PortAudio; "
+                               "devices plugged in later need a restart",
+                               getattr(sd, "__version__", "?"))
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="audio-devices", daemon=True)
+            self._thread.start()
+        for name in names or self._devices:
+            self.want(name)
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        with self._lock:
+            self._wanted.clear()
+        for name, device in self._devices.items():
+            device.stop()
+            self._set_state(name, STOPPED)
+
+    def want(self, name: str) -> str:
+        """Ask for *name* to be open; returns its current state without waiting."""
+        with self._lock:
+            if name not in self._wanted:
+                self._wanted.add(name)
+                self._next_attempt[name] = 0.0
+                self._wake.set()
+            return self._states[name]
+
+    def state(self, name: str) -> str:
+        return self._states[name]
+
+    def states(self) -> dict:
+        with self._lock:
+            return dict(self._states)
+
+    def _set_state(self, name: str, state: str):
+        with self._lock:
+            if self._states[name] == state:
+                return
+            self._states[name] = state
+            states = dict(self._states)
+        logger.info("AudioDevices: %s %s", name, state)
+        if self._on_change:
+            try:
+                self._on_change(states)
+            except Exception:
+                logger.exception("AudioDevices: on_change callback failed")
+
+    def _run(self):
+        while self._running:
+            with self._lock:
+                wanted = [name for name in self._devices if name in self._wanted]
+            for name in wanted:
+                if not self._running:
+                    break
+                self._supervise(name)
+            self._wake.wait(config.AUDIO_DEVICE_POLL_SECONDS)
+            self._wake.clear()
+
+    def _supervise(self, name: str):
+        device = self._devices[name]
+        if self._states[name] == ACTIVE:
+            if device.healthy:
+                return
+            logger.warning("AudioDevices: %s lost, re-opening", name)
+            device.stop()
+            self._set_state(name, RETRYING)
+            self._next_attempt[name] = 0.0
+        if time.monotonic() < self._next_attempt[name]:
+            return
+
+        self._set_state(name, OPENING)
+        if self._failures[name]:
+            self._rescan()
+        if device.start():
+            self._failures[name] = 0
+            self._set_state(name, ACTIVE)
+            return
+        self._failures[name] += 1
+        delay = min(config.AUDIO_DEVICE_RETRY_SECONDS * 2 ** (self._failures[name] - 1),
+                    config.AUDIO_DEVICE_RETRY_MAX_SECONDS)
+        self._next_attempt[name] = time.monotonic() + delay
+        logger.info("AudioDevices: %s unavailable (attempt %d), retrying in %d s",
+                    name, self._failures[name], delay)
+        self._set_state(name, RETRYING)
+
+    def _rescan(self):
+        """Re-initialise PortAudio so hot-plugged devices show up (only while nothing is open)."""
+        if not _CAN_RESCAN or any(self._states[n] == ACTIVE for n in self._devices):
+            return
+        try:
+            sd._terminate()
+            sd._initialize()
+            logger.info("AudioDevices: rescanned devices:\n%s", sd.query_devices())
+        except Exception:
+            logger.exception("AudioDevices: PortAudio re-initialisation failed")
@@ -0,0 +1,172 @@
+"""Per-session bandwidth accounting and data budgets.
+
+Bytes sent to each login session are counted per channel:
+
+  * "webrtc": RTP payload bytes, polled from aiortc's outbound stats
+  * "audio":  Socket.IO audio_stream emits
+  * "video":  Socket.IO video_frame relays to display clients
+  * "http":   HTTP response bodies (MJPEG, LL-HLS, snapshots, playback, API)
+
+A session may set a daily budget.  As the fraction used crosses each
+BANDWIDTH_BUDGET_STEPS threshold, the session's quality limits step down
+(WebRTC bitrate ceiling, MJPEG frame rate, audio_stream format), so a
+forgotten tab on a mobile connection slows to a trickle instead of using
+gigabytes.  LL-HLS segments are shared by every client and are only counted.
+
+Usage lives in memory for the life of the session, like the session store,
+so there is no monthly budget: usage starts again at every login and server
+restart, long before a month is out.
+Clients authenticated with the bearer token share one account (TOKEN_KEY).
+Every function is thread-safe (Flask threads, Socket.IO tasks and the WebRTC
+asyncio loop all record here).
+"""
+
+import threading
+import time
+
+from . import config
+
+CHANNELS = ("webrtc", "audio", "video", "http")
+TOKEN_KEY = "token"  # account for requests authenticated by bearer token
+
+_lock = threading.Lock()
+_accounts: dict[str, "_Account"] = {}  # {session_id | TOKEN_KEY: account}
+
+
+class _Account:
+    def __init__(self):
+        self.started_at = time.time()
+        self.last_seen = self.started_at
+        self.bytes = dict.fromkeys(CHANNELS, 0)
+        self.day = _today()
+        self.day_bytes = 0
+        self.daily_budget: int | None = None
+
+    def roll_over(self):
+        day = _today()
+        if day != self.day:
+            self.day, self.day_bytes = day, 0
+
+    def budget_used(self) -> float | None:
+        """Fraction of the daily budget used today, or None without a budget."""
+        return self.day_bytes / self.daily_budget if self.daily_budget else None
+
+    def level(self) -> int:
+        used = self.budget_used()
+        if used is None:
+            return 0
+        return sum(1 for step in config.BANDWIDTH_BUDGET_STEPS if used >= step[0])
+
+
+def _today() -> str:
+    return time.strftime("%Y-%m-%d")
+
+
+def _account(key: str) -> _Account:
+    """Get or create the account for *key* (call with _lock held)."""
+    account = _accounts.get(key)
+    if account is None:
+        _prune()
+        account = _accounts[key] = _Account()
+    account.roll_over()
+    return account
+
+
+def _prune():
+    # Sessions expire silently; forget accounts idle for longer than any TTL
+    cutoff = time.time() - max(config.SESSION_TTL_SECONDS, config.DISPLAY_SESSION_TTL_SECONDS)
+    for key in [k for k, a in _accounts.items() if a.last_seen < cutoff]:
+        del _accounts[key]
+
+
+def key_for(session_id: str | None) -> str:
+    """Account key of a login session ("" / None means bearer token)."""
+    return session_id or TOKEN_KEY
+
+
+def record(key: str, channel: str, nbytes: int):
+    """Add *nbytes* sent on *channel* to *key*'s account."""
+    if nbytes <= 0:
+        return
+    with _lock:
+        account = _account(key)
+        account.bytes[channel] += nbytes
+        account.day_bytes += nbytes
+        account.last_seen = time.time()
+
+
+def metered(key: str, channel: str, chunks):
+    """Wrap an iterable of byte chunks so each one is recorded as it is sent."""
+    try:
+        for chunk in chunks:
+            record(key, channel, len(chunk))
+            yield chunk
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def set_budget(key: str, daily_bytes=None) -> dict:
+    """Set (or with None, remove) the daily budget of *key*.
+
+    Raises:
+        ValueError: a budget that is not a positive integer
+    """
+    if daily_bytes is not None and (not isinstance(daily_bytes, int)
+                                    or isinstance(daily_bytes, bool) or daily_bytes <= 0):
+        raise ValueError("The budget must be a positive integer (bytes) or null")
+    with _lock:
+        account = _account(key)
+        account.daily_budget = daily_bytes
+    return usage(key)
+
+
+def limits(key: str) -> dict | None:
+    """Quality limits for *key* at its current budget level, or None (unlimited)."""
+    with _lock:
+        account = _accounts.get(key)
+        if account is None:
+            return None
+        account.roll_over()
+        level = account.level()
+    if level == 0:
+        return None
+    _, max_bitrate, mjpeg_fps, audio_format = config.BANDWIDTH_BUDGET_STEPS[level - 1]
+    return {"level": level, "webrtc_max_bitrate": max_bitrate, "mjpeg_max_fps": mjpeg_fps,
+            "audio_max_format": audio_format}
+
+
+def usage(key: str) -> dict:
+    """Counters, budgets and current limits of *key* (the /api/bandwidth payload)."""
+    with _lock:
+        account = _account(key)
+        used = account.budget_used()
+        result = {
+            "since": int(account.started_at),
+            "bytes": dict(account.bytes, total=sum(account.bytes.values())),
+            "today_bytes": account.day_bytes,
+            "budget": {
+                "daily_bytes": account.daily_budget,
+                "used": round(used, 3) if used is not None else None,
+            },
+        }
+    result["limits"] = limits(key)
+    return result
+
+
+def totals() -> dict:
+    """Bytes per channel summed over every account."""
+    with _lock:
+        result = dict.fromkeys(CHANNELS, 0)
+        for account in _accounts.values():
+            for channel, nbytes in account.bytes.items():
+                result[channel] += nbytes
+    result["total"] = sum(result.values())
+    return result
+
+
+def forget(key: str):
+    """Drop *key*'s account (logout)."""
+    with _lock:
+        _accounts.pop(key, None)
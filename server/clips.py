@@ -0,0 +1,411 @@
+"""Event clips: a pre-roll ring of encoded media flushed to MP4 on demand.
+
+The last CLIP_PREROLL_SECONDS of LiveEncoder packets are kept in memory as
+whole GOPs (capped at CLIP_PREROLL_MAX_BYTES), alongside the raw microphone
+PCM for the same window.  ``trigger()`` writes the pre-roll plus the next
+few seconds to a fragmented MP4 file: video packets are copied as-is, and
+only the (small) audio stream is encoded to AAC while the clip is written.
+
+A trigger that starts inside the window of a clip still being written
+extends that clip (up to CLIP_MAX_SECONDS) instead of starting another, so a
+burst of events makes one file.  At most CLIP_MAX_WRITERS clips are written
+at once; further triggers raise ClipsBusy.
+"""
+
+import collections
+import glob
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import av
+import numpy as np
+from av import AudioFrame
+
+from . import config
+from . import fmp4
+
+logger = logging.getLogger(__name__)
+
+
+class ClipsBusy(RuntimeError):
+    """CLIP_MAX_WRITERS clips are already being written."""
+
+
+class _Clip:
+    def __init__(self, filename: str, start: float, end: float, reason: str, callback):
+        self.filename = filename
+        self.start = start
+        self.end = end       # extended by overlapping triggers while not closed
+        self.reason = reason
+        self.callbacks = [callback] if callback else []
+        self.closed = False  # the writer has passed the end: no more extensions
+
+    def info(self) -> dict:
+        return {
+            "filename": self.filename,
+            "start": self.start,
+            "end": self.end,
+            "reason": self.reason,
+        }
+
+
+class ClipBuffer:
+    """Keeps the pre-roll ring and writes clips from it."""
+
+    def __init__(self, encoder, audio_capture=None):
+        self._encoder = encoder
+        self._audio_capture = audio_capture
+        self._video_listener = None
+        self._audio_reader = None
+        self._running = False
+        self._threads: list[threading.Thread] = []
+        self._cond = threading.Condition()
+        # Video ring: packets of whole GOPs, addressed by a running sequence number
+        self._packets: collections.deque = collections.deque()
+        self._first_seq = 0
+        self._keyframes: collections.deque[int] = collections.deque()
+        self._bytes = 0
+        # Audio ring: (wallclock at receipt, pcm bytes)
+        self._audio: collections.deque[tuple[float, bytes]] = collections.deque()
+        self._audio_first_seq = 0
+        self._active: list[_Clip] = []
+
+    # ── Lifecycle ──
+
+    def start(self):
+        if self._running:
+            return
+        os.makedirs(config.CLIP_DIR, exist_ok=True)
+        self._video_listener = self._encoder.add_listener()
+        self._running = True
+        self._threads = [threading.Thread(target=self._video_loop, name="clip-video", daemon=True)]
+        if self._audio_capture is not None:
+            self._audio_reader = self._audio_capture.add_listener()
+            self._threads.append(
+                threading.Thread(target=self._audio_loop, name="clip-audio", daemon=True))
+        for t in self._threads:
+            t.start()
+        logger.info("ClipBuffer: started (pre-roll %ds, max %d bytes)",
+                    config.CLIP_PREROLL_SECONDS, config.CLIP_PREROLL_MAX_BYTES)
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+        if self._video_listener:
+            self._encoder.remove_listener(self._video_listener)
+            self._video_listener = None
+        if self._audio_reader is not None:
+            self._audio_capture.remove_listener(self._audio_reader)
+            self._audio_reader = None
+        logger.info("ClipBuffer: stopped")
+
+    # ── Ring maintenance ──
+
+    def _video_loop(self):
+        while self._running:
+            packet = self._video_listener.get(timeout=0.5)
+            if packet is None:
+                continue
+            with self._cond:
+                self._append_packet(packet)
+                self._cond.notify_all()
+
+    def _append_packet(self, packet):
+        if not self._packets and not packet.is_keyframe:
+            return
+        if packet.is_keyframe:
+            self._keyframes.append(self._first_seq + len(self._packets))
+        self._packets.append(packet)
+        self._bytes += len(packet.data)
+        # Drop the oldest GOP while the next one still covers the pre-roll
+        # window, or while over the byte budget.  The newest GOP always stays.
+        horizon = packet.wallclock - config.CLIP_PREROLL_SECONDS
+        while len(self._keyframes) >= 2:
+            second = self._packets[self._keyframes[1] - self._first_seq]
+            if self._bytes <= config.CLIP_PREROLL_MAX_BYTES and second.wallclock > horizon:
+                break
+            self._keyframes.popleft()
+            while self._first_seq < self._keyframes[0]:
+                self._bytes -= len(self._packets.popleft().data)
+                self._first_seq += 1
+
+    def _audio_loop(self):
+        keep = config.CLIP_PREROLL_SECONDS + config.LIVE_ENCODER_GOP_SECONDS + 1
+        while self._running:
+            item = self._audio_reader.read(timeout=0.5)
+            if item is None:
+                continue
+            pcm, missed = item
+            now = time.time()
+            with self._cond:
+                # Keep the audio timeline continuous across skipped chunks
+                for _ in range(missed):
+                    self._audio.append((now, bytes(len(pcm))))
+                self._audio.append((now, pcm))
+                while self._audio and self._audio[0][0] < now - keep:
+                    self._audio.popleft()
+                    self._audio_first_seq += 1
+                self._cond.notify_all()
+
+    # ── Clips ──
+
+    def trigger(self, pre_seconds: float | None = None, post_seconds: float | None = None,
+                reason: str = "manual", callback=None) -> dict:
+        """Start writing a clip covering [now - pre, now + post].
+
+        Returns immediately with the clip's filename; the file appears in
+        CLIP_DIR once the window has closed.  *callback*, if given, is called
+        from the writer thread with the finished clip's info dict (``None`` on
+        failure).  If a clip being written already covers *now - pre*, it is
+        extended to *now + post* and returned instead.  Raises ClipsBusy if
+        CLIP_MAX_WRITERS clips are being written and none can be extended.
+        """
+        if not self._running:
+            raise RuntimeError("clip buffer is not running")
+        pre = config.CLIP_PREROLL_SECONDS if pre_seconds is None else pre_seconds
+        post = config.CLIP_POSTROLL_SECONDS if post_seconds is None else post_seconds
+        pre = max(0.0, min(float(pre), config.CLIP_PREROLL_SECONDS))
+        post = max(0.0, min(float(post), config.CLIP_MAX_POSTROLL_SECONDS))
+
+        now = datetime.now()
+        filename = now.strftime("clip_%Y%m%d_%H%M%S") + f"_{now.microsecond // 1000:03d}.mp4"
+        ts = now.timestamp()
+        start, end = ts - pre, ts + post
+        with self._cond:
+            for clip in self._active:
+                if not clip.closed and clip.start <= start <= clip.end:
+                    clip.end = max(clip.end, min(end, clip.start + config.CLIP_MAX_SECONDS))
+                    if callback:
+                        clip.callbacks.append(callback)
+                    logger.info("ClipBuffer: clip %s extended (%s, until +%.1fs)",
+                                clip.filename, reason, clip.end - ts)
+                    return clip.info()
+            if len(self._active) >= config.CLIP_MAX_WRITERS:
+                raise ClipsBusy(f"{len(self._active)} clips are being written")
+            clip = _Clip(filename, start, end, reason, callback)
+            self._active.append(clip)
+        threading.Thread(target=self._write_clip, args=(clip,), name="clip-writer",
+                         daemon=True).start()
+        logger.info("ClipBuffer: clip %s triggered (%s, -%.1fs/+%.1fs)",
+                    filename, reason, pre, post)
+        return clip.info()
+
+    def _write_clip(self, clip: _Clip):
+        path = os.path.join(config.CLIP_DIR, clip.filename)
+        result = None
+        try:
+            size = self._write_clip_file(clip, path + ".part")
+            if size:
+                os.replace(path + ".part", path)
+                result = dict(clip.info(), size_bytes=size)
+                logger.info("ClipBuffer: clip %s finished (%d bytes)", clip.filename, size)
+            else:
+                logger.warning("ClipBuffer: clip %s has no video, discarded", clip.filename)
+        except Exception:
+            logger.exception("ClipBuffer: clip %s failed", clip.filename)
+        finally:
+            try:
+                os.remove(path + ".part")
+            except FileNotFoundError:
+                pass
+            with self._cond:
+                clip.closed = True
+                self._active.remove(clip)
+        if result:
+            self._enforce_limit()
+        for callback in clip.callbacks:
+            try:
+                callback(result)
+            except Exception:
+                logger.exception("ClipBuffer: clip callback failed")
+
+    def _write_clip_file(self, clip: _Clip, path: str) -> int:
+        with self._cond:
+            cursor = self._start_cursor(clip.start)
+            with_audio = bool(self._audio) and self._audio[-1][0] > time.time() - 1.0
+
+        writer = None
+        video_track = audio_track = audio_codec = None
+        audio_cursor = None
+        audio_pts = audio_base = 0
+        base_pts = 0
+        gop: list = []
+        nominal = 90000 // max(1, self._encoder.fps)
+        done = False
+
+        def flush(next_pts: int | None):
+            nonlocal audio_cursor, audio_pts, audio_base
+            samples = []
+            for i, packet in enumerate(gop):
+                if i + 1 < len(gop):
+                    duration = gop[i + 1].pts - packet.pts
+                elif next_pts is not None and 0 < next_pts - packet.pts <= 2 * nominal:
+                    duration = next_pts - packet.pts
+                else:
+                    duration = nominal
+                samples.append(fmp4.Sample(fmp4.annexb_to_sample(packet.data), duration,
+                                           packet.is_keyframe))
+            runs = [(video_track, gop[0].pts - base_pts, samples)]
+            if audio_codec is not None:
+                end = gop[-1].wallclock + samples[-1].duration / 90000
+                with self._cond:
+                    if audio_cursor is None:
+                        audio_cursor = self._audio_cursor(gop[0].wallclock)
+                    chunks, audio_cursor = self._audio_since(audio_cursor, end)
+                audio_samples = []
+                for pcm in chunks:
+                    audio_samples += self._encode_audio(audio_codec, pcm, audio_pts)
+                    audio_pts += len(pcm) // (2 * config.AUDIO_CHANNELS)
+                if done:
+                    audio_samples += self._encode_audio(audio_codec, None, audio_pts)
+                if audio_samples:
+                    runs.append((audio_track, audio_base, audio_samples))
+                    audio_base += sum(s.duration for s in audio_samples)
+            writer.write_fragment(runs)
+            gop.clear()
+
+        while not done:
+            with self._cond:
+                packets, cursor = self._packets_since(cursor)
+                if not packets:
+                    if not self._running or time.time() > clip.end + 1.0:
+                        clip.closed = True
+                        break
+                    self._cond.wait(timeout=0.2)
+                    continue
+            for packet in packets:
+                if packet.wallclock >= clip.end:
+                    with self._cond:  # decided together with trigger()'s extensions
+                        clip.closed = packet.wallclock >= clip.end
+                    if clip.closed:
+                        done = True
+                        break
+                if writer is None:
+                    if not packet.is_keyframe:
+                        continue
+                    video_track = fmp4.VideoTrack(packet.params)
+                    tracks = [video_track]
+                    if with_audio:
+                        audio_codec = self._open_audio_codec()
+                        audio_track = fmp4.AudioTrack(
+                            config.AUDIO_SAMPLE_RATE, config.AUDIO_CHANNELS,
+                            bytes(audio_codec.extradata), bitrate=config.CLIP_AUDIO_BITRATE)
+                        tracks.append(audio_track)
+                    writer = fmp4.FileWriter(path, tracks)
+                    base_pts = packet.pts
+                elif packet.is_keyframe:
+                    if packet.params != video_track.params:
+                        with self._cond:
+                            clip.closed = True
+                        done = True  # resolution changed: end the clip here
+                        break
+                    flush(packet.pts)
+                gop.append(packet)
+
+        if writer is None:
+            return 0
+        done = True
+        if gop:
+            flush(None)
+        duration_ms = int((clip.end - clip.start) * 1000)
+        return writer.close(duration_ms)
+
+    def _start_cursor(self, start: float) -> int | None:
+        """Sequence number of the last keyframe at or before *start*."""
+        if not self._keyframes:
+            return None
+        chosen = self._keyframes[0]
+        for seq in self._keyframes:
+            if self._packets[seq - self._first_seq].wallclock > start:
+                break
+            chosen = seq
+        return chosen
+
+    def _packets_since(self, cursor: int | None) -> tuple[list, int | None]:
+        end = self._first_seq + len(self._packets)
+        if cursor is None:
+            # Nothing was buffered at trigger time: start with the first arrival
+            if not self._packets:
+                return [], None
+            cursor = self._first_seq
+        if cursor < self._first_seq:
+            # Ring wrapped past us (writer stalled): resume at the oldest GOP
+            logger.warning("ClipBuffer: clip writer fell behind, skipping %d packets",
+                           self._first_seq - cursor)
+            cursor = self._first_seq
+        packets = [self._packets[i - self._first_seq] for i in range(cursor, end)]
+        return packets, end
+
+    def _audio_cursor(self, wallclock: float) -> int:
+        seq = self._audio_first_seq
+        for received, _ in self._audio:
+            if received >= wallclock:
+                break
+            seq += 1
+        return seq
+
+    def _audio_since(self, cursor: int, until: float) -> tuple[list[bytes], int]:
+        cursor = max(cursor, self._audio_first_seq)
+        chunks = []
+        for i in range(cursor - self._audio_first_seq, len(self._audio)):
+            received, pcm = self._audio[i]
+            if received >= until:
+                break
+            chunks.append(pcm)
+        return chunks, cursor + len(chunks)
+
+    @staticmethod
+    def _open_audio_codec():
+        codec = av.CodecContext.create("aac", "w")
+        codec.sample_rate = config.AUDIO_SAMPLE_RATE
+        codec.layout = "mono" if config.AUDIO_CHANNELS == 1 else "stereo"
+        codec.format = "fltp"
+        codec.bit_rate = config.CLIP_AUDIO_BITRATE
+        codec.open()
+        return codec
+
+    @staticmethod
+    def _encode_audio(codec, pcm: bytes | None, pts: int) -> list:
+        frame = None
+        if pcm is not None:
+            samples = np.frombuffer(pcm, dtype=np.int16).reshape(1, -1)
+            frame = AudioFrame.from_ndarray(
+                samples, format="s16", layout="mono" if config.AUDIO_CHANNELS == 1 else "stereo")
+            frame.sample_rate = config.AUDIO_SAMPLE_RATE
+            frame.pts = pts
+        return [fmp4.Sample(bytes(p), p.duration or codec.frame_size, True)
+                for p in codec.encode(frame)]
+
+    # ── Storage ──
+
+    def _enforce_limit(self):
+        files = sorted(glob.glob(os.path.join(config.CLIP_DIR, "clip_*.mp4")))
+        used = sum(os.path.getsize(f) for f in files)
+        while files and used > config.CLIP_MAX_BYTES:
+            oldest = files.pop(0)
+            used -= os.path.getsize(oldest)
+            os.remove(oldest)
+            logger.info("ClipBuffer: deleted oldest clip %s (FIFO)", os.path.basename(oldest))
+
+    def stats(self) -> dict:
+        with self._cond:
+            buffered = 0.0
+            if self._packets:
+                buffered = self._packets[-1].wallclock - self._packets[0].wallclock
+            return {
+                "preroll_seconds": round(buffered, 1),
+                "preroll_bytes": self._bytes,
+                "preroll_limit_bytes": config.CLIP_PREROLL_MAX_BYTES,
+                "writing": [c.info() for c in self._active],
+            }
+
+    @property
+    def is_active(self) -> bool:
+        return self._running
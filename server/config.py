@@ -16,8 +16,11 @@ RATE_LIMIT_WINDOW_SECONDS = 300  # 5 minutes
 # Production: PET_CAMERA_HOST must be explicitly set (e.g. Tailscale IP 100.x.x.x)
 # Development: defaults to 0.0.0.0
 HOST = os.environ.get("PET_CAMERA_HOST", "0.0.0.0" if IS_DEV else "")
-PORT = 5555
+PORT = int(os.environ.get("PET_CAMERA_PORT", "5555"))
 SECRET_KEY = os.environ.get("PET_CAMERA_SECRET", os.urandom(32).hex())
+# "gevent" (event-driven, native WebSocket) or "threading" (Werkzeug dev server)
+SERVER_MODE = os.environ.get("PET_CAMERA_SERVER", "threading" if IS_DEV else "gevent")
+SERVER_THREADPOOL_SIZE = 64  # gevent: threads for handlers that wait on camera/HLS/WebRTC threads
 
 # Camera defaults
 # Set PET_CAMERA_INDEX to a specific device index, or leave unset for auto-detect
@@ -37,10 +40,52 @@ VALID_FPS = [5, 10, 15, 30]
 AUDIO_SAMPLE_RATE = 16000
 AUDIO_CHANNELS = 1
 AUDIO_CHUNK_SIZE = 1024  # samples per chunk (~64ms at 16kHz)
+AUDIO_RING_CHUNKS = 64   # capture ring shared by all listeners (~4 s); slower readers skip ahead
+# Rate the microphone and speaker are opened at; empty = the device's preferred
+# rate (converted to/from AUDIO_SAMPLE_RATE by server/resample.py)
+AUDIO_DEVICE_RATE = int(os.environ.get("PET_CAMERA_AUDIO_DEVICE_RATE", "0") or 0)
+# Rates a client may stream at (its AudioContext rate), resampled on the server
+AUDIO_CLIENT_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000, 88200, 96000)
+# chunks joined into one Socket.IO audio_stream packet (fewer messages, +64 ms latency each)
+AUDIO_PACKET_CHUNKS = int(os.environ.get("PET_CAMERA_AUDIO_PACKET_CHUNKS", "1"))
+AUDIO_OPUS_BITRATE = 24_000  # bps, audio_stream format "opus"
+# Silence suppression: listeners get nothing (one audio_vad marker) while the room is quiet
+AUDIO_SILENCE_SUPPRESSION = os.environ.get("PET_CAMERA_AUDIO_SILENCE_SUPPRESSION", "1") != "0"
+AUDIO_VAD_OPEN_DBFS = -45.0      # a chunk this loud opens the gate immediately
+AUDIO_VAD_CLOSE_DBFS = -50.0     # ...and it closes after the hangover below this level
+AUDIO_VAD_HANGOVER_CHUNKS = 8    # ~0.5 s, so pauses and fading sounds are not cut
+AUDIO_JITTER_TARGET_MS = 120  # talk-back pre-fill until arrival jitter has been measured
+AUDIO_JITTER_MIN_MS = 40      # adaptive target depth never goes below this
+AUDIO_JITTER_MAX_MS = 500     # talk-back backlog trimmed beyond this (target stays under half)
+# Device supervisor (open / retry / hot-plug on a background thread)
+AUDIO_DEVICE_RETRY_SECONDS = 5       # first retry after a failed open, doubling...
+AUDIO_DEVICE_RETRY_MAX_SECONDS = 60  # ...up to this
+AUDIO_DEVICE_POLL_SECONDS = 2        # health check interval for open devices
+AUDIO_DEVICE_STALL_SECONDS = 3       # microphone callback silent this long = device gone
+
+# Sound events (barking / whining / loud noise) detected from the microphone
+SOUND_EVENTS_ENABLED = os.environ.get("PET_CAMERA_SOUND_EVENTS", "1") != "0"
+SOUND_FFT_SIZE = 1024              # analysis window (64 ms), 50% overlap
+SOUND_ONSET_DB = 15.0              # a burst starts this far above the background level
+SOUND_BARK_MIN_DBFS = -35.0        # peak level of a bark
+SOUND_BARK_MAX_MS = 600            # longer bursts are not barks
+SOUND_BARK_MID_SHARE = 0.5         # fraction of a bark's energy in 300-3000 Hz
+SOUND_WHINE_MIN_MS = 800           # tonal this long = whining
+SOUND_WHINE_MAX_FLATNESS = 0.15    # spectral flatness of a tonal frame (0 = pure tone, 1 = white noise)
+SOUND_NOISE_MIN_DBFS = -30.0       # mean level of sustained loud noise...
+SOUND_NOISE_MIN_MS = 1500          # ...held this long
+SOUND_EVENT_COOLDOWN_SECONDS = 10  # per type; events in between are only counted
 
 # Video relay (Phase 2)
 VIDEO_FRAME_MAX_BYTES = 200 * 1024  # 200 KB max per frame
 VIDEO_MAX_FPS = 15  # server-side rate limit
+VIDEO_RELAY_ACK_TIMEOUT_SECONDS = 5  # a display's unacked frame is given up on after this
+VIDEO_RELAY_FPS_WINDOW_SECONDS = 5   # delivered / dropped FPS per display are averaged over this
+# WebRTC forwarding: the owner publishes a WebRTC track, forwarded to displays without re-encoding
+VIDEO_FORWARD_MAX_DISPLAYS = 8       # display peers (cheap: packetizing only, no encoder)
+VIDEO_FORWARD_MAX_BITRATE = 600_000  # bps the owner's phone is asked to encode at
+VIDEO_FORWARD_QUEUE_FRAMES = 30      # per display; beyond this it restarts at the next keyframe
+VIDEO_FORWARD_PLI_INTERVAL = 0.5     # seconds between keyframe requests to the owner's phone
 
 # Display session
 DISPLAY_SESSION_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days
@@ -49,12 +94,92 @@ DISPLAY_SESSION_TTL_SECONDS = 30 * 24 * 60 * 60  # 30 days
 SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "snapshots")
 SNAPSHOT_MAX_BYTES = 500 * 1024 * 1024  # 500 MB
 
+# Live encoder (single shared H.264 encode for recording)
+LIVE_ENCODER_BITRATE = 2_000_000  # bps
+LIVE_ENCODER_GOP_SECONDS = 2      # keyframe interval = recording fragment length
+LIVE_ENCODER_PRESET = "veryfast"
+
+# Recording (continuous DVR)
+RECORDING_ENABLED = os.environ.get("PET_CAMERA_RECORDING", "1") != "0"
+RECORDING_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "recordings")
+RECORDING_SEGMENT_SECONDS = 5 * 60  # one MP4 file per 5 minutes
+RECORDING_MAX_BYTES = 20 * 1024 * 1024 * 1024  # 20 GB
+RECORDING_RETENTION_DAYS = 7
+RECORDING_RETRY_SECONDS = 2       # first new segment after a write error, doubling...
+RECORDING_RETRY_MAX_SECONDS = 60  # ...up to this
+
+# Audio archive (rolling compressed microphone recording)
+AUDIO_ARCHIVE_ENABLED = os.environ.get("PET_CAMERA_AUDIO_ARCHIVE", "1") != "0"
+AUDIO_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "audio_archive")
+AUDIO_ARCHIVE_BITRATE = 24_000               # bps (AAC-LC, ~180 KB per minute)
+AUDIO_ARCHIVE_FLUSH_SECONDS = 5              # frames are written to disk in batches this often
+AUDIO_ARCHIVE_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB (~8 days at 24 kbps)
+AUDIO_ARCHIVE_RETENTION_DAYS = 7
+AUDIO_ARCHIVE_EVENT_BEFORE_SECONDS = 30      # audio linked from sound events / snapshots...
+AUDIO_ARCHIVE_EVENT_AFTER_SECONDS = 10       # ...spans this long around them
+
+# Event clips
+CLIPS_ENABLED = os.environ.get("PET_CAMERA_CLIPS", "1") != "0"
+CLIP_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "clips")
+CLIP_PREROLL_SECONDS = 10           # kept in memory, prepended to every clip
+CLIP_PREROLL_MAX_BYTES = 8 * 1024 * 1024  # hard cap on the in-memory ring
+CLIP_POSTROLL_SECONDS = 10          # default length after the trigger
+CLIP_MAX_POSTROLL_SECONDS = 60
+CLIP_MAX_SECONDS = 120              # overlapping triggers extend a clip up to this length...
+CLIP_MAX_WRITERS = 2                # ...and at most this many clips are written at once
+CLIP_AUDIO_BITRATE = 32_000         # bps (AAC)
+CLIP_MAX_BYTES = 2 * 1024 * 1024 * 1024  # 2 GB
+
+# LL-HLS fallback (packaged from the live encoder, no extra encode)
+HLS_ENABLED = os.environ.get("PET_CAMERA_HLS", "1") != "0"
+HLS_PART_SECONDS = 0.5     # CMAF partial segment target
+HLS_WINDOW_SEGMENTS = 6    # finished segments kept in memory (x GOP seconds)
+HLS_IDLE_SECONDS = 30      # stop packaging after this long without requests
+
+# MJPEG (multipart/x-mixed-replace) output
+MJPEG_QUALITY = 80
+MJPEG_MAX_FPS = 15
+
+# Playback (recordings / clips)
+PLAYBACK_CHUNK_BYTES = 256 * 1024          # per write to the socket
+PLAYBACK_READAHEAD_BYTES = 4 * 1024 * 1024  # page-in hint ahead of the reader
+
+# Bandwidth accounting / data budgets (per login session)
+BANDWIDTH_POLL_SECONDS = 5  # WebRTC 送信量の集計間隔（予算超過時の画質切替もこの間隔で反映）
+BANDWIDTH_BUDGET_STEPS = [
+    # (予算の使用率, WebRTC 映像ビットレート上限 bps, MJPEG FPS 上限, 音声形式の上限)
+    # 音声は audio_codec.FORMATS の並び（pcm → adpcm → opus）でこれより重い形式を置き換える。
+    # クライアントは ADPCM を必ず再生できるが Opus は環境依存のため、上限は "adpcm" か None
+    (0.5, 1_000_000, 10, "adpcm"),
+    (0.8, 500_000, 5, "adpcm"),
+    (1.0, 250_000, 1, "adpcm"),
+]
+
 # Logs
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "logs")
 
 # WebRTC
 WEBRTC_DEFAULT_FPS = 10  # WebRTC 配信時のデフォルト FPS
 WEBRTC_MAX_PEERS = 3     # 同時接続数の上限
+# "inprocess": aiortc がピアごとにエンコード / "process": 共有メモリ経由でワーカープロセスが 1 回だけエンコード
+WEBRTC_ENCODER_MODE = os.environ.get("PET_CAMERA_WEBRTC_ENCODER", "inprocess")
+WEBRTC_ENCODER_PRESET = "veryfast"  # libx264
+# 映像コーデックの優先順（ブラウザが提示したものだけが対象）
+WEBRTC_CODECS = os.environ.get("PET_CAMERA_WEBRTC_CODECS", "H264,VP8").split(",")
+# エンコーダープロファイル（オファー時に "profile" で個別指定も可）
+WEBRTC_PROFILE = os.environ.get("PET_CAMERA_WEBRTC_PROFILE", "balanced")
+WEBRTC_PROFILES = {
+    # bitrate: start (bps), max_bitrate: REMB ceiling, gop_seconds: keyframe
+    # interval (PLI also forces one), low_latency: no lookahead / realtime deadline
+    "low_latency": {"bitrate": 800_000, "max_bitrate": 1_200_000,
+                    "gop_seconds": 1, "low_latency": True},
+    "balanced": {"bitrate": 1_500_000, "max_bitrate": 2_500_000,
+                 "gop_seconds": 2, "low_latency": True},
+    "quality": {"bitrate": 2_500_000, "max_bitrate": 4_000_000,
+                "gop_seconds": 4, "low_latency": False},
+}
+WEBRTC_STATUS_INTERVAL = 2  # seconds between status pushes on the control channel
+WEBRTC_ROI_MAX_ZOOM = 4      # ROI ズーム倍率の上限（クロップ領域の最小 = 1/4）
 
 # TLS
 CERT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "certs")
@@ -0,0 +1,221 @@
+"""WebRTC data channel for settings commands and pushed status.
+
+The viewer opens a reliable, ordered channel labelled "control" on its video
+peer connection, so a connected viewer needs no HTTP requests for settings,
+camera switching or status:
+
+    client -> server  {"id": 1, "type": "settings.set", "settings": {...}}
+    server -> client  {"type": "ack", "id": 1, "ok": true, "result": {...}}
+                      {"type": "ack", "id": 1, "ok": false,
+                       "error": {"code": "...", "message": "..."}}
+                      {"type": "status", "full": true, "data": {...}}
+                      {"type": "status", "delta": {...}, "removed": [[key, ...], ...]}
+
+Status is the /api/status payload plus this peer's RTP statistics under
+"stats" and its session's data usage (/api/bandwidth) under "bandwidth".
+The first push after the channel opens is complete; later pushes only carry
+keys whose value changed (nested objects are diffed recursively) and, under
+"removed" when there are any, the paths of keys that went away, so a value
+that became null is not mistaken for a removal.
+
+Everything here runs on the WebRTC asyncio loop.  The command handler and
+status provider are set by the app and may block (device enumeration,
+camera switching), so they are called in the default executor.
+"""
+
+import asyncio
+import json
+import logging
+import time
+
+from . import bandwidth, config
+
+logger = logging.getLogger(__name__)
+
+LABEL = "control"
+
+_channels: dict[str, "_Channel"] = {}  # {pc_id: channel}
+_handler = None          # callable(session_id, msg) -> {"ok": ..., "result"/"error": ...}
+_status_provider = None  # callable() -> dict (the /api/status payload)
+_peer_commands: dict = {}  # {type: callable(pc_id, msg) -> reply}, run on the loop
+_pusher: asyncio.Task | None = None
+
+
+class _Channel:
+    def __init__(self, pc_id: str, session_id: str, pc, channel):
+        self.pc_id = pc_id
+        self.session_id = session_id
+        self.pc = pc
+        self.channel = channel
+        self.sent_state: dict | None = None  # last pushed status, for deltas
+        self.bytes_sent = 0
+        self.stats_at = time.monotonic()
+
+    def send(self, message: dict):
+        if self.channel.readyState == "open":
+            self.channel.send(json.dumps(message, separators=(",", ":")))
+
+
+def set_handler(handler):
+    """Register the callable that executes commands (see module docstring)."""
+    global _handler
+    _handler = handler
+
+
+def set_status_provider(provider):
+    """Register the callable returning the status pushed to every channel."""
+    global _status_provider
+    _status_provider = provider
+
+
+def register_peer_command(kind: str, handler):
+    """Handle *kind* on the asyncio loop with the peer's pc_id (WebRTC state)."""
+    _peer_commands[kind] = handler
+
+
+def attach(pc_id: str, session_id: str, pc, channel):
+    """Serve *channel* for peer *pc_id* (call on the asyncio loop)."""
+    ch = _Channel(pc_id, session_id, pc, channel)
+    _channels[pc_id] = ch
+
+    @channel.on("message")
+    def on_message(message):
+        asyncio.ensure_future(_handle(ch, message))
+
+    @channel.on("close")
+    def on_close():
+        if _channels.get(pc_id) is ch:
+            detach(pc_id)
+
+    logger.info("Control [%s]: channel open (total=%d)", pc_id, len(_channels))
+    _ensure_pusher()
+
+
+def detach(pc_id: str):
+    if _channels.pop(pc_id, None) is not None:
+        logger.info("Control [%s]: channel closed (remaining=%d)", pc_id, len(_channels))
+
+
+def count() -> int:
+    return len(_channels)
+
+
+async def _handle(ch: _Channel, message):
+    try:
+        msg = json.loads(message)
+    except (TypeError, ValueError):
+        msg = None
+    if not isinstance(msg, dict) or not isinstance(msg.get("type"), str):
+        ch.send({"type": "ack", "id": None, "ok": False,
+                 "error": {"code": "INVALID_PARAMETER", "message": "Malformed command"}})
+        return
+
+    if msg["type"] == "status.get":
+        # Resend everything; the next push continues with deltas from here
+        ch.sent_state = None
+        ch.send({"type": "ack", "id": msg.get("id"), "ok": True, "result": {}})
+        await _push(ch, await _collect_status())
+        return
+
+    peer_command = _peer_commands.get(msg["type"])
+    if peer_command is not None:
+        reply = peer_command(ch.pc_id, msg)
+    elif _handler is None:
+        reply = {"ok": False, "error": {"code": "UNAVAILABLE", "message": "No command handler"}}
+    else:
+        loop = asyncio.get_running_loop()
+        try:
+            reply = await loop.run_in_executor(None, _handler, ch.session_id, msg)
+        except Exception as e:
+            logger.exception("Control [%s]: command %s failed", ch.pc_id, msg["type"])
+            reply = {"ok": False, "error": {"code": "INTERNAL_ERROR", "message": str(e)}}
+    ch.send({"type": "ack", "id": msg.get("id"), **reply})
+
+
+# ─── Status push ─────────────────────────────────────────────────────────
+
+
+def _ensure_pusher():
+    global _pusher
+    if _pusher is None or _pusher.done():
+        _pusher = asyncio.ensure_future(_push_loop())
+
+
+async def _push_loop():
+    while _channels:
+        status = await _collect_status()
+        for ch in list(_channels.values()):
+            try:
+                await _push(ch, status)
+            except Exception:
+                # e.g. send() racing the channel's close: skip it, keep the others
+                logger.exception("Control [%s]: status push failed", ch.pc_id)
+        await asyncio.sleep(config.WEBRTC_STATUS_INTERVAL)
+
+
+async def _collect_status() -> dict:
+    if _status_provider is None:
+        return {}
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(None, _status_provider)
+    except Exception:
+        logger.exception("Control: status provider failed")
+        return {}
+
+
+async def _push(ch: _Channel, status: dict):
+    state = dict(status, stats=await _peer_stats(ch),
+                 bandwidth=bandwidth.usage(bandwidth.key_for(ch.session_id)))
+    if ch.sent_state is None:
+        ch.send({"type": "status", "full": True, "data": state})
+    else:
+        delta, removed = diff(ch.sent_state, state)
+        if removed:
+            ch.send({"type": "status", "delta": delta, "removed": removed})
+        elif delta:
+            ch.send({"type": "status", "delta": delta})
+    ch.sent_state = state
+
+
+async def _peer_stats(ch: _Channel) -> dict:
+    """Outbound video counters and receiver reports for one peer."""
+    stats = {}
+    try:
+        report = await ch.pc.getStats()
+    except Exception:
+        return stats
+    for s in report.values():
+        if getattr(s, "kind", None) != "video":
+            continue
+        if s.type == "outbound-rtp":
+            now = time.monotonic()
+            elapsed = now - ch.stats_at
+            if elapsed > 0 and s.bytesSent >= ch.bytes_sent:
+                stats["bitrate_kbps"] = round((s.bytesSent - ch.bytes_sent) * 8 / elapsed / 1000)
+            ch.bytes_sent, ch.stats_at = s.bytesSent, now
+            stats["packets_sent"] = s.packetsSent
+        elif s.type == "remote-inbound-rtp":
+            stats["packets_lost"] = s.packetsLost
+            stats["jitter_ms"] = round(s.jitter / 90)  # 90 kHz RTP clock
+            if s.roundTripTime is not None:
+                stats["rtt_ms"] = round(s.roundTripTime * 1000)
+    return stats
+
+
+def diff(old: dict, new: dict, path: tuple = ()) -> tuple[dict, list[list]]:
+    """Keys of *new* that differ from *old*, and the paths of keys only *old* has."""
+    delta = {}
+    removed = []
+    for key, value in new.items():
+        if key not in old:
+            delta[key] = value
+        elif isinstance(value, dict) and isinstance(old[key], dict):
+            nested, nested_removed = diff(old[key], value, path + (key,))
+            if nested:
+                delta[key] = nested
+            removed += nested_removed
+        elif old[key] != value:
+            delta[key] = value
+    removed += [[*path, key] for key in old if key not in new]
+    return delta, removed
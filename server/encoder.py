@@ -0,0 +1,199 @@
+"""Shared live H.264 encoder.
+
+The camera feed is encoded once here and the resulting packets are fanned out
+to consumers (recorder, ...) that only copy bytes.  aiortc keeps encoding the
+WebRTC feed itself; this encoder exists so that storage and other outputs never
+trigger a second encode per consumer.
+"""
+
+import fractions
+import logging
+import queue
+import threading
+import time
+
+import av
+from av import VideoFrame
+
+from . import config
+from .fmp4 import H264Params
+
+logger = logging.getLogger(__name__)
+
+TIME_BASE = fractions.Fraction(1, 90000)
+
+
+class EncodedPacket:
+    """One encoded access unit (Annex-B) with its timing."""
+
+    __slots__ = ("data", "pts", "is_keyframe", "wallclock", "params")
+
+    def __init__(self, data: bytes, pts: int, is_keyframe: bool, wallclock: float,
+                 params: H264Params):
+        self.data = data
+        self.pts = pts              # 90 kHz, monotonic since encoder start
+        self.is_keyframe = is_keyframe
+        self.wallclock = wallclock  # time.time() at capture
+        self.params = params
+
+
+class PacketListener:
+    """Bounded per-consumer packet queue.
+
+    A listener always starts on a keyframe.  If the consumer falls behind and
+    the queue fills, packets are dropped until the next keyframe so the
+    consumer never sees a broken GOP.
+    """
+
+    def __init__(self, maxsize: int):
+        self._queue: queue.Queue[EncodedPacket] = queue.Queue(maxsize=maxsize)
+        self._resync = True
+        self.dropped = 0
+
+    def get(self, timeout: float) -> EncodedPacket | None:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _offer(self, packet: EncodedPacket):
+        """Called from the encoder thread."""
+        if self._resync:
+            if not packet.is_keyframe:
+                self.dropped += 1
+                return
+            self._resync = False
+        try:
+            self._queue.put_nowait(packet)
+        except queue.Full:
+            self.dropped += 1
+            self._resync = True
+
+
+class LiveEncoder:
+    """Encodes the latest camera frame at a fixed rate into H.264 packets."""
+
+    def __init__(self, camera):
+        self._camera = camera
+        self._listeners: list[PacketListener] = []
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self._codec = None
+        self._size: tuple[int, int] | None = None
+        self._params: H264Params | None = None
+        self._fps = config.DEFAULT_FPS
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._encode_loop, name="live-encoder",
+                                        daemon=True)
+        self._thread.start()
+        logger.info("LiveEncoder: started")
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._codec = None
+        logger.info("LiveEncoder: stopped")
+
+    def add_listener(self, maxsize: int = 256) -> PacketListener:
+        listener = PacketListener(maxsize)
+        with self._lock:
+            self._listeners.append(listener)
+        logger.info("LiveEncoder: listener added (total=%d)", len(self._listeners))
+        return listener
+
+    def remove_listener(self, listener: PacketListener):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+        logger.info("LiveEncoder: listener removed (total=%d)", len(self._listeners))
+
+    def _open_codec(self, width: int, height: int, fps: int):
+        codec = av.CodecContext.create("libx264", "w")
+        codec.width = width
+        codec.height = height
+        codec.pix_fmt = "yuv420p"
+        codec.time_base = TIME_BASE
+        codec.framerate = fractions.Fraction(fps, 1)
+        gop = fps * config.LIVE_ENCODER_GOP_SECONDS
+        codec.gop_size = gop
+        codec.bit_rate = config.LIVE_ENCODER_BITRATE
+        codec.options = {
+            "preset": config.LIVE_ENCODER_PRESET,
+            "tune": "zerolatency",
+            # Fixed GOP so recording fragments line up with wall-clock time
+            "x264-params": f"scenecut=0:min-keyint={gop}",
+        }
+        self._codec = codec
+        self._size = (width, height)
+        self._fps = fps
+        self._params = None
+        logger.info("LiveEncoder: codec opened (%dx%d@%dfps, gop=%d, %d kbps)",
+                    width, height, fps, gop, config.LIVE_ENCODER_BITRATE // 1000)
+
+    def _encode_loop(self):
+        start = time.monotonic()
+        next_tick = start
+        while self._running:
+            fps = self._camera.get_settings()["fps"]
+            next_tick += 1.0 / fps
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()  # fell behind: don't try to catch up
+
+            with self._lock:
+                listeners = list(self._listeners)
+            if not listeners:
+                continue
+
+            raw = self._camera.get_frame_raw()
+            if raw is None:
+                continue
+            height, width = raw.shape[:2]
+            if self._codec is None or self._size != (width, height) or self._fps != fps:
+                self._open_codec(width, height, fps)
+
+            now = time.monotonic()
+            frame = VideoFrame.from_ndarray(raw, format="bgr24")
+            frame.pts = int((now - start) * 90000)
+            frame.time_base = TIME_BASE
+            try:
+                packets = self._codec.encode(frame)
+            except Exception:
+                logger.exception("LiveEncoder: encode failed, reopening codec")
+                self._codec = None
+                continue
+
+            wallclock = time.time()
+            for packet in packets:
+                data = bytes(packet)
+                if packet.is_keyframe:
+                    params = H264Params.from_keyframe(data, width, height)
+                    if params is not None and params != self._params:
+                        self._params = params
+                if self._params is None:
+                    continue
+                encoded = EncodedPacket(data, packet.pts, packet.is_keyframe,
+                                        wallclock, self._params)
+                for listener in listeners:
+                    listener._offer(encoded)
+
+    @property
+    def is_active(self) -> bool:
+        return self._running and self._codec is not None
+
+    @property
+    def fps(self) -> int:
+        return self._fps
+
+    @property
+    def params(self) -> H264Params | None:
+        return self._params
@@ -0,0 +1,217 @@
+"""WebRTC codec preference and encoder profiles.
+
+A profile (config.WEBRTC_PROFILES) fixes the encoder's starting bitrate, the
+ceiling congestion control (REMB) may raise it to, the keyframe interval and
+whether low-latency tuning is used.  aiortc's stock encoders hard-code all
+of these, so peers get the subclasses below, installed on their sender once
+the codec has been negotiated.
+"""
+
+import fractions
+import multiprocessing
+
+import av
+from aiortc import RTCRtpSender
+from aiortc.codecs.h264 import H264Encoder
+from aiortc.codecs.vpx import Vp8Encoder, number_of_threads
+from aiortc.mediastreams import VIDEO_TIME_BASE, convert_timebase
+from aiortc.rtcrtpparameters import RTCRtpCodecCapability
+
+from . import config
+
+MIN_BITRATE = 250_000  # floor for REMB-driven reductions
+MAX_FRAME_RATE = 30    # x264 time base, as in aiortc; frames carry their own pts
+
+CODEC_MIME_TYPES = {"H264": "video/H264", "VP8": "video/VP8"}
+
+
+def resolve_profile(name: str | None) -> tuple[str, dict]:
+    """Return (name, settings) for *name*, or the deployment default.
+
+    Raises:
+        ValueError: unknown profile name
+    """
+    name = name or config.WEBRTC_PROFILE
+    if name not in config.WEBRTC_PROFILES:
+        raise ValueError(f"Unknown profile: {name}")
+    return name, config.WEBRTC_PROFILES[name]
+
+
+def parse_codecs(value) -> list[str]:
+    """Normalise a codec order given as a list or comma-separated string.
+
+    Raises:
+        ValueError: unsupported codec name
+    """
+    if isinstance(value, str):
+        value = value.split(",")
+    codecs = [str(c).strip().upper() for c in value if str(c).strip()]
+    for codec in codecs:
+        if codec not in CODEC_MIME_TYPES:
+            raise ValueError(f"Unsupported codec: {codec}")
+    return codecs
+
+
+def codec_preferences(order: list[str], offer_sdp: str) -> list[RTCRtpCodecCapability]:
+    """Capabilities for setCodecPreferences, in *order*, limited to the offer.
+
+    Codecs the browser did not offer are skipped so negotiation still
+    succeeds with whatever is left; an empty list keeps aiortc's defaults.
+    """
+    capabilities = RTCRtpSender.getCapabilities("video").codecs
+    preferred = []
+    for name in order:
+        if f"{name}/90000" not in offer_sdp:
+            continue
+        mime = CODEC_MIME_TYPES[name].lower()
+        preferred += [c for c in capabilities if c.mimeType.lower() == mime]
+    if preferred:
+        preferred += [c for c in capabilities if c.mimeType.lower() == "video/rtx"]
+    return preferred
+
+
+def x264_options(profile: dict, preset: str) -> dict:
+    options = {
+        "level": "31",
+        "preset": preset,
+        "maxrate": str(profile["max_bitrate"]),
+        "bufsize": str(profile["max_bitrate"]),  # 1 s VBV
+    }
+    if profile["low_latency"]:
+        # No lookahead or frame threading: each frame leaves the encoder as
+        # soon as it is coded.
+        options["tune"] = "zerolatency"
+    return options
+
+
+def vp8_options(profile: dict, bitrate: int) -> dict:
+    options = {
+        "bufsize": str(bitrate),
+        "maxrate": str(profile["max_bitrate"]),
+        "noise-sensitivity": "4",
+        "partitions": "0",
+        "static-thresh": "1",
+        "undershoot-pct": "100",
+        "overshoot-pct": "15",
+    }
+    if profile["low_latency"]:
+        options.update({"deadline": "realtime", "cpu-used": "-6", "lag-in-frames": "0"})
+    else:
+        options.update({"deadline": "good", "cpu-used": "5", "lag-in-frames": "8"})
+    return options
+
+
+def create_encoder(mime_type: str, profile: dict):
+    """Encoder for a negotiated codec, or None to keep aiortc's own."""
+    mime_type = mime_type.lower()
+    if mime_type == "video/h264":
+        return ProfileH264Encoder(profile)
+    if mime_type == "video/vp8":
+        return ProfileVp8Encoder(profile)
+    return None
+
+
+def _gop_frames(profile: dict) -> int:
+    return max(1, int(config.WEBRTC_DEFAULT_FPS * profile["gop_seconds"]))
+
+
+class _ProfileBitrate:
+    """target_bitrate clamped to the profile instead of aiortc's constants."""
+
+    def _init_profile(self, profile: dict):
+        self.profile = profile
+        self._bitrate = profile["bitrate"]
+        self._cap: int | None = None
+
+    @property
+    def target_bitrate(self) -> int:
+        return self._bitrate
+
+    @target_bitrate.setter
+    def target_bitrate(self, bitrate: int) -> None:
+        ceiling = min(self.profile["max_bitrate"], self._cap or self.profile["max_bitrate"])
+        self._bitrate = max(MIN_BITRATE, min(bitrate, ceiling))
+
+    def set_bitrate_cap(self, cap: int | None) -> None:
+        """Lower the ceiling below the profile's (data budgets); None removes it.
+
+        Takes effect on the next frame.  Once lifted, REMB raises the bitrate
+        back up as bandwidth allows.
+        """
+        self._cap = cap
+        self.target_bitrate = self._bitrate
+
+    def _bitrate_changed(self) -> bool:
+        # Reopen only on >10% change, as aiortc does
+        return abs(self._bitrate - self.codec.bit_rate) / self.codec.bit_rate > 0.1
+
+
+class ProfileH264Encoder(_ProfileBitrate, H264Encoder):
+    def __init__(self, profile: dict):
+        super().__init__()
+        self._init_profile(profile)
+
+    def _encode_frame(self, frame: av.VideoFrame, force_keyframe: bool):
+        if self.codec and (frame.width != self.codec.width
+                           or frame.height != self.codec.height
+                           or self._bitrate_changed()):
+            self.codec = None
+
+        frame.pict_type = (av.video.frame.PictureType.I if force_keyframe
+                           else av.video.frame.PictureType.NONE)
+
+        if self.codec is None:
+            self.codec = av.CodecContext.create("libx264", "w")
+            self.codec.width = frame.width
+            self.codec.height = frame.height
+            self.codec.bit_rate = self._bitrate
+            self.codec.pix_fmt = "yuv420p"
+            self.codec.framerate = fractions.Fraction(MAX_FRAME_RATE, 1)
+            self.codec.time_base = fractions.Fraction(1, MAX_FRAME_RATE)
+            self.codec.gop_size = _gop_frames(self.profile)
+            self.codec.options = x264_options(self.profile, config.WEBRTC_ENCODER_PRESET)
+            self.codec.profile = "Baseline"
+
+        data = b"".join(bytes(p) for p in self.codec.encode(frame))
+        if data:
+            yield from self._split_bitstream(data)
+
+
+class ProfileVp8Encoder(_ProfileBitrate, Vp8Encoder):
+    def __init__(self, profile: dict):
+        super().__init__()
+        self._init_profile(profile)
+
+    def encode(self, frame, force_keyframe: bool = False):
+        if frame.format.name != "yuv420p":
+            frame = frame.reformat(format="yuv420p")
+
+        if self.codec and (frame.width != self.codec.width
+                           or frame.height != self.codec.height
+                           or self._bitrate_changed()):
+            self.codec = None
+
+        frame.pict_type = (av.video.frame.PictureType.I if force_keyframe
+                           else av.video.frame.PictureType.NONE)
+
+        if self.codec is None:
+            self.codec = av.CodecContext.create("libvpx", "w")
+            self.codec.width = frame.width
+            self.codec.height = frame.height
+            self.codec.bit_rate = self._bitrate
+            self.codec.pix_fmt = "yuv420p"
+            self.codec.gop_size = _gop_frames(self.profile)
+            self.codec.qmin = 2
+            self.codec.qmax = 56
+            self.codec.options = vp8_options(self.profile, self._bitrate)
+            self.codec.thread_count = number_of_threads(
+                frame.width * frame.height, multiprocessing.cpu_count())
+
+        data = b"".join(bytes(p) for p in self.codec.encode(frame))
+        if not data:  # still filling lag-in-frames
+            return [], convert_timebase(frame.pts, frame.time_base, VIDEO_TIME_BASE)
+        # pack() handles packetisation and the picture id
+        packet = av.Packet(data)
+        packet.pts = frame.pts
+        packet.time_base = frame.time_base
+        return self.pack(packet)
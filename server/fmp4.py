@@ -0,0 +1,363 @@
+"""Fragmented MP4 (ISO BMFF) writer for pre-encoded H.264 and AAC.
+
+Only what the recorder needs: an init segment (ftyp + moov), media fragments
+(moof + mdat) and a random-access index (mfra).  Video samples arrive in
+Annex-B form as produced by libx264 and are converted to length-prefixed NAL
+units; nothing is decoded or re-encoded.
+"""
+
+import struct
+
+# Sample flags (ISO/IEC 14496-12 8.8.3.1)
+_FLAGS_SYNC = 0x02000000      # sample_depends_on = 2 (I-frame)
+_FLAGS_NON_SYNC = 0x01010000  # sample_depends_on = 1, is_non_sync_sample
+
+_MATRIX = struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+
+NAL_SPS = 7
+NAL_PPS = 8
+_NAL_AUD = 9
+
+
+def _box(kind: bytes, *payload: bytes) -> bytes:
+    body = b"".join(payload)
+    return struct.pack(">I", 8 + len(body)) + kind + body
+
+
+def _full_box(kind: bytes, version: int, flags: int, *payload: bytes) -> bytes:
+    return _box(kind, struct.pack(">I", (version << 24) | flags), *payload)
+
+
+# ─── H.264 bitstream helpers ─────────────────────────────────────────────
+
+
+def split_annexb(data: bytes) -> list[bytes]:
+    """Split an Annex-B byte stream into NAL units (start codes removed)."""
+    nals = []
+    pos = data.find(b"\x00\x00\x01")
+    while pos != -1:
+        start = pos + 3
+        pos = data.find(b"\x00\x00\x01", start)
+        nal = data[start:] if pos == -1 else data[start:pos]
+        nal = nal.rstrip(b"\x00")
+        if nal:
+            nals.append(nal)
+    return nals
+
+
+def nal_type(nal: bytes) -> int:
+    return nal[0] & 0x1F
+
+
+def annexb_to_sample(data: bytes) -> bytes:
+    """Convert an Annex-B access unit to an MP4 sample.
+
+    Parameter sets and access-unit delimiters are dropped; they live in the
+    avcC box of the init segment.
+    """
+    return b"".join(
+        struct.pack(">I", len(nal)) + nal
+        for nal in split_annexb(data)
+        if nal_type(nal) not in (NAL_SPS, NAL_PPS, _NAL_AUD)
+    )
+
+
+class H264Params:
+    """SPS/PPS and picture size of an H.264 stream (one init segment)."""
+
+    def __init__(self, sps: bytes, pps: bytes, width: int, height: int):
+        self.sps = sps
+        self.pps = pps
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_keyframe(cls, data: bytes, width: int, height: int) -> "H264Params | None":
+        """Extract parameter sets from an Annex-B keyframe, or None if absent."""
+        sps = pps = None
+        for nal in split_annexb(data):
+            kind = nal_type(nal)
+            if kind == NAL_SPS and sps is None:
+                sps = nal
+            elif kind == NAL_PPS and pps is None:
+                pps = nal
+        if sps is None or pps is None:
+            return None
+        return cls(sps, pps, width, height)
+
+    @property
+    def codec_string(self) -> str:
+        """RFC 6381 codec string, e.g. ``avc1.64001f``."""
+        return "avc1.%02x%02x%02x" % (self.sps[1], self.sps[2], self.sps[3])
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, H264Params)
+                and (self.sps, self.pps, self.width, self.height)
+                == (other.sps, other.pps, other.width, other.height))
+
+    def __hash__(self) -> int:
+        return hash((self.sps, self.pps, self.width, self.height))
+
+
+# ─── Tracks ──────────────────────────────────────────────────────────────
+
+
+class VideoTrack:
+    kind = "video"
+
+    def __init__(self, params: H264Params, track_id: int = 1, timescale: int = 90000):
+        self.params = params
+        self.track_id = track_id
+        self.timescale = timescale
+
+    def _handler(self) -> bytes:
+        return b"vide"
+
+    def _media_header(self) -> bytes:
+        return _full_box(b"vmhd", 0, 1, b"\x00" * 8)
+
+    def _sample_entry(self) -> bytes:
+        p = self.params
+        avcc = struct.pack(">BBBBB", 1, p.sps[1], p.sps[2], p.sps[3], 0xFF)
+        avcc += struct.pack(">BH", 0xE1, len(p.sps)) + p.sps
+        avcc += struct.pack(">BH", 1, len(p.pps)) + p.pps
+        if p.sps[1] in (100, 110, 122, 144):
+            # High profile extension: 4:2:0, 8-bit, no SPS extensions
+            avcc += bytes([0xFC | 1, 0xF8, 0xF8, 0])
+        return _box(
+            b"avc1",
+            b"\x00" * 6, struct.pack(">H", 1),        # reserved, data_reference_index
+            b"\x00" * 16,                             # pre_defined / reserved
+            struct.pack(">HH", p.width, p.height),
+            struct.pack(">II", 0x00480000, 0x00480000),  # 72 dpi
+            b"\x00" * 4, struct.pack(">H", 1),        # reserved, frame_count
+            b"\x00" * 32,                             # compressorname
+            struct.pack(">Hh", 0x0018, -1),
+            _box(b"avcC", avcc),
+        )
+
+    def _tkhd_size(self) -> bytes:
+        return struct.pack(">II", self.params.width << 16, self.params.height << 16)
+
+
+class AudioTrack:
+    kind = "audio"
+
+    def __init__(self, sample_rate: int, channels: int, audio_specific_config: bytes,
+                 track_id: int = 2, bitrate: int = 0):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.asc = audio_specific_config
+        self.track_id = track_id
+        self.timescale = sample_rate
+        self.bitrate = bitrate
+
+    def _handler(self) -> bytes:
+        return b"soun"
+
+    def _media_header(self) -> bytes:
+        return _full_box(b"smhd", 0, 0, b"\x00" * 4)
+
+    def _sample_entry(self) -> bytes:
+        def descr(tag: int, payload: bytes) -> bytes:
+            n = len(payload)
+            size = bytes([0x80 | (n >> 21) & 0x7F, 0x80 | (n >> 14) & 0x7F,
+                          0x80 | (n >> 7) & 0x7F, n & 0x7F])
+            return bytes([tag]) + size + payload
+
+        dec_config = descr(0x04, bytes([0x40, 0x15]) + b"\x00\x00\x00"
+                           + struct.pack(">II", self.bitrate, self.bitrate)
+                           + descr(0x05, self.asc))
+        es = descr(0x03, struct.pack(">HB", 0, 0) + dec_config + descr(0x06, b"\x02"))
+        return _box(
+            b"mp4a",
+            b"\x00" * 6, struct.pack(">H", 1),
+            b"\x00" * 8,
+            struct.pack(">HHHH", self.channels, 16, 0, 0),
+            struct.pack(">I", self.sample_rate << 16),
+            _full_box(b"esds", 0, 0, es),
+        )
+
+    def _tkhd_size(self) -> bytes:
+        return b"\x00" * 8
+
+
+class Sample:
+    __slots__ = ("data", "duration", "is_sync")
+
+    def __init__(self, data: bytes, duration: int, is_sync: bool):
+        self.data = data
+        self.duration = duration
+        self.is_sync = is_sync
+
+
+# ─── Segments ────────────────────────────────────────────────────────────
+
+
+def _trak(track) -> bytes:
+    is_audio = track.kind == "audio"
+    tkhd = _full_box(
+        b"tkhd", 0, 3,
+        struct.pack(">IIII", 0, 0, track.track_id, 0),
+        struct.pack(">I", 0), b"\x00" * 8,
+        struct.pack(">hhHH", 0, 0, 0x0100 if is_audio else 0, 0),
+        _MATRIX, track._tkhd_size(),
+    )
+    mdhd = _full_box(b"mdhd", 0, 0, struct.pack(">IIIIHH", 0, 0, track.timescale, 0, 0x55C4, 0))
+    hdlr = _full_box(b"hdlr", 0, 0, struct.pack(">I", 0), track._handler(), b"\x00" * 12,
+                     b"SoundHandler\x00" if is_audio else b"VideoHandler\x00")
+    dinf = _box(b"dinf", _full_box(b"dref", 0, 0, struct.pack(">I", 1), _full_box(b"url ", 0, 1)))
+    stbl = _box(
+        b"stbl",
+        _full_box(b"stsd", 0, 0, struct.pack(">I", 1), track._sample_entry()),
+        _full_box(b"stts", 0, 0, struct.pack(">I", 0)),
+        _full_box(b"stsc", 0, 0, struct.pack(">I", 0)),
+        _full_box(b"stsz", 0, 0, struct.pack(">II", 0, 0)),
+        _full_box(b"stco", 0, 0, struct.pack(">I", 0)),
+    )
+    minf = _box(b"minf", track._media_header(), dinf, stbl)
+    return _box(b"trak", tkhd, _box(b"mdia", mdhd, hdlr, minf))
+
+
+def init_segment(tracks: list, duration_ms: int = 0) -> bytes:
+    """Build ftyp + moov.  *duration_ms* goes into mehd (0 while live)."""
+    ftyp = _box(b"ftyp", b"isom", struct.pack(">I", 0x200), b"isomiso6avc1mp41")
+    mvhd = _full_box(
+        b"mvhd", 0, 0,
+        struct.pack(">IIII", 0, 0, 1000, 0),
+        struct.pack(">IH", 0x00010000, 0x0100), b"\x00" * 10,
+        _MATRIX, b"\x00" * 24,
+        struct.pack(">I", max(t.track_id for t in tracks) + 1),
+    )
+    mvex = _box(
+        b"mvex",
+        _full_box(b"mehd", 1, 0, struct.pack(">Q", duration_ms)),
+        *(_full_box(b"trex", 0, 0, struct.pack(">IIIII", t.track_id, 1, 0, 0, 0))
+          for t in tracks),
+    )
+    return ftyp + _box(b"moov", mvhd, *(_trak(t) for t in tracks), mvex)
+
+
+def fragment(sequence: int, runs: list) -> bytes:
+    """Build moof + mdat.
+
+    *runs* is a list of ``(track, base_decode_time, samples)``; each track's
+    samples become one trun whose data is laid out in order in the mdat.
+    """
+    def build(offsets: list[int]) -> bytes:
+        trafs = []
+        for (track, base_time, samples), offset in zip(runs, offsets):
+            entries = b"".join(
+                struct.pack(">IIII", s.duration, len(s.data),
+                            _FLAGS_SYNC if s.is_sync else _FLAGS_NON_SYNC, 0)
+                for s in samples
+            )
+            trafs.append(_box(
+                b"traf",
+                _full_box(b"tfhd", 0, 0x020000, struct.pack(">I", track.track_id)),
+                _full_box(b"tfdt", 1, 0, struct.pack(">Q", base_time)),
+                _full_box(b"trun", 0, 0x000F01, struct.pack(">Ii", len(samples), offset), entries),
+            ))
+        return _box(b"moof", _full_box(b"mfhd", 0, 0, struct.pack(">I", sequence)), *trafs)
+
+    payloads = [b"".join(s.data for s in samples) for _, _, samples in runs]
+    moof_size = len(build([0] * len(runs)))
+    offsets, pos = [], moof_size + 8
+    for payload in payloads:
+        offsets.append(pos)
+        pos += len(payload)
+    return build(offsets) + _box(b"mdat", *payloads)
+
+
+def mfra(track_id: int, entries: list[tuple[int, int]]) -> bytes:
+    """Random-access index: ``entries`` are ``(decode_time, moof_offset)``."""
+    body = struct.pack(">III", track_id, 0, len(entries)) + b"".join(
+        struct.pack(">QQBBB", t, offset, 1, 1, 1) for t, offset in entries
+    )
+    tfra = _full_box(b"tfra", 1, 0, body)
+    size = 8 + len(tfra) + 16
+    return _box(b"mfra", tfra, _full_box(b"mfro", 0, 0, struct.pack(">I", size)))
+
+
+def iter_boxes(f, end: int | None = None):
+    """Yield ``(kind, offset, size)`` for the top-level boxes of file *f*."""
+    pos = f.tell()
+    while end is None or pos < end:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack(">I4s", header)
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+        elif size == 0:
+            return
+        if size < 8:
+            return
+        yield kind, pos, size
+        pos += size
+        f.seek(pos)
+
+
+def read_tfdt(moof: bytes) -> int | None:
+    """Return the first baseMediaDecodeTime found in a moof payload."""
+    idx = moof.find(b"tfdt")
+    if idx < 0:
+        return None
+    version = moof[idx + 4]
+    if version == 1:
+        return struct.unpack_from(">Q", moof, idx + 8)[0]
+    return struct.unpack_from(">I", moof, idx + 8)[0]
+
+
+class FileWriter:
+    """Write an init segment followed by fragments to a file.
+
+    ``close()`` appends an mfra index and rewrites the init segment with the
+    final duration, so the file is seekable in ordinary players.
+    """
+
+    def __init__(self, path: str, tracks: list):
+        self.path = path
+        self._tracks = tracks
+        self._file = open(path, "wb")
+        self._sequence = 0
+        self._random_access: list[tuple[int, int]] = []
+        init = init_segment(tracks)
+        try:
+            self._file.write(init)
+        except OSError:
+            self._file.close()
+            raise
+        self.init_size = len(init)
+        self.size = len(init)
+
+    def write_fragment(self, runs: list) -> int:
+        """Append one fragment and return its byte offset in the file."""
+        self._sequence += 1
+        data = fragment(self._sequence, runs)
+        offset = self.size
+        self._file.write(data)
+        self._file.flush()  # readers (playback, crash recovery) see whole fragments
+        self.size += len(data)
+        track, base_time, samples = runs[0]
+        if samples and samples[0].is_sync:
+            self._random_access.append((base_time, offset))
+        return offset
+
+    def close(self, duration_ms: int) -> int:
+        """Finalize the file and return its size in bytes."""
+        if self._random_access:
+            tail = mfra(self._tracks[0].track_id, self._random_access)
+            self._file.write(tail)
+            self.size += len(tail)
+        self._file.seek(0)
+        self._file.write(init_segment(self._tracks, duration_ms))
+        self._file.close()
+        return self.size
+
+    def abort(self):
+        """Close the file after a write error, leaving it unfinalized."""
+        try:
+            self._file.close()
+        except OSError:
+            pass
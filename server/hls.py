@@ -0,0 +1,319 @@
+"""Low-latency HLS output packaged from the shared live encoder.
+
+Each GOP becomes one media segment made of CMAF partial segments (moof+mdat,
+HLS_PART_SECONDS each) kept in an in-memory window.  Nothing is re-encoded,
+so an HLS viewer costs an HTTP response, not a WebRTC encoder.  The
+packager only subscribes to LiveEncoder while someone is requesting the
+stream and detaches after HLS_IDLE_SECONDS.
+
+Playlist requests with ``_HLS_msn``/``_HLS_part`` block until that part
+exists (blocking playlist reload), and part requests named by the preload
+hint block until the part is complete.
+"""
+
+import collections
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+
+from . import config
+from . import fmp4
+
+logger = logging.getLogger(__name__)
+
+
+class _Part:
+    __slots__ = ("data", "duration", "independent")
+
+    def __init__(self, data: bytes, duration: float, independent: bool):
+        self.data = data
+        self.duration = duration
+        self.independent = independent
+
+
+class _Segment:
+    def __init__(self, msn: int, init_id: int, wallclock: float, discontinuity: bool):
+        self.msn = msn
+        self.init_id = init_id
+        self.wallclock = wallclock
+        self.discontinuity = discontinuity
+        self.parts: list[_Part] = []
+        self.complete = False
+
+    @property
+    def duration(self) -> float:
+        return sum(p.duration for p in self.parts)
+
+
+class HlsPackager:
+    def __init__(self, encoder):
+        self._encoder = encoder
+        self._listener = None
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self._cond = threading.Condition()
+        self._last_request = 0.0
+        # Window state (guarded by _cond)
+        self._segments: collections.deque[_Segment] = collections.deque()
+        self._inits: dict[int, bytes] = {}
+        self._init_id = 0
+        self._next_msn = 0
+        self._discontinuity_seq = 0
+        # Packager state (packager thread only)
+        self._track: fmp4.VideoTrack | None = None
+        self._pending = None
+        self._part_samples: list[fmp4.Sample] = []
+        self._part_base = 0
+        self._part_ticks = 0
+        self._sequence = 0
+
+    # ── Lifecycle ──
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._package_loop, name="hls", daemon=True)
+        self._thread.start()
+        logger.info("HLS: packager started (part %.2fs, window %d segments)",
+                    config.HLS_PART_SECONDS, config.HLS_WINDOW_SEGMENTS)
+
+    def stop(self):
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._detach()
+        logger.info("HLS: packager stopped")
+
+    def touch(self):
+        """Record viewer activity; attaches to the encoder if idle."""
+        with self._cond:
+            self._last_request = time.monotonic()
+            if self._listener is None:
+                self._cond.notify_all()
+
+    def _attach(self):
+        self._listener = self._encoder.add_listener()
+        logger.info("HLS: viewer activity, packaging live stream")
+
+    def _detach(self):
+        if self._listener is None:
+            return
+        self._encoder.remove_listener(self._listener)
+        with self._cond:
+            self._listener = None
+            # Next viewer starts a fresh window after a discontinuity
+            self._segments.clear()
+            self._inits.clear()
+        self._track = None
+        self._pending = None
+        self._part_samples = []
+        self._part_ticks = 0
+        logger.info("HLS: no viewers for %ds, detached from encoder", config.HLS_IDLE_SECONDS)
+
+    def _package_loop(self):
+        while self._running:
+            with self._cond:
+                idle = time.monotonic() - self._last_request > config.HLS_IDLE_SECONDS
+                if self._listener is None and idle:
+                    self._cond.wait(timeout=0.5)
+                    continue
+            if idle:
+                self._detach()
+                continue
+            if self._listener is None:
+                self._attach()
+            packet = self._listener.get(timeout=0.5)
+            if packet is not None:
+                try:
+                    self._on_packet(packet)
+                except Exception:
+                    logger.exception("HLS: packaging failed, restarting window")
+                    self._detach()
+
+    # ── Packaging ──
+
+    def _on_packet(self, packet):
+        nominal = 90000 // max(1, self._encoder.fps)
+        pending, self._pending = self._pending, packet
+        if pending is not None:
+            duration = packet.pts - pending.pts
+            if not 0 < duration <= 2 * nominal:
+                duration = nominal
+            self._add_sample(pending, duration, nominal)
+        if packet.is_keyframe:
+            self._flush_part()
+            self._start_segment(packet)
+
+    def _start_segment(self, packet):
+        with self._cond:
+            current = self._segments[-1] if self._segments else None
+            if current is not None:
+                current.complete = True
+            discontinuity = self._track is None or packet.params != self._track.params
+            if discontinuity:
+                self._track = fmp4.VideoTrack(packet.params)
+                self._init_id += 1
+                self._inits[self._init_id] = fmp4.init_segment([self._track])
+                self._part_base = 0
+            self._segments.append(_Segment(self._next_msn, self._init_id, packet.wallclock,
+                                           discontinuity and current is not None))
+            self._next_msn += 1
+            self._trim()
+            self._cond.notify_all()
+
+    def _add_sample(self, packet, duration: int, nominal: int):
+        if self._track is None:
+            return
+        target = int(config.HLS_PART_SECONDS * 90000)
+        if self._part_samples and self._part_ticks + duration > target:
+            self._flush_part()
+        self._part_samples.append(fmp4.Sample(fmp4.annexb_to_sample(packet.data), duration,
+                                              packet.is_keyframe))
+        self._part_ticks += duration
+        if self._part_ticks + nominal > target:
+            self._flush_part()  # the next frame would not fit: publish now
+
+    def _flush_part(self):
+        if not self._part_samples:
+            return
+        samples, self._part_samples = self._part_samples, []
+        self._sequence += 1
+        data = fmp4.fragment(self._sequence, [(self._track, self._part_base, samples)])
+        part = _Part(data, self._part_ticks / 90000, samples[0].is_sync)
+        self._part_base += self._part_ticks
+        self._part_ticks = 0
+        with self._cond:
+            self._segments[-1].parts.append(part)
+            self._cond.notify_all()
+
+    def _trim(self):
+        while len(self._segments) > config.HLS_WINDOW_SEGMENTS + 1:
+            self._segments.popleft()
+            if self._segments[0].discontinuity:
+                self._discontinuity_seq += 1
+                self._segments[0].discontinuity = False
+        live = {s.init_id for s in self._segments}
+        for init_id in [i for i in self._inits if i not in live]:
+            del self._inits[init_id]
+
+    # ── Serving ──
+
+    def _target_duration(self) -> int:
+        longest = max((s.duration for s in self._segments if s.complete), default=0)
+        return max(config.LIVE_ENCODER_GOP_SECONDS, math.ceil(longest))
+
+    def _find(self, msn: int) -> _Segment | None:
+        if not self._segments:
+            return None
+        index = msn - self._segments[0].msn
+        if 0 <= index < len(self._segments):
+            return self._segments[index]
+        return None
+
+    def _has(self, msn: int, part: int | None) -> bool:
+        if not self._segments:
+            return False
+        last = self._segments[-1]
+        if msn < last.msn:
+            return True
+        if msn > last.msn:
+            return False
+        return len(last.parts) > part if part is not None else last.complete
+
+    def playlist(self, msn: int | None = None, part: int | None = None) -> str | None:
+        """Return the media playlist, blocking until (msn, part) is available.
+
+        Returns None if the stream has not produced anything yet.  Raises
+        ValueError if *msn* is more than two segments ahead of the live edge.
+        """
+        self.touch()
+        wait = 3 * config.LIVE_ENCODER_GOP_SECONDS
+        with self._cond:
+            if msn is not None and self._segments and msn > self._segments[-1].msn + 2:
+                raise ValueError("_HLS_msn is too far in the future")
+            if msn is None:
+                self._cond.wait_for(lambda: self._segments and self._segments[-1].parts
+                                    or len(self._segments) > 1,
+                                    timeout=wait + config.LIVE_ENCODER_GOP_SECONDS)
+            else:
+                self._cond.wait_for(lambda: self._has(msn, part), timeout=wait)
+            if not self._segments or (len(self._segments) == 1 and not self._segments[0].parts):
+                return None
+            return self._render()
+
+    def _render(self) -> str:
+        target = self._target_duration()
+        part_target = config.HLS_PART_SECONDS
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:9",
+            f"#EXT-X-TARGETDURATION:{target}",
+            f"#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK={3 * part_target:.3f}",
+            f"#EXT-X-PART-INF:PART-TARGET={part_target:.3f}",
+            "#EXT-X-INDEPENDENT-SEGMENTS",
+            f"#EXT-X-MEDIA-SEQUENCE:{self._segments[0].msn}",
+        ]
+        if self._discontinuity_seq:
+            lines.append(f"#EXT-X-DISCONTINUITY-SEQUENCE:{self._discontinuity_seq}")
+        # Parts are listed only near the live edge, as the spec recommends
+        live_edge = sum(s.duration for s in self._segments)
+        elapsed = 0.0
+        init_id = None
+        for seg in self._segments:
+            if seg.discontinuity:
+                lines.append("#EXT-X-DISCONTINUITY")
+            if seg.init_id != init_id:
+                init_id = seg.init_id
+                lines.append(f'#EXT-X-MAP:URI="init_{init_id}.mp4"')
+            lines.append("#EXT-X-PROGRAM-DATE-TIME:"
+                         + datetime.fromtimestamp(seg.wallclock).astimezone().isoformat(
+                             timespec="milliseconds"))
+            duration = seg.duration
+            if live_edge - elapsed - duration < 3 * target or not seg.complete:
+                for i, part in enumerate(seg.parts):
+                    independent = ",INDEPENDENT=YES" if part.independent else ""
+                    lines.append(f'#EXT-X-PART:DURATION={part.duration:.5f},'
+                                 f'URI="part_{seg.msn}_{i}.m4s"{independent}')
+            elapsed += duration
+            if seg.complete:
+                lines.append(f"#EXTINF:{duration:.5f},")
+                lines.append(f"seg_{seg.msn}.m4s")
+            else:
+                lines.append(f'#EXT-X-PRELOAD-HINT:TYPE=PART,'
+                             f'URI="part_{seg.msn}_{len(seg.parts)}.m4s"')
+        return "\n".join(lines) + "\n"
+
+    def init(self, init_id: int) -> bytes | None:
+        with self._cond:
+            return self._inits.get(init_id)
+
+    def part(self, msn: int, index: int) -> bytes | None:
+        """Return a partial segment, blocking briefly if it is the hinted one."""
+        self.touch()
+        with self._cond:
+            self._cond.wait_for(lambda: self._has(msn, index),
+                                timeout=2 * config.LIVE_ENCODER_GOP_SECONDS)
+            seg = self._find(msn)
+            if seg is None or index >= len(seg.parts):
+                return None
+            return seg.parts[index].data
+
+    def segment(self, msn: int) -> bytes | None:
+        self.touch()
+        with self._cond:
+            self._cond.wait_for(lambda: self._has(msn, None),
+                                timeout=2 * config.LIVE_ENCODER_GOP_SECONDS)
+            seg = self._find(msn)
+            if seg is None or not seg.complete:
+                return None
+            return b"".join(p.data for p in seg.parts)
+
+    @property
+    def viewer_active(self) -> bool:
+        return self._listener is not None
@@ -0,0 +1,141 @@
+"""MJPEG (multipart/x-mixed-replace) output with one shared JPEG encoder.
+
+A single thread encodes the latest camera frame and publishes it to a
+one-slot mailbox.  Each HTTP client always picks up the newest JPEG when its
+previous write completes, so a slow client skips frames (counted as drops)
+instead of queueing them, and N clients still cost one encode per frame.
+The encoder thread only runs while at least one client is connected.
+A client may also be held below the encoder's rate (data budgets); the
+frames it skips for that are counted as throttled.
+"""
+
+import itertools
+import logging
+import threading
+import time
+
+import cv2
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+BOUNDARY = "frame"
+
+
+class _Subscriber:
+    _ids = itertools.count(1)
+
+    def __init__(self, remote: str):
+        self.id = next(self._ids)
+        self.remote = remote
+        self.connected_at = time.time()
+        self.sent = 0
+        self.dropped = 0
+        self.throttled = 0
+
+    def info(self) -> dict:
+        return {
+            "id": self.id,
+            "remote": self.remote,
+            "connected_seconds": int(time.time() - self.connected_at),
+            "frames_sent": self.sent,
+            "frames_dropped": self.dropped,
+            "frames_throttled": self.throttled,
+        }
+
+
+class MjpegBroadcaster:
+    MIMETYPE = f"multipart/x-mixed-replace; boundary={BOUNDARY}"
+
+    def __init__(self, camera):
+        self._camera = camera
+        self._cond = threading.Condition()
+        self._subscribers: list[_Subscriber] = []
+        self._jpeg: bytes | None = None
+        self._seq = 0
+        self._encoded = 0
+        self._thread: threading.Thread | None = None
+
+    def _ensure_encoder(self):
+        """Start the encoder thread if it is not running (call with _cond held)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._encode_loop, name="mjpeg-encoder",
+                                            daemon=True)
+            self._thread.start()
+            logger.info("MJPEG: encoder started")
+
+    def _encode_loop(self):
+        next_tick = time.monotonic()
+        while True:
+            with self._cond:
+                if not self._subscribers:
+                    self._thread = None
+                    self._jpeg = None
+                    logger.info("MJPEG: no subscribers, encoder stopped")
+                    return
+            fps = min(self._camera.get_settings()["fps"], config.MJPEG_MAX_FPS)
+            next_tick += 1.0 / fps
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
+
+            frame = self._camera.get_frame_raw()
+            if frame is None:
+                continue
+            ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, config.MJPEG_QUALITY])
+            if not ok:
+                continue
+            part = (f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(buf)}\r\n\r\n").encode() + buf.tobytes() + b"\r\n"
+            with self._cond:
+                self._jpeg = part
+                self._seq += 1
+                self._encoded += 1
+                self._cond.notify_all()
+
+    def stream(self, remote: str, max_fps=None):
+        """Generator of multipart parts for one client.
+
+        *max_fps*, if given, is called before each frame and returns this
+        client's frame-rate limit (None for no limit).
+        """
+        sub = _Subscriber(remote)
+        sent_at = 0.0
+        with self._cond:
+            self._subscribers.append(sub)
+            self._ensure_encoder()
+            last = self._seq
+        logger.info("MJPEG: subscriber %d connected from %s (total=%d)",
+                    sub.id, remote, len(self._subscribers))
+        try:
+            while True:
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self._seq > last, timeout=5.0):
+                        continue
+                    if self._seq - last > 1:
+                        sub.dropped += self._seq - last - 1
+                    last = self._seq
+                    part = self._jpeg
+                limit = max_fps() if max_fps else None
+                if limit and time.monotonic() - sent_at < 1.0 / limit:
+                    sub.throttled += 1
+                    continue
+                sent_at = time.monotonic()
+                yield part  # blocks while the client drains the previous frame
+                sub.sent += 1
+        finally:
+            with self._cond:
+                self._subscribers.remove(sub)
+            logger.info("MJPEG: subscriber %d disconnected (sent=%d, dropped=%d)",
+                        sub.id, sub.sent, sub.dropped)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "subscribers": len(self._subscribers),
+                "frames_encoded": self._encoded,
+                "clients": [s.info() for s in self._subscribers],
+            }
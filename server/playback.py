@@ -0,0 +1,225 @@
+"""Byte-range playback of recordings, clips and the audio archive.
+
+Files are served from a read-only memory map in fixed-size chunks, with an
+explicit read-ahead hint of at most PLAYBACK_READAHEAD_BYTES past the current
+position, so seeking through a multi-hundred-megabyte segment only touches the
+pages that are actually sent.  Single, suffix, open-ended and multi-range
+(``multipart/byteranges``) requests are supported, along with If-Range.
+"""
+
+import mmap
+import os
+import secrets
+from datetime import datetime
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_date
+
+from . import config
+
+_HAS_MADVISE = hasattr(mmap.mmap, "madvise") and hasattr(mmap, "MADV_WILLNEED")
+
+
+# ─── Range responses ─────────────────────────────────────────────────────
+
+
+def _resolve_ranges(st: os.stat_result) -> list[tuple[int, int]] | None:
+    """Return satisfiable ``(start, stop)`` spans, ``[]`` if none, or ``None``
+    when the request should get the whole file."""
+    rng = request.range
+    if rng is None or rng.units != "bytes":
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range and not _if_range_matches(if_range, st):
+        return None
+    size = st.st_size
+    spans = []
+    for begin, end in rng.ranges:
+        if begin < 0:
+            start, stop = max(0, size + begin), size
+        else:
+            start, stop = begin, size if end is None else min(end, size)
+        if start < stop:
+            spans.append((start, stop))
+    return spans
+
+
+def _etag(st: os.stat_result) -> str:
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def _if_range_matches(value: str, st: os.stat_result) -> bool:
+    if value.startswith("W/"):
+        return False  # If-Range needs a strong comparison (RFC 7233 3.2)
+    if value.startswith('"'):
+        return value == _etag(st)
+    date = parse_date(value)
+    return date is not None and int(st.st_mtime) <= int(date.timestamp())
+
+
+def send_ranged(path: str, mimetype: str) -> Response:
+    """Serve *path* with HTTP Range support from a memory map."""
+    f = open(path, "rb")
+    st = os.fstat(f.fileno())
+    size = st.st_size
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": _etag(st),
+        "Last-Modified": http_date(st.st_mtime),
+        "Cache-Control": "private, no-cache",
+    }
+
+    spans = _resolve_ranges(st)
+    if spans is not None and not spans:
+        f.close()
+        headers["Content-Range"] = f"bytes */{size}"
+        return Response(status=416, headers=headers)
+
+    if spans is None:
+        status, parts = 200, [(b"", 0, size)]
+        headers["Content-Type"] = mimetype
+    elif len(spans) == 1:
+        start, stop = spans[0]
+        status, parts = 206, [(b"", start, stop)]
+        headers["Content-Type"] = mimetype
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{size}"
+    else:
+        boundary = secrets.token_hex(12)
+        parts = []
+        for start, stop in spans:
+            head = (f"\r\n--{boundary}\r\nContent-Type: {mimetype}\r\n"
+                    f"Content-Range: bytes {start}-{stop - 1}/{size}\r\n\r\n").encode()
+            parts.append((head, start, stop))
+        parts.append((f"\r\n--{boundary}--\r\n".encode(), 0, 0))
+        status = 206
+        headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+
+    headers["Content-Length"] = str(sum(len(h) + stop - start for h, start, stop in parts))
+    if request.method == "HEAD":
+        f.close()
+        return Response(status=status, headers=headers)
+    return Response(_iter_parts(f, size, parts), status=status, headers=headers,
+                    direct_passthrough=True)
+
+
+def _iter_parts(f, size: int, parts: list[tuple[bytes, int, int]]):
+    mm = None
+    try:
+        if size:
+            mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        chunk = config.PLAYBACK_CHUNK_BYTES
+        for head, start, stop in parts:
+            if head:
+                yield head
+            advised = start
+            for pos in range(start, stop, chunk):
+                end = min(pos + chunk, stop)
+                if _HAS_MADVISE and end > advised:
+                    advised = _advise(mm, pos, min(stop, pos + config.PLAYBACK_READAHEAD_BYTES))
+                yield mm[pos:end]
+    finally:
+        if mm is not None:
+            mm.close()
+        f.close()
+
+
+def send_concatenated(spans: list[tuple[str, int, int]], mimetype: str,
+                      download_name: str) -> Response:
+    """Serve byte spans ``(path, start, stop)`` of several files back to back as one body.
+
+    Used for formats whose pieces concatenate into a valid file (ADTS audio),
+    so any time range is streamed without being assembled in memory.  There
+    is no Range support: the body only exists for the duration of the request.
+    """
+    headers = {
+        "Content-Type": mimetype,
+        "Content-Length": str(sum(stop - start for _, start, stop in spans)),
+        "Content-Disposition": f'inline; filename="{download_name}"',
+        "Cache-Control": "private, no-cache",
+    }
+    if request.method == "HEAD":
+        return Response(headers=headers)
+    return Response(_iter_spans(spans), headers=headers, direct_passthrough=True)
+
+
+def _iter_spans(spans: list[tuple[str, int, int]]):
+    for path, start, stop in spans:
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return  # deleted by the size quota meanwhile; the client sees a short body
+        yield from _iter_parts(f, os.fstat(f.fileno()).st_size, [(b"", start, stop)])
+
+
+def _advise(mm: mmap.mmap, start: int, stop: int) -> int:
+    """Ask the kernel to page in [start, stop) ahead of the reader."""
+    aligned = start - start % mmap.PAGESIZE
+    try:
+        mm.madvise(mmap.MADV_WILLNEED, aligned, stop - aligned)
+    except OSError:
+        pass
+    return stop
+
+
+# ─── Recording / audio archive index ─────────────────────────────────────
+
+
+def recording_url(seg: dict) -> str:
+    return f"/api/recordings/{seg['day']}/{seg['filename']}"
+
+
+def archive_url(seg: dict) -> str:
+    return f"/api/audio/archive?start={seg['start']:.3f}&end={seg['end']:.3f}"
+
+
+def timeline(segments: list[dict], day: str | None = None, url=recording_url) -> list[dict]:
+    """Group segments by day (oldest first) in the /api/recordings/timeline shape."""
+    days: dict[str, list[dict]] = {}
+    for seg in segments:
+        if day and seg["day"] != day:
+            continue
+        days.setdefault(seg["day"], []).append({
+            "filename": seg["filename"],
+            "url": url(seg),
+            "start": _iso(seg["start"]),
+            "end": _iso(seg["end"]),
+            "duration_seconds": round(seg["end"] - seg["start"], 3),
+            "size_bytes": seg["size"],
+            "in_progress": bool(seg.get("in_progress")),
+        })
+    return [{"date": d, "segments": segs} for d, segs in sorted(days.items())]
+
+
+def locate(segments: list[dict], ts: float) -> dict | None:
+    """Map a wall-clock time to the fragment that contains it.
+
+    If *ts* falls in a gap between segments, the next segment's first
+    fragment is returned with ``exact`` false.
+    """
+    for seg in segments:
+        if not seg["fragments"] or ts >= seg["end"]:
+            continue
+        exact = ts >= seg["start"]
+        offset_sec, byte_offset = seg["fragments"][0]
+        if exact:
+            for frag_sec, frag_offset in seg["fragments"]:
+                if seg["start"] + frag_sec > ts:
+                    break
+                offset_sec, byte_offset = frag_sec, frag_offset
+        return {
+            "filename": seg["filename"],
+            "url": recording_url(seg),
+            "exact": exact,
+            "segment_start": _iso(seg["start"]),
+            "fragment_time": _iso(seg["start"] + offset_sec),
+            "offset_seconds": offset_sec,
+            "byte_offset": byte_offset,
+            "init_size": seg["init_size"],
+            "range": f"bytes={byte_offset}-",
+            "in_progress": bool(seg.get("in_progress")),
+        }
+    return None
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts).astimezone().isoformat()
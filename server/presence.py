@@ -0,0 +1,185 @@
+"""Connected clients and the exclusive session, indexed by sid, IP and feature.
+
+Only one phone may use the audio/video features (listening, talking, sending
+video) at a time.  The client IP that starts the first feature holds the
+exclusive session until none of its clients (on /audio or /video) uses any
+feature any more; meanwhile every other IP gets ``exclusive_blocked``.
+Talking and sending video also have a single holder each.
+
+All state is changed under one lock, so checking the session and starting a
+feature is a single atomic step, and connect, disconnect, ``start()`` and
+``stop()`` each touch a fixed number of dict/set entries: the number of active
+features per IP is counted as they start and stop instead of being found by
+scanning the listeners.
+
+/audio clients are told whether they are blocked with ``exclusive_status``.
+Each joins the PRESENCE_ROOM on connect and gets its initial status; after
+that only changes are sent, as one emit to the room that skips the holder's
+own clients (whose status does not change): ``{"blocked": true}`` when an IP
+claims the session, ``{"blocked": false}`` when it is released.  These emits
+happen under the lock, so a client never sees them out of order.
+"""
+
+import logging
+import threading
+
+from . import bandwidth
+
+logger = logging.getLogger(__name__)
+
+LISTEN, TALK, SEND = "listen", "talk", "send"
+FEATURES = (LISTEN, TALK, SEND)
+SINGLE_HOLDER = frozenset((TALK, SEND))  # one client at a time
+
+# start() results other than None (started)
+BLOCKED = "exclusive_blocked"  # another IP holds the exclusive session
+BUSY = "busy"                  # another client holds this single-holder feature
+
+PRESENCE_ROOM = "presence"
+
+
+class _Client:
+    __slots__ = ("sid", "ip", "account", "namespace", "features")
+
+    def __init__(self, sid: str, ip: str, account: str, namespace: str):
+        self.sid = sid
+        self.ip = ip
+        self.account = account
+        self.namespace = namespace
+        self.features: set[str] = set()
+
+
+class Presence:
+    def __init__(self, socketio, namespace: str = "/audio"):
+        self._socketio = socketio
+        self._namespace = namespace  # where exclusive_status is sent
+        self._lock = threading.Lock()
+        self._clients: dict[str, _Client] = {}
+        self._by_ip: dict[str, set[str]] = {}          # ip -> sids (all namespaces)
+        self._by_feature: dict[str, set[str]] = {f: set() for f in FEATURES}
+        self._active_by_ip: dict[str, int] = {}        # ip -> features in use by its clients
+        self._holders: dict[str, str] = {}             # single-holder feature -> sid
+        self._counts: dict[str, int] = {}              # namespace -> clients
+        self._exclusive_ip: str | None = None
+
+    # --- clients ---
+
+    def connect(self, sid: str, ip: str, account: str, namespace: str):
+        """Register *sid*; a client on the status namespace also gets its exclusive_status."""
+        with self._lock:
+            self._clients[sid] = _Client(sid, ip, account, namespace)
+            self._by_ip.setdefault(ip, set()).add(sid)
+            self._counts[namespace] = self._counts.get(namespace, 0) + 1
+            if namespace == self._namespace:
+                self._socketio.server.enter_room(sid, PRESENCE_ROOM, namespace=namespace)
+                blocked = self._exclusive_ip is not None and ip != self._exclusive_ip
+                self._emit({"blocked": blocked}, to=sid)
+
+    def disconnect(self, sid: str) -> set[str]:
+        """Forget *sid*, stopping its features.  Returns the features it was using."""
+        with self._lock:
+            client = self._clients.pop(sid, None)
+            if client is None:
+                return set()
+            features = set(client.features)
+            for feature in features:
+                self._stop(client, feature)
+            sids = self._by_ip[client.ip]
+            sids.discard(sid)
+            if not sids:
+                del self._by_ip[client.ip]
+            self._counts[client.namespace] -= 1
+            return features
+
+    def ip(self, sid: str) -> str | None:
+        client = self._clients.get(sid)
+        return client.ip if client else None
+
+    def account(self, sid: str) -> str:
+        """Bandwidth account of *sid* (the shared token account if unknown)."""
+        client = self._clients.get(sid)
+        return client.account if client else bandwidth.TOKEN_KEY
+
+    def count(self, namespace: str) -> int:
+        return self._counts.get(namespace, 0)
+
+    # --- features ---
+
+    def start(self, sid: str, feature: str) -> str | None:
+        """Start *feature* for *sid*, claiming the exclusive session if it is free.
+
+        Returns None if it started (or was already in use by *sid*), BLOCKED
+        if another IP holds the session (or *sid* is unknown) and BUSY if
+        another client holds a single-holder feature.
+        """
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None:
+                return BLOCKED
+            if feature in client.features:
+                return None
+            if self._exclusive_ip is not None and self._exclusive_ip != client.ip:
+                return BLOCKED
+            if feature in SINGLE_HOLDER:
+                if self._holders.get(feature, sid) != sid:
+                    return BUSY
+                self._holders[feature] = sid
+            client.features.add(feature)
+            self._by_feature[feature].add(sid)
+            self._active_by_ip[client.ip] = self._active_by_ip.get(client.ip, 0) + 1
+            if self._exclusive_ip is None:
+                self._exclusive_ip = client.ip
+                logger.info("Exclusive: claimed by %s", client.ip)
+                self._emit({"blocked": True}, to=PRESENCE_ROOM, skip_sid=list(self._by_ip[client.ip]))
+            return None
+
+    def stop(self, sid: str, feature: str) -> bool:
+        """Stop *feature* for *sid*.  Returns False if it was not using it."""
+        with self._lock:
+            client = self._clients.get(sid)
+            if client is None or feature not in client.features:
+                return False
+            self._stop(client, feature)
+            return True
+
+    def blocked(self, sid: str) -> bool:
+        """Whether another IP holds the exclusive session (or *sid* is unknown)."""
+        client = self._clients.get(sid)
+        exclusive_ip = self._exclusive_ip
+        return client is None or (exclusive_ip is not None and exclusive_ip != client.ip)
+
+    def holder(self, feature: str) -> str | None:
+        """Sid holding a single-holder feature (lock-free: one dict read)."""
+        return self._holders.get(feature)
+
+    def users(self, feature: str) -> int:
+        return len(self._by_feature[feature])
+
+    def _stop(self, client: _Client, feature: str):
+        client.features.discard(feature)
+        self._by_feature[feature].discard(client.sid)
+        if self._holders.get(feature) == client.sid:
+            del self._holders[feature]
+        active = self._active_by_ip[client.ip] - 1
+        if active:
+            self._active_by_ip[client.ip] = active
+            return
+        del self._active_by_ip[client.ip]
+        if self._exclusive_ip == client.ip:
+            self._exclusive_ip = None
+            logger.info("Exclusive: released by %s", client.ip)
+            self._emit({"blocked": False}, to=PRESENCE_ROOM, skip_sid=list(self._by_ip[client.ip]))
+
+    def _emit(self, status: dict, **kwargs):
+        try:
+            self._socketio.emit("exclusive_status", status, namespace=self._namespace, **kwargs)
+        except Exception:
+            logger.exception("Exclusive: status emit failed")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "exclusive_ip": self._exclusive_ip,
+                "clients": dict(self._counts),
+                "features": {f: len(sids) for f, sids in self._by_feature.items()},
+            }
@@ -0,0 +1,331 @@
+"""Continuous recorder: rolling fragmented-MP4 segments from the live encoder.
+
+Packets are copied straight from LiveEncoder into one fragment per GOP, so
+recording costs disk writes only.  Each finished segment gets a JSON sidecar
+holding its time index (fragment start time -> byte offset); the oldest
+segments are deleted to stay within RECORDING_MAX_BYTES and the retention
+period.
+
+A write error (disk full, permissions) ends the current segment only: it is
+closed as it is, keeping the fragments already written, and recording
+resumes with a new segment at a keyframe after RECORDING_RETRY_SECONDS,
+doubling up to RECORDING_RETRY_MAX_SECONDS while the errors continue.
+"""
+
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from . import config
+from . import fmp4
+
+logger = logging.getLogger(__name__)
+
+
+def _sidecar_path(mp4_path: str) -> str:
+    return os.path.splitext(mp4_path)[0] + ".json"
+
+
+class Recorder:
+    def __init__(self, encoder):
+        self._encoder = encoder
+        self._listener = None
+        self._running = False
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._segments: list[dict] = []   # finished segments, oldest first
+        self._current: dict | None = None  # segment being written
+        self._writer: fmp4.FileWriter | None = None
+        self._track: fmp4.VideoTrack | None = None
+        self._base_pts = 0
+        self._gop: list = []
+        self._failures = 0
+        self._retry_at = 0.0  # monotonic time before which no segment is opened
+
+    # ── Lifecycle ──
+
+    def start(self):
+        if self._running:
+            return
+        os.makedirs(config.RECORDING_DIR, exist_ok=True)
+        self._load_index()
+        self._listener = self._encoder.add_listener()
+        self._running = True
+        self._thread = threading.Thread(target=self._record_loop, name="recorder", daemon=True)
+        self._thread.start()
+        logger.info("Recorder: started (%d segments on disk)", len(self._segments))
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._listener:
+            self._encoder.remove_listener(self._listener)
+            self._listener = None
+        logger.info("Recorder: stopped")
+
+    def _record_loop(self):
+        while self._running:
+            packet = self._listener.get(timeout=0.5)
+            if packet is None:
+                continue
+            try:
+                if packet.is_keyframe and self._gop:
+                    self._flush_gop(next_pts=packet.pts)
+                    if self._should_roll(packet):
+                        self._close_segment()
+                if self._writer is None:
+                    if not packet.is_keyframe or time.monotonic() < self._retry_at:
+                        continue
+                    self._open_segment(packet)
+                self._gop.append(packet)
+            except Exception:
+                self._write_failed()
+        try:
+            if self._gop:
+                self._flush_gop(next_pts=None)
+        except Exception:
+            self._write_failed()
+        self._close_segment()
+
+    def _write_failed(self):
+        """Give up on the current segment and wait before opening the next one."""
+        self._failures += 1
+        delay = min(config.RECORDING_RETRY_SECONDS * 2 ** (self._failures - 1),
+                    config.RECORDING_RETRY_MAX_SECONDS)
+        self._retry_at = time.monotonic() + delay
+        logger.exception("Recorder: write failed (attempt %d), new segment in %d s",
+                         self._failures, delay)
+        self._gop = []
+        self._abort_segment()
+
+    # ── Segments ──
+
+    def _should_roll(self, packet) -> bool:
+        if self._writer is None:
+            return False
+        if packet.params != self._track.params:
+            return True
+        return packet.wallclock - self._current["start"] >= config.RECORDING_SEGMENT_SECONDS
+
+    def _open_segment(self, packet):
+        started = datetime.fromtimestamp(packet.wallclock)
+        day = started.strftime("%Y-%m-%d")
+        day_dir = os.path.join(config.RECORDING_DIR, day)
+        os.makedirs(day_dir, exist_ok=True)
+        filename = started.strftime("rec_%Y%m%d_%H%M%S.mp4")
+        path = os.path.join(day_dir, filename)
+        self._track = fmp4.VideoTrack(packet.params)
+        try:
+            self._writer = fmp4.FileWriter(path, [self._track])
+        except OSError:
+            self._track = None
+            try:
+                os.remove(path)  # a partial init segment
+            except OSError:
+                pass
+            raise
+        self._base_pts = packet.pts
+        with self._lock:
+            self._current = {
+                "day": day,
+                "filename": filename,
+                "start": packet.wallclock,
+                "end": packet.wallclock,
+                "width": packet.params.width,
+                "height": packet.params.height,
+                "codec": packet.params.codec_string,
+                "init_size": self._writer.init_size,
+                "size": self._writer.size,
+                "fragments": [],
+            }
+        logger.info("Recorder: segment opened %s/%s", day, filename)
+
+    def _flush_gop(self, next_pts: int | None):
+        gop, self._gop = self._gop, []
+        nominal = 90000 // max(1, self._encoder.fps)
+        samples = []
+        for i, packet in enumerate(gop):
+            if i + 1 < len(gop):
+                duration = gop[i + 1].pts - packet.pts
+            elif next_pts is not None and 0 < next_pts - packet.pts <= 2 * nominal:
+                duration = next_pts - packet.pts
+            else:
+                duration = nominal
+            samples.append(fmp4.Sample(fmp4.annexb_to_sample(packet.data), duration,
+                                       packet.is_keyframe))
+        base_time = gop[0].pts - self._base_pts
+        offset = self._writer.write_fragment([(self._track, base_time, samples)])
+        with self._lock:
+            seg = self._current
+            seg["fragments"].append([round(gop[0].wallclock - seg["start"], 3), offset])
+            seg["end"] = gop[-1].wallclock + samples[-1].duration / 90000
+            seg["size"] = self._writer.size
+        self._failures = 0
+
+    def _close_segment(self):
+        if self._writer is None:
+            return
+        with self._lock:
+            seg = self._current
+            duration_ms = int((seg["end"] - seg["start"]) * 1000)
+        try:
+            seg["size"] = self._writer.close(duration_ms)
+            tmp = _sidecar_path(self._writer.path) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(seg, f)
+            os.replace(tmp, _sidecar_path(self._writer.path))
+        except OSError:
+            logger.exception("Recorder: failed to finalize %s", seg["filename"])
+        with self._lock:
+            self._segments.append(seg)
+            self._current = None
+        self._writer = None
+        self._track = None
+        logger.info("Recorder: segment closed %s (%.0fs, %d bytes)",
+                    seg["filename"], seg["end"] - seg["start"], seg["size"])
+        self._enforce_limits()
+
+    def _abort_segment(self):
+        """Close the segment after a write error, keeping its whole fragments."""
+        if self._writer is None:
+            return
+        self._writer.abort()
+        path = self._writer.path
+        with self._lock:
+            seg, self._current = self._current, None
+        self._writer = None
+        self._track = None
+        if not seg["fragments"]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return
+        try:
+            os.truncate(path, seg["size"])  # drop a partly written fragment
+            with open(_sidecar_path(path), "w", encoding="utf-8") as f:
+                json.dump(seg, f)
+        except OSError:
+            pass  # rebuilt from the file at the next start if still missing
+        with self._lock:
+            self._segments.append(seg)
+        logger.warning("Recorder: segment %s ended early (%.0fs)",
+                       seg["filename"], seg["end"] - seg["start"])
+
+    def _enforce_limits(self):
+        """Delete the oldest segments beyond the size quota or retention period."""
+        cutoff = time.time() - config.RECORDING_RETENTION_DAYS * 24 * 60 * 60
+        with self._lock:
+            used = sum(s["size"] for s in self._segments)
+            if self._current:
+                used += self._current["size"]
+            expired = []
+            while self._segments and (used > config.RECORDING_MAX_BYTES
+                                      or self._segments[0]["end"] < cutoff):
+                seg = self._segments.pop(0)
+                used -= seg["size"]
+                expired.append(seg)
+        for seg in expired:
+            path = self.segment_path(seg)
+            logger.info("Recorder: deleting oldest %s/%s (FIFO)", seg["day"], seg["filename"])
+            for p in (path, _sidecar_path(path)):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # e.g. still memory-mapped by a playback request on Windows
+                    logger.warning("Recorder: could not delete %s", p)
+            try:
+                os.rmdir(os.path.dirname(path))  # only succeeds once the day is empty
+            except OSError:
+                pass
+
+    # ── Index ──
+
+    def _load_index(self):
+        segments = []
+        for path in sorted(glob.glob(os.path.join(config.RECORDING_DIR, "*", "rec_*.mp4"))):
+            sidecar = _sidecar_path(path)
+            try:
+                with open(sidecar, encoding="utf-8") as f:
+                    segments.append(json.load(f))
+                continue
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError):
+                logger.warning("Recorder: unreadable index %s, rebuilding", sidecar)
+            seg = self._recover_segment(path)
+            if seg:
+                segments.append(seg)
+        with self._lock:
+            self._segments = segments
+        self._enforce_limits()
+
+    @staticmethod
+    def _recover_segment(path: str) -> dict | None:
+        """Rebuild the index of a segment left unfinished by a crash."""
+        filename = os.path.basename(path)
+        try:
+            start = datetime.strptime(filename, "rec_%Y%m%d_%H%M%S.mp4").timestamp()
+            fragments, init_size = [], 0
+            with open(path, "rb") as f:
+                for kind, offset, size in fmp4.iter_boxes(f):
+                    if kind == b"moov":
+                        init_size = offset + size
+                    elif kind == b"moof":
+                        f.seek(offset)
+                        tfdt = fmp4.read_tfdt(f.read(size))
+                        if tfdt is not None:
+                            fragments.append([round(tfdt / 90000, 3), offset])
+                size = f.seek(0, os.SEEK_END)
+        except (OSError, ValueError):
+            logger.exception("Recorder: cannot recover %s", path)
+            return None
+        if not fragments:
+            return None
+        seg = {
+            "day": os.path.basename(os.path.dirname(path)),
+            "filename": filename,
+            "start": start,
+            "end": start + fragments[-1][0] + config.LIVE_ENCODER_GOP_SECONDS,
+            "init_size": init_size,
+            "size": size,
+            "fragments": fragments,
+            "recovered": True,
+        }
+        with open(_sidecar_path(path), "w", encoding="utf-8") as f:
+            json.dump(seg, f)
+        logger.info("Recorder: recovered index for %s (%d fragments)", filename, len(fragments))
+        return seg
+
+    @staticmethod
+    def segment_path(seg: dict) -> str:
+        return os.path.join(config.RECORDING_DIR, seg["day"], seg["filename"])
+
+    def segments(self) -> list[dict]:
+        """Return all segments (finished and in progress), oldest first."""
+        with self._lock:
+            result = [dict(s) for s in self._segments]
+            if self._current:
+                result.append(dict(self._current, in_progress=True,
+                                   fragments=list(self._current["fragments"])))
+        return result
+
+    @property
+    def storage_used_bytes(self) -> int:
+        with self._lock:
+            used = sum(s["size"] for s in self._segments)
+            if self._current:
+                used += self._current["size"]
+        return used
+
+    @property
+    def is_active(self) -> bool:
+        return self._running and self._writer is not None
@@ -0,0 +1,112 @@
+"""HTTP / Socket.IO serving mode.
+
+SERVER_MODE picks the server ``main()`` runs:
+
+  * "threading": Werkzeug's development server, one OS thread per
+    connection (the default with PET_CAMERA_ENV=development)
+  * "gevent": gevent's event-driven WSGI server with native WebSocket
+    (simple-websocket), one greenlet per connection (the production default)
+
+The Flask routes and Socket.IO handlers are the same in both.  In gevent
+mode the standard library is NOT monkey-patched: the camera, audio, encoder
+and WebRTC subsystems keep their OS threads (they block in C calls that
+would stall the event loop), and only the server runs on the gevent hub.
+Two things bridge the two worlds:
+
+  * emits from subsystem threads: each Engine.IO socket's outgoing queue is
+    a HubQueue, whose put() from another thread is handed to the hub with
+    ``run_callback_threadsafe`` instead of touching gevent state directly
+  * handlers that wait on a subsystem thread or a device (WebRTC
+    negotiation and talker changes, MJPEG frames, LL-HLS playlist reloads
+    and the hinted part / segment requests, camera settings, switching and
+    enumeration, snapshot JPEG encoding) go through ``blocking()`` /
+    ``iterate()``, which run the wait on the hub's threadpool
+    (SERVER_THREADPOOL_SIZE threads) so other connections keep going.
+    Everything else they call only takes a subsystem's lock briefly.
+
+If gevent is not installed the threading mode is used, with a warning.
+"""
+
+import logging
+import threading
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve(mode: str) -> str:
+    if mode not in ("gevent", "threading"):
+        logger.warning("Server: unknown PET_CAMERA_SERVER %r, using threading", mode)
+        return "threading"
+    if mode == "gevent":
+        try:
+            import gevent  # noqa: F401
+        except ImportError:
+            logger.warning("Server: gevent is not installed, using the threading (Werkzeug) server")
+            return "threading"
+    return mode
+
+
+MODE = _resolve(config.SERVER_MODE)
+
+if MODE == "gevent":
+    import gevent
+    from gevent.queue import JoinableQueue
+
+    class HubQueue(JoinableQueue):
+        """Engine.IO outgoing queue that subsystem threads may put() into."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._hub = gevent.get_hub()
+            self._owner = threading.get_ident()
+
+        def put(self, item, block=True, timeout=None):
+            if threading.get_ident() == self._owner:
+                super().put(item, block, timeout)
+            else:
+                # Unbounded, so the put never waits; run it on the hub's thread
+                self._hub.loop.run_callback_threadsafe(super().put, item)
+
+
+def install(socketio):
+    """Adapt the Socket.IO server to MODE (call once, before serving)."""
+    if MODE == "gevent":
+        socketio.server.eio.create_queue = HubQueue
+        gevent.get_hub().threadpool.maxsize = config.SERVER_THREADPOOL_SIZE
+
+
+def blocking(fn, *args, **kwargs):
+    """Call *fn*, which may wait on another thread, without stalling other connections."""
+    if MODE == "gevent":
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
+
+
+_END = object()
+
+
+def iterate(gen):
+    """Stream *gen*, whose next() may wait on another thread (see ``blocking``)."""
+    if MODE != "gevent":
+        yield from gen
+        return
+    try:
+        while True:
+            item = blocking(next, gen, _END)
+            if item is _END:
+                return
+            yield item
+    finally:
+        gen.close()
+
+
+def run(app, socketio, host: str, port: int, ssl_ctx: tuple[str, str] | None):
+    """Serve until interrupted."""
+    logger.info("Server: %s mode", MODE)
+    if MODE == "gevent":
+        tls = {"certfile": ssl_ctx[0], "keyfile": ssl_ctx[1]} if ssl_ctx else {}
+        socketio.run(app, host=host, port=port, **tls)
+    else:
+        socketio.run(app, host=host, port=port, ssl_context=ssl_ctx, allow_unsafe_werkzeug=True)
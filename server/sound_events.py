@@ -0,0 +1,254 @@
+"""Sound events from the microphone: barking, whining and sustained loud noise.
+
+A dedicated thread reads the capture ring like any other listener, so the
+PortAudio callback never does more than it already did.  Audio is analysed
+in Hann-windowed FFT frames of SOUND_FFT_SIZE samples with 50% overlap (all
+frames of a chunk in one numpy call).  Per frame:
+
+  * level: RMS in dBFS
+  * band shares: fraction of the energy in BANDS (one matrix product)
+  * flatness: spectral flatness of the mid band (low = tonal, e.g. a whine)
+
+A *burst* starts when a frame is SOUND_ONSET_DB above the running background
+level (and at least at the VAD's AUDIO_VAD_OPEN_DBFS) and ends when it falls
+back below that (with 6 dB of hysteresis).  A burst is classified as:
+
+  * "bark":  at most SOUND_BARK_MAX_MS long, loud enough, mostly mid band
+  * "whine": tonal for at least SOUND_WHINE_MIN_MS
+  * "noise": broadband and above SOUND_NOISE_MIN_DBFS for SOUND_NOISE_MIN_MS
+
+Each type is reported at most once per SOUND_EVENT_COOLDOWN_SECONDS of audio
+(the rest are only counted) to the callback set with ``set_on_event``.
+Chunks the capture's voice-activity gate marks as silent cannot hold any of
+these, so outside a burst they skip the FFT and only feed the background.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ("bark", "whine", "noise")
+BANDS = {"low": (50, 300), "mid": (300, 3000), "high": (3000, 8000)}  # Hz
+FLOOR_DBFS = -96.0
+RELEASE_DB = 6.0            # a burst ends this far below its onset threshold
+BACKGROUND_ALPHA = 0.02     # per frame (~1.6 s time constant at 32 ms hops)
+MAX_BURST_SECONDS = 10      # longer = a new steady background (fan, TV), re-learned
+
+
+def _dbfs(power):
+    return np.maximum(FLOOR_DBFS, 10 * np.log10(np.maximum(power, 1e-12) / 32768.0 ** 2))
+
+
+class _Burst:
+    def __init__(self, frame: int):
+        self.start = frame
+        self.frames = 0
+        self.peak_dbfs = FLOOR_DBFS
+        self.peak_hz = 0
+        self.mid_share = 0.0   # running sum, divided by frames
+        self.tonal = 0         # frames below SOUND_WHINE_MAX_FLATNESS
+        self.level_sum = 0.0
+        self.reported: set[str] = set()
+
+
+class SoundEventDetector:
+    def __init__(self, audio_capture=None, rate: int = config.AUDIO_SAMPLE_RATE):
+        self._capture = audio_capture
+        self._rate = rate
+        self._size = config.SOUND_FFT_SIZE
+        self._hop = self._size // 2
+        self._window = np.hanning(self._size).astype(np.float32)
+        freqs = np.fft.rfftfreq(self._size, 1 / rate)
+        # (bins, bands) 0/1 matrix: band energies of every frame in one product
+        self._band_matrix = np.stack([(freqs >= lo) & (freqs < hi) for lo, hi in BANDS.values()],
+                                     axis=1).astype(np.float32)
+        self._mid = list(BANDS).index("mid")
+        self._mid_bins = self._band_matrix[:, self._mid].astype(bool)
+        self._mid_freqs = freqs[self._mid_bins]
+        self._hop_ms = self._hop * 1000 / rate
+
+        self._tail = np.zeros(self._size - self._hop, dtype=np.float32)
+        self._frame = 0
+        self._background: float | None = None
+        self._burst: _Burst | None = None
+        self._last_emit = dict.fromkeys(EVENT_TYPES, float("-inf"))
+        self._counts = dict.fromkeys(EVENT_TYPES, 0)
+        self._last_event: dict | None = None
+        self._busy_seconds = 0.0
+        self._audio_seconds = 0.0
+
+        self._on_event = None
+        self._running = False
+        self._thread: threading.Thread | None = None
+
+    def set_on_event(self, callback):
+        """Register ``callback(event)`` called from the detector thread for each reported event."""
+        self._on_event = callback
+
+    def start(self):
+        if self._running or self._capture is None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="sound-events", daemon=True)
+        self._thread.start()
+        logger.info("SoundEvents: started")
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    @property
+    def is_active(self) -> bool:
+        return self._running
+
+    def stats(self) -> dict:
+        audio = self._audio_seconds
+        return {
+            "running": self._running,
+            "counts": dict(self._counts),
+            "last": self._last_event,
+            "cpu_percent": round(self._busy_seconds / audio * 100, 3) if audio else 0.0,
+        }
+
+    def _run(self):
+        reader = self._capture.add_listener()
+        try:
+            while self._running:
+                item = reader.read(timeout=0.5)
+                if item is None:
+                    continue
+                pcm, missed = item
+                if missed:
+                    self.reset()  # don't join analysis windows across the gap
+                for event in self.feed(np.frombuffer(pcm, dtype=np.int16), reader.voiced):
+                    self._dispatch(event)
+        except Exception:
+            logger.exception("SoundEvents: stopped on error")
+            self._running = False
+        finally:
+            self._capture.remove_listener(reader)
+
+    def _dispatch(self, event: dict):
+        logger.info("SoundEvents: %s (%.1f dBFS, %d ms)", event["type"], event["level_dbfs"],
+                    event["duration_ms"])
+        if self._on_event:
+            try:
+                self._on_event(event)
+            except Exception:
+                logger.exception("SoundEvents: on_event callback failed")
+
+    def reset(self):
+        """Forget the analysis window and any burst in progress (keeps the background)."""
+        self._tail[:] = 0
+        self._burst = None
+
+    def feed(self, samples: np.ndarray, voiced: bool = True) -> list[dict]:
+        """Analyse the next chunk of int16 samples; returns the events to report."""
+        began = time.perf_counter()
+        buf = np.concatenate([self._tail, samples.reshape(-1).astype(np.float32)])
+        count = (len(buf) - self._size) // self._hop + 1 if len(buf) >= self._size else 0
+        self._tail = buf[count * self._hop:]
+        self._audio_seconds += len(samples) / self._rate
+        if count == 0:
+            return []
+
+        frames = np.lib.stride_tricks.sliding_window_view(buf, self._size)[::self._hop][:count]
+        levels = _dbfs(np.einsum("ij,ij->i", frames, frames) / self._size)
+        events = []
+        if not voiced and self._burst is None:
+            for level in levels:
+                self._track_background(float(level))
+                self._frame += 1
+        else:
+            spectrum = np.fft.rfft(frames * self._window, axis=1)
+            power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+            bands = power @ self._band_matrix
+            shares = bands / np.maximum(bands.sum(axis=1, keepdims=True), 1e-12)
+            mid = power[:, self._mid_bins] + 1e-12
+            flatness = np.exp(np.log(mid).mean(axis=1)) / mid.mean(axis=1)
+            peaks = self._mid_freqs[mid.argmax(axis=1)]
+            for i in range(count):
+                events.extend(self._step(float(levels[i]), float(shares[i, self._mid]),
+                                         float(flatness[i]), float(peaks[i])))
+        self._busy_seconds += time.perf_counter() - began
+        return events
+
+    def _track_background(self, level: float):
+        if self._background is None:
+            self._background = level
+        self._background += BACKGROUND_ALPHA * (level - self._background)
+
+    def _step(self, level: float, mid_share: float, flatness: float, peak_hz: float) -> list[dict]:
+        """Advance the burst state machine by one frame."""
+        self._frame += 1
+        if self._background is None:
+            self._background = level
+        onset = max(self._background + config.SOUND_ONSET_DB, config.AUDIO_VAD_OPEN_DBFS)
+        burst = self._burst
+        if burst is None:
+            if level < onset:
+                self._track_background(level)
+                return []
+            burst = self._burst = _Burst(self._frame)
+        elif level < onset - RELEASE_DB:
+            self._burst = None
+            return self._classify_end(burst)
+
+        burst.frames += 1
+        burst.mid_share += mid_share
+        burst.level_sum += level
+        if flatness < config.SOUND_WHINE_MAX_FLATNESS:
+            burst.tonal += 1
+        if level > burst.peak_dbfs:
+            burst.peak_dbfs, burst.peak_hz = level, peak_hz
+        events = self._classify_sustained(burst)
+        if burst.frames * self._hop_ms >= MAX_BURST_SECONDS * 1000:
+            self._burst = None
+            self._background = level
+        return events
+
+    def _classify_sustained(self, burst: _Burst) -> list[dict]:
+        duration = burst.frames * self._hop_ms
+        if ("whine" not in burst.reported and duration >= config.SOUND_WHINE_MIN_MS
+                and burst.tonal >= 0.6 * burst.frames):
+            burst.reported.add("whine")
+            return self._report("whine", burst)
+        if ("noise" not in burst.reported and duration >= config.SOUND_NOISE_MIN_MS
+                and burst.level_sum / burst.frames >= config.SOUND_NOISE_MIN_DBFS
+                and burst.tonal < 0.6 * burst.frames):
+            burst.reported.add("noise")
+            return self._report("noise", burst)
+        return []
+
+    def _classify_end(self, burst: _Burst) -> list[dict]:
+        duration = burst.frames * self._hop_ms
+        if (duration <= config.SOUND_BARK_MAX_MS
+                and burst.peak_dbfs >= config.SOUND_BARK_MIN_DBFS
+                and burst.mid_share / burst.frames >= config.SOUND_BARK_MID_SHARE):
+            return self._report("bark", burst)
+        return []
+
+    def _report(self, kind: str, burst: _Burst) -> list[dict]:
+        self._counts[kind] += 1
+        now = self._frame * self._hop_ms / 1000  # audio time, so replays behave the same
+        if now - self._last_emit[kind] < config.SOUND_EVENT_COOLDOWN_SECONDS:
+            return []
+        self._last_emit[kind] = now
+        event = {
+            "type": kind,
+            "time": datetime.now(timezone.utc).isoformat(),
+            "level_dbfs": round(burst.peak_dbfs, 1),
+            "duration_ms": int(burst.frames * self._hop_ms),
+            "peak_hz": int(burst.peak_hz),
+        }
+        self._last_event = event
+        return [event]
@@ -0,0 +1,302 @@
+"""Out-of-process H.264 encoder for WebRTC.
+
+In the default (in-process) mode aiortc encodes every peer's video itself,
+in executor threads that share the GIL with the asyncio loop, Flask and the
+capture thread.  With WEBRTC_ENCODER_MODE = "process" the camera frame is
+instead copied into shared memory and encoded once by a worker process; the
+encoded access unit comes back over a pipe and is handed to aiortc as an
+``av.Packet``, which every peer's RTCRtpSender only packetizes.
+
+Only one frame is in flight at a time, so a single shared-memory slot is
+enough.  If the worker dies, EncodedVideoTrack returns raw frames and aiortc
+encodes them in-process until the worker has been restarted.
+"""
+
+import asyncio
+import fractions
+import logging
+import multiprocessing
+import threading
+import time
+from multiprocessing import shared_memory
+
+import av
+import numpy as np
+from aiortc import MediaStreamTrack
+from av import VideoFrame
+
+from . import config
+from .encoder_profiles import x264_options
+
+logger = logging.getLogger(__name__)
+
+TIME_BASE = fractions.Fraction(1, 90000)
+
+
+# ─── Worker process ──────────────────────────────────────────────────────
+
+
+def _worker_main(conn):
+    """Encode loop run in the child process.
+
+    Messages from the parent:
+        ("open", shm_name, width, height, fps, profile)
+        ("encode", pts, force_keyframe)
+        ("close",)
+    Replies:
+        ("packet", pts, data, is_keyframe, encode_seconds)
+    """
+    shm = None
+    view = None
+    codec = None
+    try:
+        while True:
+            msg = conn.recv()
+            if msg[0] == "open":
+                _, shm_name, width, height, fps, profile = msg
+                if shm is not None:
+                    shm.close()
+                shm = _attach_shm(shm_name)
+                view = np.ndarray((height, width, 3), dtype=np.uint8, buffer=shm.buf)
+                codec = av.CodecContext.create("libx264", "w")
+                codec.width = width
+                codec.height = height
+                codec.pix_fmt = "yuv420p"
+                codec.time_base = TIME_BASE
+                codec.framerate = fractions.Fraction(fps, 1)
+                codec.gop_size = max(1, int(fps * profile["gop_seconds"]))
+                codec.bit_rate = profile["bitrate"]
+                # Same profile aiortc's own H264Encoder negotiates
+                codec.profile = "Baseline"
+                codec.options = x264_options(profile, config.WEBRTC_ENCODER_PRESET)
+                conn.send(("opened",))
+            elif msg[0] == "encode":
+                _, pts, force_keyframe = msg
+                started = time.perf_counter()
+                frame = VideoFrame.from_ndarray(view, format="bgr24")
+                frame.pts = pts
+                frame.time_base = TIME_BASE
+                if force_keyframe:
+                    frame.pict_type = av.video.frame.PictureType.I
+                packets = codec.encode(frame)
+                data = b"".join(bytes(p) for p in packets)
+                is_keyframe = any(p.is_keyframe for p in packets)
+                conn.send(("packet", pts, data, is_keyframe, time.perf_counter() - started))
+            elif msg[0] == "close":
+                return
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        view = None
+        if shm is not None:
+            shm.close()
+
+
+def _attach_shm(name: str) -> shared_memory.SharedMemory:
+    try:
+        # The parent owns (and unlinks) the segment; don't track it here too
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+
+class EncoderProcess:
+    """Parent-side handle of one encoder worker."""
+
+    def __init__(self):
+        self._ctx = multiprocessing.get_context("spawn")  # same behaviour on Windows
+        self._proc = None
+        self._conn = None
+        self._shm: shared_memory.SharedMemory | None = None
+        self._view: np.ndarray | None = None
+        self._config: tuple | None = None
+        self._reader: threading.Thread | None = None
+        self._pending: asyncio.Future | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.encode_seconds = 0.0
+
+    @property
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.is_alive()
+
+    def start(self):
+        parent, child = self._ctx.Pipe()
+        self._proc = self._ctx.Process(target=_worker_main, args=(child,),
+                                       name="webrtc-encoder", daemon=True)
+        self._proc.start()
+        child.close()
+        self._conn = parent
+        self._config = None
+        self._reader = threading.Thread(target=self._read_loop, args=(parent,),
+                                        name="webrtc-encoder-reader", daemon=True)
+        self._reader.start()
+        logger.info("VideoEncoder: worker process started (pid=%d)", self._proc.pid)
+
+    def stop(self):
+        if self._conn is not None:
+            try:
+                self._conn.send(("close",))
+            except (OSError, ValueError):
+                pass
+        if self._proc is not None:
+            self._proc.join(timeout=2)
+            if self._proc.is_alive():
+                self._proc.terminate()
+            self._proc = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        self._release_shm()
+        self._config = None
+
+    def _release_shm(self):
+        self._view = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def _read_loop(self, conn):
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                msg = None
+            future, loop = self._pending, self._loop
+            if future is not None and loop is not None:
+                loop.call_soon_threadsafe(_resolve, future, msg)
+            if msg is None:
+                return
+
+    async def encode(self, raw: np.ndarray, pts: int, fps: int, profile: dict,
+                     force_keyframe: bool) -> tuple[bytes, bool] | None:
+        """Encode one bgr24 frame; returns (annexb, is_keyframe) or None on failure."""
+        height, width = raw.shape[:2]
+        wanted = (width, height, fps, profile)
+        if self._config != wanted:
+            if not await self._open(*wanted):
+                return None
+            force_keyframe = True
+        np.copyto(self._view, raw)
+        reply = await self._request(("encode", pts, force_keyframe))
+        if reply is None or reply[0] != "packet":
+            return None
+        _, _, data, is_keyframe, seconds = reply
+        self.encode_seconds = seconds
+        return data, is_keyframe
+
+    async def _open(self, width: int, height: int, fps: int, profile: dict) -> bool:
+        old = self._shm
+        self._shm = shared_memory.SharedMemory(create=True, size=width * height * 3)
+        self._view = np.ndarray((height, width, 3), dtype=np.uint8, buffer=self._shm.buf)
+        reply = await self._request(("open", self._shm.name, width, height, fps, profile))
+        if old is not None:
+            old.close()
+            old.unlink()  # the worker has switched to the new segment
+        if reply is None:
+            return False
+        self._config = (width, height, fps, profile)
+        logger.info("VideoEncoder: %dx%d@%dfps, %d kbps", width, height, fps,
+                    profile["bitrate"] // 1000)
+        return True
+
+    async def _request(self, msg: tuple, timeout: float = 2.0):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._loop, self._pending = loop, future
+        try:
+            self._conn.send(msg)
+            return await asyncio.wait_for(future, timeout)
+        except (OSError, ValueError):
+            return None
+        except asyncio.TimeoutError:
+            # A late reply would be mistaken for the next one: kill the worker
+            # and let EncodedVideoTrack restart it.
+            logger.warning("VideoEncoder: worker did not answer %s, terminating", msg[0])
+            if self._proc is not None:
+                self._proc.terminate()
+            return None
+        finally:
+            self._pending = None
+
+
+def _resolve(future: asyncio.Future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+# ─── Track ───────────────────────────────────────────────────────────────
+
+
+class EncodedVideoTrack(MediaStreamTrack):
+    """Camera -> pre-encoded H.264 track for the process encoder mode.
+
+    Shared by all peers through MediaRelay, so each frame is encoded once no
+    matter how many viewers there are.  Peers' keyframe requests (PLI/FIR)
+    are forwarded through ``request_keyframe()``.
+    """
+
+    kind = "video"
+
+    def __init__(self, camera, fps: int = 10, profile: dict | None = None):
+        super().__init__()
+        self._camera = camera
+        self._fps = fps
+        self._profile = profile or config.WEBRTC_PROFILES[config.WEBRTC_PROFILE]
+        self._start: float | None = None
+        self._count = 0
+        self._encoder = EncoderProcess()
+        self._encoder.start()
+        self._force_keyframe = True
+        self._restart_at = 0.0
+
+    def request_keyframe(self):
+        self._force_keyframe = True
+
+    def resume_from(self, other):
+        """Continue *other*'s pacing and timestamps (source hand-over)."""
+        self._start, self._count = other._start, other._count
+
+    async def recv(self) -> av.Packet | VideoFrame:
+        if self._start is None:
+            self._start = time.time()
+
+        target_time = self._count / self._fps
+        wait = target_time - (time.time() - self._start)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        raw = self._camera.get_frame_raw()
+        if raw is None:
+            await asyncio.sleep(1)
+            raw = np.zeros((720, 1280, 3), dtype=np.uint8)
+
+        pts = int(self._count * 90000 / self._fps)
+        self._count += 1
+
+        if not self._encoder.alive and time.time() >= self._restart_at:
+            logger.warning("VideoEncoder: worker not running, restarting")
+            self._encoder.stop()
+            self._encoder.start()
+            self._restart_at = time.time() + 5
+        if self._encoder.alive:
+            force, self._force_keyframe = self._force_keyframe, False
+            result = await self._encoder.encode(raw, pts, self._fps, self._profile, force)
+            if result is not None:
+                packet = av.Packet(result[0])
+                packet.pts = pts
+                packet.time_base = TIME_BASE
+                return packet
+            self._force_keyframe = True
+
+        # Worker unavailable: let aiortc encode this frame in-process
+        frame = VideoFrame.from_ndarray(raw, format="bgr24")
+        frame.pts = pts
+        frame.time_base = TIME_BASE
+        return frame
+
+    def stop(self):
+        super().stop()
+        # Joining the worker can take a moment; keep it off the event loop
+        threading.Thread(target=self._encoder.stop, name="webrtc-encoder-stop",
+                         daemon=True).start()
@@ -0,0 +1,243 @@
+"""Owner-to-display video forwarding over WebRTC (no decode, no re-encode).
+
+The owner's phone publishes its camera as a WebRTC video track, encoded by
+the phone's own (usually hardware) H.264 / VP8 encoder.  aiortc normally
+hands each complete frame from an RTCRtpReceiver to a decoder thread; for the
+publisher that queue is replaced by a ForwardQueue, which passes the still
+encoded frame (an H.264 Annex B access unit or a VP8 frame) to the
+VideoForwarder instead.  Every display peer has a ForwardedTrack whose
+``recv()`` returns the frame as an ``av.Packet``, so its RTCRtpSender only
+packetizes it, as with EncodedVideoTrack.  All of this runs in the webrtc
+event loop.
+
+Keyframes: a display joining, or losing packets it cannot recover by NACK,
+asks for a keyframe (PLI); the request is passed on to the publisher as a
+PLI of its own, at most once per VIDEO_FORWARD_PLI_INTERVAL seconds.  A
+display only starts (or, after its queue overflowed, restarts) at a
+keyframe, so it never shows a half-decoded picture.
+
+Displays keep their peer connection when the owner stops and starts again.
+Each publisher's RTP timestamps start at a random 32-bit origin, so they are
+rebased on its first frame (unwrapping at 2^32) and continue just after the
+previous publisher's last frame: display pts never jump or go backwards.  A
+display that negotiated another
+codec than the publisher's gets nothing (logged); both use WEBRTC_CODECS.
+"""
+
+import asyncio
+import fractions
+import functools
+import logging
+import queue
+import time
+
+import av
+from aiortc import MediaStreamTrack
+from aiortc.mediastreams import MediaStreamError
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+TIME_BASE = fractions.Fraction(1, 90000)
+
+
+def receiver_supported(receiver) -> bool:
+    """Whether *receiver* has the aiortc internals that forwarding replaces or calls.
+
+    These are private (tested with the aiortc version pinned in
+    requirements.txt), so webrtc probes them once at startup.
+    """
+    return (isinstance(getattr(receiver, "_RTCRtpReceiver__decoder_queue", None), queue.Queue)
+            and callable(getattr(receiver, "_send_rtcp_pli", None)))
+
+
+def is_keyframe(mime_type: str, data: bytes) -> bool:
+    """Whether an encoded frame can be decoded on its own."""
+    if mime_type.lower() == "video/vp8":
+        return bool(data) and not data[0] & 0x01
+    # H.264 Annex B: an IDR slice (type 5) or the SPS (7) sent ahead of one
+    i = data.find(b"\x00\x00\x01")
+    while i != -1 and i + 3 < len(data):
+        if (data[i + 3] & 0x1F) in (5, 7):
+            return True
+        i = data.find(b"\x00\x00\x01", i + 3)
+    return False
+
+
+class ForwardQueue(queue.Queue):
+    """Stands in for an RTCRtpReceiver's decoder queue.
+
+    aiortc puts ``(codec, frame)`` for every complete frame, which goes to
+    *forward* instead; the None put when the receiver stops still reaches the
+    (idle) decoder thread so that it exits.
+    """
+
+    def __init__(self, forward):
+        super().__init__()
+        self._forward = forward
+
+    def put(self, item, block=True, timeout=None):
+        if item is None:
+            super().put(item, block, timeout)
+        else:
+            self._forward(*item)
+
+
+class ForwardedTrack(MediaStreamTrack):
+    """One display's copy of the published video, as pre-encoded packets."""
+
+    kind = "video"
+
+    def __init__(self, forwarder: "VideoForwarder", pc_id: str):
+        super().__init__()
+        self._forwarder = forwarder
+        self.pc_id = pc_id
+        self.mime_type: str | None = None  # negotiated codec, set after the answer
+        self.waiting_keyframe = True
+        self.forwarded = 0
+        self.skipped = 0
+        self._packets: asyncio.Queue = asyncio.Queue()
+        self._mismatch_logged = False
+
+    def push(self, mime_type: str, data: bytes, pts: int, keyframe: bool) -> bool:
+        """Queue one frame.  Returns True if this display needs a keyframe."""
+        if self.mime_type is not None and mime_type.lower() != self.mime_type.lower():
+            if not self._mismatch_logged:
+                logger.warning("VideoForward [%s]: publisher sends %s, display negotiated %s",
+                               self.pc_id, mime_type, self.mime_type)
+                self._mismatch_logged = True
+            self.skipped += 1
+            return False
+        if self.waiting_keyframe:
+            if not keyframe:
+                self.skipped += 1
+                return True
+            self.waiting_keyframe = False
+        if self._packets.qsize() >= config.VIDEO_FORWARD_QUEUE_FRAMES:
+            # The sender fell behind: drop the backlog and restart at a keyframe
+            while not self._packets.empty():
+                self._packets.get_nowait()
+                self.skipped += 1
+            self.skipped += 1
+            self.waiting_keyframe = True
+            return True
+        packet = av.Packet(data)
+        packet.pts = pts
+        packet.time_base = TIME_BASE
+        self._packets.put_nowait(packet)
+        self.forwarded += 1
+        return False
+
+    async def recv(self) -> av.Packet:
+        if self.readyState != "live":
+            raise MediaStreamError
+        packet = await self._packets.get()
+        if packet is None:
+            raise MediaStreamError
+        return packet
+
+    def stop(self):
+        if self.readyState == "live":
+            self._forwarder.unsubscribe(self)
+            self._packets.put_nowait(None)  # wake the sender's pending recv()
+        super().stop()
+
+    def info(self) -> dict:
+        return {
+            "pc_id": self.pc_id,
+            "codec": self.mime_type,
+            "frames_forwarded": self.forwarded,
+            "frames_skipped": self.skipped,
+            "waiting_keyframe": self.waiting_keyframe,
+        }
+
+
+class VideoForwarder:
+    """Fans the publisher's encoded frames out to the display tracks."""
+
+    def __init__(self):
+        self._tracks: set[ForwardedTrack] = set()
+        self._publisher: str | None = None  # pc_id
+        self._receiver = None
+        self._mime_type: str | None = None
+        self._pts_offset = 0
+        self._last_pts = -1
+        self._rtp_last: int | None = None  # publisher's last RTP timestamp
+        self._rtp_elapsed = 0               # ticks since its first frame (unwrapped)
+        self._last_pli = 0.0
+        self.frames = 0
+        self.keyframes_requested = 0
+
+    def publish(self, pc_id: str, receiver):
+        """Forward the video arriving on *receiver* (call before it starts receiving).
+
+        Replaces any previous publisher.  Uses aiortc's name-mangled decoder
+        queue, which ``receive()`` hands to the decoder thread (see
+        receiver_supported()).
+        """
+        receiver._RTCRtpReceiver__decoder_queue = ForwardQueue(
+            functools.partial(self._on_frame, pc_id))
+        self._publisher = pc_id
+        self._receiver = receiver
+        self._mime_type = None
+        # Rebased on the new stream's first frame, one frame after the old one
+        self._pts_offset = self._last_pts + 1 + 90000 // config.VIDEO_MAX_FPS
+        self._rtp_last = None
+        for track in self._tracks:
+            track.waiting_keyframe = True
+        logger.info("VideoForward: publisher %s (displays=%d)", pc_id, len(self._tracks))
+
+    def unpublish(self, pc_id: str):
+        if self._publisher != pc_id:
+            return
+        self._publisher = None
+        self._receiver = None
+        logger.info("VideoForward: publisher %s left", pc_id)
+
+    def subscribe(self, pc_id: str) -> ForwardedTrack:
+        track = ForwardedTrack(self, pc_id)
+        self._tracks.add(track)
+        self.request_keyframe()
+        return track
+
+    def unsubscribe(self, track: ForwardedTrack):
+        self._tracks.discard(track)
+
+    def request_keyframe(self):
+        """Ask the publisher for a keyframe (PLI), rate-limited."""
+        now = time.monotonic()
+        if self._receiver is None or now - self._last_pli < config.VIDEO_FORWARD_PLI_INTERVAL:
+            return
+        self._last_pli = now
+        self.keyframes_requested += 1
+        for source in self._receiver.getSynchronizationSources():
+            asyncio.ensure_future(self._receiver._send_rtcp_pli(source.source))
+
+    def _on_frame(self, pc_id: str, codec, frame):
+        if pc_id != self._publisher:
+            return  # late frame from a replaced publisher
+        self.frames += 1
+        self._mime_type = codec.mimeType
+        if self._rtp_last is None:
+            self._rtp_elapsed = 0
+        else:
+            self._rtp_elapsed += (frame.timestamp - self._rtp_last + 2**31) % 2**32 - 2**31
+        self._rtp_last = frame.timestamp
+        pts = self._pts_offset + self._rtp_elapsed
+        self._last_pts = max(self._last_pts, pts)
+        keyframe = is_keyframe(codec.mimeType, frame.data)
+        need_keyframe = False
+        for track in self._tracks:
+            need_keyframe |= track.push(codec.mimeType, frame.data, pts, keyframe)
+        if need_keyframe:
+            self.request_keyframe()
+
+    def stats(self) -> dict:
+        return {
+            "publishing": self._publisher is not None,
+            "codec": self._mime_type,
+            "frames": self.frames,
+            "keyframes_requested": self.keyframes_requested,
+            "displays": [track.info() for track in list(self._tracks)],  # copied: any thread
+        }
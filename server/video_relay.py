@@ -0,0 +1,148 @@
+"""Owner-to-display video relay with one latest-frame slot per display.
+
+The sender's JPEG frames (Socket.IO ``video_frame`` on /video) used to be
+emitted to every display as they arrived, so a display on a slow link built
+an unbounded send backlog and fell further and further behind.
+
+Each display now has at most one frame in flight: a frame is emitted with a
+Socket.IO acknowledgement, and display.js acks once it has decoded it.
+Frames arriving meanwhile go into the display's mailbox, replacing (and
+counting as dropped) whatever was waiting there; the ack sends the mailbox
+contents.  A display therefore always gets the newest frame, and its latency
+stays within one frame's delivery time whatever its link does, while fast
+displays are not held back by slow ones.
+
+A frame not acknowledged within VIDEO_RELAY_ACK_TIMEOUT_SECONDS is given up
+on (a client that never acks still gets a frame that often).  Delivered and
+dropped frames per second (over VIDEO_RELAY_FPS_WINDOW_SECONDS) and the last
+ack round trip are reported per display by ``stats()``.
+"""
+
+import functools
+import logging
+import threading
+import time
+from collections import deque
+
+from . import bandwidth, config
+
+logger = logging.getLogger(__name__)
+
+
+class _Display:
+    def __init__(self, sid: str, account: str):
+        self.sid = sid
+        self.account = account
+        self.pending: bytes | None = None  # mailbox: newest frame not yet sent
+        self.seq = 0                       # id of the frame in flight (or last sent)
+        self.sent_at: float | None = None  # send time of the frame in flight; None = idle
+        self.ack_ms: float | None = None
+        self.delivered = 0
+        self.dropped = 0
+        self.timeouts = 0
+        self.delivered_at: deque[float] = deque()
+        self.dropped_at: deque[float] = deque()
+        self.joined_at = time.monotonic()
+
+    def info(self, now: float) -> dict:
+        window = config.VIDEO_RELAY_FPS_WINDOW_SECONDS
+        for times in (self.delivered_at, self.dropped_at):
+            while times and now - times[0] > window:
+                times.popleft()
+        span = min(window, max(now - self.joined_at, 1.0))
+        return {
+            "sid": self.sid,
+            "delivered_fps": round(len(self.delivered_at) / span, 1),
+            "dropped_fps": round(len(self.dropped_at) / span, 1),
+            "frames_delivered": self.delivered,
+            "frames_dropped": self.dropped,
+            "ack_timeouts": self.timeouts,
+            "last_ack_ms": round(self.ack_ms) if self.ack_ms is not None else None,
+            "in_flight": self.sent_at is not None,
+        }
+
+
+class VideoRelay:
+    def __init__(self, socketio, namespace: str = "/video"):
+        self._socketio = socketio
+        self._namespace = namespace
+        self._lock = threading.Lock()
+        self._displays: dict[str, _Display] = {}
+
+    def add(self, sid: str, account: str) -> bool:
+        """Start relaying frames to *sid*.  Returns False if it was already a display."""
+        with self._lock:
+            if sid in self._displays:
+                return False
+            self._displays[sid] = _Display(sid, account)
+        return True
+
+    def remove(self, sid: str) -> bool:
+        """Stop relaying to *sid* (a late ack is ignored).  Returns False if it was not a display."""
+        with self._lock:
+            return self._displays.pop(sid, None) is not None
+
+    def __contains__(self, sid: str) -> bool:
+        return sid in self._displays
+
+    @property
+    def count(self) -> int:
+        return len(self._displays)
+
+    def publish(self, frame: bytes):
+        """Offer *frame* to every display: sent now if it is idle, else left in its mailbox."""
+        now = time.monotonic()
+        sends = []
+        with self._lock:
+            for d in self._displays.values():
+                if d.sent_at is not None and now - d.sent_at > config.VIDEO_RELAY_ACK_TIMEOUT_SECONDS:
+                    d.timeouts += 1
+                    d.sent_at = None
+                    logger.info("VideoRelay: display %s did not ack within %ss, sending the next frame",
+                                d.sid, config.VIDEO_RELAY_ACK_TIMEOUT_SECONDS)
+                if d.pending is not None:
+                    d.dropped += 1
+                    d.dropped_at.append(now)
+                if d.sent_at is None:
+                    d.pending = None
+                    sends.append(self._start_send(d, frame, now))
+                else:
+                    d.pending = frame
+        for send in sends:
+            self._send(*send)
+
+    def _start_send(self, d: _Display, frame: bytes, now: float) -> tuple:
+        """Mark *frame* in flight to *d* (call with _lock held); returns _send's arguments."""
+        d.seq += 1
+        d.sent_at = now
+        return d.sid, d.account, d.seq, frame
+
+    def _send(self, sid: str, account: str, seq: int, frame: bytes):
+        # Emit outside the lock: with the threading server a fast ack may run before emit returns
+        self._socketio.server.emit("video_frame", frame, namespace=self._namespace, to=sid,
+                                   callback=functools.partial(self._on_ack, sid, seq))
+        bandwidth.record(account, "video", len(frame))
+
+    def _on_ack(self, sid: str, seq: int, *args):
+        now = time.monotonic()
+        send = None
+        with self._lock:
+            d = self._displays.get(sid)
+            if d is None:
+                return
+            d.delivered += 1
+            d.delivered_at.append(now)
+            if seq != d.seq or d.sent_at is None:
+                return  # ack for a frame already given up on
+            d.ack_ms = (now - d.sent_at) * 1000
+            d.sent_at = None
+            if d.pending is not None:
+                send = self._start_send(d, d.pending, now)
+                d.pending = None
+        if send:
+            self._send(*send)
+
+    def stats(self) -> list[dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [d.info(now) for d in self._displays.values()]
@@ -1,21 +1,60 @@
 """WebRTC streaming module using aiortc.
 
 Flask threads call only the public API (start, stop, peer_count, handle_offer,
-close_peer, reset_source_track).  All shared state lives inside the asyncio
-event loop to avoid TOCTOU and thread-safety issues.
+handle_publish, handle_display, forward_stats, close_peer, reset_source_track,
+set_talker, set_talk_sink).  All shared state lives inside the asyncio event
+loop to avoid TOCTOU and thread-safety issues.
+
+Talk-back: the viewer's microphone arrives as an Opus audio track in the same
+peer connection.  aiortc de-jitters and decodes it; frames are resampled to the
+speaker format and handed to the talk sink (AudioPlayer.play), but only for the
+peer currently holding the talk slot.
+
+Control: a "control" data channel opened by the viewer is handed to
+control_channel, which carries settings commands and pushed status.  The
+"roi.set" / "roi.clear" commands are handled here: a zoomed peer is moved to
+its own cropping CameraVideoTrack without renegotiation.
+
+Bandwidth: bytes sent to every peer are polled from aiortc's stats and
+recorded against its session (see bandwidth); once a session passes one of
+its budget steps, its encoders' bitrate is capped.  Worker-mode peers cannot
+be capped individually, so a capped one is also moved to its own track.
+
+Owner video: the owner's phone can publish its camera as a WebRTC track
+(handle_publish) that display peers (handle_display) receive as forwarded
+RTP, without decoding or re-encoding (see video_forward).  These peers do
+not count against the viewer limit.
+
+aiortc internals: forwarding replaces a receiver's decoder queue and calls
+its PLI sender; encoder profiles replace a sender's encoder and read the
+negotiated codecs of its transceiver; keyframe requests (PLI/FIR) for frames
+aiortc does not encode itself are routed by overriding a sender's
+``_send_keyframe``.  These are private, so requirements.txt pins the tested
+aiortc version (1.15.0) and start() probes them on a throwaway peer
+connection.  If one is missing, an error is logged and the feature is
+turned off: owner video is refused with FORWARD_UNAVAILABLE (the phones
+fall back to the JPEG relay), peers keep aiortc's stock encoders, without
+profiles or budget caps, and worker mode encodes in-process.
 """
 
 import asyncio
 import fractions
 import logging
+import math
 import threading
 import time
 
-from aiortc import RTCPeerConnection, RTCSessionDescription, MediaStreamTrack
+import aiortc
+import cv2
+from aiortc import RTCPeerConnection, RTCRtpSender, RTCSessionDescription, MediaStreamTrack
 from aiortc.contrib.media import MediaRelay
-from av import VideoFrame
+from aiortc.mediastreams import MediaStreamError
+from av import AudioResampler, VideoFrame
 
-from . import config
+from . import bandwidth, config, control_channel
+from .encoder_profiles import codec_preferences, create_encoder, parse_codecs, resolve_profile
+from .video_encoder import EncodedVideoTrack
+from .video_forward import VideoForwarder, receiver_supported
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +66,19 @@ _peer_connections: dict[str, RTCPeerConnection] = {}  # {pc_id: pc}
 _pc_sessions: dict[str, str] = {}  # {pc_id: session_id} — owner tracking
 _relay: MediaRelay | None = None
 _source_track: "CameraVideoTrack | None" = None
+_encoded_track: EncodedVideoTrack | None = None  # WEBRTC_ENCODER_MODE == "process"
+_video_senders: dict[str, tuple[RTCRtpSender, bool]] = {}  # {pc_id: (sender, uses worker)}
+_own_tracks: dict[str, "CameraVideoTrack"] = {}  # {pc_id: per-peer track (ROI / capped)}
+_bitrate_caps: dict[str, int] = {}  # {pc_id: bps} from the session's data budget
+_bytes_sent: dict[str, int] = {}  # {pc_id: RTP bytes already recorded}
+_meter: asyncio.Task | None = None
+_camera = None
 _disconnect_timers: dict[str, asyncio.TimerHandle] = {}  # {pc_id: timer}
+_talk_pc_id: str | None = None  # peer whose audio track is routed to the speaker
+_talk_sink = None  # callable(pcm_bytes) set by the app (AudioPlayer.play)
+_forwarder = VideoForwarder()  # owner video -> displays
+_forward_roles: dict[str, str] = {}  # {pc_id: "publisher" | "display"}
+_aiortc_hooks: dict[str, bool] = {}  # {feature: private aiortc hooks present}, from start()
 
 DISCONNECTED_TIMEOUT = 30  # seconds
 
@@ -39,6 +90,10 @@ class CameraVideoTrack(MediaStreamTrack):
     """Camera -> WebRTC video track.
 
     Always returns the latest frame from Camera to prevent latency build-up.
+    With ``roi`` set, the capture is cropped to that region and scaled back
+    up to the capture size before encoding.  That adds no pixels the sensor
+    did not record, but the whole bitrate goes to the region, so a zoomed
+    viewer is not enlarging the compression artefacts of the full frame.
     """
 
     kind = "video"
@@ -49,6 +104,11 @@ class CameraVideoTrack(MediaStreamTrack):
         self._fps = fps
         self._start: float | None = None
         self._count = 0
+        self.roi: tuple[float, float, float, float] | None = None  # (x, y, w, h), 0..1
+
+    def resume_from(self, other):
+        """Continue *other*'s pacing and timestamps (source hand-over)."""
+        self._start, self._count = other._start, other._count
 
     async def recv(self) -> VideoFrame:
         if self._start is None:
@@ -68,6 +128,8 @@ class CameraVideoTrack(MediaStreamTrack):
             await asyncio.sleep(1)
             import numpy as np
             raw = np.zeros((720, 1280, 3), dtype=np.uint8)
+        elif self.roi is not None:
+            raw = _crop_to_roi(raw, self.roi)
 
         frame = VideoFrame.from_ndarray(raw, format="bgr24")
 
@@ -79,6 +141,38 @@ class CameraVideoTrack(MediaStreamTrack):
         return frame
 
 
+def _crop_to_roi(raw, roi):
+    """Crop *raw* to the normalised *roi* and upscale it back to the frame size."""
+    height, width = raw.shape[:2]
+    x, y, w, h = roi
+    x0, y0 = int(x * width), int(y * height)
+    x1, y1 = max(x0 + 2, int((x + w) * width)), max(y0 + 2, int((y + h) * height))
+    crop = raw[y0:y1, x0:x1]
+    return cv2.resize(crop, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def parse_roi(msg: dict) -> tuple[float, float, float, float]:
+    """Validate a normalised crop rectangle from a client.
+
+    The rectangle is made square in normalised units (the frame's aspect
+    ratio), limited to WEBRTC_ROI_MAX_ZOOM and moved inside the frame.
+
+    Raises:
+        ValueError: missing or non-numeric x, y, w, h
+    """
+    try:
+        x, y, w, h = (float(msg[k]) for k in ("x", "y", "w", "h"))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("x, y, w and h (0-1) are required")
+    if not all(map(math.isfinite, (x, y, w, h))) or w <= 0 or h <= 0:
+        raise ValueError("x, y, w and h must be finite with w, h > 0")
+    size = min(1.0, max(w, h, 1.0 / config.WEBRTC_ROI_MAX_ZOOM))
+    cx, cy = x + w / 2, y + h / 2
+    x = min(max(cx - size / 2, 0.0), 1.0 - size)
+    y = min(max(cy - size / 2, 0.0), 1.0 - size)
+    return (x, y, size, size)
+
+
 # ─── Public API (callable from Flask threads) ───────────────────────────
 
 
@@ -90,6 +184,10 @@ def start():
     _loop_thread = threading.Thread(target=_loop.run_forever, daemon=True)
     _loop_thread.start()
     logger.info("WebRTC: asyncio event loop started")
+    try:
+        asyncio.run_coroutine_threadsafe(_probe_aiortc(), _loop).result(timeout=10)
+    except Exception:
+        logger.exception("WebRTC: aiortc probe failed")
 
 
 def stop():
@@ -116,11 +214,13 @@ def peer_count() -> int:
 
 
 def handle_offer(camera, offer_sdp: str, pc_id: str, session_id: str,
-                 max_peers: int) -> str:
+                 max_peers: int, profile: str | None = None,
+                 codecs: list[str] | None = None) -> str:
     """Process an SDP offer and return the answer SDP.
 
     The peer-count check and registration happen atomically inside the asyncio
-    loop to prevent TOCTOU races.
+    loop to prevent TOCTOU races.  *profile* and *codecs* override
+    WEBRTC_PROFILE and WEBRTC_CODECS for this peer.
 
     Raises:
         RuntimeError: event loop not started
@@ -129,12 +229,52 @@ def handle_offer(camera, offer_sdp: str, pc_id: str, session_id: str,
     if _loop is None:
         raise RuntimeError("WebRTC event loop not started")
     future = asyncio.run_coroutine_threadsafe(
-        _create_peer_connection(camera, offer_sdp, pc_id, session_id, max_peers),
+        _create_peer_connection(camera, offer_sdp, pc_id, session_id, max_peers,
+                                profile, codecs),
         _loop,
     )
     return future.result(timeout=10)
 
 
+def handle_publish(offer_sdp: str, pc_id: str, session_id: str) -> str:
+    """Accept the owner's video track and return the answer SDP.
+
+    The track is forwarded to display peers; a previous publisher is
+    replaced (the caller closes its peer connection).
+
+    Raises:
+        RuntimeError: event loop not started
+        ValueError: NO_VIDEO (the offer has no video to send) or
+            FORWARD_UNAVAILABLE (see _probe_aiortc)
+    """
+    if _loop is None:
+        raise RuntimeError("WebRTC event loop not started")
+    future = asyncio.run_coroutine_threadsafe(
+        _create_forward_peer(offer_sdp, pc_id, session_id, "publisher"), _loop
+    )
+    return future.result(timeout=10)
+
+
+def handle_display(offer_sdp: str, pc_id: str, session_id: str, max_displays: int) -> str:
+    """Connect a display to the forwarded owner video and return the answer SDP.
+
+    Raises:
+        RuntimeError: event loop not started
+        ValueError: TOO_MANY_PEERS or FORWARD_UNAVAILABLE (see _probe_aiortc)
+    """
+    if _loop is None:
+        raise RuntimeError("WebRTC event loop not started")
+    future = asyncio.run_coroutine_threadsafe(
+        _create_forward_peer(offer_sdp, pc_id, session_id, "display", max_displays), _loop
+    )
+    return future.result(timeout=10)
+
+
+def forward_stats() -> dict:
+    """Owner video forwarding counters (safe to call from any thread)."""
+    return _forwarder.stats()
+
+
 def close_peer(pc_id: str, session_id: str | None = None) -> bool:
     """Close a PeerConnection.  Returns False if session mismatch."""
     if _loop is None:
@@ -145,8 +285,30 @@ def close_peer(pc_id: str, session_id: str | None = None) -> bool:
     return future.result(timeout=5)
 
 
+def set_talk_sink(sink):
+    """Register the callable that receives talk-back PCM (int16 bytes)."""
+    global _talk_sink
+    _talk_sink = sink
+
+
+def set_talker(pc_id: str | None, session_id: str | None = None) -> bool:
+    """Route incoming audio from *pc_id* to the talk sink (None stops routing).
+
+    Returns False if the peer does not exist or belongs to another session.
+    """
+    if _loop is None:
+        return False
+    future = asyncio.run_coroutine_threadsafe(
+        _set_talker(pc_id, session_id), _loop
+    )
+    return future.result(timeout=5)
+
+
 def reset_source_track():
-    """Reset the shared source track (call after camera settings change)."""
+    """Reset the shared source track (call after camera settings change).
+
+    Connected viewers are moved to the new track without renegotiation.
+    """
     if _loop is None:
         return
     asyncio.run_coroutine_threadsafe(_reset_source(), _loop)
@@ -155,31 +317,411 @@ def reset_source_track():
 # ─── Internal async helpers (run inside the asyncio loop) ────────────────
 
 
+async def _probe_aiortc():
+    """Check the private aiortc hooks used here on a throwaway peer connection."""
+    pc = RTCPeerConnection()
+    try:
+        transceiver = pc.addTransceiver("video")
+        _aiortc_hooks["owner video forwarding"] = receiver_supported(transceiver.receiver)
+        _aiortc_hooks["encoder profiles"] = (
+            hasattr(transceiver.sender, "_RTCRtpSender__encoder")
+            and isinstance(getattr(transceiver, "_codecs", None), list))
+        _aiortc_hooks["keyframe requests"] = callable(
+            getattr(transceiver.sender, "_send_keyframe", None))
+    finally:
+        await pc.close()
+    for feature, present in _aiortc_hooks.items():
+        if not present:
+            logger.error("WebRTC: aiortc %s lacks the internals for %s (pinned in "
+                         "requirements.txt); it is disabled", aiortc.__version__, feature)
+
+
 async def _reset_source():
-    global _source_track
-    if _source_track:
-        _source_track.stop()
-    _source_track = None
+    global _source_track, _encoded_track
+    # A track that has not delivered a frame yet is already fresh
+    old_tracks = {
+        use_worker: track if track is not None and track._start is not None else None
+        for use_worker, track in ((False, _source_track), (True, _encoded_track))
+    }
+    if old_tracks[False]:
+        _source_track = None
+    if old_tracks[True]:
+        _encoded_track = None
+
+    for pc_id, (sender, use_worker) in _video_senders.items():
+        old = old_tracks[use_worker]
+        if old is None or pc_id in _own_tracks:
+            continue
+        source = _shared_source(_camera, use_worker)
+        if source._start is None:
+            source.resume_from(old)
+        sender.replaceTrack(_relay.subscribe(source))
+        if use_worker:
+            _route_keyframes(sender, source.request_keyframe)
+            source.request_keyframe()
+
+    # Each sender is still awaiting a frame from the old track; stopping it
+    # right away would end the sender, so give that frame time to arrive.
+    for track in old_tracks.values():
+        if track is not None:
+            _loop.call_later(2, track.stop)
+
+
+def _shared_source(camera, use_worker: bool) -> MediaStreamTrack:
+    """The shared camera track for in-process or worker encoding (created lazily)."""
+    global _source_track, _encoded_track
+    if use_worker:
+        if _encoded_track is None:
+            _encoded_track = EncodedVideoTrack(camera, fps=config.WEBRTC_DEFAULT_FPS)
+        return _encoded_track
+    if _source_track is None:
+        _source_track = CameraVideoTrack(camera, fps=config.WEBRTC_DEFAULT_FPS)
+    return _source_track
+
+
+def _transceiver_of(pc: RTCPeerConnection, sender: RTCRtpSender):
+    return next(t for t in pc.getTransceivers() if t.sender is sender)
+
+
+def _route_keyframes(sender: RTCRtpSender, request_keyframe):
+    """Send the sender's keyframe requests (PLI/FIR) to *request_keyframe*.
+
+    aiortc only honours them for frames it encodes itself; None restores its
+    own handling.  Only used where _probe_aiortc found the hook.
+    """
+    if request_keyframe is None:
+        vars(sender).pop("_send_keyframe", None)
+    else:
+        sender._send_keyframe = request_keyframe
+
+
+def _negotiated_codec(transceiver) -> str | None:
+    """MIME type of the transceiver's negotiated codec (private in aiortc)."""
+    codecs = getattr(transceiver, "_codecs", None)
+    return codecs[0].mimeType if codecs else None
+
+
+def _install_encoder(transceiver, profile: dict) -> str | None:
+    """Give the sender a profile-configured encoder for the negotiated codec.
+
+    aiortc creates its stock encoder lazily when sending starts, so setting
+    the (name-mangled) attribute after negotiation takes its place.  Without
+    that attribute (see _probe_aiortc) the stock encoder is kept.
+    """
+    mime_type = _negotiated_codec(transceiver)
+    if mime_type is None or not _aiortc_hooks.get("encoder profiles"):
+        return mime_type
+    encoder = create_encoder(mime_type, profile)
+    if encoder is not None:
+        transceiver.sender._RTCRtpSender__encoder = encoder
+    return mime_type
+
+
+def _own_track(pc_id: str) -> "CameraVideoTrack":
+    """Move the peer off the shared relayed source onto its own track.
+
+    The track is encoded by the peer's sender in-process, even in worker
+    mode.  Idempotent; switching happens without renegotiation.
+    """
+    track = _own_tracks.get(pc_id)
+    if track is None:
+        sender, use_worker = _video_senders[pc_id]
+        track = CameraVideoTrack(_camera, fps=config.WEBRTC_DEFAULT_FPS)
+        shared = _shared_source(_camera, use_worker)
+        if shared._start is not None:
+            track.resume_from(shared)
+        if use_worker:
+            _route_keyframes(sender, None)  # back to aiortc's own keyframe handling
+        sender.replaceTrack(track)
+        _own_tracks[pc_id] = track
+    return track
+
+
+def _release_own_track(pc_id: str):
+    """Return the peer to the shared source once nothing needs its own track."""
+    track = _own_tracks.get(pc_id)
+    if track is None or pc_id not in _video_senders:
+        return
+    sender, use_worker = _video_senders[pc_id]
+    if track.roi is not None or (use_worker and pc_id in _bitrate_caps):
+        return
+    del _own_tracks[pc_id]
+    source = _shared_source(_camera, use_worker)
+    if source._start is None:
+        source.resume_from(track)
+    sender.replaceTrack(_relay.subscribe(source))
+    if use_worker:
+        _route_keyframes(sender, source.request_keyframe)
+        source.request_keyframe()
+    _loop.call_later(2, track.stop)  # let the pending recv() finish first
+
+
+def _set_roi(pc_id: str, msg: dict) -> dict:
+    """Control command "roi.set": crop this peer's video to a region.
+
+    The peer gets its own CameraVideoTrack; later updates only change its
+    ``roi`` and apply from the next frame.
+    """
+    try:
+        roi = parse_roi(msg)
+    except ValueError as e:
+        return {"ok": False, "error": {"code": "INVALID_PARAMETER", "message": str(e)}}
+    if pc_id not in _video_senders:
+        return {"ok": False, "error": {"code": "NOT_FOUND", "message": "No video sender"}}
+
+    if roi == (0.0, 0.0, 1.0, 1.0):
+        return _clear_roi(pc_id, msg)
+    track = _own_track(pc_id)
+    if track.roi is None:
+        logger.info("WebRTC [%s]: ROI zoom started", pc_id)
+    track.roi = roi
+    return {"ok": True, "result": {"roi": dict(zip(("x", "y", "w", "h"), roi))}}
+
+
+def _clear_roi(pc_id: str, msg: dict) -> dict:
+    """Control command "roi.clear": back to the full frame."""
+    track = _own_tracks.get(pc_id)
+    if track is not None and track.roi is not None:
+        track.roi = None
+        _release_own_track(pc_id)
+        logger.info("WebRTC [%s]: ROI zoom cleared", pc_id)
+    return {"ok": True, "result": {"roi": None}}
+
+
+control_channel.register_peer_command("roi.set", _set_roi)
+control_channel.register_peer_command("roi.clear", _clear_roi)
+
+
+def _ensure_meter():
+    global _meter
+    if _meter is None or _meter.done():
+        _meter = asyncio.ensure_future(_meter_loop())
+
+
+async def _meter_loop():
+    while _peer_connections:
+        await asyncio.sleep(config.BANDWIDTH_POLL_SECONDS)
+        for pc_id in list(_peer_connections):
+            await _meter_peer(pc_id)
+
+
+async def _rtp_bytes_sent(pc: RTCPeerConnection) -> int | None:
+    try:
+        report = await pc.getStats()
+    except Exception:
+        return None
+    return sum(s.bytesSent for s in report.values() if s.type == "outbound-rtp")
+
+
+async def _meter_peer(pc_id: str):
+    """Record the bytes sent to *pc_id* since the last poll and apply its budget."""
+    pc = _peer_connections.get(pc_id)
+    if pc is None:
+        return
+    sent = await _rtp_bytes_sent(pc)
+    if sent is None or _peer_connections.get(pc_id) is not pc:
+        return  # closed meanwhile: _cleanup_pc records the rest
+    key = bandwidth.key_for(_pc_sessions.get(pc_id))
+    bandwidth.record(key, "webrtc", sent - _bytes_sent.get(pc_id, 0))
+    _bytes_sent[pc_id] = sent
+    limits = bandwidth.limits(key)
+    _set_bitrate_cap(pc_id, limits["webrtc_max_bitrate"] if limits else None)
+
+
+def _set_bitrate_cap(pc_id: str, cap: int | None):
+    if _bitrate_caps.get(pc_id) == cap or pc_id not in _video_senders:
+        return
+    if cap is None:
+        _bitrate_caps.pop(pc_id, None)
+    else:
+        _bitrate_caps[pc_id] = cap
+    sender, use_worker = _video_senders[pc_id]
+    if use_worker:
+        # The worker's stream is shared by every peer
+        if cap is None:
+            _release_own_track(pc_id)
+        else:
+            _own_track(pc_id)
+    encoder = getattr(sender, "_RTCRtpSender__encoder", None)
+    if hasattr(encoder, "set_bitrate_cap"):
+        encoder.set_bitrate_cap(cap)
+    logger.info("WebRTC [%s]: data budget bitrate cap %s", pc_id,
+                f"{cap // 1000} kbps" if cap else "lifted")
+
+
+async def _set_talker(pc_id: str | None, session_id: str | None) -> bool:
+    global _talk_pc_id
+    if pc_id is None:
+        _talk_pc_id = None
+        return True
+    if pc_id not in _peer_connections:
+        return False
+    if session_id is not None and _pc_sessions.get(pc_id) != session_id:
+        logger.warning("WebRTC [%s]: talk rejected (session mismatch)", pc_id)
+        return False
+    _talk_pc_id = pc_id
+    logger.info("WebRTC [%s]: talk-back routed to speaker", pc_id)
+    return True
+
+
+async def _consume_talk_audio(pc_id: str, track: MediaStreamTrack):
+    """Feed the viewer's microphone track into the talk sink.
+
+    Frames from a peer that does not hold the talk slot are still read (and
+    discarded) so the receiver never backs up.
+    """
+    layout = "mono" if config.AUDIO_CHANNELS == 1 else "stereo"
+    resampler = AudioResampler(format="s16", layout=layout,
+                               rate=config.AUDIO_SAMPLE_RATE)
+    while True:
+        try:
+            frame = await track.recv()
+        except MediaStreamError:
+            break
+        sink = _talk_sink
+        if _talk_pc_id != pc_id or sink is None:
+            continue
+        for out in resampler.resample(frame):
+            sink(out.to_ndarray().tobytes())
+    logger.info("WebRTC [%s]: talk-back track ended", pc_id)
 
 
 async def _create_peer_connection(camera, offer_sdp: str, pc_id: str,
-                                  session_id: str, max_peers: int) -> str:
+                                  session_id: str, max_peers: int,
+                                  profile_name: str | None = None,
+                                  codecs: list[str] | None = None) -> str:
     """Create a PeerConnection and return the answer SDP.
 
     Peer-count check + registration is atomic (runs in the single-threaded
     asyncio loop).
     """
-    global _source_track
+    global _camera
 
     # ── Atomic peer limit check ──
-    if len(_peer_connections) >= max_peers:
+    if len(_peer_connections) - len(_forward_roles) >= max_peers:
         raise ValueError("TOO_MANY_PEERS")
+    profile_name, profile = resolve_profile(profile_name)
 
     pc = RTCPeerConnection()
     _peer_connections[pc_id] = pc
     _pc_sessions[pc_id] = session_id
+    _monitor_connection(pc, pc_id)
 
-    # ── Connection-state monitoring ──
+    # ── Talk-back (viewer microphone) ──
+
+    @pc.on("track")
+    def on_track(track):
+        if track.kind == "audio":
+            asyncio.ensure_future(_consume_talk_audio(pc_id, track))
+
+    # ── Control / telemetry data channel ──
+
+    @pc.on("datachannel")
+    def on_datachannel(channel):
+        if channel.label == control_channel.LABEL:
+            control_channel.attach(pc_id, session_id, pc, channel)
+
+    # ── Add video track ──
+
+    # The worker only produces H.264 with the deployment profile; peers that
+    # cannot receive it or ask for another profile get the in-process track
+    # (as do all peers if keyframe requests cannot be routed to the worker).
+    use_worker = (config.WEBRTC_ENCODER_MODE == "process"
+                  and _aiortc_hooks.get("keyframe requests", False)
+                  and profile_name == config.WEBRTC_PROFILE
+                  and "H264/90000" in offer_sdp)
+    _camera = camera
+    source = _shared_source(camera, use_worker)
+    relayed = _relay.subscribe(source)
+    sender = pc.addTrack(relayed)
+    _video_senders[pc_id] = (sender, use_worker)
+    transceiver = _transceiver_of(pc, sender)
+    order = ["H264"] if use_worker else (codecs or parse_codecs(config.WEBRTC_CODECS))
+    preferences = codec_preferences(order, offer_sdp)
+    if preferences:
+        transceiver.setCodecPreferences(preferences)
+    if use_worker:
+        # aiortc only honours PLI/FIR for frames it encodes itself, so route
+        # this peer's keyframe requests to the shared worker instead.
+        _route_keyframes(sender, source.request_keyframe)
+        source.request_keyframe()  # the new viewer needs an IDR
+
+    # ── SDP exchange ──
+
+    offer = RTCSessionDescription(sdp=offer_sdp, type="offer")
+    await pc.setRemoteDescription(offer)
+    answer = await pc.createAnswer()
+    await pc.setLocalDescription(answer)
+    codec = _install_encoder(transceiver, profile)
+    _ensure_meter()
+
+    logger.info(
+        "WebRTC [%s]: peer connection created (session=%s, codec=%s, profile=%s, total=%d)",
+        pc_id,
+        session_id[:8] if session_id else "?",
+        codec,
+        profile_name,
+        len(_peer_connections),
+    )
+    return pc.localDescription.sdp
+
+
+async def _create_forward_peer(offer_sdp: str, pc_id: str, session_id: str, role: str,
+                               max_displays: int = 0) -> str:
+    """Create an owner-video publisher or display PeerConnection; return the answer SDP."""
+    if role == "display":
+        displays = sum(1 for r in _forward_roles.values() if r == "display")
+        if displays >= max_displays:
+            raise ValueError("TOO_MANY_PEERS")
+    elif "m=video" not in offer_sdp:
+        raise ValueError("NO_VIDEO")
+    if not (_aiortc_hooks.get("owner video forwarding") and _aiortc_hooks.get("keyframe requests")):
+        raise ValueError("FORWARD_UNAVAILABLE")
+
+    pc = RTCPeerConnection()
+    _peer_connections[pc_id] = pc
+    _pc_sessions[pc_id] = session_id
+    _forward_roles[pc_id] = role
+    _monitor_connection(pc, pc_id)
+    order = parse_codecs(config.WEBRTC_CODECS)
+
+    if role == "publisher":
+        transceiver = pc.addTransceiver("video", direction="recvonly")
+
+        @pc.on("track")
+        def on_track(track):
+            # Fired by setRemoteDescription, before the receiver starts
+            if track.kind == "video" and _forward_roles.get(pc_id) == "publisher":
+                _forwarder.publish(pc_id, transceiver.receiver)
+    else:
+        track = _forwarder.subscribe(pc_id)
+        sender = pc.addTrack(track)
+        # Keyframe requests go to the owner's phone: nothing is encoded here
+        _route_keyframes(sender, _forwarder.request_keyframe)
+        transceiver = _transceiver_of(pc, sender)
+
+    preferences = codec_preferences(order, offer_sdp)
+    if preferences:
+        transceiver.setCodecPreferences(preferences)
+    try:
+        await pc.setRemoteDescription(RTCSessionDescription(sdp=offer_sdp, type="offer"))
+        answer = await pc.createAnswer()
+        await pc.setLocalDescription(answer)
+    except Exception:
+        await _cleanup_pc(pc_id)
+        raise
+    codec = _negotiated_codec(transceiver)
+    if role == "display":
+        track.mime_type = codec
+    _ensure_meter()
+
+    logger.info("WebRTC [%s]: owner video %s connected (session=%s, codec=%s)",
+                pc_id, role, session_id[:8] if session_id else "?", codec)
+    return pc.localDescription.sdp
+
+
+def _monitor_connection(pc: RTCPeerConnection, pc_id: str):
+    """Clean up *pc* when it fails, closes or stays disconnected."""
 
     @pc.on("connectionstatechange")
     async def on_connection_state_change():
@@ -202,29 +744,6 @@ async def _create_peer_connection(camera, offer_sdp: str, pc_id: str,
             _cancel_disconnect_timer(pc_id)
             await _cleanup_pc(pc_id)
 
-    # ── Add video track ──
-
-    if _source_track is None:
-        _source_track = CameraVideoTrack(camera, fps=config.WEBRTC_DEFAULT_FPS)
-
-    relayed = _relay.subscribe(_source_track)
-    pc.addTrack(relayed)
-
-    # ── SDP exchange ──
-
-    offer = RTCSessionDescription(sdp=offer_sdp, type="offer")
-    await pc.setRemoteDescription(offer)
-    answer = await pc.createAnswer()
-    await pc.setLocalDescription(answer)
-
-    logger.info(
-        "WebRTC [%s]: peer connection created (session=%s, total=%d)",
-        pc_id,
-        session_id[:8] if session_id else "?",
-        len(_peer_connections),
-    )
-    return pc.localDescription.sdp
-
 
 # ─── Disconnect timeout ─────────────────────────────────────────────────
 
@@ -264,6 +783,7 @@ async def _cleanup_pc(pc_id: str, required_session: str | None = None) -> bool:
     If *required_session* is given, only close when the owner matches.
     Returns True if closed (or already gone), False on session mismatch.
     """
+    global _talk_pc_id
     if required_session is not None:
         owner = _pc_sessions.get(pc_id)
         if owner is not None and owner != required_session:
@@ -271,9 +791,23 @@ async def _cleanup_pc(pc_id: str, required_session: str | None = None) -> bool:
             return False
 
     _cancel_disconnect_timer(pc_id)
-    _pc_sessions.pop(pc_id, None)
+    # Claim the peer before the first await: a concurrent cleanup or meter
+    # poll then finds it gone, so its bytes are recorded exactly once
     pc = _peer_connections.pop(pc_id, None)
+    session_id = _pc_sessions.pop(pc_id, None)
+    recorded = _bytes_sent.pop(pc_id, 0)
+    _video_senders.pop(pc_id, None)
+    _own_tracks.pop(pc_id, None)  # stopped below as the sender's track
+    _bitrate_caps.pop(pc_id, None)
+    if _forward_roles.pop(pc_id, None) == "publisher":
+        _forwarder.unpublish(pc_id)
+    control_channel.detach(pc_id)
+    if _talk_pc_id == pc_id:
+        _talk_pc_id = None
     if pc:
+        sent = await _rtp_bytes_sent(pc)  # count the bytes since the last poll
+        if sent is not None:
+            bandwidth.record(bandwidth.key_for(session_id), "webrtc", sent - recorded)
         # Explicitly stop relayed tracks before closing
         for sender in pc.getSenders():
             if sender.track:
@@ -285,10 +819,24 @@ async def _cleanup_pc(pc_id: str, required_session: str | None = None) -> bool:
 
 async def _close_all():
     """Close every PeerConnection (shutdown helper)."""
+    global _encoded_track
     for pc_id in list(_disconnect_timers):
         _cancel_disconnect_timer(pc_id)
     coros = [pc.close() for pc in _peer_connections.values()]
     if coros:
         await asyncio.gather(*coros, return_exceptions=True)
+    for pc_id in list(_peer_connections):
+        control_channel.detach(pc_id)
     _peer_connections.clear()
     _pc_sessions.clear()
+    _video_senders.clear()
+    _own_tracks.clear()
+    _bitrate_caps.clear()
+    _bytes_sent.clear()
+    for pc_id, role in list(_forward_roles.items()):
+        if role == "publisher":
+            _forwarder.unpublish(pc_id)
+    _forward_roles.clear()
+    if _encoded_track:
+        _encoded_track.stop()
+        _encoded_track = None
@@ -88,19 +88,63 @@
   const videoOverlay = document.getElementById('video-overlay');
   const loadingOverlay = document.getElementById('loading-overlay');
 
+  // Fall back to LL-HLS if WebRTC has not connected within this time,
+  // or immediately when the server is at its peer limit.
+  const HLS_FALLBACK_DELAY = 15000;
+  let hlsFallbackTimer = null;
+
+  function armHlsFallback() {
+    clearTimeout(hlsFallbackTimer);
+    hlsFallbackTimer = setTimeout(switchToHls, HLS_FALLBACK_DELAY);
+  }
+
+  async function switchToHls() {
+    clearTimeout(hlsFallbackTimer);
+    if (PetHLS.isActive || PetWebRTC.isConnected()) return;
+    console.log('[App] WebRTC unavailable, switching to HLS');
+    PetWebRTC.close();
+    if (await PetHLS.start(videoWebRTC)) {
+      waitForVideoFrame(videoWebRTC, () => {
+        videoOverlay.hidden = true;
+        loadingOverlay.hidden = true;
+      });
+    }
+  }
+
+  function connectVideo() {
+    if (PetHLS.isActive) return;
+    armHlsFallback();
+    PetWebRTC.connect(videoWebRTC);
+  }
+
   PetWebRTC.onConnected = () => {
     console.log('[App] WebRTC connected');
+    clearTimeout(hlsFallbackTimer);
     videoOverlay.hidden = true;
     loadingOverlay.hidden = true;
+    PetZoom.reset();  // a new peer starts on the full frame
   };
 
   PetWebRTC.onDisconnected = () => {
     console.log('[App] WebRTC disconnected, waiting for reconnect...');
   };
 
+  PetWebRTC.onFailed = (status) => {
+    if (status === 429) switchToHls();  // TOO_MANY_PEERS
+  };
+
+  // ?profile=low_latency|balanced|quality selects the server encoder profile
+  PetWebRTC.profile = new URLSearchParams(location.search).get('profile');
+
+  // Pinch zoom: the server crops the capture (ROI) for this peer only
+  PetZoom.attach(videoWebRTC, (rect) => {
+    if (!PetWebRTC.controlReady) return;
+    PetWebRTC.command(rect ? 'roi.set' : 'roi.clear', rect || {}).catch(() => {});
+  });
+
   // Initial connection
   videoOverlay.hidden = false;
-  PetWebRTC.connect(videoWebRTC);
+  connectVideo();
 
   // ---- Audio: Listen toggle ----
   btnListen.addEventListener('click', () => {
@@ -194,13 +238,25 @@
     contrastVal.textContent = settingContrast.value;
   });
 
+  // Settings go over the WebRTC control channel when it is open, HTTP otherwise
+  async function control(type, params, url, options) {
+    if (PetWebRTC.controlReady) return PetWebRTC.command(type, params);
+    const res = await fetch(url, options);
+    const data = await res.json();
+    if (!res.ok) {
+      const err = new Error(data.error?.message || 'Request failed');
+      err.code = data.error?.code;
+      throw err;
+    }
+    return data;
+  }
+
   async function loadSettings() {
     try {
-      const [settingsRes, camerasRes] = await Promise.all([
-        fetch('/api/settings'),
-        fetch('/api/cameras'),
+      const [s, c] = await Promise.all([
+        control('settings.get', {}, '/api/settings'),
+        control('cameras.list', {}, '/api/cameras').catch(() => null),
       ]);
-      const s = await settingsRes.json();
       settingRes.value = `${s.resolution.width}x${s.resolution.height}`;
       settingFps.value = s.fps;
       settingBrightness.value = s.brightness;
@@ -208,9 +264,10 @@
       brightnessVal.textContent = s.brightness;
       contrastVal.textContent = s.contrast;
 
+      loadBandwidth();
+
       // Populate camera device dropdown
-      if (camerasRes.ok) {
-        const c = await camerasRes.json();
+      if (c) {
         settingCamera.innerHTML = '';
         c.cameras.forEach((cam) => {
           const opt = document.createElement('option');
@@ -230,20 +287,17 @@
     try {
       // Switch camera device if changed
       const selectedCameraIndex = parseInt(settingCamera.value);
-      const camRes = await fetch('/api/cameras');
-      if (camRes.ok) {
-        const camData = await camRes.json();
-        if (selectedCameraIndex !== camData.current_index) {
-          const switchRes = await fetch('/api/cameras/current', {
+      const camData = await control('cameras.list', {}, '/api/cameras').catch(() => null);
+      if (camData && selectedCameraIndex !== camData.current_index) {
+        try {
+          await control('camera.switch', { index: selectedCameraIndex }, '/api/cameras/current', {
             method: 'PATCH',
             headers: { 'Content-Type': 'application/json' },
             body: JSON.stringify({ index: selectedCameraIndex }),
           });
-          if (!switchRes.ok) {
-            const data = await switchRes.json();
-            alert(data.error?.message || 'カメラの切り替えに失敗しました');
-            return;
-          }
+        } catch (err) {
+          alert(err.message || 'カメラの切り替えに失敗しました');
+          return;
         }
       }
 
@@ -255,21 +309,18 @@
         brightness: parseInt(settingBrightness.value),
         contrast: parseInt(settingContrast.value),
       };
-      const res = await fetch('/api/settings', {
-        method: 'PATCH',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(body),
-      });
-      if (res.ok) {
-        settingsPanel.hidden = true;
-        // Reconnect WebRTC with new camera settings
-        PetWebRTC.close();
-        videoOverlay.hidden = false;
-        PetWebRTC.connect(videoWebRTC);
-      } else {
-        const data = await res.json();
-        alert(data.error?.message || '設定の適用に失敗しました');
+      try {
+        await control('settings.set', { settings: body }, '/api/settings', {
+          method: 'PATCH',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify(body),
+        });
+      } catch (err) {
+        alert(err.message || '設定の適用に失敗しました');
+        return;
       }
+      // The server moves the live stream to the new settings; no reconnect needed
+      settingsPanel.hidden = true;
     } catch (err) {
       alert('設定の適用に失敗しました');
     }
@@ -284,6 +335,47 @@
     contrastVal.textContent = '50';
   });
 
+  // ---- Data budget ----
+  const bandwidthUsage = document.getElementById('bandwidth-usage');
+  const budgetDaily = document.getElementById('budget-daily');
+  const btnBudgetSave = document.getElementById('btn-budget-save');
+  const MB = 1000 * 1000;
+
+  function formatBytes(n) {
+    return n >= 1000 * MB ? `${(n / (1000 * MB)).toFixed(2)} GB` : `${(n / MB).toFixed(1)} MB`;
+  }
+
+  function renderBandwidth(b) {
+    let text = `今日 ${formatBytes(b.today_bytes)}`;
+    if (b.budget.used != null) text += `（上限の ${Math.round(b.budget.used * 100)}%）`;
+    if (b.limits) text += ` — 画質を制限中（段階 ${b.limits.level}）`;
+    bandwidthUsage.textContent = text;
+  }
+
+  async function loadBandwidth() {
+    try {
+      const b = await control('bandwidth.get', {}, '/api/bandwidth');
+      renderBandwidth(b);
+      budgetDaily.value = b.budget.daily_bytes ? Math.round(b.budget.daily_bytes / MB) : '';
+    } catch (err) {
+      bandwidthUsage.textContent = '状態を取得できません';
+    }
+  }
+
+  btnBudgetSave.addEventListener('click', async () => {
+    const toBytes = (input) => (input.value ? Math.round(Number(input.value) * MB) : null);
+    const body = { daily_bytes: toBytes(budgetDaily) };
+    try {
+      renderBandwidth(await control('bandwidth.budget', body, '/api/bandwidth/budget', {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body),
+      }));
+    } catch (err) {
+      alert(err.message || '上限の保存に失敗しました');
+    }
+  });
+
   // ---- Status polling ----
   const lsFps = document.getElementById('ls-fps');
   const lsRes = document.getElementById('ls-res');
@@ -296,23 +388,84 @@
     return `${h}:${m}:${s}`;
   }
 
+  function renderStatus(data) {
+    uptimeEl.textContent = formatUptime(data.uptime_seconds);
+    statusFps.textContent = `${data.fps} fps`;
+    statusRes.textContent = data.resolution;
+    const activity = data.audio.activity;
+    const sound = data.audio.microphone_active && activity ? (activity.active ? '・音あり' : '・静か') : '';
+    const mic = micLabel(data.audio.devices && data.audio.devices.microphone,
+                         data.audio.microphone_active) + sound;
+    const listeners = data.audio.listening_clients;
+    statusAudio.textContent = `マイク: ${mic} / リスナー: ${listeners}`;
+    // Sync to landscape status panel (use line break instead of slash)
+    if (lsFps) {
+      lsFps.textContent = statusFps.textContent;
+      lsRes.textContent = statusRes.textContent;
+      lsAudio.innerHTML = `マイク: ${mic}<br>リスナー: ${listeners}`;
+    }
+    renderSoundActivity(Boolean(activity && activity.active));
+    // Pushed over the control channel only
+    if (data.bandwidth && !settingsPanel.hidden) renderBandwidth(data.bandwidth);
+  }
+
+  const DEVICE_LABELS = { opening: '接続中', retrying: '再接続中', stopped: 'OFF' };
+
+  function micLabel(state, active) {
+    if (state && state !== 'active') return DEVICE_LABELS[state] || state;
+    return active ? 'ON' : 'OFF';
+  }
+
+  // Device supervisor pushes: show a missing microphone right away
+  PetAudio.onDeviceChange = (states) => {
+    if (!states.microphone || states.microphone === 'active') return;
+    statusAudio.textContent = `マイク: ${micLabel(states.microphone)}`;
+    if (lsAudio) lsAudio.textContent = statusAudio.textContent;
+  };
+
+  /** Highlight the microphone status while the home is not silent. */
+  function renderSoundActivity(active) {
+    statusAudio.classList.toggle('sound-active', active);
+    if (lsAudio) lsAudio.classList.toggle('sound-active', active);
+  }
+
+  // Listening viewers hear about sound starting and stopping immediately
+  PetAudio.onActivity = renderSoundActivity;
+
+  // ---- Sound event alerts (pushed to every viewer) ----
+  const soundEventBanner = document.getElementById('sound-event-banner');
+  const SOUND_EVENT_LABELS = { bark: '吠えています', whine: '鳴いています', noise: '大きな物音がしています' };
+  const SOUND_EVENT_SHOW_MS = 8000;
+  let soundEventTimer = null;
+
+  PetAudio.onSoundEvent = (event) => {
+    if (!soundEventBanner) return;
+    const at = new Date(event.time).toLocaleTimeString('ja-JP');
+    soundEventBanner.textContent = `${SOUND_EVENT_LABELS[event.type] || event.type}（${at}）`;
+    if (event.audio_url) {
+      const link = document.createElement('a');
+      link.href = event.audio_url;
+      link.target = '_blank';
+      link.rel = 'noopener';
+      link.className = 'sound-event-audio';
+      link.textContent = '▶ 前後の音を聞く';
+      soundEventBanner.append(link);
+    }
+    soundEventBanner.hidden = false;
+    clearTimeout(soundEventTimer);
+    soundEventTimer = setTimeout(() => { soundEventBanner.hidden = true; }, SOUND_EVENT_SHOW_MS);
+    if (navigator.vibrate) navigator.vibrate(200);
+  };
+
+  // Connected viewers get status pushed over the control channel
+  PetWebRTC.onStatus = renderStatus;
+
   async function pollStatus() {
+    if (PetWebRTC.controlReady) return;
     try {
       const res = await fetch('/api/status');
       if (!res.ok) return;
-      const data = await res.json();
-      uptimeEl.textContent = formatUptime(data.uptime_seconds);
-      statusFps.textContent = `${data.fps} fps`;
-      statusRes.textContent = data.resolution;
-      const mic = data.audio.microphone_active ? 'ON' : 'OFF';
-      const listeners = data.audio.listening_clients;
-      statusAudio.textContent = `マイク: ${mic} / リスナー: ${listeners}`;
-      // Sync to landscape status panel (use line break instead of slash)
-      if (lsFps) {
-        lsFps.textContent = statusFps.textContent;
-        lsRes.textContent = statusRes.textContent;
-        lsAudio.innerHTML = `マイク: ${mic}<br>リスナー: ${listeners}`;
-      }
+      renderStatus(await res.json());
     } catch (err) {
       // ignore
     }
@@ -368,6 +521,13 @@
   let ownerCanvasCtx = null;
   let captureInterval = null;
   let isSendingVideo = false;
+  // WebRTC publishing: the phone's encoder sends H.264/VP8 that the server
+  // forwards to displays as is.  JPEG frames are only sent when publishing
+  // failed or for displays that could not open WebRTC themselves.
+  let ownerPc = null;
+  let isPublishing = false;
+  let jpegDisplays = 0;
+  let displayClients = null;
 
   if (btnShowFace) {
     btnShowFace.addEventListener('click', () => {
@@ -420,7 +580,7 @@
       timeout: 20000,
     });
 
-    videoSocket.on('connect', () => {
+    videoSocket.on('connect', async () => {
       console.log('[OwnerVideo] Socket connected');
       videoSocket.emit('video_send_start', { width: 640, height: 480, fps: 10 });
 
@@ -434,6 +594,9 @@
       // Start frame capture (clear existing interval to avoid duplicates)
       if (captureInterval) clearInterval(captureInterval);
       captureInterval = setInterval(captureAndSend, 100); // 10fps
+
+      isPublishing = await publishOwnerVideo();
+      updateOwnerVideoStatus();
     });
 
     videoSocket.io.on('reconnect_attempt', (attempt) => {
@@ -452,9 +615,9 @@
     videoSocket.on('video_status', (status) => {
       console.log('[OwnerVideo] Status:', status);
       if (status.display_clients !== undefined) {
-        ownerVideoStatus.textContent = isSendingVideo
-          ? `送信中: 640x480 / 10fps / 接続PC: ${status.display_clients}台`
-          : '';
+        displayClients = status.display_clients;
+        jpegDisplays = status.jpeg_displays || 0;
+        updateOwnerVideoStatus();
       }
     });
 
@@ -465,14 +628,79 @@
         clearInterval(captureInterval);
         captureInterval = null;
       }
+      closeOwnerPc();
       if (isSendingVideo) {
         ownerVideoStatus.textContent = '切断 — 再接続中...';
       }
     });
   }
 
+  function updateOwnerVideoStatus() {
+    if (!isSendingVideo) {
+      ownerVideoStatus.textContent = '';
+      return;
+    }
+    const mode = isPublishing ? 'WebRTC' : 'JPEG';
+    ownerVideoStatus.textContent = displayClients === null
+      ? `送信中: 640x480 / 10fps / ${mode}`
+      : `送信中: 640x480 / 10fps / ${mode} / 接続PC: ${displayClients}台`;
+  }
+
+  /** Publish the camera track over WebRTC; resolves false if it cannot be used. */
+  async function publishOwnerVideo() {
+    if (!window.RTCPeerConnection || !ownerVideoStream || !videoSocket) return false;
+    closeOwnerPc();
+    const pc = new RTCPeerConnection({ iceServers: [] });
+    ownerPc = pc;
+    try {
+      const track = ownerVideoStream.getVideoTracks()[0];
+      const sender = pc.addTransceiver(track, { direction: 'sendonly' }).sender;
+      await pc.setLocalDescription(await pc.createOffer());
+      await PetWebRTC.waitIceGathering(pc);
+
+      const answer = await videoSocket.timeout(15000).emitWithAck('video_publish', {
+        sdp: pc.localDescription.sdp,
+        type: 'offer',
+      });
+      if (answer.error) throw new Error(answer.error.code + ': ' + answer.error.message);
+      if (ownerPc !== pc) return false;  // stopped meanwhile
+      await pc.setRemoteDescription({ sdp: answer.sdp, type: 'answer' });
+
+      // The server forwards what the phone encodes: keep it within budget
+      const params = sender.getParameters();
+      if (params.encodings && params.encodings.length) {
+        params.encodings[0].maxBitrate = answer.max_bitrate;
+        params.encodings[0].maxFramerate = answer.max_fps;
+        await sender.setParameters(params).catch(e => console.warn('[OwnerVideo] setParameters:', e));
+      }
+
+      pc.onconnectionstatechange = () => {
+        if (pc.connectionState === 'failed' && ownerPc === pc) {
+          console.warn('[OwnerVideo] WebRTC failed — falling back to JPEG');
+          closeOwnerPc();
+          updateOwnerVideoStatus();
+        }
+      };
+      console.log('[OwnerVideo] Publishing over WebRTC (pc_id=' + answer.pc_id + ')');
+      return true;
+    } catch (err) {
+      console.warn('[OwnerVideo] WebRTC publish failed — sending JPEG:', err);
+      if (ownerPc === pc) closeOwnerPc();
+      return false;
+    }
+  }
+
+  function closeOwnerPc() {
+    if (ownerPc) {
+      ownerPc.close();
+      ownerPc = null;
+    }
+    isPublishing = false;
+  }
+
   function captureAndSend() {
     if (!ownerVideoElement || !ownerCanvasCtx || !videoSocket || !videoSocket.connected) return;
+    if (isPublishing && jpegDisplays === 0) return;  // every display gets the WebRTC track
 
     ownerCanvasCtx.drawImage(ownerVideoElement, 0, 0, 640, 480);
     ownerCanvas.toBlob((blob) => {
@@ -492,6 +720,10 @@
       captureInterval = null;
     }
 
+    closeOwnerPc();
+    displayClients = null;
+    jpegDisplays = 0;
+
     if (videoSocket) {
       videoSocket.emit('video_send_stop');
       videoSocket.disconnect();
@@ -605,7 +837,7 @@
       // Global safety: ensure overlay eventually hides even if all recovery fails
       setTimeout(() => { loadingOverlay.hidden = true; }, 15000);
 
-      if (PetWebRTC.isConnected()) {
+      if (PetWebRTC.isConnected() || PetHLS.isActive) {
         // iOS suspends video in background — nudge playback
         videoWebRTC.play().catch(() => {});
         // Wait for actual video frame before hiding overlay
@@ -614,7 +846,7 @@
         });
       } else {
         // Need full reconnect — onConnected will hide overlay
-        PetWebRTC.connect(videoWebRTC);
+        connectVideo();
       }
 
       // Owner video reconnect
@@ -639,7 +871,7 @@
     console.log('[App] Network online');
     // WebRTC video reconnect
     if (!PetWebRTC.isConnected()) {
-      PetWebRTC.connect(videoWebRTC);
+      connectVideo();
     }
     // Owner video reconnect
     if (isSendingVideo && videoSocket && !videoSocket.connected) {
@@ -650,5 +882,6 @@
   // ---- Page unload: clean up WebRTC ----
   window.addEventListener('pagehide', () => {
     PetWebRTC.close();
+    PetHLS.stop();
   });
 })();
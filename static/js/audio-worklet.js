@@ -0,0 +1,256 @@
+/**
+ * DNG Camera — AudioWorklet processors (loaded by audio.js)
+ *
+ * Both run on the audio rendering thread, so a busy page never delays or
+ * drops audio; only posting to / from the page goes through the main thread.
+ *
+ * pet-capture: talk-back microphone.  Converts each 128-frame render quantum
+ *   to the talk rate (low-pass FIR + linear interpolation, only when the
+ *   server could not take the AudioContext's own rate), packs it as int16 and
+ *   posts a chunk every chunkMs, transferring the buffer.
+ * pet-player: one continuous output node for listening.  Samples at the
+ *   stream's rate are read from a ring buffer that audio.js writes either
+ *   directly (a SharedArrayBuffer, when the page is cross-origin isolated) or
+ *   through port messages copied in here.  The player converts to the
+ *   context rate while reading, starts once prebufferMs is buffered, skips
+ *   back to that depth if more than maxMs pile up, and fills gaps with
+ *   comfort noise while the server reports silence.
+ */
+
+/**
+ * Single-producer single-consumer ring of float samples.  Layout of the
+ * buffer: Int32 read index, Int32 write index, then the samples; one slot
+ * stays empty so that read === write means empty.  The same layout is
+ * written from the page in audio.js (_ringPush).
+ */
+class SampleRing {
+  constructor(buffer) {
+    this.index = new Int32Array(buffer, 0, 2);
+    this.data = new Float32Array(buffer, 8);
+  }
+
+  available() {
+    const size = this.data.length;
+    return (Atomics.load(this.index, 1) - this.index[0] + size) % size;
+  }
+
+  push(samples) {
+    const size = this.data.length;
+    const write = this.index[1];
+    const free = (Atomics.load(this.index, 0) - write - 1 + size) % size;
+    const n = Math.min(samples.length, free);
+    const first = Math.min(n, size - write);
+    this.data.set(samples.subarray(0, first), write);
+    this.data.set(samples.subarray(first, n), 0);
+    Atomics.store(this.index, 1, (write + n) % size);
+    return n;
+  }
+
+  /** Copy the next n samples into dst at offset without consuming them. */
+  peek(dst, offset, n) {
+    const size = this.data.length;
+    const read = this.index[0];
+    const first = Math.min(n, size - read);
+    dst.set(this.data.subarray(read, read + first), offset);
+    dst.set(this.data.subarray(0, n - first), offset + first);
+  }
+
+  advance(n) {
+    Atomics.store(this.index, 0, (this.index[0] + n) % this.data.length);
+  }
+
+  clear() {
+    Atomics.store(this.index, 0, Atomics.load(this.index, 1));
+  }
+}
+
+class PlayerProcessor extends AudioWorkletProcessor {
+  constructor(options) {
+    super();
+    const opts = options.processorOptions;
+    this.ring = new SampleRing(opts.buffer || new ArrayBuffer(8 + opts.capacity * 4));
+    this.prebufferMs = opts.prebufferMs;
+    this.maxMs = opts.maxMs;
+    this.setRate(opts.rate);
+    this.buffering = true;
+    this.idle = false;   // the server stopped sending (silence), not a network gap
+    this.noise = 0;      // comfort noise amplitude while idle
+    this.underruns = 0;
+    this.dropped = 0;    // stream-rate samples skipped to cap the latency
+    this.sinceStats = 0;
+    this.port.onmessage = (e) => {
+      const msg = e.data;
+      if (msg.type === 'samples') this.ring.push(msg.samples);
+      else if (msg.type === 'rate') this.setRate(msg.rate);
+      else if (msg.type === 'idle') {
+        this.idle = msg.idle;
+        this.noise = msg.idle ? msg.noise : 0;
+      } else if (msg.type === 'reset') {
+        this.ring.clear();
+        this.buffering = true;
+        this.idle = false;
+        this.noise = 0;
+      }
+    };
+  }
+
+  setRate(rate) {
+    this.rate = rate;
+    this.step = rate / sampleRate;  // stream samples per output frame
+    this.pos = 0;                   // position between this.last (0) and the next sample (1)
+    this.last = 0;
+    this.scratch = new Float32Array(Math.ceil(128 * this.step) + 2);
+    this.prebuffer = Math.round(rate * this.prebufferMs / 1000);
+    this.max = Math.round(rate * this.maxMs / 1000);
+  }
+
+  process(inputs, outputs) {
+    const out = outputs[0][0];
+    let available = this.ring.available();
+    if (available > this.max) {
+      this.ring.advance(available - this.prebuffer);
+      this.dropped += available - this.prebuffer;
+      available = this.prebuffer;
+    }
+    if (this.buffering && available >= this.prebuffer) this.buffering = false;
+
+    let filled = 0;
+    if (!this.buffering) {
+      filled = this.render(out, available);
+      if (filled < out.length) {
+        this.buffering = true;
+        if (!this.idle) this.underruns++;
+      }
+    }
+    for (let i = filled; i < out.length; i++) {
+      out[i] = this.noise ? (Math.random() * 2 - 1) * this.noise : 0;
+    }
+
+    this.sinceStats += out.length;
+    if (this.sinceStats >= sampleRate) {
+      this.sinceStats = 0;
+      this.port.postMessage({
+        depth_ms: Math.round(this.ring.available() * 1000 / this.rate),
+        target_ms: this.prebufferMs,
+        underruns: this.underruns,
+        dropped_ms: Math.round(this.dropped * 1000 / this.rate),
+      });
+    }
+    return true;
+  }
+
+  /** Fill out from the ring at the context rate; returns the frames written. */
+  render(out, available) {
+    const frames = out.length;
+    if (this.step === 1) {
+      const n = Math.min(frames, available);
+      this.ring.peek(out, 0, n);
+      this.ring.advance(n);
+      return n;
+    }
+    // scratch[0] is the last sample consumed, scratch[k] the k-th one ahead
+    const end = this.pos + frames * this.step;
+    const consumed = Math.floor(end);
+    const needed = Math.max(consumed, Math.floor(this.pos + (frames - 1) * this.step) + 1);
+    if (available < needed) return 0;  // underrun: keep the ring for the re-fill
+    const s = this.scratch;
+    s[0] = this.last;
+    this.ring.peek(s, 1, Math.min(available, consumed + 1));
+    for (let i = 0; i < frames; i++) {
+      const p = this.pos + i * this.step;
+      const j = Math.floor(p);
+      const f = p - j;
+      out[i] = s[j] + (s[j + 1] - s[j]) * f;
+    }
+    this.last = s[consumed];
+    this.ring.advance(consumed);
+    this.pos = end - consumed;
+    return frames;
+  }
+}
+
+const FIR_TAPS = 32;
+
+/** Hann-windowed sinc low-pass, cutoff in cycles per sample. */
+function lowpass(cutoff) {
+  const taps = new Float32Array(FIR_TAPS);
+  const mid = (FIR_TAPS - 1) / 2;
+  let sum = 0;
+  for (let k = 0; k < FIR_TAPS; k++) {
+    const x = k - mid;
+    const sinc = x === 0 ? 2 * cutoff : Math.sin(2 * Math.PI * cutoff * x) / (Math.PI * x);
+    taps[k] = sinc * (0.5 - 0.5 * Math.cos(2 * Math.PI * (k + 0.5) / FIR_TAPS));
+    sum += taps[k];
+  }
+  for (let k = 0; k < FIR_TAPS; k++) taps[k] /= sum;
+  return taps;
+}
+
+class CaptureProcessor extends AudioWorkletProcessor {
+  constructor(options) {
+    super();
+    const { rate, chunkMs } = options.processorOptions;
+    this.step = sampleRate / rate;  // input frames per output sample
+    this.pos = 0;
+    this.last = 0;
+    // Only decimation needs the anti-alias filter (cutoff at 90% of the output Nyquist)
+    this.taps = this.step > 1 ? lowpass(0.45 / this.step) : null;
+    this.history = new Float32Array(FIR_TAPS - 1 + 128);
+    this.filtered = new Float32Array(129);
+    this.chunkSize = Math.round(rate * chunkMs / 1000);
+    this.chunk = new Int16Array(this.chunkSize);
+    this.fill = 0;
+    this.running = true;
+    this.port.onmessage = (e) => {
+      if (e.data.type === 'stop') this.running = false;
+    };
+  }
+
+  process(inputs) {
+    if (!this.running) return false;
+    const input = inputs[0] && inputs[0][0];
+    if (!input) return true;  // no microphone frames this quantum
+    if (this.step === 1) {
+      for (let i = 0; i < input.length; i++) this.emit(input[i]);
+      return true;
+    }
+    // s[0] = last filtered sample of the previous quantum, s[1..n] = this one
+    const n = input.length;
+    const s = this.filtered;
+    s[0] = this.last;
+    if (this.taps) {
+      const h = this.history;
+      h.copyWithin(0, n);  // keep the previous FIR_TAPS - 1 samples
+      h.set(input, FIR_TAPS - 1);
+      for (let i = 0; i < n; i++) {
+        let acc = 0;
+        for (let k = 0; k < FIR_TAPS; k++) acc += h[i + k] * this.taps[k];
+        s[i + 1] = acc;
+      }
+    } else {
+      s.set(input, 1);
+    }
+    let p = this.pos;
+    while (p < n) {
+      const j = Math.floor(p);
+      this.emit(s[j] + (s[j + 1] - s[j]) * (p - j));
+      p += this.step;
+    }
+    this.pos = p - n;
+    this.last = s[n];
+    return true;
+  }
+
+  emit(sample) {
+    const v = Math.max(-1, Math.min(1, sample));
+    this.chunk[this.fill++] = v < 0 ? v * 0x8000 : v * 0x7FFF;
+    if (this.fill === this.chunkSize) {
+      this.port.postMessage(this.chunk.buffer, [this.chunk.buffer]);
+      this.chunk = new Int16Array(this.chunkSize);
+      this.fill = 0;
+    }
+  }
+}
+
+registerProcessor('pet-player', PlayerProcessor);
+registerProcessor('pet-capture', CaptureProcessor);
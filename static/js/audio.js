@@ -1,12 +1,32 @@
 /**
  * DNG Camera — Audio module
- * Handles microphone capture (getUserMedia) and speaker playback (Web Audio API)
- * via Socket.IO WebSocket connection.
+ * Handles microphone capture (getUserMedia) and speaker playback (Web Audio API).
+ * Talk-back goes over the WebRTC peer connection when one is up (Opus track),
+ * otherwise PCM is sent via the Socket.IO WebSocket connection.
+ * Listening asks the server for Opus (decoded with WebCodecs) where the
+ * browser supports it, else IMA-ADPCM (decoded here), instead of raw PCM.
+ * While the room is silent the server sends nothing; its audio_vad marker
+ * carries the background level, played back here as comfort noise.
+ * Sound events detected on the server (barking etc.) arrive as sound_event
+ * whether or not this client is listening.
+ * Opus listening and PCM talk-back run at the AudioContext's own rate when
+ * the server supports it; the server resamples (polyphase) to its 16 kHz.
+ * Capture and playback run in AudioWorklet processors (audio-worklet.js) on
+ * the audio thread: talk-back PCM is converted and chunked there every
+ * CAPTURE_CHUNK_MS, and listening feeds one continuous player node through a
+ * ring buffer (shared memory when the page is cross-origin isolated).
  * Includes auto-reconnect with state recovery and visibility change handling.
  */
 
 const PetAudio = (() => {
   const SERVER_RATE = 16000;
+  // Client rates the server resamples from / to (config.AUDIO_CLIENT_RATES)
+  const NATIVE_RATES = [8000, 16000, 22050, 24000, 32000, 44100, 48000, 88200, 96000];
+  const WORKLET_URL = '/static/js/audio-worklet.js';
+  const CAPTURE_CHUNK_MS = 20;         // talk-back PCM per audio_talk message
+  const PLAYER_PREBUFFER_MS = 80;      // listening starts (and re-starts) at this depth...
+  const PLAYER_MAX_MS = 400;           // ...and skips back to it beyond this
+  const PLAYER_CAPACITY_SECONDS = 2;   // ring size, in seconds at the context rate
 
   let socket = null;
   let audioCtx = null;
@@ -15,12 +35,38 @@ const PetAudio = (() => {
   let mediaStream = null;
   let volume = 0.8;
 
-  // Playback queue for incoming audio
+  // AudioWorklet playback: one continuous node fed through a ring buffer
+  let _workletReady = null;  // Promise<boolean>, module loaded once per AudioContext
+  let _player = null;
+  let _playerGain = null;
+  let _playerRing = null;    // {index, data} over a SharedArrayBuffer, if cross-origin isolated
+  let _playerRate = 0;       // stream rate the player converts from
+  let _playerIdle = false;   // comfort noise on (server reported silence)
+  let _playbackStats = null;
+
+  // Without AudioWorklet (insecure context): one AudioBufferSource per chunk
   let nextPlayTime = 0;
 
+  // audio_stream payload format ("pcm" | "adpcm" | "opus"), confirmed by audio_status
+  let _format = 'pcm';
+  let _rate = SERVER_RATE;  // rate of the audio_stream payload, confirmed by audio_status
+  let _talkRate = SERVER_RATE;  // rate of our audio_talk PCM
+  let _opusDecoder = null;
+  let _opusTimestamp = 0;
+
+  // Silence suppression
+  let _onActivity = null;
+
+  // Microphone / speaker state pushed by the server's device supervisor
+  let deviceStates = {};
+  let _onDeviceChange = null;
+  let _onSoundEvent = null;
+  let _preferredFormat = null;  // Promise<format>, resolved on first listen
+
   // Talk refs for cleanup
   let _talkSource = null;
-  let _talkProcessor = null;
+  let _talkNode = null;
+  let _talkViaWebRTC = false;
 
   // Exclusive session control
   let isBlocked = false;
@@ -48,7 +94,7 @@ const PetAudio = (() => {
       if (_wasListening && !isListening) {
         isListening = true;
         nextPlayTime = 0;
-        socket.emit('audio_listen_start');
+        _emitListenStart();
         console.log('[Audio] Recovered listening state');
       }
     });
@@ -62,13 +108,54 @@ const PetAudio = (() => {
     });
 
     socket.on('audio_stream', (data) => {
-      if (isListening && audioCtx) {
-        playPCM(data);
-      }
+      if (!isListening || !audioCtx) return;
+      _stopComfortNoise();
+      if (_format === 'opus') playOpus(data);
+      else if (_format === 'adpcm') playADPCM(data);
+      else playPCM(data);
+    });
+
+    // The server skipped audio we could not keep up with (connection too slow)
+    socket.on('audio_lag', (lag) => {
+      console.warn(`[Audio] Missed ${lag.missed_chunks} chunks (${lag.missed_ms} ms)`);
+    });
+
+    // Server stopped (active=false) or resumed sending because of the room's sound level
+    socket.on('audio_vad', (vad) => {
+      if (!isListening) return;
+      if (vad.active) _stopComfortNoise();
+      else _startComfortNoise(vad.noise_dbfs);
+      if (_onActivity) _onActivity(vad.active);
+    });
+
+    socket.on('sound_event', (event) => {
+      console.log('[Audio] Sound event:', event);
+      if (_onSoundEvent) _onSoundEvent(event);
+    });
+
+    socket.on('audio_device', (states) => {
+      deviceStates = states;
+      if (_onDeviceChange) _onDeviceChange(states);
     });
 
     socket.on('audio_status', (status) => {
       console.log('[Audio] Status:', status);
+      if (status.listening && status.format) {
+        _format = status.format;
+        _rate = status.rate || SERVER_RATE;
+      }
+      if (status.talking && status.talk_rate) _talkRate = status.talk_rate;
+      // Speaker missing on the server: the talk slot was not granted
+      if (status.error === 'device_unavailable' && status.talking === false && isTalking) {
+        stopTalking();
+        alert('サーバーのスピーカーが使用できません（再接続を試みています）');
+      }
+      // Server could not bind our peer connection — fall back to PCM
+      if (status.talking && status.transport === 'socketio' && _talkViaWebRTC && isTalking) {
+        _talkViaWebRTC = false;
+        PetWebRTC.setTalkTrack(null);
+        _startPcmTalk();
+      }
     });
 
     socket.on('exclusive_status', (status) => {
@@ -95,8 +182,69 @@ const PetAudio = (() => {
     }
   }
 
+  /** AudioContext rate if the server can stream at it, else undefined (16 kHz). */
+  function _nativeRate() {
+    return audioCtx && NATIVE_RATES.includes(audioCtx.sampleRate) ? audioCtx.sampleRate : undefined;
+  }
+
+  /** Load the processors once; resolves false where AudioWorklet is unavailable. */
+  function _loadWorklet() {
+    if (!_workletReady) {
+      _workletReady = audioCtx.audioWorklet
+        ? audioCtx.audioWorklet.addModule(WORKLET_URL).then(() => true, (err) => {
+          console.error('[Audio] AudioWorklet failed to load:', err);
+          return false;
+        })
+        : Promise.resolve(false);
+    }
+    return _workletReady;
+  }
+
+  /** Create the player node (once); resolves false if AudioWorklet is unavailable. */
+  async function _ensurePlayer() {
+    if (_player) return true;
+    if (!(await _loadWorklet())) return false;
+    if (_player) return true;  // created while we waited
+    const capacity = audioCtx.sampleRate * PLAYER_CAPACITY_SECONDS;
+    let buffer = null;
+    if (window.crossOriginIsolated) {
+      buffer = new SharedArrayBuffer(8 + capacity * 4);
+      _playerRing = { index: new Int32Array(buffer, 0, 2), data: new Float32Array(buffer, 8) };
+    }
+    _playerRate = _rate;
+    _player = new AudioWorkletNode(audioCtx, 'pet-player', {
+      numberOfInputs: 0,
+      numberOfOutputs: 1,
+      outputChannelCount: [1],
+      processorOptions: {
+        buffer, capacity, rate: _playerRate,
+        prebufferMs: PLAYER_PREBUFFER_MS, maxMs: PLAYER_MAX_MS,
+      },
+    });
+    _player.port.onmessage = (e) => { _playbackStats = e.data; };
+    _playerGain = audioCtx.createGain();
+    _playerGain.gain.value = volume;
+    _player.connect(_playerGain).connect(audioCtx.destination);
+    console.log('[Audio] Player ready,', _playerRing ? 'shared ring' : 'message ring');
+    return true;
+  }
+
+  /** Write side of the player's SampleRing (same layout as in audio-worklet.js). */
+  function _ringPush(ring, samples) {
+    const size = ring.data.length;
+    const write = ring.index[1];
+    const free = (Atomics.load(ring.index, 0) - write - 1 + size) % size;
+    const n = Math.min(samples.length, free);
+    const first = Math.min(n, size - write);
+    ring.data.set(samples.subarray(0, first), write);
+    ring.data.set(samples.subarray(first, n), 0);
+    Atomics.store(ring.index, 1, (write + n) % size);
+  }
+
   /**
    * Resample PCM from srcRate to dstRate using linear interpolation.
+   * Only used for playback without AudioWorklet when the server could not
+   * match the AudioContext rate.
    */
   function resample(float32, srcRate, dstRate) {
     if (srcRate === dstRate) return float32;
@@ -113,28 +261,35 @@ const PetAudio = (() => {
     return out;
   }
 
-  function playPCM(pcmBytes) {
-    if (!audioCtx) return;
-
-    try {
-      // Convert to ArrayBuffer regardless of incoming type
-      let arrayBuf;
-      if (pcmBytes instanceof ArrayBuffer) {
-        arrayBuf = pcmBytes;
-      } else if (pcmBytes.buffer instanceof ArrayBuffer) {
-        arrayBuf = pcmBytes.buffer;
-      } else {
-        arrayBuf = new Uint8Array(pcmBytes).buffer;
-      }
+  /** Incoming binary payload as an ArrayBuffer, whatever type Socket.IO hands us. */
+  function _toArrayBuffer(data) {
+    if (data instanceof ArrayBuffer) return data;
+    if (data.buffer instanceof ArrayBuffer) {
+      return data.buffer.slice(data.byteOffset, data.byteOffset + data.byteLength);
+    }
+    return new Uint8Array(data).buffer;
+  }
 
-      const int16 = new Int16Array(arrayBuf);
-      const float32 = new Float32Array(int16.length);
-      for (let i = 0; i < int16.length; i++) {
-        float32[i] = (int16[i] / 32768.0) * volume;
-      }
+  /** Queue mono float samples at `rate` behind what is already buffered. */
+  function playSamples(float32, rate) {
+    if (!audioCtx || float32.length === 0) return;
+    if (!_player) {
+      _scheduleBuffer(float32, rate);
+      return;
+    }
+    if (rate !== _playerRate) {
+      _player.port.postMessage({ type: 'rate', rate });
+      _playerRate = rate;
+    }
+    if (_playerRing) _ringPush(_playerRing, float32);
+    else _player.port.postMessage({ type: 'samples', samples: float32 }, [float32.buffer]);
+  }
 
-      // Resample from 16kHz server rate to AudioContext rate
-      const resampled = resample(float32, SERVER_RATE, audioCtx.sampleRate);
+  /** Fallback without AudioWorklet: schedule the samples as their own buffer. */
+  function _scheduleBuffer(float32, rate) {
+    try {
+      const resampled = resample(float32, rate, audioCtx.sampleRate);
+      for (let i = 0; i < resampled.length; i++) resampled[i] *= volume;
 
       const buffer = audioCtx.createBuffer(1, resampled.length, audioCtx.sampleRate);
       buffer.getChannelData(0).set(resampled);
@@ -154,6 +309,140 @@ const PetAudio = (() => {
     }
   }
 
+  function playPCM(pcmBytes) {
+    const int16 = new Int16Array(_toArrayBuffer(pcmBytes));
+    const float32 = new Float32Array(int16.length);
+    for (let i = 0; i < int16.length; i++) {
+      float32[i] = int16[i] / 32768.0;
+    }
+    playSamples(float32, _rate);
+  }
+
+  // ---- IMA-ADPCM (server/audio_codec.py) ----
+  // 36-byte blocks: int16 LE predictor, u8 step index, pad, 32 bytes of
+  // 4-bit codes (low nibble first) for 64 samples.
+  const ADPCM_BLOCK_BYTES = 36;
+  const ADPCM_BLOCK_SAMPLES = 64;
+  const ADPCM_STEPS = [
+    7, 8, 9, 10, 11, 12, 13, 14, 16, 17, 19, 21, 23, 25, 28, 31, 34, 37, 41, 45,
+    50, 55, 60, 66, 73, 80, 88, 97, 107, 118, 130, 143, 157, 173, 190, 209, 230,
+    253, 279, 307, 337, 371, 408, 449, 494, 544, 598, 658, 724, 796, 876, 963,
+    1060, 1166, 1282, 1411, 1552, 1707, 1878, 2066, 2272, 2499, 2749, 3024, 3327,
+    3660, 4026, 4428, 4871, 5358, 5894, 6484, 7132, 7845, 8630, 9493, 10442,
+    11487, 12635, 13899, 15289, 16818, 18500, 20350, 22385, 24623, 27086, 29794,
+    32767,
+  ];
+  const ADPCM_INDEX = [-1, -1, -1, -1, 2, 4, 6, 8];
+
+  function playADPCM(data) {
+    const bytes = new Uint8Array(_toArrayBuffer(data));
+    const view = new DataView(bytes.buffer);
+    const blocks = Math.floor(bytes.length / ADPCM_BLOCK_BYTES);
+    const float32 = new Float32Array(blocks * ADPCM_BLOCK_SAMPLES);
+    let out = 0;
+    for (let b = 0; b < blocks; b++) {
+      const offset = b * ADPCM_BLOCK_BYTES;
+      let predictor = view.getInt16(offset, true);
+      let index = bytes[offset + 2];
+      for (let i = 4; i < ADPCM_BLOCK_BYTES; i++) {
+        const byte = bytes[offset + i];
+        for (const code of [byte & 0x0F, byte >> 4]) {
+          const step = ADPCM_STEPS[index];
+          let delta = step >> 3;
+          if (code & 4) delta += step;
+          if (code & 2) delta += step >> 1;
+          if (code & 1) delta += step >> 2;
+          predictor += (code & 8) ? -delta : delta;
+          predictor = Math.max(-32768, Math.min(32767, predictor));
+          index = Math.max(0, Math.min(88, index + ADPCM_INDEX[code & 7]));
+          float32[out++] = predictor / 32768.0;
+        }
+      }
+    }
+    playSamples(float32, _rate);
+  }
+
+  // ---- Opus via WebCodecs ----
+  // Each message is a run of [u16 big-endian length][20 ms Opus packet].
+  const OPUS_CONFIG = { codec: 'opus', sampleRate: SERVER_RATE, numberOfChannels: 1 };
+  let _opusRate = SERVER_RATE;  // rate the current decoder was configured for
+
+  async function _detectFormat() {
+    try {
+      if (window.AudioDecoder && (await AudioDecoder.isConfigSupported(OPUS_CONFIG)).supported) {
+        return 'opus';
+      }
+    } catch (err) {
+      // fall through
+    }
+    return 'adpcm';
+  }
+
+  function _ensureOpusDecoder() {
+    if (_opusDecoder && _opusDecoder.state !== 'closed') {
+      if (_opusRate === _rate) return _opusDecoder;
+      _opusDecoder.close();  // stream rate changed (re-listen after reconnect)
+    }
+    _opusDecoder = new AudioDecoder({
+      output: (audioData) => {
+        const float32 = new Float32Array(audioData.numberOfFrames);
+        audioData.copyTo(float32, { planeIndex: 0, format: 'f32-planar' });
+        const rate = audioData.sampleRate;
+        audioData.close();
+        if (isListening) playSamples(float32, rate);
+      },
+      error: (err) => console.error('[Audio] Opus decode error:', err),
+    });
+    _opusDecoder.configure({ ...OPUS_CONFIG, sampleRate: _rate });
+    _opusRate = _rate;
+    _opusTimestamp = 0;
+    return _opusDecoder;
+  }
+
+  function playOpus(data) {
+    const bytes = new Uint8Array(_toArrayBuffer(data));
+    const decoder = _ensureOpusDecoder();
+    let offset = 0;
+    while (offset + 2 <= bytes.length) {
+      const length = (bytes[offset] << 8) | bytes[offset + 1];
+      offset += 2;
+      decoder.decode(new EncodedAudioChunk({
+        type: 'key',
+        timestamp: _opusTimestamp,
+        data: bytes.subarray(offset, offset + length),
+      }));
+      _opusTimestamp += 20000;  // µs per packet
+      offset += length;
+    }
+  }
+
+  /**
+   * Play quiet white noise at the room's background level until sound resumes.
+   * The player switches to it once the audio already buffered has played.
+   */
+  function _startComfortNoise(dbfs) {
+    if (!_player) return;  // not without AudioWorklet
+    const amplitude = dbfs > -90 ? Math.pow(10, dbfs / 20) * Math.sqrt(3) : 0;  // uniform noise RMS = a / √3
+    _player.port.postMessage({ type: 'idle', idle: true, noise: amplitude });
+    _playerIdle = true;
+  }
+
+  function _stopComfortNoise() {
+    if (!_playerIdle) return;
+    _player.port.postMessage({ type: 'idle', idle: false });
+    _playerIdle = false;
+  }
+
+  async function _emitListenStart() {
+    if (!_preferredFormat) _preferredFormat = _detectFormat();
+    const format = await _preferredFormat;
+    await _ensurePlayer();
+    // Opus costs the same at any rate, so ask for ours; PCM / ADPCM bitrates
+    // grow with the rate, so those stay at 16 kHz and are resampled here
+    const rate = format === 'opus' ? _nativeRate() : undefined;
+    if (socket && isListening) socket.emit('audio_listen_start', { format, rate });
+  }
+
   function startListening() {
     if (isListening) return;
     connect();
@@ -161,7 +450,7 @@ const PetAudio = (() => {
     isListening = true;
     _wasListening = true;
     nextPlayTime = 0;
-    socket.emit('audio_listen_start');
+    _emitListenStart();
   }
 
   function stopListening() {
@@ -170,6 +459,10 @@ const PetAudio = (() => {
     _wasListening = false;
     nextPlayTime = 0;
     if (socket) socket.emit('audio_listen_stop');
+    if (_player) _player.port.postMessage({ type: 'reset' });
+    _playerIdle = false;
+    if (_opusDecoder && _opusDecoder.state !== 'closed') _opusDecoder.close();
+    _opusDecoder = null;
   }
 
   async function startTalking() {
@@ -193,32 +486,48 @@ const PetAudio = (() => {
     }
 
     isTalking = true;
-    socket.emit('audio_talk_start');
-
-    const source = audioCtx.createMediaStreamSource(mediaStream);
-    const processor = audioCtx.createScriptProcessor(4096, 1, 1);
-    const ctxRate = audioCtx.sampleRate;
 
-    processor.onaudioprocess = (e) => {
-      if (!isTalking || !socket) return;
-      const float32 = e.inputBuffer.getChannelData(0);
+    // Rate of the PCM fallback: ours if the server resamples it, else 16 kHz
+    _talkRate = _nativeRate() || SERVER_RATE;
+    const micTrack = mediaStream.getAudioTracks()[0];
+    if (typeof PetWebRTC !== 'undefined' && await PetWebRTC.setTalkTrack(micTrack)) {
+      _talkViaWebRTC = true;
+      socket.emit('audio_talk_start', { pc_id: PetWebRTC.pcId, rate: _talkRate });
+      return;
+    }
 
-      // Downsample from AudioContext rate to 16kHz server rate
-      const resampled = resample(float32, ctxRate, SERVER_RATE);
+    socket.emit('audio_talk_start', { rate: _talkRate });
+    _startPcmTalk();
+  }
 
-      const int16 = new Int16Array(resampled.length);
-      for (let i = 0; i < resampled.length; i++) {
-        const s = Math.max(-1, Math.min(1, resampled[i]));
-        int16[i] = s < 0 ? s * 0x8000 : s * 0x7FFF;
-      }
-      socket.emit('audio_talk', int16.buffer);
+  /**
+   * Fallback talk path: the pet-capture worklet sends CAPTURE_CHUNK_MS of
+   * int16 PCM at _talkRate (converted there only if the server can't take ours).
+   */
+  async function _startPcmTalk() {
+    if (!mediaStream) return;
+    if (!(await _loadWorklet())) {
+      console.error('[Audio] AudioWorklet unavailable, cannot send talk-back audio');
+      return;
+    }
+    if (!isTalking || !mediaStream || _talkNode) return;  // released (or started) meanwhile
+    const source = audioCtx.createMediaStreamSource(mediaStream);
+    const node = new AudioWorkletNode(audioCtx, 'pet-capture', {
+      numberOfInputs: 1,
+      numberOfOutputs: 1,
+      outputChannelCount: [1],
+      channelCount: 1,
+      channelCountMode: 'explicit',
+      processorOptions: { rate: _talkRate, chunkMs: CAPTURE_CHUNK_MS },
+    });
+    node.port.onmessage = (e) => {
+      if (isTalking && socket) socket.emit('audio_talk', e.data);
     };
-
-    source.connect(processor);
-    processor.connect(audioCtx.destination);
+    source.connect(node);
+    node.connect(audioCtx.destination);  // keeps it rendering; the output is silent
 
     _talkSource = source;
-    _talkProcessor = processor;
+    _talkNode = node;
   }
 
   function stopTalking() {
@@ -227,10 +536,14 @@ const PetAudio = (() => {
 
     if (socket) socket.emit('audio_talk_stop');
 
-    if (_talkProcessor) {
-      _talkProcessor.disconnect();
-      _talkProcessor.onaudioprocess = null;
-      _talkProcessor = null;
+    if (_talkViaWebRTC) {
+      _talkViaWebRTC = false;
+      PetWebRTC.setTalkTrack(null);
+    }
+    if (_talkNode) {
+      _talkNode.port.postMessage({ type: 'stop' });
+      _talkNode.disconnect();
+      _talkNode = null;
     }
     if (_talkSource) {
       _talkSource.disconnect();
@@ -244,6 +557,7 @@ const PetAudio = (() => {
 
   function setVolume(v) {
     volume = Math.max(0, Math.min(1, v));
+    if (_playerGain) _playerGain.gain.value = volume;
   }
 
   // ---- Visibility change: resume AudioContext if suspended ----
@@ -290,5 +604,11 @@ const PetAudio = (() => {
     get isTalking() { return isTalking; },
     get isBlocked() { return isBlocked; },
     set onBlockedChange(fn) { _onBlockedChange = fn; },
+    set onActivity(fn) { _onActivity = fn; },
+    set onDeviceChange(fn) { _onDeviceChange = fn; },
+    set onSoundEvent(fn) { _onSoundEvent = fn; },
+    get deviceStates() { return deviceStates; },
+    /** Listening buffer once a second: {depth_ms, target_ms, underruns, dropped_ms} (AudioWorklet only). */
+    get playbackStats() { return _playbackStats; },
   };
 })();
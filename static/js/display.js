@@ -1,10 +1,13 @@
 /**
  * DNG Camera — Display page (Phase 2)
- * Receives video frames from smartphone via Socket.IO and renders them.
+ * Receives the smartphone's video and renders it: over WebRTC (the phone's
+ * encoded track, forwarded by the server) where possible, else as JPEG frames
+ * via Socket.IO.
  * Includes auto-reconnect, Wake Lock re-acquisition, and visibility recovery.
  */
 (() => {
   const img = document.getElementById('display-video');
+  const video = document.getElementById('display-webrtc');
   const statusEl = document.getElementById('display-status');
   const noSignalEl = document.getElementById('no-signal');
 
@@ -13,6 +16,8 @@
   let hideStatusTimer = null;
   let wakeLock = null;
   let heartbeatInterval = null;
+  let pc = null;  // WebRTC connection for the forwarded owner video
+  let jpegJoined = false;  // receiving video_frame JPEGs (the server's relay)
 
   // ---- Clear video (show black screen) ----
   function clearVideo() {
@@ -22,11 +27,114 @@
     }
     img.removeAttribute('src');
     img.classList.add('hidden');
+    video.classList.add('hidden');  // keeps its stream: frames resume on their own
     noSignalEl.classList.remove('hidden');
     clearTimeout(hideStatusTimer);
     hideStatusTimer = null;
   }
 
+  // ---- A frame is on screen: hide status, clear the video if frames stop ----
+  function frameShown(el) {
+    el.classList.remove('hidden');
+    statusEl.classList.add('hidden');
+    noSignalEl.classList.add('hidden');
+
+    clearTimeout(hideStatusTimer);
+    hideStatusTimer = setTimeout(() => {
+      clearVideo();
+      statusEl.textContent = '映像が途切れました';
+      statusEl.classList.remove('hidden');
+    }, 3000);
+  }
+
+  // ---- WebRTC: the owner's track forwarded by the server ----
+  async function startWebRTC() {
+    if (!window.RTCPeerConnection) return false;
+    closeWebRTC();
+    const peer = new RTCPeerConnection({ iceServers: [] });
+    pc = peer;
+    try {
+      peer.addTransceiver('video', { direction: 'recvonly' });
+      peer.ontrack = (event) => {
+        video.srcObject = new MediaStream([event.track]);
+        video.play().catch(e => console.warn('[Display] Autoplay blocked:', e));
+        watchFrames(peer);
+      };
+
+      await peer.setLocalDescription(await peer.createOffer());
+      await waitIceGathering(peer);
+      const answer = await socket.timeout(15000).emitWithAck('display_webrtc', {
+        sdp: peer.localDescription.sdp,
+        type: 'offer',
+      });
+      if (answer.error) throw new Error(answer.error.code + ': ' + answer.error.message);
+      if (pc !== peer) return false;  // disconnected meanwhile
+      await peer.setRemoteDescription({ sdp: answer.sdp, type: 'answer' });
+
+      peer.onconnectionstatechange = () => {
+        if (peer.connectionState === 'failed' && pc === peer) {
+          console.warn('[Display] WebRTC failed — switching to JPEG frames');
+          closeWebRTC();
+          joinJpeg(true);
+        }
+      };
+      console.log('[Display] Receiving over WebRTC (pc_id=' + answer.pc_id + ')');
+      return true;
+    } catch (err) {
+      console.warn('[Display] WebRTC unavailable — using JPEG frames:', err);
+      if (pc === peer) closeWebRTC();
+      return false;
+    }
+  }
+
+  function closeWebRTC() {
+    if (pc) {
+      pc.close();
+      pc = null;
+    }
+    video.srcObject = null;
+    video.classList.add('hidden');
+  }
+
+  function joinJpeg(on) {
+    if (on === jpegJoined || !socket || !socket.connected) return;
+    jpegJoined = on;
+    socket.emit(on ? 'display_join' : 'display_leave');
+  }
+
+  /** Call frameShown for every decoded frame of *peer*'s video. */
+  function watchFrames(peer) {
+    const onFrame = () => {
+      if (pc !== peer) return;
+      frameShown(video);
+      next();
+    };
+    const next = 'requestVideoFrameCallback' in HTMLVideoElement.prototype
+      ? () => video.requestVideoFrameCallback(onFrame)
+      : () => video.addEventListener('timeupdate', onFrame, { once: true });
+    next();
+  }
+
+  function waitIceGathering(peer) {
+    return new Promise((resolve) => {
+      if (peer.iceGatheringState === 'complete') {
+        resolve();
+        return;
+      }
+      const check = () => {
+        if (peer.iceGatheringState === 'complete') {
+          peer.removeEventListener('icegatheringstatechange', check);
+          resolve();
+        }
+      };
+      peer.addEventListener('icegatheringstatechange', check);
+      setTimeout(() => {
+        peer.removeEventListener('icegatheringstatechange', check);
+        resolve();
+      }, 5000);
+    });
+  }
+
   // ---- Socket.IO connection with resilience ----
   function connect() {
     socket = io('/video', {
@@ -40,10 +148,13 @@
       timeout: 20000,
     });
 
-    socket.on('connect', () => {
+    socket.on('connect', async () => {
       console.log('[Display] Connected');
       statusEl.textContent = '接続完了 — 映像待機中...';
-      socket.emit('display_join');
+      jpegJoined = false;
+      if (!await startWebRTC()) {
+        joinJpeg(true);
+      }
 
       // Session TTL heartbeat: extend display session every 6 hours
       if (heartbeatInterval) clearInterval(heartbeatInterval);
@@ -77,7 +188,8 @@
       statusEl.classList.remove('hidden');
     });
 
-    socket.on('video_frame', (data) => {
+    // The server sends the next (newest) frame only after this one is acked
+    socket.on('video_frame', (data, ack) => {
       try {
         // Revoke previous blob URL to prevent memory leak
         if (currentBlobUrl) {
@@ -87,26 +199,20 @@
         const blob = new Blob([data], { type: 'image/jpeg' });
         currentBlobUrl = URL.createObjectURL(blob);
         img.src = currentBlobUrl;
-        img.classList.remove('hidden');
-
-        // Hide status text and no-signal when receiving frames
-        statusEl.classList.add('hidden');
-        noSignalEl.classList.add('hidden');
-
-        // Reset the hide timer — clear video if frames stop
-        clearTimeout(hideStatusTimer);
-        hideStatusTimer = setTimeout(() => {
-          clearVideo();
-          statusEl.textContent = '映像が途切れました';
-          statusEl.classList.remove('hidden');
-        }, 3000);
+        frameShown(img);
+        if (ack) img.decode().then(() => ack(), () => ack());
       } catch (err) {
         console.error('[Display] Frame processing error:', err);
+        if (ack) ack();
       }
     });
 
     socket.on('video_status', (status) => {
       console.log('[Display] Status:', status);
+      if (pc) {
+        // JPEG frames only while the phone is sending without WebRTC
+        joinJpeg(status.sending && !status.webrtc_publishing);
+      }
       if (!status.sending) {
         clearVideo();
         statusEl.textContent = '映像待機中...';
@@ -116,6 +222,7 @@
 
     socket.on('disconnect', (reason) => {
       console.log('[Display] Disconnected:', reason);
+      closeWebRTC();  // the server closes its side with the socket
       clearVideo();
       statusEl.textContent = '切断されました — 再接続中...';
       statusEl.classList.remove('hidden');
@@ -0,0 +1,92 @@
+/**
+ * DNG Camera — LL-HLS fallback player
+ * Used when WebRTC cannot connect (blocked UDP, peer limit reached).
+ * Safari plays the playlist natively; other browsers load hls.js on demand.
+ */
+const PetHLS = (() => {
+  const PLAYLIST_URL = '/hls/stream.m3u8';
+  const HLSJS_URL = 'https://cdn.jsdelivr.net/npm/hls.js@1.5.17/dist/hls.min.js';
+
+  let _videoEl = null;
+  let _hls = null;
+  let _active = false;
+  let _hlsjsLoading = null;
+
+  function _loadHlsJs() {
+    if (window.Hls) return Promise.resolve();
+    if (!_hlsjsLoading) {
+      _hlsjsLoading = new Promise((resolve, reject) => {
+        const script = document.createElement('script');
+        script.src = HLSJS_URL;
+        script.onload = resolve;
+        script.onerror = () => {
+          _hlsjsLoading = null;
+          reject(new Error('hls.js failed to load'));
+        };
+        document.head.appendChild(script);
+      });
+    }
+    return _hlsjsLoading;
+  }
+
+  /**
+   * Start HLS playback on the given video element.
+   * @param {HTMLVideoElement} videoEl
+   * @returns {Promise<boolean>}
+   */
+  async function start(videoEl) {
+    stop();
+    _videoEl = videoEl;
+    _active = true;
+    videoEl.srcObject = null;
+
+    if (videoEl.canPlayType('application/vnd.apple.mpegurl')) {
+      videoEl.src = PLAYLIST_URL;
+    } else {
+      try {
+        await _loadHlsJs();
+      } catch (err) {
+        console.error('[HLS]', err);
+        _active = false;
+        return false;
+      }
+      if (!_active || !window.Hls.isSupported()) {
+        _active = false;
+        return false;
+      }
+      _hls = new window.Hls({ lowLatencyMode: true, backBufferLength: 10 });
+      _hls.on(window.Hls.Events.ERROR, (event, data) => {
+        if (!data.fatal) return;
+        console.warn('[HLS] Fatal error:', data.type, data.details);
+        if (data.type === window.Hls.ErrorTypes.MEDIA_ERROR) {
+          _hls.recoverMediaError();
+        } else {
+          _hls.startLoad();
+        }
+      });
+      _hls.loadSource(PLAYLIST_URL);
+      _hls.attachMedia(videoEl);
+    }
+    videoEl.play().catch(e => console.warn('[HLS] Autoplay blocked:', e));
+    console.log('[HLS] Playback started');
+    return true;
+  }
+
+  function stop() {
+    if (_hls) {
+      _hls.destroy();
+      _hls = null;
+    }
+    if (_videoEl && _active) {
+      _videoEl.removeAttribute('src');
+      _videoEl.load();
+    }
+    _active = false;
+  }
+
+  return {
+    start,
+    stop,
+    get isActive() { return _active; },
+  };
+})();
@@ -1,6 +1,9 @@
 /**
  * DNG Camera — WebRTC video module
- * Receives WebRTC video from the server.
+ * Receives WebRTC video from the server and, while push-to-talk is held,
+ * sends the microphone as an Opus track on the same peer connection.
+ * A "control" data channel on the same connection carries settings commands
+ * and pushed status, so a connected viewer makes no further HTTP requests.
  *
  * State transitions:
  *   IDLE -> CONNECTING -> CONNECTED -> (DISCONNECTED -> CONNECTING | IDLE)
@@ -10,6 +13,15 @@ const PetWebRTC = (() => {
   let pc = null;
   let pcId = null;
   let _videoEl = null;
+  let _talkSender = null;
+  let _profile = null;  // encoder profile requested from the server (null = default)
+
+  // ── Control channel ──
+  let _control = null;
+  let _nextCommandId = 1;
+  const _pendingCommands = new Map();  // id -> {resolve, reject, timer}
+  let _status = null;  // latest status, kept current by server deltas
+  const COMMAND_TIMEOUT = 10000;
 
   // ── State ──
   let _isClosing = false;
@@ -22,6 +34,8 @@ const PetWebRTC = (() => {
   // ── Callbacks ──
   let _onConnected = null;
   let _onDisconnected = null;
+  let _onFailed = null;
+  let _onStatus = null;
 
   /**
    * Start a WebRTC connection.
@@ -79,6 +93,12 @@ const PetWebRTC = (() => {
       // Receive-only video
       pc.addTransceiver('video', { direction: 'recvonly' });
 
+      // Send-only audio for talk-back. No track until push-to-talk is held;
+      // replaceTrack() attaches the microphone without renegotiation.
+      _talkSender = pc.addTransceiver('audio', { direction: 'sendonly' }).sender;
+
+      _openControlChannel(pc);
+
       const offer = await pc.createOffer();
       await pc.setLocalDescription(offer);
 
@@ -91,11 +111,14 @@ const PetWebRTC = (() => {
         body: JSON.stringify({
           sdp: pc.localDescription.sdp,
           type: 'offer',
+          profile: _profile || undefined,
         }),
       });
 
       if (!res.ok) {
-        throw new Error('Server returned ' + res.status);
+        const err = new Error('Server returned ' + res.status);
+        err.status = res.status;
+        throw err;
       }
 
       const answer = await res.json();
@@ -111,6 +134,7 @@ const PetWebRTC = (() => {
     } catch (err) {
       console.error('[WebRTC] Connection failed:', err);
       _internalClose();
+      if (_onFailed) _onFailed(err.status || 0);
       if (!_isClosing) {
         _scheduleRetry(0);
       }
@@ -165,7 +189,102 @@ const PetWebRTC = (() => {
     }
   }
 
+  function _openControlChannel(peerConnection) {
+    const channel = peerConnection.createDataChannel('control');
+    channel.onmessage = (event) => {
+      let msg;
+      try {
+        msg = JSON.parse(event.data);
+      } catch (err) {
+        return;
+      }
+      if (msg.type === 'ack') {
+        const pending = _pendingCommands.get(msg.id);
+        if (!pending) return;
+        _pendingCommands.delete(msg.id);
+        clearTimeout(pending.timer);
+        if (msg.ok) {
+          pending.resolve(msg.result);
+        } else {
+          const err = new Error(msg.error?.message || 'Command failed');
+          err.code = msg.error?.code;
+          pending.reject(err);
+        }
+      } else if (msg.type === 'status') {
+        _status = msg.full ? msg.data : _mergeDelta(_status || {}, msg.delta || {});
+        if (msg.removed) _removePaths(_status, msg.removed);
+        if (_onStatus) _onStatus(_status);
+      }
+    };
+    channel.onclose = () => {
+      if (_control === channel) _resetControl();
+    };
+    _control = channel;
+  }
+
+  function _mergeDelta(target, delta) {
+    for (const [key, value] of Object.entries(delta)) {
+      if (value !== null && typeof value === 'object' && !Array.isArray(value)
+          && typeof target[key] === 'object' && target[key] !== null) {
+        _mergeDelta(target[key], value);
+      } else {
+        target[key] = value;  // including null: a removed key is listed in "removed"
+      }
+    }
+    return target;
+  }
+
+  /** Delete each key path (["audio", "jitter"]) the server reported as removed. */
+  function _removePaths(target, paths) {
+    for (const path of paths) {
+      let parent = target;
+      for (const key of path.slice(0, -1)) parent = parent?.[key];
+      if (parent && typeof parent === 'object') delete parent[path[path.length - 1]];
+    }
+  }
+
+  function _resetControl() {
+    if (_control) {
+      _control.onmessage = null;
+      _control.onclose = null;
+      _control.close();
+      _control = null;
+    }
+    _status = null;
+    for (const pending of _pendingCommands.values()) {
+      clearTimeout(pending.timer);
+      pending.reject(new Error('Control channel closed'));
+    }
+    _pendingCommands.clear();
+  }
+
+  /**
+   * Send a command over the control channel.
+   * @param {string} type - e.g. "settings.set", "camera.switch"
+   * @param {object} [params]
+   * @returns {Promise<object>} the command result; rejects with err.code on error
+   */
+  function command(type, params = {}) {
+    if (!isControlReady()) {
+      return Promise.reject(new Error('Control channel not open'));
+    }
+    const id = _nextCommandId++;
+    return new Promise((resolve, reject) => {
+      const timer = setTimeout(() => {
+        _pendingCommands.delete(id);
+        reject(new Error('Command timed out'));
+      }, COMMAND_TIMEOUT);
+      _pendingCommands.set(id, { resolve, reject, timer });
+      _control.send(JSON.stringify({ ...params, id, type }));
+    });
+  }
+
+  function isControlReady() {
+    return _control !== null && _control.readyState === 'open';
+  }
+
   function _internalClose() {
+    _resetControl();
     if (pcId) {
       // Notify server (best-effort, keepalive survives pagehide)
       fetch('/api/webrtc/' + pcId, { method: 'DELETE', keepalive: true }).catch(() => {});
@@ -179,6 +298,23 @@ const PetWebRTC = (() => {
       pc.close();
       pc = null;
     }
+    _talkSender = null;
+  }
+
+  /**
+   * Attach (or detach with null) the talk-back microphone track.
+   * @param {MediaStreamTrack|null} track
+   * @returns {Promise<boolean>} false if there is no usable connection
+   */
+  async function setTalkTrack(track) {
+    if (!_talkSender || !isConnected()) return false;
+    try {
+      await _talkSender.replaceTrack(track);
+      return true;
+    } catch (err) {
+      console.warn('[WebRTC] replaceTrack failed:', err);
+      return false;
+    }
   }
 
   /**
@@ -198,7 +334,21 @@ const PetWebRTC = (() => {
     connect,
     close,
     isConnected,
+    setTalkTrack,
+    command,
+    get controlReady() { return isControlReady(); },
+    /** Latest pushed status (null until the control channel delivers one). */
+    get status() { return _status; },
+    get pcId() { return pcId; },
+    /** Resolves once *peerConnection* has gathered its ICE candidates (or after 5 s). */
+    waitIceGathering: _waitIceGathering,
+    /** Encoder profile for the next connect() ("low_latency", "balanced", "quality"). */
+    set profile(name) { _profile = name; },
     set onConnected(fn) { _onConnected = fn; },
     set onDisconnected(fn) { _onDisconnected = fn; },
+    /** Called with the HTTP status (0 if none) when an offer attempt fails. */
+    set onFailed(fn) { _onFailed = fn; },
+    /** Called with the full, merged status whenever the server pushes an update. */
+    set onStatus(fn) { _onStatus = fn; },
   };
 })();
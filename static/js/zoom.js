@@ -0,0 +1,140 @@
+/**
+ * DNG Camera — pinch-to-zoom on the live video
+ * Tracks pinch / pan / double-tap on the video element and reports the
+ * visible region as a normalised rectangle. The server crops the
+ * capture to it (ROI) and encodes the crop at the full bitrate, so zooming
+ * does not enlarge the full frame's compression artefacts.
+ */
+const PetZoom = (() => {
+  const MAX_ZOOM = 4;           // matches WEBRTC_ROI_MAX_ZOOM on the server
+  const DOUBLE_TAP_MS = 300;
+
+  let _el = null;
+  let _onChange = null;
+  let _zoom = 1;
+  let _cx = 0.5;
+  let _cy = 0.5;
+  let _pinch = null;
+  let _pan = null;
+  let _lastTap = 0;
+  let _emitPending = false;
+
+  /**
+   * @param {HTMLElement} el - element receiving the gestures (the video)
+   * @param {function(?{x:number,y:number,w:number,h:number})} onChange -
+   *   called with the visible region, or null when zoomed out
+   */
+  function attach(el, onChange) {
+    _el = el;
+    _onChange = onChange;
+    el.addEventListener('touchstart', _onTouchStart, { passive: false });
+    el.addEventListener('touchmove', _onTouchMove, { passive: false });
+    el.addEventListener('touchend', _onTouchEnd);
+    el.addEventListener('touchcancel', _onTouchEnd);
+    _updateTouchAction();
+  }
+
+  function _point(touch) {
+    const r = _el.getBoundingClientRect();
+    return { x: (touch.clientX - r.left) / r.width, y: (touch.clientY - r.top) / r.height };
+  }
+
+  function _distance(a, b) {
+    return Math.hypot(a.clientX - b.clientX, a.clientY - b.clientY);
+  }
+
+  function _onTouchStart(e) {
+    if (e.touches.length === 2) {
+      const [a, b] = e.touches;
+      const mid = _point({ clientX: (a.clientX + b.clientX) / 2, clientY: (a.clientY + b.clientY) / 2 });
+      // Frame point under the fingers, kept there while the zoom changes
+      _pinch = {
+        dist: _distance(a, b),
+        zoom: _zoom,
+        mid,
+        fx: _cx + (mid.x - 0.5) / _zoom,
+        fy: _cy + (mid.y - 0.5) / _zoom,
+      };
+      _pan = null;
+      e.preventDefault();
+    } else if (e.touches.length === 1 && _zoom > 1) {
+      const p = _point(e.touches[0]);
+      _pan = { x: p.x, y: p.y, cx: _cx, cy: _cy };
+    }
+  }
+
+  function _onTouchMove(e) {
+    if (_pinch && e.touches.length === 2) {
+      const [a, b] = e.touches;
+      _zoom = Math.min(MAX_ZOOM, Math.max(1, _pinch.zoom * _distance(a, b) / _pinch.dist));
+      _cx = _pinch.fx - (_pinch.mid.x - 0.5) / _zoom;
+      _cy = _pinch.fy - (_pinch.mid.y - 0.5) / _zoom;
+      _clampAndEmit();
+      e.preventDefault();
+    } else if (_pan && e.touches.length === 1) {
+      const p = _point(e.touches[0]);
+      _cx = _pan.cx - (p.x - _pan.x) / _zoom;
+      _cy = _pan.cy - (p.y - _pan.y) / _zoom;
+      _clampAndEmit();
+      e.preventDefault();
+    }
+  }
+
+  function _onTouchEnd(e) {
+    if (e.touches.length < 2) _pinch = null;
+    if (e.touches.length === 0) {
+      const moved = _pan && (_pan.cx !== _cx || _pan.cy !== _cy);
+      _pan = null;
+      if (e.changedTouches.length === 1 && !moved) {
+        const now = Date.now();
+        if (now - _lastTap < DOUBLE_TAP_MS) {
+          reset();
+          _lastTap = 0;
+          return;
+        }
+        _lastTap = now;
+      }
+    }
+  }
+
+  function _clampAndEmit() {
+    const half = 0.5 / _zoom;
+    _cx = Math.min(Math.max(_cx, half), 1 - half);
+    _cy = Math.min(Math.max(_cy, half), 1 - half);
+    _updateTouchAction();
+    // At most one update per animation frame
+    if (_emitPending) return;
+    _emitPending = true;
+    requestAnimationFrame(() => {
+      _emitPending = false;
+      if (_onChange) _onChange(region());
+    });
+  }
+
+  function _updateTouchAction() {
+    // Let the page scroll over the video unless it is zoomed in
+    if (_el) _el.style.touchAction = _zoom > 1 ? 'none' : 'pan-y';
+  }
+
+  /** Visible region (normalised), or null when not zoomed. */
+  function region() {
+    if (_zoom <= 1) return null;
+    const size = 1 / _zoom;
+    return { x: _cx - size / 2, y: _cy - size / 2, w: size, h: size };
+  }
+
+  /** Zoom out to the full frame. */
+  function reset() {
+    _zoom = 1;
+    _cx = 0.5;
+    _cy = 0.5;
+    _clampAndEmit();
+  }
+
+  return {
+    attach,
+    reset,
+    region,
+    get zoom() { return _zoom; },
+  };
+})();
@@ -5,13 +5,16 @@
  * Streaming data (WebSocket) is NOT cached.
  */
 
-const CACHE_NAME = "petcam-v18";
+const CACHE_NAME = "petcam-v35";
 const APP_SHELL = [
   "/",
   "/static/css/style.css",
   "/static/js/webrtc.js",
+  "/static/js/hls.js",
+  "/static/js/zoom.js",
   "/static/js/app.js",
   "/static/js/audio.js",
+  "/static/js/audio-worklet.js",
   "/static/js/display.js",
   "/static/img/icon-192.png",
   "/static/img/favicon.png",